@@ -130,6 +130,8 @@ def initialize_cache_system(app):
     app.config.setdefault('SERVICE_CACHE_MAX_MEMORY_MB', 500)
     app.config.setdefault('SERVICE_CACHE_DEFAULT_TTL', 1800)  # 30 minutes
     app.config.setdefault('SERVICE_CACHE_MAX_ENTRIES', 10000)
+    app.config.setdefault('SERVICE_CACHE_BACKEND', os.environ.get('SERVICE_CACHE_BACKEND', 'memory'))
+    app.config.setdefault('SERVICE_CACHE_REDIS_URL', os.environ.get('SERVICE_CACHE_REDIS_URL'))
     
     # Config Cache Settings
     app.config.setdefault('CONFIG_CACHE_ENABLED', True)
@@ -233,13 +235,11 @@ def create_app() -> Flask:
                 return jsonify({'success': False, 'message': 'Authentication required. Please log in.'}), 401
             return redirect(url_for('auth_views.login'))
 
-        # Set up user loader for Flask-Login using database_service
+        # Set up user loader for Flask-Login - cached principal, no query per request
         @login_manager.user_loader
         def load_user(user_id):
-            from app.models.transaction import User
-            from app.services.database_service import get_db_session
-            with get_db_session() as session:
-                return session.query(User).filter_by(user_id=user_id).first()
+            from app.services.user_principal_service import get_user_principal
+            return get_user_principal(user_id)
         
         # Register menu context processor
         from app.services.menu_service import register_menu_context_processor
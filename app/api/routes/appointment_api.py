@@ -16,7 +16,7 @@ import logging
 from datetime import datetime, date, time, timedelta, timezone
 from typing import Dict, List, Optional
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, make_response
 from flask_login import current_user, login_required
 from sqlalchemy import func
 
@@ -31,6 +31,12 @@ from app.models.transaction import User
 from app.models.master import Staff, Patient, Branch, StaffSpecialization
 from app.security.authorization.decorators import token_required
 from app.services.branch_service import get_user_branch_id as get_branch_id_from_service
+from app.services.user_principal_service import get_user_principal
+from app.services.appointment_feed_service import (
+    allocation_conditions, appointment_conditions, calendar_event, feed_etag, load_allocations,
+    load_appointments, queue_item, resolve_names, resource_booking
+)
+from app.services.appointment_event_service import event_stream, get_event_broker
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -47,12 +53,31 @@ def get_user_branch_id_safe(user_id, hospital_id):
     """
     try:
         if user_id and hospital_id:
+            # Cached request principal carries the resolved branch
+            principal = get_user_principal(user_id)
+            if principal and str(principal.hospital_id) == str(hospital_id):
+                return principal.branch_id
             return get_branch_id_from_service(user_id, hospital_id)
     except Exception as e:
         logger.warning(f"Error getting branch from service: {e}")
     return None
 
 
+def conditional_feed_response(etag: str, build):
+    """
+    304 when the client already holds etag, else build()'s response.
+    Feeds are revalidated on every request (no-cache), so polling screens
+    only download a feed when it changed.
+    """
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # =============================================================================
 # SLOT AVAILABILITY ENDPOINTS
 # =============================================================================
@@ -1018,7 +1043,9 @@ def generate_slots(user_id, session):
         - staff_id: Optional (generate for specific doctor)
         - start_date: Optional (defaults to today)
         - end_date: Optional (defaults to 7 days from start)
-        - regenerate: Optional (delete and regenerate unbooked slots)
+        - regenerate: Optional (replace unbooked slots that no longer match the schedule)
+        - dry_run: Optional (return the diff without writing anything)
+        - parallel: Optional (process doctors concurrently, committed per doctor)
     """
     try:
         data = request.get_json() or {}
@@ -1037,40 +1064,34 @@ def generate_slots(user_id, session):
             end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
 
         regenerate = data.get('regenerate', False)
+        dry_run = data.get('dry_run', False)
+        max_workers = current_app.config.get('SLOT_GENERATION_WORKERS', 4) if data.get('parallel') else 1
 
         branch_id = uuid.UUID(data['branch_id']) if data.get('branch_id') else get_user_branch_id_safe(user.user_id, user.hospital_id)
         staff_id = uuid.UUID(data['staff_id']) if data.get('staff_id') else None
 
-        total_slots = 0
+        result = slot_generator_service.generate_slots(
+            session=session,
+            branch_id=branch_id,
+            start_date=start_date,
+            end_date=end_date,
+            staff_ids=[staff_id] if staff_id else None,
+            regenerate=regenerate,
+            dry_run=dry_run,
+            max_workers=max_workers
+        )
 
-        if staff_id:
-            # Generate for specific doctor
-            slots = slot_generator_service.generate_slots_for_doctor(
-                session=session,
-                staff_id=staff_id,
-                branch_id=branch_id,
-                start_date=start_date,
-                end_date=end_date,
-                regenerate=regenerate
-            )
-            total_slots = len(slots)
+        if dry_run:
+            session.rollback()
         else:
-            # Generate for all doctors in branch
-            results = slot_generator_service.generate_slots_for_branch(
-                session=session,
-                branch_id=branch_id,
-                start_date=start_date,
-                end_date=end_date,
-                regenerate=regenerate
-            )
-            total_slots = sum(len(slots) for slots in results.values())
-
-        session.commit()
+            session.commit()
 
+        summary = result.to_dict(include_diff=dry_run)
+        verb = 'Would generate' if dry_run else 'Generated'
         return jsonify({
             'success': True,
-            'message': f'Generated {total_slots} slots',
-            'slots_created': total_slots,
+            'message': f"{verb} {summary['slots_created']} slots",
+            **summary,
             'date_range': {
                 'start': start_date.isoformat(),
                 'end': end_date.isoformat()
@@ -1368,90 +1389,38 @@ def get_calendar_events():
         end_date = parse_date_from_iso(end_str, date.today() + timedelta(days=7))
 
 
+        staff_uuid = None
+        if staff_id:
+            try:
+                staff_uuid = uuid.UUID(staff_id)
+            except ValueError:
+                pass
+
         with get_db_session() as session:
-            # Build query
-            query = session.query(Appointment).filter(
-                Appointment.hospital_id == hospital_id,
-                Appointment.appointment_date >= start_date,
-                Appointment.appointment_date <= end_date,
-                Appointment.is_deleted == False
+            conditions = appointment_conditions(
+                hospital_id, start_date, end_date, branch_id=branch_id, staff_id=staff_uuid
             )
+            etag = feed_etag(session, conditions, 'calendar-events', hospital_id, branch_id,
+                             start_date, end_date, staff_uuid)
 
-            # Apply branch filter
-            if branch_id:
-                query = query.filter(Appointment.branch_id == branch_id)
+            def build():
+                appointments = load_appointments(session, conditions)
+                logger.info(f"[CALENDAR-EVENTS] Found {len(appointments)} appointments")
 
-            # Apply staff filter
-            if staff_id:
-                try:
-                    query = query.filter(Appointment.staff_id == uuid.UUID(staff_id))
-                except ValueError:
-                    pass
-
-            # Exclude cancelled/no-show by default (optional)
-            # query = query.filter(Appointment.status.notin_(['cancelled', 'no_show']))
-
-            appointments = query.all()
-            logger.info(f"[CALENDAR-EVENTS] Found {len(appointments)} appointments")
-
-            # Format for FullCalendar
-            events = []
-            for appt in appointments:
-                # Get patient name
-                patient = session.query(Patient).filter_by(patient_id=appt.patient_id).first()
-                patient_name = patient.full_name if patient else 'Unknown'
-
-                # Get doctor name
-                doctor = session.query(Staff).filter_by(staff_id=appt.staff_id).first() if appt.staff_id else None
-                doctor_name = f"{doctor.first_name} {doctor.last_name or ''}".strip() if doctor else 'Unassigned'
-
-                # Create start/end datetime
-                start_datetime = datetime.combine(appt.appointment_date, appt.start_time) if appt.start_time else datetime.combine(appt.appointment_date, time(9, 0))
-                if appt.end_time:
-                    end_datetime = datetime.combine(appt.appointment_date, appt.end_time)
-                else:
-                    # Default 30 min duration
-                    end_datetime = start_datetime + timedelta(minutes=appt.estimated_duration_minutes or 30)
-
-                # Determine color based on status
-                color_map = {
-                    'requested': '#fbbf24',
-                    'confirmed': '#3b82f6',
-                    'checked_in': '#a855f7',
-                    'in_progress': '#f97316',
-                    'completed': '#22c55e',
-                    'cancelled': '#ef4444',
-                    'no_show': '#6b7280',
-                    'rescheduled': '#64748b'
-                }
+                names = resolve_names(
+                    session,
+                    patient_ids=[appt.patient_id for appt in appointments],
+                    staff_ids=[appt.staff_id for appt in appointments]
+                )
+                events = [calendar_event(appt, names) for appt in appointments]
 
-                events.append({
-                    'id': str(appt.appointment_id),
-                    'title': f"{patient_name} - {doctor_name}",
-                    'start': start_datetime.isoformat(),
-                    'end': end_datetime.isoformat(),
-                    'backgroundColor': color_map.get(appt.status, '#3b82f6'),
-                    'borderColor': color_map.get(appt.status, '#3b82f6'),
-                    'extendedProps': {
-                        'patient_id': str(appt.patient_id),
-                        'patient_name': patient_name,
-                        'doctor_id': str(appt.staff_id) if appt.staff_id else None,
-                        'doctor_name': doctor_name,
-                        'status': appt.status,
-                        'priority': appt.priority,
-                        'appointment_number': appt.appointment_number,
-                        'token_number': appt.token_number,
-                        'chief_complaint': appt.chief_complaint,
-                        'is_walk_in': appt.booking_source == 'walk_in',
-                        'is_follow_up': appt.is_follow_up
-                    }
-                })
+                return jsonify({
+                    'success': True,
+                    'events': events,
+                    'count': len(events)
+                }), 200
 
-            return jsonify({
-                'success': True,
-                'events': events,
-                'count': len(events)
-            }), 200
+            return conditional_feed_response(etag, build)
 
     except Exception as e:
         logger.error(f"Error fetching calendar events: {str(e)}", exc_info=True)
@@ -1490,10 +1459,9 @@ def get_resource_calendar():
             target_date = date.today()
 
         with get_db_session() as session:
-            from app.models.master import Room, Staff as MasterStaff, AppointmentResource
+            from app.models.master import Room
 
             resources = []
-            bookings = []
 
             if resource_type == 'room':
                 # Get all active rooms in branch
@@ -1510,44 +1478,11 @@ def get_resource_calendar():
                         'type': 'room'
                     })
 
-                # Get room bookings for this date
-                room_allocations = session.query(AppointmentResource).filter(
-                    AppointmentResource.resource_type == 'room',
-                    AppointmentResource.allocation_date == target_date,
-                    AppointmentResource.status.in_(['allocated', 'in_use'])
-                ).all()
-
-                # Helper to format time (handles both time objects and strings)
-                def format_time(t, default='09:00'):
-                    if t is None:
-                        return default
-                    if hasattr(t, 'strftime'):
-                        return t.strftime('%H:%M')
-                    if isinstance(t, str):
-                        return t[:5]
-                    return default
-
-                for alloc in room_allocations:
-                    # Get appointment details
-                    appt = session.query(Appointment).filter_by(
-                        appointment_id=alloc.appointment_id
-                    ).first()
-                    if not appt:
-                        continue
-
-                    patient = session.query(Patient).filter_by(patient_id=appt.patient_id).first()
-                    doctor = session.query(Staff).filter_by(staff_id=appt.staff_id).first() if appt.staff_id else None
+                conditions = allocation_conditions(hospital_id, 'room', target_date)
+                etag_conditions = dict(join_allocations=True)
 
-                    bookings.append({
-                        'resource_id': str(alloc.resource_id),
-                        'appointment_id': str(appt.appointment_id),
-                        'patient_name': patient.full_name if patient else 'Unknown',
-                        'doctor_name': f"Dr. {doctor.first_name}" if doctor else None,
-                        'service_name': None,  # Could fetch if needed
-                        'start_time': format_time(alloc.start_time, '09:00'),
-                        'end_time': format_time(alloc.end_time, '09:30'),
-                        'status': appt.status
-                    })
+                def load_rows():
+                    return load_allocations(session, hospital_id, 'room', target_date)
 
             elif resource_type == 'doctor':
                 # Get all active doctors in branch
@@ -1566,40 +1501,25 @@ def get_resource_calendar():
                         'type': 'doctor'
                     })
 
-                # Get doctor appointments for this date
-                doctor_ids = [d.staff_id for d in doctors]
-                appointments = session.query(Appointment).filter(
-                    Appointment.staff_id.in_(doctor_ids),
-                    Appointment.appointment_date == target_date,
-                    Appointment.is_deleted == False,
-                    Appointment.status.notin_(['cancelled', 'no_show'])
-                ).all()
-
-                for appt in appointments:
-                    patient = session.query(Patient).filter_by(patient_id=appt.patient_id).first()
-
-                    start_time = appt.start_time.strftime('%H:%M') if appt.start_time else '09:00'
-                    end_time = appt.end_time.strftime('%H:%M') if appt.end_time else '09:30'
+                # Doctor appointments for this date
+                conditions = appointment_conditions(
+                    hospital_id, target_date, target_date,
+                    staff_ids=[d.staff_id for d in doctors],
+                    exclude_statuses=('cancelled', 'no_show')
+                )
+                etag_conditions = {}
 
-                    bookings.append({
-                        'resource_id': str(appt.staff_id),
-                        'appointment_id': str(appt.appointment_id),
-                        'patient_name': patient.full_name if patient else 'Unknown',
-                        'doctor_name': None,
-                        'service_name': None,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'status': appt.status
-                    })
+                def load_rows():
+                    return load_appointments(session, conditions)
 
             elif resource_type == 'therapist':
                 # Get all active therapists/nurses in branch
-                therapists = session.query(MasterStaff).filter(
-                    MasterStaff.branch_id == branch_id,
-                    MasterStaff.staff_type.in_(['therapist', 'nurse', 'technician']),
-                    MasterStaff.is_active == True,
-                    MasterStaff.is_deleted == False
-                ).order_by(MasterStaff.first_name).all()
+                therapists = session.query(Staff).filter(
+                    Staff.branch_id == branch_id,
+                    Staff.staff_type.in_(['therapist', 'nurse', 'technician']),
+                    Staff.is_active == True,
+                    Staff.is_deleted == False
+                ).order_by(Staff.first_name).all()
 
                 for ther in therapists:
                     resources.append({
@@ -1609,55 +1529,45 @@ def get_resource_calendar():
                         'type': 'therapist'
                     })
 
-                # Get staff allocations for this date
-                staff_allocations = session.query(AppointmentResource).filter(
-                    AppointmentResource.resource_type == 'staff',
-                    AppointmentResource.allocation_date == target_date,
-                    AppointmentResource.status.in_(['allocated', 'in_use'])
-                ).all()
+                # Only allocations of the listed therapists
+                therapist_ids = {t.staff_id for t in therapists}
+                conditions = allocation_conditions(hospital_id, 'staff', target_date)
+                etag_conditions = dict(join_allocations=True)
 
-                for alloc in staff_allocations:
-                    # Check if this staff is in our therapist list
-                    if alloc.resource_id not in [t.staff_id for t in therapists]:
-                        continue
+                def load_rows():
+                    return [
+                        row for row in load_allocations(session, hospital_id, 'staff', target_date)
+                        if row.resource_id in therapist_ids
+                    ]
 
-                    appt = session.query(Appointment).filter_by(
-                        appointment_id=alloc.appointment_id
-                    ).first()
-                    if not appt:
-                        continue
-
-                    patient = session.query(Patient).filter_by(patient_id=appt.patient_id).first()
-                    doctor = session.query(Staff).filter_by(staff_id=appt.staff_id).first() if appt.staff_id else None
-
-                    # Helper to format time (handles both time objects and strings)
-                    def format_time_val(t, default='09:00'):
-                        if t is None:
-                            return default
-                        if hasattr(t, 'strftime'):
-                            return t.strftime('%H:%M')
-                        if isinstance(t, str):
-                            return t[:5]
-                        return default
-
-                    bookings.append({
-                        'resource_id': str(alloc.resource_id),
-                        'appointment_id': str(appt.appointment_id),
-                        'patient_name': patient.full_name if patient else 'Unknown',
-                        'doctor_name': f"Dr. {doctor.first_name}" if doctor else None,
-                        'service_name': None,
-                        'start_time': format_time_val(alloc.start_time, '09:00'),
-                        'end_time': format_time_val(alloc.end_time, '09:30'),
-                        'status': appt.status
-                    })
+            else:
+                conditions = None
+
+            def build():
+                bookings = []
+                if conditions is not None:
+                    rows = load_rows()
+                    names = resolve_names(
+                        session,
+                        patient_ids=[row.patient_id for row in rows],
+                        staff_ids=[row.staff_id for row in rows] if resource_type != 'doctor' else ()
+                    )
+                    bookings = [resource_booking(row, names) for row in rows]
 
-            return jsonify({
-                'success': True,
-                'date': target_date.isoformat(),
-                'resource_type': resource_type,
-                'resources': resources,
-                'bookings': bookings
-            }), 200
+                return jsonify({
+                    'success': True,
+                    'date': target_date.isoformat(),
+                    'resource_type': resource_type,
+                    'resources': resources,
+                    'bookings': bookings
+                }), 200
+
+            if conditions is None:
+                return build()
+
+            etag = feed_etag(session, conditions, 'resource-calendar', resource_type, target_date,
+                             [(r['id'], r['name'], r['subtitle']) for r in resources], **etag_conditions)
+            return conditional_feed_response(etag, build)
 
     except Exception as e:
         logger.error(f"Error fetching resource calendar: {str(e)}", exc_info=True)
@@ -3686,85 +3596,92 @@ def get_queue_web():
             else:
                 end_date = target_date
 
-            # Build query - filter from target_date to end_date
-            query = session.query(Appointment).filter(
-                Appointment.hospital_id == hospital_id,
-                Appointment.is_deleted == False,
-                Appointment.appointment_date >= target_date,
-                Appointment.appointment_date <= end_date
+            conditions = appointment_conditions(
+                hospital_id, target_date, end_date,
+                staff_id=uuid.UUID(staff_id) if staff_id else None,
+                status=status_filter
             )
+            # Waiting minutes age without the rows changing: today's queue is
+            # revalidated at most once a minute
+            minute = datetime.now(timezone.utc).strftime('%H:%M') if target_date <= date.today() <= end_date else None
+            etag = feed_etag(session, conditions, 'web-queue', hospital_id, target_date, end_date,
+                             staff_id, status_filter, minute)
+
+            def build():
+                # Order by date, then time
+                appointments = load_appointments(
+                    session, conditions, order_by=(Appointment.appointment_date, Appointment.start_time)
+                )
+                names = resolve_names(
+                    session,
+                    patient_ids=[appt.patient_id for appt in appointments],
+                    staff_ids=[appt.staff_id for appt in appointments]
+                )
+                queue = [queue_item(appt, names) for appt in appointments]
+
+                # Calculate summary
+                summary = {
+                    'total': len(queue),
+                    'waiting': sum(1 for q in queue if q['status'] == 'checked_in'),
+                    'in_progress': sum(1 for q in queue if q['status'] == 'in_progress'),
+                    'completed': sum(1 for q in queue if q['status'] == 'completed'),
+                    'confirmed': sum(1 for q in queue if q['status'] == 'confirmed')
+                }
 
-            if staff_id:
-                query = query.filter(Appointment.staff_id == uuid.UUID(staff_id))
+                return jsonify({
+                    'success': True,
+                    'queue': queue,
+                    'summary': summary,
+                    'date_range': date_range
+                }), 200
 
-            if status_filter:
-                query = query.filter(Appointment.status == status_filter)
+            return conditional_feed_response(etag, build)
 
-            # Order by date, then time
-            appointments = query.order_by(
-                Appointment.appointment_date,
-                Appointment.start_time
-            ).all()
+    except Exception as e:
+        logger.error(f"Error getting queue (web): {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
-            # Format queue items
-            queue = []
-            for appt in appointments:
-                # Get patient info
-                patient = session.query(Patient).filter_by(patient_id=appt.patient_id).first()
-                patient_name = patient.full_name if patient else 'Unknown'
-                patient_phone = ''
-                if patient and patient.contact_info:
-                    contact = patient.contact_info if isinstance(patient.contact_info, dict) else {}
-                    patient_phone = contact.get('phone', '')
-
-                # Get doctor info
-                doctor_name = ''
-                if appt.staff_id:
-                    doctor = session.query(Staff).filter_by(staff_id=appt.staff_id).first()
-                    if doctor:
-                        doctor_name = f"Dr. {doctor.first_name} {doctor.last_name or ''}".strip()
 
-                # Calculate waiting time
-                waiting_minutes = None
-                if appt.status == 'checked_in' and appt.check_in_time:
-                    waiting_minutes = int((datetime.now(timezone.utc) - appt.check_in_time).total_seconds() / 60)
-
-                queue.append({
-                    'appointment_id': str(appt.appointment_id),
-                    'appointment_number': appt.appointment_number,
-                    'patient_name': patient_name,
-                    'patient_phone': patient_phone,
-                    'patient_mrn': patient.mrn if patient else None,
-                    'doctor_name': doctor_name,
-                    'appointment_date': appt.appointment_date.strftime('%Y-%m-%d'),
-                    'appointment_time': appt.start_time.strftime('%H:%M') if appt.start_time else None,
-                    'status': appt.status,
-                    'priority': appt.priority or 'normal',
-                    'token_number': appt.token_number,
-                    'chief_complaint': appt.chief_complaint,
-                    'is_walk_in': appt.booking_source == 'walk_in',
-                    'is_follow_up': appt.is_follow_up,
-                    'waiting_minutes': waiting_minutes
-                })
+@appointment_api_bp.route('/web/queue/stream', methods=['GET'])
+@login_required
+def stream_queue_events():
+    """
+    Live appointment changes as server-sent events (session-based auth).
+    Replaces polling /web/queue, /queue/today and /calendar-events: each
+    event carries the changed appointment's queue item and calendar event.
 
-            # Calculate summary
-            summary = {
-                'total': len(queue),
-                'waiting': sum(1 for q in queue if q['status'] == 'checked_in'),
-                'in_progress': sum(1 for q in queue if q['status'] == 'in_progress'),
-                'completed': sum(1 for q in queue if q['status'] == 'completed'),
-                'confirmed': sum(1 for q in queue if q['status'] == 'confirmed')
-            }
+    Query params:
+        - branch_id: Optional branch filter
+        - staff_id: Optional doctor filter
 
-            return jsonify({
-                'success': True,
-                'queue': queue,
-                'summary': summary,
-                'date_range': date_range
-            }), 200
+    Reconnecting clients send Last-Event-ID (EventSource does this itself)
+    and receive the events they missed, or a 'reset' event when they must
+    refetch the full feed.
+    """
+    try:
+        branch_id = request.args.get('branch_id')
+        staff_id = request.args.get('staff_id')
+        broker = get_event_broker()
+        subscription = broker.subscribe(
+            current_user.hospital_id,
+            branch_id=uuid.UUID(branch_id) if branch_id else None,
+            staff_id=uuid.UUID(staff_id) if staff_id else None,
+            last_event_id=request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        )
 
+        return Response(
+            event_stream(broker, subscription, broker.keepalive_seconds),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    except ValueError:
+        return jsonify({'error': 'Invalid branch_id or staff_id'}), 400
     except Exception as e:
-        logger.error(f"Error getting queue (web): {str(e)}", exc_info=True)
+        logger.error(f"Error opening queue stream: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
@@ -3797,6 +3714,7 @@ def get_available_rooms():
 
         with get_db_session() as session:
             from app.models.master import Room, ServiceResourceRequirement
+            from app.services.resource_availability_service import get_availability_index
 
             # If service_id provided, get required room type
             required_room_type = room_type_filter
@@ -3828,7 +3746,15 @@ def get_available_rooms():
 
             rooms = query.order_by(Room.room_type, Room.room_code).all()
 
-            # Check availability if date/time provided
+            # Allocations of the day, loaded once for every room
+            availability = None
+            if date_str and start_time and end_time:
+                try:
+                    target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+                    availability = get_availability_index(hospital_id, target_date, session)
+                except ValueError:
+                    pass
+
             room_list = []
             for room in rooms:
                 room_data = {
@@ -3841,33 +3767,11 @@ def get_available_rooms():
                     'conflict_reason': None
                 }
 
-                # Check for conflicts if date/time provided
-                if date_str and start_time and end_time:
-                    from app.models.master import AppointmentResource
-                    from app.models.appointment import Appointment
-
-                    try:
-                        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-
-                        # Check appointment_resources for conflicts
-                        conflict = session.query(AppointmentResource).join(
-                            Appointment, AppointmentResource.appointment_id == Appointment.appointment_id
-                        ).filter(
-                            AppointmentResource.resource_type == 'room',
-                            AppointmentResource.resource_id == room.room_id,
-                            AppointmentResource.allocation_date == target_date,
-                            AppointmentResource.status.in_(['allocated', 'in_use']),
-                            Appointment.status.notin_(['cancelled', 'no_show']),
-                            # Time overlap check
-                            AppointmentResource.start_time < end_time,
-                            AppointmentResource.end_time > start_time
-                        ).first()
-
-                        if conflict:
-                            room_data['is_available'] = False
-                            room_data['conflict_reason'] = f"Booked {conflict.start_time}-{conflict.end_time}"
-                    except ValueError:
-                        pass
+                if availability:
+                    conflict = availability.conflict('room', room.room_id, start_time, end_time)
+                    if conflict:
+                        room_data['is_available'] = False
+                        room_data['conflict_reason'] = f"Booked {conflict.start_time}-{conflict.end_time}"
 
                 room_list.append(room_data)
 
@@ -3908,6 +3812,7 @@ def get_available_therapists():
 
         with get_db_session() as session:
             from app.models.master import ServiceResourceRequirement
+            from app.services.resource_availability_service import get_availability_index
 
             # If service_id provided, get required staff types (excluding doctor - doctors are selected separately)
             required_staff_types = []
@@ -3939,7 +3844,15 @@ def get_available_therapists():
             therapists = query.order_by(Staff.staff_type, Staff.first_name).all()
             logger.info(f"Found {len(therapists)} staff members with is_resource=True")
 
-            # Check availability
+            # Allocations of the day, loaded once for every therapist
+            availability = None
+            if date_str and start_time and end_time:
+                try:
+                    target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+                    availability = get_availability_index(hospital_id, target_date, session)
+                except ValueError:
+                    pass
+
             therapist_list = []
             for therapist in therapists:
                 therapist_data = {
@@ -3951,33 +3864,11 @@ def get_available_therapists():
                     'conflict_reason': None
                 }
 
-                # Check for conflicts if date/time provided
-                if date_str and start_time and end_time:
-                    from app.models.master import AppointmentResource
-                    from app.models.appointment import Appointment
-
-                    try:
-                        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-
-                        # Check appointment_resources for conflicts
-                        conflict = session.query(AppointmentResource).join(
-                            Appointment, AppointmentResource.appointment_id == Appointment.appointment_id
-                        ).filter(
-                            AppointmentResource.resource_type == 'staff',
-                            AppointmentResource.resource_id == therapist.staff_id,
-                            AppointmentResource.allocation_date == target_date,
-                            AppointmentResource.status.in_(['allocated', 'in_use']),
-                            Appointment.status.notin_(['cancelled', 'no_show']),
-                            # Time overlap check
-                            AppointmentResource.start_time < end_time,
-                            AppointmentResource.end_time > start_time
-                        ).first()
-
-                        if conflict:
-                            therapist_data['is_available'] = False
-                            therapist_data['conflict_reason'] = f"Assigned {conflict.start_time}-{conflict.end_time}"
-                    except ValueError:
-                        pass
+                if availability:
+                    conflict = availability.conflict('staff', therapist.staff_id, start_time, end_time)
+                    if conflict:
+                        therapist_data['is_available'] = False
+                        therapist_data['conflict_reason'] = f"Assigned {conflict.start_time}-{conflict.end_time}"
 
                 therapist_list.append(therapist_data)
 
@@ -3993,6 +3884,61 @@ def get_available_therapists():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@appointment_api_bp.route('/web/resources/free-windows', methods=['GET'])
+@login_required
+def get_resource_free_windows():
+    """
+    Get the first free windows of a room or therapist on a date.
+
+    Query params:
+        - resource_type: Required ('room' or 'staff')
+        - resource_id: Required
+        - date: Required (YYYY-MM-DD)
+        - duration: Optional minutes (default 30)
+        - limit: Optional number of windows (default 5)
+    """
+    from app.services.resource_allocation_service import resource_allocation_service, ResourceAllocationError
+
+    try:
+        resource_type = request.args.get('resource_type')
+        if resource_type not in ('room', 'staff'):
+            return jsonify({'success': False, 'error': 'resource_type must be room or staff'}), 400
+
+        try:
+            resource_id = uuid.UUID(request.args.get('resource_id', ''))
+            target_date = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Valid resource_id and date are required'}), 400
+
+        duration = request.args.get('duration', 30, type=int)
+        limit = request.args.get('limit', 5, type=int)
+
+        with get_db_session() as session:
+            windows = resource_allocation_service.get_free_windows(
+                session=session,
+                hospital_id=current_user.hospital_id,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                target_date=target_date,
+                duration_minutes=duration,
+                limit=limit
+            )
+
+        return jsonify({
+            'success': True,
+            'resource_type': resource_type,
+            'resource_id': str(resource_id),
+            'date': target_date.isoformat(),
+            'windows': windows
+        }), 200
+
+    except ResourceAllocationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error getting free windows: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @appointment_api_bp.route('/web/service/<service_id>/requirements', methods=['GET'])
 @login_required
 def get_service_requirements(service_id):
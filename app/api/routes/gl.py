@@ -26,6 +26,8 @@ def get_transactions(current_user, session):
         
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
+        cursor = request.args.get('cursor')
+        count_mode = request.args.get('count', 'exact')
         
         # Call service with session
         result = search_gl_transactions(
@@ -37,7 +39,9 @@ def get_transactions(current_user, session):
             account_id=account_id,
             page=page,
             per_page=per_page,
-            session=session
+            session=session,
+            cursor=cursor,
+            count_mode=count_mode
         )
         
         return jsonify(result), 200
@@ -847,6 +847,11 @@ class EntityConfiguration:
     items_per_page: int = 20
     fixed_table_layout: bool = False
     
+    # Pagination Strategy (large transaction lists)
+    pagination_mode: str = "offset"       # "offset" or "keyset" (cursor seek, see app/engine/keyset_pagination.py)
+    count_mode: str = "exact"             # "exact", "capped" ("10,000+") or "estimated" (EXPLAIN row estimate)
+    count_cap: int = 10000                # Row cap for capped/estimated counts
+    
     # Complex Features
     multi_method_display: bool = False
     complex_filter_behavior: bool = False
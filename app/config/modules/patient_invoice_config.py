@@ -473,7 +473,7 @@ PATIENT_INVOICE_FIELDS = [
 
     # === FREE/SAMPLE ITEM INDICATORS ===
     # Note: In list view, these are rendered below payment_status (not separate columns)
-    # This is handled by _format_status_badge in data_assembler.py
+    # This is handled by the status badge formatter in list_render_plan.py
     FieldDefinition(
         name="has_free_items",
         label="Free Items",
@@ -1761,6 +1761,10 @@ PATIENT_INVOICE_CONFIG = EntityConfiguration(
     default_sort_field="invoice_date",
     default_sort_direction="desc",
 
+    # === PAGINATION (multi-year invoice history) ===
+    pagination_mode="keyset",
+    count_mode="estimated",
+
     # === CORE CONFIGURATIONS ===
     fields=PATIENT_INVOICE_FIELDS,
     view_layout=PATIENT_INVOICE_VIEW_LAYOUT,
@@ -26,7 +26,7 @@ from app.services.supplier_service import (
     approve_supplier_payment,
     reject_supplier_payment
 )
-from app.engine.universal_service_cache import cache_service_method, cache_universal
+from app.engine.universal_service_cache import cache_service_method
 from app.utils.unicode_logging import get_unicode_safe_logger
 logger = get_unicode_safe_logger(__name__)
 
@@ -83,7 +83,6 @@ class SupplierFormController(FormController):
             current_app.logger.error(f"Error setting up supplier form choices: {str(e)}")
             return False
 
-    @cache_universal(entity_type='purchase_order', operation='get_form_context')
     def get_additional_context(self, *args, **kwargs):
         """Get additional context including branch selection - UPDATED with unified branch service"""
         context = super().get_additional_context(*args, **kwargs) if hasattr(super(), 'get_additional_context') else {}
@@ -3056,42 +3055,21 @@ class PurchaseOrderFormController(FormController):
         return form
     
     def generate_po_number(self):
-        """Generate a new PO number"""
-        from datetime import datetime
+        """Preview the next PO number (reserved only when the PO is saved)"""
         from flask_login import current_user
-        from app.services.database_service import get_db_session
         from app.models.transaction import PurchaseOrderHeader
+        from app.services.sequence_allocator_service import (
+            get_sequence_allocator, get_financial_year, format_document_number, last_number_from_documents
+        )
         
-        # Get current financial year
-        today = datetime.now()
-        if today.month >= 4:  # Financial year starts in April
-            fin_year_start = today.year
-            fin_year_end = today.year + 1
-        else:
-            fin_year_start = today.year - 1
-            fin_year_end = today.year
-            
-        fin_year = f"{fin_year_start % 100:02d}-{fin_year_end % 100:02d}"  # e.g., "24-25"
-        
-        # Get the last PO number for this hospital and financial year
-        with get_db_session(read_only=True) as session:
-            last_po = session.query(PurchaseOrderHeader).filter(
-                PurchaseOrderHeader.hospital_id == current_user.hospital_id,
-                PurchaseOrderHeader.po_number.like(f"PO/{fin_year}/%")
-            ).order_by(PurchaseOrderHeader.po_number.desc()).first()
-            
-            if last_po:
-                # Extract the sequence number
-                try:
-                    seq_num = int(last_po.po_number.split('/')[-1])
-                    new_seq_num = seq_num + 1
-                except:
-                    new_seq_num = 1
-            else:
-                new_seq_num = 1
+        fin_year = get_financial_year()
+        next_seq = get_sequence_allocator().peek(
+            current_user.hospital_id, 'PO', fin_year,
+            seed=last_number_from_documents(PurchaseOrderHeader.po_number, 'PO', fin_year)
+        )
         
-        # Format: PO/YY-YY/00001
-        return f"PO/{fin_year}/{new_seq_num:05d}"
+        # Format: PO/YYYY-YYYY/00001 (same as supplier_service._generate_po_number)
+        return format_document_number('PO', fin_year, next_seq)
 
     def process_form(self, form, *args, **kwargs):
         """Process the form data for creation - ENHANCED with GST calculations"""
@@ -0,0 +1,552 @@
+# File: app/engine/batch_document_service.py
+
+"""
+Batch Document Service - one download for the documents of many entities
+
+universal_batch_documents starts a job and returns its id; the job runs in a
+background thread of this worker:
+
+    prefetch    service.get_by_ids()                 PREPARE_CHUNK_SIZE ids per batch
+    prepare     enhance + prepare_document_context   job thread, one organization context
+    render      build_document_pdf / excel / word    render process pool, bounded in flight
+    merge       one PDF (pypdf) or a ZIP (xlsx/docx) in entity order, as documents finish
+
+Job state lives in <job_id>.json next to the output, so the status, download
+and cancel endpoints answer from any worker process. Cancelling drops a
+<job_id>.cancel marker that the job checks between documents.
+
+Configuration (app config):
+- BATCH_DOCUMENT_PATH:            output directory (default <instance>/batch_documents)
+- BATCH_DOCUMENT_MAX_IN_FLIGHT:   documents rendering at once (default 2 x render workers)
+- BATCH_DOCUMENT_JOBS:            batches running at once per process (default 2)
+- BATCH_DOCUMENT_RETENTION_HOURS: finished outputs are kept for (default 24)
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# output format -> (UniversalDocumentService builder, file extension, mimetype)
+BATCH_FORMATS = {
+    'pdf': ('build_document_pdf', 'pdf', 'application/pdf'),
+    'excel': ('build_document_excel', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'word': ('build_document_word', 'docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+}
+FORMAT_ALIASES = {'xlsx': 'excel', 'docx': 'word'}
+ZIP_MIMETYPE = 'application/zip'
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+PREPARE_CHUNK_SIZE = 100
+DEFAULT_JOBS = 2
+DEFAULT_RETENTION_HOURS = 24
+PROGRESS_INTERVAL_SECONDS = 0.5
+MAX_REPORTED_ERRORS = 20
+
+# Context entries holding live objects (services, proxies, config classes):
+# render processes get the plain data only
+PROCESS_UNSAFE_KEYS = ('entity_config', 'service', 'service_methods', 'current_user')
+
+
+def render_batch_document(output_format: str, context: Dict, doc_config: Dict) -> bytes:
+    """Build one document. Module level so the render process pool can pickle it."""
+    from app.engine.document_service import get_document_service
+
+    builder = getattr(get_document_service(), BATCH_FORMATS[output_format][0])
+    return builder(context, doc_config)
+
+def normalize_batch_format(output_format: Optional[str]) -> Optional[str]:
+    """'pdf', 'excel' or 'word' for a requested format, None when not batchable"""
+    output_format = (output_format or '').lower()
+    output_format = FORMAT_ALIASES.get(output_format, output_format)
+    return output_format if output_format in BATCH_FORMATS else None
+
+def doc_config_as_dict(doc_config) -> Dict:
+    """DocumentConfiguration -> dict with enum values, as universal_document_view passes it"""
+    if not hasattr(doc_config, '__dict__'):
+        return doc_config
+    return {
+        key: value.value if hasattr(value, 'value') else value
+        for key, value in doc_config.__dict__.items()
+        if not key.startswith('_')
+    }
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class BatchDocumentJob:
+    """A batch and its JSON state file (written atomically, read by any worker)"""
+
+    def __init__(self, directory: Path, state: Dict):
+        self.directory = Path(directory)
+        self.state = state
+        self._last_saved = 0.0
+
+    @property
+    def job_id(self) -> str:
+        return self.state['job_id']
+
+    @property
+    def status(self) -> str:
+        return self.state['status']
+
+    @property
+    def state_file(self) -> Path:
+        return self.directory / f"{self.job_id}.json"
+
+    @property
+    def cancel_file(self) -> Path:
+        return self.directory / f"{self.job_id}.cancel"
+
+    @property
+    def output_file(self) -> Path:
+        return self.directory / f"{self.job_id}.{self.state['extension']}"
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self.cancel_file.exists()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @classmethod
+    def load(cls, directory: Path, job_id: str) -> Optional['BatchDocumentJob']:
+        try:
+            job_id = str(uuid.UUID(str(job_id)))
+            with open(Path(directory) / f"{job_id}.json", encoding='utf-8') as state_file:
+                return cls(directory, json.load(state_file))
+        except (ValueError, OSError):
+            return None
+
+    def update(self, force: bool = True, **changes):
+        """Apply changes; progress-only updates are saved at most every PROGRESS_INTERVAL_SECONDS"""
+        self.state.update(changes)
+        if force or time.monotonic() - self._last_saved >= PROGRESS_INTERVAL_SECONDS:
+            self.save()
+
+    def save(self):
+        temporary = self.state_file.with_suffix('.json.part')
+        with open(temporary, 'w', encoding='utf-8') as state_file:
+            json.dump(self.state, state_file, default=str)
+        os.replace(temporary, self.state_file)
+        self._last_saved = time.monotonic()
+
+    def record_error(self, item_id, error: str):
+        self.state['failed'] += 1
+        if len(self.state['errors']) < MAX_REPORTED_ERRORS:
+            self.state['errors'].append({'item_id': str(item_id), 'error': error})
+
+    def to_dict(self) -> Dict:
+        """Public view of the state (status endpoint)"""
+        state = {key: value for key, value in self.state.items() if key not in ('user_id', 'hospital_id')}
+        total = state.get('total') or 0
+        state['progress'] = round(100 * state.get('processed', 0) / total) if total else 0
+        return state
+
+
+class _PdfMerger:
+    """Appends rendered PDFs to one document in entity order"""
+
+    def __init__(self, path: Path):
+        from pypdf import PdfWriter
+        self.path = path
+        self.writer = PdfWriter()
+        self.count = 0
+
+    def add(self, filename: str, content: bytes):
+        from pypdf import PdfReader
+        self.writer.append(PdfReader(BytesIO(content)))
+        self.count += 1
+
+    def close(self):
+        temporary = self.path.with_suffix('.part')
+        with open(temporary, 'wb') as output:
+            self.writer.write(output)
+        os.replace(temporary, self.path)
+
+    def discard(self):
+        self.writer = None
+
+
+class _ZipCollector:
+    """Writes each rendered document into a ZIP as it arrives"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.temporary = path.with_suffix('.part')
+        self.archive = zipfile.ZipFile(self.temporary, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.names = set()
+        self.count = 0
+
+    def add(self, filename: str, content: bytes):
+        name, counter = filename, 1
+        while name in self.names:
+            stem, extension = os.path.splitext(filename)
+            name, counter = f"{stem}_{counter}{extension}", counter + 1
+        self.names.add(name)
+        self.archive.writestr(name, content)
+        self.count += 1
+
+    def close(self):
+        self.archive.close()
+        os.replace(self.temporary, self.path)
+
+    def discard(self):
+        self.archive.close()
+        self.temporary.unlink(missing_ok=True)
+
+
+class BatchDocumentService:
+    """
+    Batch document generation for Universal Engine entities
+    Usage:
+        service = get_batch_document_service()
+        job = service.start(entity_type, doc_type, entity_ids, 'pdf')   # request
+        service.get_job(job_id).to_dict()                                # status
+        service.cancel(job_id)
+    """
+
+    def __init__(self, app=None, storage_path: Optional[Path] = None, max_in_flight: Optional[int] = None,
+                 render_queue=None, document_service=None):
+        self._app = app
+        self._storage_path = storage_path
+        self._max_in_flight = max_in_flight
+        self._render_queue = render_queue
+        self._document_service = document_service
+        self._runner: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # CONFIGURATION
+    # =========================================================================
+
+    def _app_config(self, name: str, default):
+        if self._app is not None:
+            return self._app.config.get(name, default)
+        try:
+            from flask import current_app
+            return current_app.config.get(name, default)
+        except RuntimeError:
+            return default
+
+    @property
+    def render_queue(self):
+        if self._render_queue is None:
+            from app.services.document_render_service import get_render_queue
+            self._render_queue = get_render_queue()
+        return self._render_queue
+
+    @property
+    def document_service(self):
+        if self._document_service is None:
+            from app.engine.document_service import get_document_service
+            self._document_service = get_document_service()
+        return self._document_service
+
+    @property
+    def storage_path(self) -> Path:
+        if self._storage_path is None:
+            configured = self._app_config('BATCH_DOCUMENT_PATH', None)
+            if configured:
+                self._storage_path = Path(configured)
+            else:
+                from flask import current_app
+                app = self._app or current_app
+                self._storage_path = Path(app.instance_path) / 'batch_documents'
+        self._storage_path.mkdir(parents=True, exist_ok=True)
+        return self._storage_path
+
+    @property
+    def max_in_flight(self) -> int:
+        if self._max_in_flight is not None:
+            return self._max_in_flight
+        configured = self._app_config('BATCH_DOCUMENT_MAX_IN_FLIGHT', None)
+        return max(1, int(configured) if configured else 2 * self.render_queue.workers)
+
+    def _get_runner(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._runner is None:
+                self._runner = ThreadPoolExecutor(
+                    max_workers=max(1, int(self._app_config('BATCH_DOCUMENT_JOBS', DEFAULT_JOBS))),
+                    thread_name_prefix='batch-documents'
+                )
+            return self._runner
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            runner, self._runner = self._runner, None
+        if runner:
+            runner.shutdown(wait=wait)
+
+    # =========================================================================
+    # JOBS
+    # =========================================================================
+
+    def create_job(self, entity_type: str, doc_type: str, item_ids: List[str], output_format: str,
+                   title: str = 'Documents', user_id=None, hospital_id=None) -> BatchDocumentJob:
+        extension = BATCH_FORMATS[output_format][1] if output_format == 'pdf' else 'zip'
+        job = BatchDocumentJob(self.storage_path, {
+            'job_id': str(uuid.uuid4()),
+            'entity_type': entity_type,
+            'doc_type': doc_type,
+            'format': output_format,
+            'extension': extension,
+            'mimetype': BATCH_FORMATS['pdf'][2] if extension == 'pdf' else ZIP_MIMETYPE,
+            'filename': f"{title}_{entity_type}_{datetime.now().strftime('%Y%m%d_%H%M')}.{extension}",
+            'status': 'queued',
+            'total': len(item_ids),
+            'processed': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'errors': [],
+            'user_id': str(user_id) if user_id else None,
+            'hospital_id': str(hospital_id) if hospital_id else None,
+            'created_at': _now().isoformat(),
+            'finished_at': None,
+        })
+        job.save()
+        return job
+
+    def start(self, entity_type: str, doc_type: str, item_ids: List[str], output_format: str,
+              fetch_kwargs: Dict) -> BatchDocumentJob:
+        """
+        Start a batch from the current request: the job thread gets a request
+        context carrying this user's session (current_user, branch context).
+        fetch_kwargs: hospital_id / branch_id ... as passed to service.get_by_id
+        """
+        from flask import current_app, request, session as flask_session
+        from flask_login import current_user
+        from app.config.entity_configurations import get_entity_config
+
+        config = get_entity_config(entity_type)
+        doc_config = doc_config_as_dict(config.document_configs[doc_type])
+
+        self.remove_expired_jobs()
+        job = self.create_job(entity_type, doc_type, item_ids, output_format,
+                              title=doc_config.get('title', 'Documents'),
+                              user_id=current_user.user_id, hospital_id=current_user.hospital_id)
+
+        app = current_app._get_current_object()
+        session_snapshot = dict(flask_session)
+        base_url = request.host_url
+        def run_in_request_context():
+            with app.test_request_context(base_url=base_url):
+                flask_session.update(session_snapshot)
+                self.run(job, config, doc_config, item_ids, fetch_kwargs)
+
+        self._get_runner().submit(run_in_request_context)
+        logger.info(f"📚 Batch {job.job_id}: {len(item_ids)} {entity_type} {doc_type} documents ({output_format}) queued")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BatchDocumentJob]:
+        return BatchDocumentJob.load(self.storage_path, job_id)
+
+    def cancel(self, job_id: str) -> Optional[BatchDocumentJob]:
+        """Ask the job to stop; it finishes the document in hand and discards its output"""
+        job = self.get_job(job_id)
+        if job and not job.is_finished:
+            job.cancel_file.touch()
+        return job
+
+    def remove_expired_jobs(self) -> int:
+        """Delete outputs and state of batches older than BATCH_DOCUMENT_RETENTION_HOURS"""
+        cutoff = time.time() - 3600 * float(self._app_config('BATCH_DOCUMENT_RETENTION_HOURS', DEFAULT_RETENTION_HOURS))
+        removed = 0
+        for path in self.storage_path.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    # =========================================================================
+    # PIPELINE
+    # =========================================================================
+
+    def iter_document_contexts(self, entity_type: str, config, doc_config: Dict, item_ids: List[str],
+                               fetch_kwargs: Dict) -> Iterator[Tuple[str, Optional[Dict], Optional[str]]]:
+        """
+        (item_id, context, error) for every id in the given order. Entities are
+        fetched PREPARE_CHUNK_SIZE at a time; the organization context and the
+        logo file are resolved once for the whole batch.
+        """
+        from flask_login import current_user
+        from app.engine.universal_services import get_universal_service
+        from app.utils.context_helpers import get_document_organization_context
+
+        doc_service = self.document_service
+        service = get_universal_service(entity_type)
+        organization_data = get_document_organization_context()
+        shared = {
+            'current_hospital_id': fetch_kwargs.get('hospital_id'),
+            'current_branch_id': fetch_kwargs.get('branch_id'),
+            'entity_type': entity_type,
+            'logo_file': doc_service.resolve_logo_file(organization_data['hospital']),
+            'author': getattr(current_user, 'full_name', None) or 'System',
+        }
+
+        for start in range(0, len(item_ids), PREPARE_CHUNK_SIZE):
+            chunk = item_ids[start:start + PREPARE_CHUNK_SIZE]
+            items = self._fetch_items(service, chunk, fetch_kwargs)
+
+            for item_id in chunk:
+                raw_data = items.get(str(item_id))
+                if not raw_data:
+                    yield item_id, None, 'Not found'
+                    continue
+                try:
+                    doc_data = doc_service.enhance_data_with_relationships(config, raw_data)
+                    context = doc_service.prepare_document_context(
+                        config, doc_config, doc_data, organization_data=organization_data
+                    )
+                    context.update(shared, item_id=str(item_id), item=doc_data)
+                    yield item_id, context, None
+                except Exception as e:
+                    logger.error(f"Batch document context failed for {entity_type}/{item_id}: {str(e)}")
+                    yield item_id, None, str(e)
+
+    def _fetch_items(self, service, item_ids: List[str], fetch_kwargs: Dict) -> Dict[str, Dict]:
+        if hasattr(service, 'get_by_ids'):
+            return service.get_by_ids(item_ids, **fetch_kwargs)
+        # Services outside UniversalEntityService: one lookup per id
+        items = {}
+        for item_id in item_ids:
+            item = service.get_by_id(item_id=item_id, **fetch_kwargs)
+            if item:
+                items[str(item_id)] = item
+        return items
+
+    def run(self, job: BatchDocumentJob, config, doc_config: Dict, item_ids: List[str], fetch_kwargs: Dict):
+        """Render every document of the job into its output file"""
+        from app.services.document_render_service import RENDER_TIMEOUT_SECONDS
+
+        output_format = job.state['format']
+        extension = BATCH_FORMATS[output_format][1]
+        doc_service = self.document_service
+        collector = _PdfMerger(job.output_file) if output_format == 'pdf' else _ZipCollector(job.output_file)
+        window = deque()   # (item_id, filename, context, future) in entity order
+        contexts = self.iter_document_contexts(job.state['entity_type'], config, doc_config,
+                                               item_ids, fetch_kwargs)
+        head_since = time.monotonic()
+        job.update(status='running')
+
+        try:
+            exhausted = False
+            while True:
+                if job.cancel_requested:
+                    break
+
+                # Keep up to max_in_flight documents rendering while the oldest is awaited
+                while not exhausted and len(window) < self.max_in_flight:
+                    try:
+                        item_id, context, error = next(contexts)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if context is None:
+                        job.record_error(item_id, error)
+                        job.update(force=False, processed=job.state['processed'] + 1)
+                        continue
+                    doc_service.preload_custom_renderer_data(context)
+                    filename = doc_service.get_document_filename(context, doc_config, extension)
+                    portable = {key: value for key, value in context.items() if key not in PROCESS_UNSAFE_KEYS}
+                    future = self.render_queue.submit_render(render_batch_document, output_format,
+                                                             portable, doc_config)
+                    window.append((item_id, filename, portable, future))
+
+                if not window:
+                    break
+
+                # Wait in short slices so a cancel request is seen promptly
+                item_id, filename, portable, future = window[0]
+                try:
+                    content = future.result(timeout=1)
+                except FutureTimeoutError:
+                    if time.monotonic() - head_since < RENDER_TIMEOUT_SECONDS:
+                        continue
+                    future.cancel()
+                    job.record_error(item_id, f"Not rendered within {RENDER_TIMEOUT_SECONDS} seconds")
+                    content = None
+                except Exception as e:
+                    content = self._render_here(job, item_id, output_format, portable, doc_config, e)
+                window.popleft()
+                head_since = time.monotonic()
+
+                if content is not None:
+                    collector.add(filename, content)
+                    job.state['succeeded'] += 1
+                job.update(force=False, processed=job.state['processed'] + 1)
+
+            if job.cancel_requested:
+                for _, _, _, future in window:
+                    future.cancel()
+                collector.discard()
+                job.cancel_file.unlink(missing_ok=True)
+                job.update(status='cancelled', finished_at=_now().isoformat())
+                logger.info(f"🛑 Batch {job.job_id} cancelled after {job.state['processed']} of {job.state['total']}")
+                return
+
+            if not collector.count:
+                collector.discard()
+                job.update(status='failed', finished_at=_now().isoformat())
+                logger.warning(f"⚠️ Batch {job.job_id}: no document could be rendered")
+                return
+
+            collector.close()
+            job.update(status='completed', finished_at=_now().isoformat())
+            logger.info(f"✅ Batch {job.job_id}: {job.state['succeeded']} documents, {job.state['failed']} failed")
+
+        except Exception as e:
+            for _, _, _, future in window:
+                future.cancel()
+            collector.discard()
+            job.state['errors'].append({'item_id': None, 'error': str(e)})
+            job.update(status='failed', finished_at=_now().isoformat())
+            logger.error(f"❌ Batch {job.job_id} failed: {str(e)}")
+
+    def _render_here(self, job: BatchDocumentJob, item_id, output_format: str, context: Dict,
+                     doc_config: Dict, error: Exception) -> Optional[bytes]:
+        """
+        A render process could not take the document (unpicklable context,
+        pool died) or failed: try once in this thread before counting it failed
+        """
+        logger.warning(f"⚠️ Batch {job.job_id}: render process failed for {item_id} ({error}), retrying here")
+        try:
+            return render_batch_document(output_format, context, doc_config)
+        except Exception as e:
+            job.record_error(item_id, str(e))
+            return None
+
+
+# Singleton instance (one batch runner per worker process)
+_batch_document_service: Optional[BatchDocumentService] = None
+_batch_document_service_lock = threading.Lock()
+
+def get_batch_document_service() -> BatchDocumentService:
+    """Get the batch document service of this worker, bound to the current Flask app"""
+    global _batch_document_service
+    if _batch_document_service is None:
+        with _batch_document_service_lock:
+            if _batch_document_service is None:
+                from flask import current_app, has_app_context
+                app = current_app._get_current_object() if has_app_context() else None
+                _batch_document_service = BatchDocumentService(app=app)
+    return _batch_document_service
@@ -0,0 +1,219 @@
+# =============================================================================
+# File: app/engine/condition_expressions.py
+# Pre-compiled conditional_display expressions
+# =============================================================================
+
+"""
+Condition Expressions - conditional_display strings compiled once
+- Parsed with ast and validated against an allow-list of node types:
+  boolean logic, comparisons, arithmetic, constants, list/tuple/set literals,
+  conditional expressions and attribute access (no private attributes)
+- Item fields are referenced as item.<field>, as a bare <field>, or as
+  item.get('<field>'[, default]); the only call allowed is item.get
+- Compiled to a code object that is evaluated against a namespace holding
+  only the referenced fields, read from the item (dict or object)
+- Cached per expression string (invalid ones too, logged once);
+  precompile_config_conditions() compiles a configuration's fields,
+  sections and actions when it is loaded, so config strings are never
+  parsed on the request path
+
+Examples:
+    "item.status == 'active'"
+    "item.payment_method == 'cash' or (item.payment_method == 'mixed' and item.cash_amount > 0)"
+    "item.po_id or (item.invoice and item.invoice.po_id)"
+    "upi_amount > 0"
+"""
+
+import ast
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+ITEM_NAME = 'item'
+MAX_COMPILED_CONDITIONS = 4096
+
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Is, ast.IsNot, ast.In, ast.NotIn,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.IfExp, ast.Name, ast.Load, ast.Attribute, ast.Constant, ast.List, ast.Tuple, ast.Set,
+)
+
+_MISSING = object()
+
+
+class ConditionExpressionError(ValueError):
+    """Raised when a condition expression is not valid or not allowed"""
+    pass
+
+
+class MissingFieldError(LookupError):
+    """Raised when an expression references a field the item does not have"""
+    pass
+
+
+class _ItemReferences(ast.NodeTransformer):
+    """
+    Rewrite item.<field> and item.get('<field>'[, default]) to plain names,
+    collecting the referenced fields and the defaults of get() lookups.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}   # field -> default (_MISSING when required)
+
+    def _reference(self, name: str, default=_MISSING, node=None) -> ast.Name:
+        if not name.isidentifier() or name.startswith('_'):
+            raise ConditionExpressionError(f"Field name not allowed: {name!r}")
+        # A required reference anywhere makes the field required
+        if name not in self.fields or default is _MISSING:
+            self.fields[name] = default
+        return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+    def visit_Call(self, node):
+        func = node.func
+        is_item_get = (isinstance(func, ast.Attribute) and func.attr == 'get'
+                       and isinstance(func.value, ast.Name) and func.value.id == ITEM_NAME)
+        if not is_item_get or node.keywords or not 1 <= len(node.args) <= 2:
+            raise ConditionExpressionError("Only item.get('<field>'[, default]) calls are allowed")
+        key = node.args[0]
+        default = node.args[1] if len(node.args) == 2 else ast.Constant(value=None)
+        if not isinstance(key, ast.Constant) or not isinstance(key.value, str):
+            raise ConditionExpressionError("item.get() needs a literal field name")
+        if not isinstance(default, ast.Constant):
+            raise ConditionExpressionError("item.get() default must be a literal")
+        return self._reference(key.value, default.value, node)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == ITEM_NAME:
+            return self._reference(node.attr, node=node)
+        if node.attr.startswith('_'):
+            raise ConditionExpressionError(f"Private attribute not allowed: {node.attr!r}")
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node):
+        if node.id == ITEM_NAME:
+            raise ConditionExpressionError("item can only be used as item.<field> or item.get('<field>')")
+        # Bare names are item fields too ("upi_amount > 0")
+        return self._reference(node.id, node=node)
+
+
+class CompiledCondition:
+    """A validated condition: its code object and the item fields it reads"""
+
+    __slots__ = ('expression', 'code', 'fields')
+
+    def __init__(self, expression: str, code, fields: Tuple[Tuple[str, Any], ...]):
+        self.expression = expression
+        self.code = code
+        self.fields = fields
+
+    def namespace(self, item, missing_as_none: bool = False) -> Dict[str, Any]:
+        """
+        Values of the referenced fields. A field missing from the item raises
+        MissingFieldError unless it was read with item.get() or missing_as_none.
+        """
+        namespace = {}
+        is_dict = isinstance(item, dict)
+        for name, default in self.fields:
+            if is_dict:
+                value = item.get(name, _MISSING)
+            else:
+                value = getattr(item, name, _MISSING)
+            if value is _MISSING:
+                if default is not _MISSING:
+                    value = default
+                elif missing_as_none:
+                    value = None
+                else:
+                    raise MissingFieldError(name)
+            namespace[name] = value
+        return namespace
+
+    def evaluate(self, item, missing_as_none: bool = False) -> bool:
+        return bool(eval(self.code, {'__builtins__': {}}, self.namespace(item, missing_as_none)))
+
+    def __repr__(self):
+        return f"CompiledCondition({self.expression!r})"
+
+
+def compile_condition(expression: str) -> CompiledCondition:
+    """Parse, validate and compile a condition expression"""
+    if not isinstance(expression, str):
+        raise ConditionExpressionError(f"Condition must be a string, got {type(expression).__name__}")
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ConditionExpressionError(f"Invalid condition {expression!r}: {e.msg}") from None
+
+    references = _ItemReferences()
+    tree = ast.fix_missing_locations(references.visit(tree))
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ConditionExpressionError(f"{type(node).__name__} not allowed in condition {expression!r}")
+
+    code = compile(tree, f'<condition:{expression}>', 'eval')
+    return CompiledCondition(expression, code, tuple(references.fields.items()))
+
+
+# expression -> CompiledCondition, or None when it did not compile
+_compiled: Dict[str, Optional[CompiledCondition]] = {}
+_compiled_lock = threading.Lock()
+
+def get_compiled_condition(expression: Any) -> Optional[CompiledCondition]:
+    """Cached compiled condition, or None when the expression is not valid (logged once)"""
+    if not isinstance(expression, str):
+        logger.warning(f"Ignoring conditional_display: {expression!r} is not a string")
+        return None
+    try:
+        return _compiled[expression]
+    except KeyError:
+        pass
+
+    try:
+        condition = compile_condition(expression)
+    except ConditionExpressionError as e:
+        logger.warning(f"Ignoring conditional_display: {str(e)}")
+        condition = None
+    with _compiled_lock:
+        if len(_compiled) >= MAX_COMPILED_CONDITIONS:
+            _compiled.clear()
+        _compiled[expression] = condition
+    return condition
+
+
+def evaluate_condition(expression: Any, item, default: bool = True, missing_as_none: bool = False) -> bool:
+    """
+    Evaluate a conditional_display expression against an item. Invalid
+    expressions, missing fields and evaluation errors return default.
+    """
+    if not expression:
+        return True
+    condition = get_compiled_condition(expression)
+    if condition is None:
+        return default
+    try:
+        return condition.evaluate(item, missing_as_none)
+    except Exception as e:
+        logger.debug(f"Expression evaluation failed for '{expression}': {str(e)}")
+        return default
+
+
+def precompile_config_conditions(config) -> int:
+    """
+    Compile every conditional_display of a configuration (fields, sections,
+    actions) so the request path only evaluates. Returns the number compiled.
+    """
+    expressions = [getattr(f, 'conditional_display', None) for f in getattr(config, 'fields', None) or []]
+    expressions += [getattr(a, 'conditional_display', None) for a in getattr(config, 'actions', None) or []]
+    for sections in (getattr(config, 'section_definitions', None), getattr(config, 'form_section_definitions', None)):
+        expressions += [getattr(s, 'conditional_display', None) for s in (sections or {}).values()]
+
+    compiled = 0
+    for expression in expressions:
+        if expression and get_compiled_condition(expression) is not None:
+            compiled += 1
+    return compiled
@@ -16,13 +16,13 @@ SAFER APPROACH:
 
 from typing import Dict, Any, Optional, List, Union
 import uuid
-from datetime import datetime, date
-from types import SimpleNamespace
 from flask import request, url_for, current_app
 from flask_login import current_user
 from flask_wtf import FlaskForm
 
 from app.config.core_definitions import EntityConfiguration, FieldDefinition, ActionDisplayType, ButtonType, ActionDefinition
+from app.engine.condition_expressions import evaluate_condition, get_compiled_condition
+from app.engine.list_render_plan import compile_field_formatter, field_type_name, get_list_render_plan
 from app.engine.universal_service_cache import cache_service_method
 from app.utils.unicode_logging import get_unicode_safe_logger
 
@@ -297,109 +297,26 @@ class EnhancedUniversalDataAssembler:
     # =============================================================================
 
     def _assemble_table_columns(self, config: EntityConfiguration) -> List[Dict]:
-        """Assemble table columns from configuration"""
+        """Assemble table columns from configuration (precomputed by the list render plan)"""
         try:
-            columns = []
-            
-            for field in config.fields:
-                if getattr(field, 'show_in_list', False):
-                    
-                    # Get complex_display_type and convert enum to string value
-                    complex_display_type_enum = getattr(field, 'complex_display_type', None)
-                    complex_display_type_value = complex_display_type_enum.value if complex_display_type_enum else None
-
-                    # Determine alignment - currency/amount fields should be right-aligned
-                    field_type = self._get_field_type_safe(field)
-                    if field_type in ['currency', 'amount', 'decimal', 'number']:
-                        default_align = 'right'
-                    else:
-                        default_align = 'left'
-
-                    column = {
-                        'name': field.name,
-                        'label': field.label,
-                        'sortable': getattr(field, 'sortable', False),
-                        'css_class': getattr(field, 'css_class', ''),
-                        'width': getattr(field, 'width', None),
-                        'max_width': getattr(field, 'max_width', None),
-                        'align': getattr(field, 'align', 'left'),
-                        'field_type': self._get_field_type_safe(field),
-                        'format_pattern': getattr(field, 'format_pattern', None),
-                        'complex_display_type': complex_display_type_value,
-                        'css_classes': getattr(field, 'css_classes', ''),
-                        'related_field': getattr(field, 'related_field', None),
-                        'related_display_field': getattr(field, 'related_display_field', None),
-                        
-                        # Universal virtual field metadata for template
-                        'virtual': getattr(field, 'virtual', False),
-                        'virtual_target': getattr(field, 'virtual_target', None),
-                        'virtual_key': getattr(field, 'virtual_key', None)
-                    }
-                    columns.append(column)
-            
-            return columns
-            
+            return [dict(column) for column in get_list_render_plan(config).table_columns]
+
         except Exception as e:
             logger.error(f"Error assembling table columns: {str(e)}")
             return []
 
-    def _extract_virtual_field_value(self, field, item: Dict):
-        """Extract virtual field value from JSONB or nested structure - ONLY FOR VIRTUAL FIELDS"""
-        try:
-            virtual_target = getattr(field, 'virtual_target', None)
-            virtual_key = getattr(field, 'virtual_key', None)
-
-            if virtual_target and virtual_key:
-                # JSONB virtual field - extract from nested structure
-                target_data = item.get(virtual_target, {})
-                if isinstance(target_data, dict):
-                    return target_data.get(virtual_key, '')
-                else:
-                    return ''
-            else:
-                # Computed virtual field - get directly from item by field name
-                # These are fields computed by the service layer (e.g., has_free_items, has_sample_items)
-                return item.get(field.name, '')
-
-        except Exception as e:
-            logger.error(f"Error extracting virtual field value for {field.name}: {str(e)}")
-            return ''
-
     def _assemble_table_data(self, config: EntityConfiguration, items: List[Dict]) -> List[Dict]:
-        """Assemble table data from raw items - PRESERVES ORIGINAL LOGIC"""
+        """
+        Assemble table data from raw items.
+        Fields, formatters and row actions are compiled once per configuration
+        (see app/engine/list_render_plan.py); each row only extracts and formats.
+        """
         try:
             if not items:
                 return []
-            
-            table_data = []
-            
-            for item in items:
-                row_data = {}
-                
-                # Process each field that should show in list
-                for field in config.fields:
-                    if getattr(field, 'show_in_list', False):
-                        
-                        # HYBRID APPROACH: Only use virtual field logic for virtual fields
-                        if getattr(field, 'virtual', False):
-                            # Virtual field - use new extraction logic
-                            raw_value = self._extract_virtual_field_value(field, item)
-                        else:
-                            # Direct field - use ORIGINAL logic (preserve existing behavior)
-                            raw_value = item.get(field.name)
-                        
-                        # Store current item for badge formatting
-                        self._current_item = item  
-                        row_data[field.name] = self._format_field_value(field, raw_value, item)
-                
-                # Add row metadata
-                row_data['_row_id'] = item.get(config.primary_key)
-                row_data['_row_actions'] = self._build_row_actions(config, item)
-                
-                table_data.append(row_data)
-            
-            return table_data
-            
+
+            return get_list_render_plan(config).render_rows(items)
+
         except Exception as e:
             logger.error(f"Error assembling table data for {config.entity_type}: {str(e)}")
             return []
@@ -409,190 +326,12 @@ class EnhancedUniversalDataAssembler:
         try:
             if raw_value is None:
                 return ''
-            
-            field_type = self._get_field_type_safe(field)
+            return compile_field_formatter(field)(raw_value, item)
 
-            # SPECIAL CASE: Currency fields with format patterns should return raw values
-            # Let the template handle the formatting
-            if field_type == 'currency' and getattr(field, 'format_pattern', None) == 'mixed_payment_breakdown':
-                # Return raw numeric value for template processing
-                try:
-                    return str(float(raw_value))
-                except (ValueError, TypeError):
-                    return '0'
-            
-            if field_type == 'currency' or field_type == 'amount':
-                try:
-                    # Always return numeric value - let template handle formatting
-                    return float(raw_value) if raw_value is not None else 0.0
-                except (ValueError, TypeError):
-                    return 0.0
-            
-            if field_type == 'date':
-                if isinstance(raw_value, (date, datetime)):
-                    return raw_value.strftime('%d/%b/%Y')  # Was: '%b %d, %Y'
-                elif isinstance(raw_value, str):
-                    try:
-                        date_obj = datetime.strptime(raw_value, '%Y-%m-%d').date()
-                        return date_obj.strftime('%d/%b/%Y')  # Was: '%b %d, %Y'
-                    except:
-                        return raw_value
-            
-            elif field_type == 'datetime':
-                if isinstance(raw_value, datetime):
-                    # For datetime objects, show date and time
-                    return raw_value.strftime('%d/%b/%Y %H:%M')
-                elif isinstance(raw_value, date):
-                    # For date objects, just show date
-                    return raw_value.strftime('%d/%b/%Y')
-                elif isinstance(raw_value, str):
-                    try:
-                        # ✅ FIXED: Handle timezone-aware datetime strings first
-                        from dateutil import parser
-                        dt_obj = parser.parse(raw_value)
-                        return dt_obj.strftime('%d/%b/%Y %H:%M')
-                    except:
-                        try:
-                            # Try parsing as full datetime first
-                            dt_obj = datetime.strptime(raw_value, '%Y-%m-%d %H:%M:%S')
-                            return dt_obj.strftime('%d/%b/%Y %H:%M')
-                        except:
-                            try:
-                                # Try parsing as datetime without seconds
-                                dt_obj = datetime.strptime(raw_value, '%Y-%m-%d %H:%M')
-                                return dt_obj.strftime('%d/%b/%Y %H:%M')
-                            except:
-                                try:
-                                    # Try parsing as just date
-                                    date_obj = datetime.strptime(raw_value, '%Y-%m-%d').date()
-                                    return date_obj.strftime('%d/%b/%Y')
-                                except:
-                                    return raw_value
-
-            # Also handle the case where a field is marked as DATE but contains datetime
-            elif field_type == 'date':
-                if isinstance(raw_value, datetime):
-                    # If it's actually a datetime, format as date only
-                    return raw_value.strftime('%d/%b/%Y')
-                elif isinstance(raw_value, date):
-                    return raw_value.strftime('%d/%b/%Y')
-                elif isinstance(raw_value, str):
-                    try:
-                        # ✅ FIXED: Handle timezone-aware datetime strings first
-                        from dateutil import parser
-                        dt_obj = parser.parse(raw_value)
-                        return dt_obj.strftime('%d/%b/%Y')
-                    except:
-                        try:
-                            # Try parsing as datetime first (common case)
-                            dt_obj = datetime.strptime(raw_value, '%Y-%m-%d %H:%M:%S')
-                            return dt_obj.strftime('%d/%b/%Y')
-                        except:
-                            try:
-                                # Try parsing as date
-                                date_obj = datetime.strptime(raw_value, '%Y-%m-%d').date()
-                                return date_obj.strftime('%d/%b/%Y')
-                            except:
-                                return raw_value
-
-            elif field_type in ['currency', 'amount']:
-                try:
-                    amount = float(raw_value)
-                    return f"₹{amount:,.2f}"
-                except:
-                    return str(raw_value)
-            
-            elif field_type == 'status_badge':
-                result = self._format_status_badge(field, raw_value, item)
-                # Return the badge HTML, or create default badge
-                if isinstance(result, dict) and 'badge_html' in result:
-                    return result['badge_html']
-                elif isinstance(result, dict) and 'formatted_value' in result:
-                    css_class = result.get('css_class', 'status-badge status-default')
-                    return f'<span class="{css_class}">{result["formatted_value"]}</span>'
-                else:
-                    return f'<span class="status-badge status-default">{str(raw_value)}</span>'
-            
-            return str(raw_value)
-            
         except Exception as e:
             logger.error(f"Error formatting field value: {str(e)}")
             return str(raw_value) if raw_value is not None else '—'
 
-    def _format_status_badge(self, field, value, item=None) -> Dict:
-        """
-        Format status badge with CSS class
-        ENHANCED: Universal deleted status detection
-        ENHANCED: Append free/sample item indicators for payment_status field
-        """
-        try:
-            # Universal DELETED STATUS DETECTION
-            is_deleted = False
-            if item:
-                # Check multiple possible deleted flags (handle both dict and object)
-                if isinstance(item, dict):
-                    is_deleted = (item.get('is_deleted', False) or
-                                item.get('deleted_flag', False) or
-                                item.get('deleted', False))
-                else:
-                    is_deleted = (getattr(item, 'is_deleted', False) or
-                                getattr(item, 'deleted_flag', False) or
-                                getattr(item, 'deleted', False))
-
-            # If deleted, override status to show "Deleted" regardless of actual status
-            if is_deleted:
-                logger.debug(f"[STATUS_BADGE_DEBUG] Detected deleted item, showing Deleted badge")
-                return {
-                    'formatted_value': 'Deleted',
-                    'css_class': 'status-badge status-deleted',
-                    'badge_html': '<span class="status-badge status-deleted"><i class="fas fa-trash-alt"></i> Deleted</span>'
-                }
-
-            # Build the main badge HTML
-            badge_html = ''
-            formatted_value = str(value).title()
-            css_class = 'status-badge status-default'
-
-            # ✅ FIXED: Return consistent structure for non-deleted status
-            if hasattr(field, 'options') and field.options:
-                for option in field.options:
-                    if str(option.get('value', '')).lower() == str(value).lower():
-                        formatted_value = option.get('label', value)
-                        css_class = f"status-badge {option.get('css_class', 'status-default')}"
-                        badge_html = f'<span class="{css_class}">{formatted_value}</span>'
-                        break
-
-            # Default badge if no option matched
-            if not badge_html:
-                badge_html = f'<span class="{css_class}">{formatted_value}</span>'
-
-            # ENHANCEMENT: Append free/sample indicators for payment_status field
-            field_name = getattr(field, 'name', '')
-            if field_name == 'payment_status' and item and isinstance(item, dict):
-                extra_badges = []
-
-                # Check for free items
-                if item.get('has_free_items') == 'true':
-                    extra_badges.append('<span class="status-badge status-success" style="font-size: 0.65rem; padding: 0.15rem 0.35rem;"><i class="fas fa-gift"></i> FREE</span>')
-
-                # Check for sample items
-                if item.get('has_sample_items') == 'true':
-                    extra_badges.append('<span class="status-badge status-purple" style="font-size: 0.65rem; padding: 0.15rem 0.35rem;"><i class="fas fa-flask"></i> SAMPLE</span>')
-
-                # Append extra badges below the main badge
-                if extra_badges:
-                    badge_html += '<br>' + ' '.join(extra_badges)
-
-            return {
-                'formatted_value': formatted_value,
-                'css_class': css_class,
-                'badge_html': badge_html
-            }
-
-        except Exception as e:
-            logger.error(f"Error formatting status badge: {str(e)}")
-            return {'text': str(value), 'css_class': 'status-default'}
-
     def _assemble_summary_data(self, config: EntityConfiguration, raw_data: Dict) -> Dict:
         """Assemble summary data from raw data"""
         try:
@@ -678,32 +417,7 @@ class EnhancedUniversalDataAssembler:
     def _build_row_actions(self, config: EntityConfiguration, item: Dict) -> List[Dict]:
         """Build action buttons for table rows"""
         try:
-            actions = []
-
-            for action_config in config.actions:
-                if not getattr(action_config, 'show_in_list', False):
-                    continue
-
-                # Use _evaluate_action_conditions which supports conditional_display
-                if self._evaluate_action_conditions(action_config, item):
-                    # Get button type
-                    button_type = getattr(action_config, 'button_type', None)
-                    button_type_value = button_type.value.replace('btn-', '') if button_type else 'info'
-
-                    action = {
-                        'name': getattr(action_config, 'name', action_config.id),
-                        'label': action_config.label,
-                        'icon': action_config.icon,
-                        'css_class': getattr(action_config, 'css_class', 'btn-sm'),
-                        'button_type': button_type_value,
-                        'url': action_config.get_url(item, config),  # Use get_url method for proper URL building
-                        'confirmation_required': getattr(action_config, 'confirmation_required', False),
-                        'confirmation_message': getattr(action_config, 'confirmation_message', ''),
-                        'javascript_handler': getattr(action_config, 'javascript_handler', None)
-                    }
-                    actions.append(action)
-
-            return actions
+            return get_list_render_plan(config).row_actions(item)
 
         except Exception as e:
             logger.error(f"Error building row actions: {str(e)}")
@@ -915,20 +629,7 @@ class EnhancedUniversalDataAssembler:
 
     def _get_field_type_safe(self, field) -> str:
         """Safely get field type as string"""
-        try:
-            if not field or not hasattr(field, 'field_type'):
-                return 'text'
-            
-            if hasattr(field.field_type, 'value'):
-                return field.field_type.value.lower()
-            elif hasattr(field.field_type, 'name'):
-                return field.field_type.name.lower()
-            else:
-                return str(field.field_type).lower().replace('fieldtype.', '')
-                
-        except Exception as e:
-            logger.error(f"Error getting field type: {str(e)}")
-            return 'text'
+        return field_type_name(field)
 
     def _get_fallback_field_data(self, field) -> Dict:
         """Get safe fallback field data"""
@@ -1129,44 +830,17 @@ class EnhancedUniversalDataAssembler:
         Supports both 'conditions' dict and 'conditional_display' expression
         """
         try:
-            # First check conditional_display expression (if present)
-            if hasattr(action, 'conditional_display') and action.conditional_display:
-                # Create a safe namespace that returns None for missing attributes
-                class SafeNamespace(SimpleNamespace):
-                    def __getattr__(self, name):
-                        # Return None for missing attributes instead of raising AttributeError
-                        return self.__dict__.get(name, None)
-
-                # Use SafeNamespace instead of SimpleNamespace for robust attribute access
-                eval_context = {
-                    'item': SafeNamespace(**item) if isinstance(item, dict) else item
-                }
-
-                # Enhanced logging for debugging parent_transaction_id issues
-                if action.id == 'back_to_consolidated':
-                    logger.info(f"🔍 [PARENT_BUTTON_DEBUG] Evaluating action {action.id}")
-                    logger.info(f"🔍 [PARENT_BUTTON_DEBUG] Conditional: {action.conditional_display}")
-                    logger.info(f"🔍 [PARENT_BUTTON_DEBUG] Item type: {type(item)}")
-                    if isinstance(item, dict):
-                        logger.info(f"🔍 [PARENT_BUTTON_DEBUG] parent_transaction_id in item: {'parent_transaction_id' in item}")
-                        logger.info(f"🔍 [PARENT_BUTTON_DEBUG] parent_transaction_id value: {item.get('parent_transaction_id')}")
-                        logger.info(f"🔍 [PARENT_BUTTON_DEBUG] parent_transaction_id type: {type(item.get('parent_transaction_id'))}")
-
+            # First check conditional_display expression (if present), compiled once per expression
+            if getattr(action, 'conditional_display', None):
+                condition = get_compiled_condition(action.conditional_display)
                 try:
-                    result = eval(action.conditional_display, {"__builtins__": {}}, eval_context)
-
-                    if action.id == 'back_to_consolidated':
-                        logger.info(f"🔍 [PARENT_BUTTON_DEBUG] Evaluation result: {result}")
-
-                    if not result:
+                    # Fields missing from the item read as None
+                    if condition is not None and not condition.evaluate(item, missing_as_none=True):
                         logger.debug(f"[ACTION_DEBUG] Action {action.id} hidden by conditional_display: {action.conditional_display}")
                         return False
                 except Exception as eval_error:
                     logger.warning(f"[ACTION_DEBUG] Error evaluating conditional_display for action {action.id}: {eval_error}")
-                    if action.id == 'back_to_consolidated':
-                        logger.error(f"🔍 [PARENT_BUTTON_DEBUG] Evaluation error: {eval_error}", exc_info=True)
                     # Default to showing on evaluation error
-                    pass
 
             # Then check conditions dict (backward compatibility)
             if not hasattr(action, 'conditions') or not action.conditions:
@@ -1704,51 +1378,18 @@ class EnhancedUniversalDataAssembler:
 
     def _evaluate_condition_expression(self, expression: str, context: Dict) -> bool:
         """
-        Safely evaluate a Python expression for conditional display.
+        Evaluate a conditional display expression against context['item'].
         Entity-agnostic - supports expressions like:
         - "item.field_name > 0"
         - "item.status == 'active'"
         - "item.method == 'cash' or (item.method == 'mixed' and item.cash_amount > 0)"
+        Expressions are validated and compiled once (app/engine/condition_expressions.py);
+        invalid expressions, missing fields and errors show the element.
         """
-        try:
-            item = context.get('item')
-            if not item:
-                return True
-
-            # Build a safe namespace with only item attributes
-            safe_namespace = {}
-
-            # Extract all attributes from item (dict or object)
-            if isinstance(item, dict):
-                for key, value in item.items():
-                    safe_namespace[key] = value
-            else:
-                # For objects, get all non-private attributes
-                for attr in dir(item):
-                    if not attr.startswith('_'):
-                        try:
-                            safe_namespace[attr] = getattr(item, attr, None)
-                        except:
-                            pass
-
-            # Replace "item." with direct attribute access in expression
-            safe_expression = expression.replace('item.', '')
-
-            # Use eval with restricted namespace (only builtins needed for comparison)
-            safe_builtins = {
-                '__builtins__': {
-                    'True': True,
-                    'False': False,
-                    'None': None,
-                }
-            }
-
-            result = eval(safe_expression, safe_builtins, safe_namespace)
-            return bool(result)
-
-        except Exception as e:
-            logger.debug(f"Expression evaluation failed for '{expression}': {str(e)}")
-            return True  # Default to showing on error
+        item = context.get('item')
+        if not item:
+            return True
+        return evaluate_condition(expression, item, default=True)
 
     def _evaluate_condition(self, condition: str, context: Dict) -> bool:
         """
@@ -0,0 +1,234 @@
+# =============================================================================
+# File: app/engine/document_resources.py
+# Per-process resources reused by every rendered document
+# =============================================================================
+
+"""
+Document Resources - what UniversalDocumentService used to rebuild per document
+- PDF style sheets: ReportLab ParagraphStyles and the fixed TableStyles,
+  compiled once per page setup of a document configuration
+- Excel styles: openpyxl fonts, fills and alignments
+- Logos: resized PNG variants from HospitalLogoService (decoded once per
+  hospital and logo version, shared with the logo upload path)
+
+Styles are never mutated once compiled, so documents rendered in threads or
+render processes share them safely. A new logo upload changes the file
+version (and clears the variants of that hospital in the uploading process).
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# doc_config entries that shape the page, and so the compiled styles
+STYLE_KEYS = ('document_type', 'page_size', 'orientation', 'margins')
+
+# LOGO_SIZES variant per output: PDF and Word print at ~1.2in, Excel shows 80px
+PDF_LOGO_VARIANT = 'large'
+WORD_LOGO_VARIANT = 'large'
+EXCEL_LOGO_VARIANT = 'small'
+
+
+@dataclass(frozen=True)
+class PdfStyleSheet:
+    """ParagraphStyles and TableStyles of build_document_pdf"""
+    title: Any
+    card_title: Any
+    normal: Any
+    label: Any
+    value: Any
+    card_header_color: Any
+    card_title_bar: Any
+    card_box: Any
+    header: Any
+    separator: Any
+    items_table: Any
+    items_summary: Any
+    section: Any
+    terms: Any
+    signature_line: Any
+    signature: Any
+
+
+@dataclass(frozen=True)
+class ExcelStyles:
+    """openpyxl styles of build_document_excel"""
+    header_font: Any
+    title_font: Any
+    section_font: Any
+    label_font: Any
+    subsection_font: Any
+    footer_font: Any
+    header_fill: Any
+    table_header_fill: Any
+    table_header_border: Any
+    table_cell_border: Any
+    center: Any
+
+
+def style_sheet_key(doc_config) -> Tuple:
+    """Hashable page setup of a doc_config (dict or DocumentConfiguration)"""
+    key = []
+    for name in STYLE_KEYS:
+        value = doc_config.get(name) if isinstance(doc_config, dict) else getattr(doc_config, name, None)
+        value = getattr(value, 'value', value)
+        if isinstance(value, dict):
+            value = tuple(sorted(value.items()))
+        key.append(value if value is None or isinstance(value, (str, int, float, tuple)) else repr(value))
+    return tuple(key)
+
+def _padding(horizontal, vertical) -> list:
+    return [
+        ('LEFTPADDING', (0, 0), (-1, -1), horizontal),
+        ('RIGHTPADDING', (0, 0), (-1, -1), horizontal),
+        ('TOPPADDING', (0, 0), (-1, -1), vertical),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), vertical),
+    ]
+
+def compile_pdf_style_sheet(doc_config) -> PdfStyleSheet:
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    styles = getSampleStyleSheet()
+    card_header_color = colors.HexColor('#5b9bd5')  # Light blue
+
+    return PdfStyleSheet(
+        title=ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Title'],
+            fontSize=18,
+            textColor=colors.HexColor('#000000'),
+            spaceAfter=15,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        card_title=ParagraphStyle(
+            'CardTitle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            textColor=colors.HexColor('#ffffff'),
+            spaceAfter=0,
+            fontName='Helvetica-Bold',
+            alignment=TA_LEFT
+        ),
+        normal=ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#000000')
+        ),
+        label=ParagraphStyle(
+            'Label',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.HexColor('#666666'),
+            fontName='Helvetica-Bold'
+        ),
+        value=ParagraphStyle(
+            'Value',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#000000')
+        ),
+        card_header_color=card_header_color,
+        card_title_bar=TableStyle([('BACKGROUND', (0, 0), (-1, -1), card_header_color)] + _padding(10, 8)),
+        card_box=TableStyle([('BOX', (0, 0), (-1, -1), 1, colors.grey)] + _padding(0, 0)),
+        header=TableStyle([
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
+        separator=TableStyle([('LINEBELOW', (0, 0), (-1, 0), 1.5, colors.black)]),
+        items_table=TableStyle([
+            # Header
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            # Body
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 5),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]),
+        items_summary=TableStyle([
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+        ]),
+        section=TableStyle(_padding(10, 6) + [('VALIGN', (0, 0), (-1, -1), 'TOP')]),
+        terms=TableStyle(_padding(10, 8) + [('VALIGN', (0, 0), (-1, -1), 'TOP')]),
+        signature_line=TableStyle([('LINEBELOW', (0, 0), (-1, 0), 1, colors.black)]),
+        signature=TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
+    )
+
+def compile_excel_styles() -> ExcelStyles:
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    thin = Side(style='thin')
+    return ExcelStyles(
+        header_font=Font(size=16, bold=True),
+        title_font=Font(size=14, bold=True),
+        section_font=Font(size=12, bold=True),
+        label_font=Font(bold=True),
+        subsection_font=Font(bold=True, size=11),
+        footer_font=Font(size=9, italic=True),
+        header_fill=PatternFill(start_color="E0E0E0", end_color="E0E0E0", fill_type="solid"),
+        table_header_fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"),
+        table_header_border=Border(bottom=thin, top=thin, left=thin, right=thin),
+        table_cell_border=Border(bottom=thin, left=thin, right=thin),
+        center=Alignment(horizontal='center'),
+    )
+
+
+_pdf_style_sheets: Dict[Tuple, PdfStyleSheet] = {}
+_excel_styles: Optional[ExcelStyles] = None
+_resources_lock = threading.Lock()
+
+def get_pdf_style_sheet(doc_config) -> PdfStyleSheet:
+    """Compiled style sheet for the page setup of doc_config (compiled on first use)"""
+    key = style_sheet_key(doc_config)
+    style_sheet = _pdf_style_sheets.get(key)
+    if style_sheet is None:
+        with _resources_lock:
+            style_sheet = _pdf_style_sheets.get(key)
+            if style_sheet is None:
+                style_sheet = _pdf_style_sheets[key] = compile_pdf_style_sheet(doc_config)
+                logger.debug(f"Compiled PDF style sheet for {key}")
+    return style_sheet
+
+def get_excel_styles() -> ExcelStyles:
+    global _excel_styles
+    if _excel_styles is None:
+        with _resources_lock:
+            if _excel_styles is None:
+                _excel_styles = compile_excel_styles()
+    return _excel_styles
+
+def get_document_logo(hospital: Dict, logo_file: str, variant: str) -> Optional[bytes]:
+    """Resized logo of the hospital as PNG bytes (None: use logo_file as it is)"""
+    from app.services.hospital_logo_service import HospitalLogoService
+    return HospitalLogoService.get_logo_variant(hospital.get('hospital_id'), logo_file, variant)
+
+def clear_document_resources():
+    """Drop compiled styles and resized logos of this process"""
+    global _excel_styles
+    from app.services.hospital_logo_service import HospitalLogoService
+
+    with _resources_lock:
+        _pdf_style_sheets.clear()
+        _excel_styles = None
+    HospitalLogoService.clear_logo_variants()
@@ -0,0 +1,250 @@
+# =============================================================================
+# File: app/engine/keyset_pagination.py
+# Keyset (seek) pagination and count strategies for list queries
+# =============================================================================
+
+"""
+Keyset Pagination - opt-in alternative to OFFSET paging
+- Opaque cursor tokens encode the sort key and primary key of the edge row
+- Pages seek with WHERE (sort, pk) < (value, id), so page 500 costs the same as page 1
+- Count strategies: exact, capped ("10,000+") or planner estimate (EXPLAIN)
+
+NULL sort keys are ordered as the largest values (PostgreSQL default:
+NULLS LAST ascending, NULLS FIRST descending) and handled by the seek.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Query, Session
+
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+PAGINATION_MODES = ('offset', 'keyset')
+COUNT_MODES = ('exact', 'capped', 'estimated')
+DEFAULT_COUNT_CAP = 10000
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+    pass
+
+
+# =============================================================================
+# CURSOR TOKENS
+# =============================================================================
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return {'u': str(value)}
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if not isinstance(value, dict):
+        return value
+    if 'u' in value:
+        return uuid.UUID(value['u'])
+    if 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    if 'd' in value:
+        return date.fromisoformat(value['d'])
+    if 'n' in value:
+        return Decimal(value['n'])
+    raise InvalidCursorError("Unknown cursor value type")
+
+def encode_cursor(sort_value: Any, pk_value: Any, direction: str = 'next') -> str:
+    """Build an opaque, URL-safe cursor for the row with these keys"""
+    payload = {'k': [_encode_value(sort_value), _encode_value(pk_value)], 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token: str) -> Tuple[Any, Any, str]:
+    """Return (sort_value, pk_value, direction) for a cursor token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        sort_value, pk_value = (_decode_value(v) for v in payload['k'])
+        direction = payload.get('d', 'next')
+    except InvalidCursorError:
+        raise
+    except Exception:
+        raise InvalidCursorError("Invalid pagination cursor")
+
+    if direction not in ('next', 'prev'):
+        raise InvalidCursorError("Invalid pagination cursor direction")
+    return sort_value, pk_value, direction
+
+
+# =============================================================================
+# SEEK PAGINATION
+# =============================================================================
+
+def _seek_condition(sort_column, pk_column, sort_value, pk_value, ascending: bool):
+    """Rows strictly after (sort_value, pk_value) in the given order, NULLs largest"""
+    if ascending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), pk_column > pk_value)
+        return or_(sort_column > sort_value,
+                   and_(sort_column == sort_value, pk_column > pk_value),
+                   sort_column.is_(None))
+    if sort_value is None:
+        return or_(sort_column.isnot(None),
+                   and_(sort_column.is_(None), pk_column < pk_value))
+    return or_(sort_column < sort_value,
+               and_(sort_column == sort_value, pk_column < pk_value))
+
+def _ordered(query: Query, sort_column, pk_column, ascending: bool) -> Query:
+    query = query.order_by(None)
+    if ascending:
+        return query.order_by(sort_column.asc().nulls_last(), pk_column.asc())
+    return query.order_by(sort_column.desc().nulls_first(), pk_column.desc())
+
+def paginate_keyset(query: Query, sort_column, pk_column, descending: bool,
+                    per_page: int, cursor: Optional[str] = None) -> Tuple[List, Dict]:
+    """
+    Fetch one page after (or before) the cursor row.
+
+    Args:
+        query: Filtered query returning model instances (any ORDER BY is replaced)
+        sort_column: Model attribute used as the primary sort key
+        pk_column: Model primary key attribute (tie-breaker, must be unique)
+        descending: Page order of the list
+        per_page: Page size
+        cursor: Token from a previous page's next_cursor/prev_cursor
+
+    Returns:
+        (rows, info) where info has has_next, has_prev, next_cursor, prev_cursor
+    """
+    direction = 'next'
+    if cursor:
+        sort_value, pk_value, direction = decode_cursor(cursor)
+
+    # Walking backwards reverses the scan order; rows are flipped afterwards
+    ascending = descending if direction == 'prev' else not descending
+    page_query = _ordered(query, sort_column, pk_column, ascending)
+    if cursor:
+        page_query = page_query.filter(
+            _seek_condition(sort_column, pk_column, sort_value, pk_value, ascending)
+        )
+
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    has_next = has_more if direction == 'next' else True
+    has_prev = bool(cursor) if direction == 'next' else has_more
+
+    def edge_cursor(row, edge_direction):
+        return encode_cursor(getattr(row, sort_column.key), getattr(row, pk_column.key), edge_direction)
+
+    info = {
+        'has_next': has_next and bool(rows),
+        'has_prev': has_prev and bool(rows),
+        'next_cursor': edge_cursor(rows[-1], 'next') if has_next and rows else None,
+        'prev_cursor': edge_cursor(rows[0], 'prev') if has_prev and rows else None,
+    }
+    return rows, info
+
+
+# =============================================================================
+# COUNT STRATEGIES
+# =============================================================================
+
+def explain_statement(query: Query, dialect) -> Tuple[str, Any]:
+    """
+    EXPLAIN (FORMAT JSON) statement and driver parameters for a query.
+    Expanding IN parameters are rendered out, as EXPLAIN goes to the driver as-is.
+    """
+    compiled = query.order_by(None).statement.compile(
+        dialect=dialect, compile_kwargs={'render_postcompile': True}
+    )
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return f"EXPLAIN (FORMAT JSON) {compiled}", params
+
+def estimate_count(session: Session, query: Query) -> Optional[int]:
+    """
+    Planner row estimate for a query via EXPLAIN (PostgreSQL only).
+    Returns None when the estimate is unavailable.
+
+    Runs in a savepoint: a failed EXPLAIN must not abort the request's
+    transaction (the count fallback and the page query still run on it).
+    """
+    try:
+        bind = session.get_bind()
+        if bind.dialect.name != 'postgresql':
+            return None
+
+        statement, params = explain_statement(query, bind.dialect)
+        with session.begin_nested():
+            plan = session.connection().exec_driver_sql(statement, params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    except Exception as e:
+        logger.warning(f"Could not estimate row count: {str(e)}")
+        return None
+
+def count_rows(session: Session, query: Query, count_mode: str = 'exact',
+               count_cap: int = DEFAULT_COUNT_CAP) -> Tuple[int, Dict]:
+    """
+    Count rows for pagination using the configured strategy.
+
+    exact:      SELECT count(*) over the whole result
+    capped:     count at most count_cap + 1 rows; larger results show "10,000+"
+    estimated:  planner estimate when it exceeds count_cap, exact count below it
+
+    Returns:
+        (total_count, info) where info has count_mode, count_is_exact and
+        total_count_display
+    """
+    count_cap = max(1, int(count_cap or DEFAULT_COUNT_CAP))
+
+    if count_mode == 'estimated':
+        estimate = estimate_count(session, query)
+        if estimate is not None and estimate > count_cap:
+            return estimate, {
+                'count_mode': 'estimated',
+                'count_is_exact': False,
+                'total_count_display': f"~{estimate:,}"
+            }
+        count_mode = 'capped'
+
+    if count_mode == 'capped':
+        limited = query.order_by(None).limit(count_cap + 1).subquery()
+        total_count = session.query(func.count()).select_from(limited).scalar() or 0
+        if total_count > count_cap:
+            return count_cap, {
+                'count_mode': 'capped',
+                'count_is_exact': False,
+                'total_count_display': f"{count_cap:,}+"
+            }
+        return total_count, {
+            'count_mode': 'capped',
+            'count_is_exact': True,
+            'total_count_display': f"{total_count:,}"
+        }
+
+    total_count = query.count()
+    return total_count, {
+        'count_mode': 'exact',
+        'count_is_exact': True,
+        'total_count_display': f"{total_count:,}"
+    }
@@ -0,0 +1,398 @@
+# =============================================================================
+# File: app/engine/list_render_plan.py
+# Compiled per-entity list rendering plans
+# =============================================================================
+
+"""
+List Render Plan - an EntityConfiguration compiled once for list rendering
+- Ordered (column, extractor, formatter) triples for the show_in_list fields,
+  with field type, virtual mapping, date/currency formatting and status badge
+  options resolved at compile time
+- Row actions with conditions pre-parsed (conditional_display compiled by
+  condition_expressions, conditions dict normalized to tuples)
+- Table column metadata and option labels shared by the list page and the
+  export path
+
+Plans are cached per entity type and recompiled when the configuration
+object (or its fields/actions lists) changes, or when the configuration
+cache invalidates the entity.
+
+Output is identical to the field-by-field formatting of
+EnhancedUniversalDataAssembler, which now delegates here.
+"""
+
+import threading
+from dataclasses import dataclass, field as dataclass_field
+from datetime import datetime, date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.engine.condition_expressions import get_compiled_condition
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+DATE_FORMAT = '%d/%b/%Y'
+DATETIME_FORMAT = '%d/%b/%Y %H:%M'
+
+NUMERIC_FIELD_TYPES = ('currency', 'amount', 'decimal', 'number')
+
+# Virtual condition fields that are skipped (action shown) when absent from the item
+OPTIONAL_CONDITION_FIELDS = ('can_be_approved', 'can_be_deleted', 'can_be_unapproved', 'has_invoice')
+
+DELETED_BADGE = '<span class="status-badge status-deleted"><i class="fas fa-trash-alt"></i> Deleted</span>'
+FREE_ITEMS_BADGE = ('<span class="status-badge status-success" style="font-size: 0.65rem; '
+                    'padding: 0.15rem 0.35rem;"><i class="fas fa-gift"></i> FREE</span>')
+SAMPLE_ITEMS_BADGE = ('<span class="status-badge status-purple" style="font-size: 0.65rem; '
+                      'padding: 0.15rem 0.35rem;"><i class="fas fa-flask"></i> SAMPLE</span>')
+
+Formatter = Callable[[Any, Any], Any]
+
+
+def field_type_name(field) -> str:
+    """Field type of a field definition as a lowercase string ('text' when unknown)"""
+    try:
+        if not field or not hasattr(field, 'field_type'):
+            return 'text'
+        if hasattr(field.field_type, 'value'):
+            return field.field_type.value.lower()
+        if hasattr(field.field_type, 'name'):
+            return field.field_type.name.lower()
+        return str(field.field_type).lower().replace('fieldtype.', '')
+    except Exception as e:
+        logger.error(f"Error getting field type: {str(e)}")
+        return 'text'
+
+# =============================================================================
+# VALUE FORMATTERS
+# =============================================================================
+
+def _as_text(value, item=None):
+    return str(value)
+
+def _as_number_string(value, item=None):
+    # Mixed payment breakdowns are formatted by the template from the raw number
+    try:
+        return str(float(value))
+    except (ValueError, TypeError):
+        return '0'
+
+def _as_number(value, item=None):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+def _as_date(value, item=None):
+    if isinstance(value, (date, datetime)):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date().strftime(DATE_FORMAT)
+        except ValueError:
+            return value
+    return str(value)
+
+def _as_datetime(value, item=None):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, date):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, str):
+        try:
+            # Timezone-aware datetime strings first
+            from dateutil import parser
+            return parser.parse(value).strftime(DATETIME_FORMAT)
+        except Exception:
+            pass
+        for pattern, output in (('%Y-%m-%d %H:%M:%S', DATETIME_FORMAT), ('%Y-%m-%d %H:%M', DATETIME_FORMAT),
+                                ('%Y-%m-%d', DATE_FORMAT)):
+            try:
+                return datetime.strptime(value, pattern).strftime(output)
+            except ValueError:
+                continue
+        return value
+    return str(value)
+
+
+def _is_deleted(item) -> bool:
+    if not item:
+        return False
+    if isinstance(item, dict):
+        return bool(item.get('is_deleted', False) or item.get('deleted_flag', False) or item.get('deleted', False))
+    return bool(getattr(item, 'is_deleted', False) or getattr(item, 'deleted_flag', False)
+                or getattr(item, 'deleted', False))
+
+def _status_badge_formatter(field) -> Formatter:
+    """Badge HTML of a status value; option lookup table built once"""
+    options = {}
+    for option in getattr(field, 'options', None) or []:
+        if isinstance(option, dict):
+            key = str(option.get('value', '')).lower()
+            options.setdefault(key, (option, f"status-badge {option.get('css_class', 'status-default')}"))
+    with_item_indicators = getattr(field, 'name', '') == 'payment_status'
+
+    def format_badge(value, item=None):
+        if _is_deleted(item):
+            return DELETED_BADGE
+
+        match = options.get(str(value).lower())
+        if match:
+            option, css_class = match
+            badge_html = f'<span class="{css_class}">{option.get("label", value)}</span>'
+        else:
+            badge_html = f'<span class="status-badge status-default">{str(value).title()}</span>'
+
+        # Free/sample item indicators below the payment status
+        if with_item_indicators and isinstance(item, dict):
+            extra_badges = []
+            if item.get('has_free_items') == 'true':
+                extra_badges.append(FREE_ITEMS_BADGE)
+            if item.get('has_sample_items') == 'true':
+                extra_badges.append(SAMPLE_ITEMS_BADGE)
+            if extra_badges:
+                badge_html += '<br>' + ' '.join(extra_badges)
+        return badge_html
+
+    return format_badge
+
+def compile_field_formatter(field, field_type: Optional[str] = None) -> Formatter:
+    """Display formatter of a field for non-None values: formatter(value, item)"""
+    field_type = field_type or field_type_name(field)
+    if field_type == 'currency' and getattr(field, 'format_pattern', None) == 'mixed_payment_breakdown':
+        return _as_number_string
+    if field_type in ('currency', 'amount'):
+        # Numeric value - the template handles currency formatting
+        return _as_number
+    if field_type == 'date':
+        return _as_date
+    if field_type == 'datetime':
+        return _as_datetime
+    if field_type == 'status_badge':
+        return _status_badge_formatter(field)
+    return _as_text
+
+# =============================================================================
+# VALUE EXTRACTORS
+# =============================================================================
+
+def compile_field_extractor(field) -> Callable[[Dict], Any]:
+    """Raw value of a field from a list item dict"""
+    name = field.name
+    if not getattr(field, 'virtual', False):
+        return lambda item: item.get(name)
+
+    virtual_target = getattr(field, 'virtual_target', None)
+    virtual_key = getattr(field, 'virtual_key', None)
+    if virtual_target and virtual_key:
+        # JSONB virtual field - extract from the nested structure
+        def extract_virtual(item):
+            target_data = item.get(virtual_target, {})
+            return target_data.get(virtual_key, '') if isinstance(target_data, dict) else ''
+        return extract_virtual
+
+    # Computed virtual field - set on the item by the service layer
+    return lambda item: item.get(name, '')
+
+# =============================================================================
+# ACTION CONDITIONS
+# =============================================================================
+
+def compile_action_visibility(action) -> Callable[[Any], bool]:
+    """
+    Visibility predicate of an action: its conditional_display expression
+    and conditions dict, parsed once. Evaluation errors show the action.
+    """
+    action_id = getattr(action, 'id', '?')
+    expression = getattr(action, 'conditional_display', None)
+    condition = get_compiled_condition(expression) if expression else None
+
+    conditions = tuple(
+        (field_name, tuple(allowed if isinstance(allowed, list) else [allowed]))
+        for field_name, allowed in (getattr(action, 'conditions', None) or {}).items()
+    )
+
+    def is_visible(item) -> bool:
+        try:
+            if condition is not None:
+                try:
+                    # Fields missing from the item read as None
+                    if not condition.evaluate(item, missing_as_none=True):
+                        return False
+                except Exception as eval_error:
+                    logger.warning(f"[ACTION_DEBUG] Error evaluating conditional_display for action "
+                                   f"{action_id}: {eval_error}")
+
+            for field_name, allowed_values in conditions:
+                if isinstance(item, dict):
+                    actual_value = item.get(field_name)
+                else:
+                    actual_value = getattr(item, field_name, None)
+                if actual_value is None:
+                    if field_name in OPTIONAL_CONDITION_FIELDS:
+                        continue
+                    if field_name == 'is_deleted':
+                        actual_value = False
+                if actual_value not in allowed_values:
+                    return False
+            return True
+
+        except Exception as e:
+            logger.error(f"Error evaluating conditions for action {action_id}: {str(e)}")
+            return True
+
+    return is_visible
+
+# =============================================================================
+# PLAN
+# =============================================================================
+
+@dataclass
+class PlanAction:
+    """A row action: visibility predicate and the parts of its button that do not depend on the row"""
+    action: Any
+    is_visible: Callable[[Any], bool]
+    button: Dict[str, Any]
+
+
+@dataclass
+class ListRenderPlan:
+    """List rendering of one entity configuration"""
+    entity_type: str
+    config: Any
+    version: Tuple
+    primary_key: str
+    list_fields: Tuple = ()
+    columns: Tuple[Tuple[str, Callable, Formatter], ...] = ()
+    actions: Tuple[PlanAction, ...] = ()
+    table_columns: Tuple[Dict[str, Any], ...] = ()
+    option_labels: Dict[str, Dict[Any, str]] = dataclass_field(default_factory=dict)
+
+    def render_row(self, item: Dict) -> Dict[str, Any]:
+        row_data = {}
+        for name, extract, format_value in self.columns:
+            raw_value = extract(item)
+            if raw_value is None:
+                row_data[name] = ''
+                continue
+            try:
+                row_data[name] = format_value(raw_value, item)
+            except Exception as e:
+                logger.error(f"Error formatting field value: {str(e)}")
+                row_data[name] = str(raw_value)
+
+        row_data['_row_id'] = item.get(self.primary_key)
+        row_data['_row_actions'] = self.row_actions(item)
+        return row_data
+
+    def render_rows(self, items: List[Dict]) -> List[Dict[str, Any]]:
+        return [self.render_row(item) for item in items]
+
+    def row_actions(self, item: Dict) -> List[Dict[str, Any]]:
+        actions = []
+        for plan_action in self.actions:
+            if not plan_action.is_visible(item):
+                continue
+            button = dict(plan_action.button)
+            # Use get_url method for proper URL building
+            button['url'] = plan_action.action.get_url(item, self.config)
+            actions.append(button)
+        return actions
+
+
+def plan_version(config) -> Tuple:
+    """Identity of a configuration as compiled: the object and its field/action lists"""
+    return (id(config), id(config.fields), len(config.fields), id(config.actions), len(config.actions))
+
+def _table_column(field, field_type: str) -> Dict[str, Any]:
+    complex_display_type = getattr(field, 'complex_display_type', None)
+    return {
+        'name': field.name,
+        'label': field.label,
+        'sortable': getattr(field, 'sortable', False),
+        'css_class': getattr(field, 'css_class', ''),
+        'width': getattr(field, 'width', None),
+        'max_width': getattr(field, 'max_width', None),
+        'align': getattr(field, 'align', 'left'),
+        'field_type': field_type,
+        'format_pattern': getattr(field, 'format_pattern', None),
+        'complex_display_type': complex_display_type.value if complex_display_type else None,
+        'css_classes': getattr(field, 'css_classes', ''),
+        'related_field': getattr(field, 'related_field', None),
+        'related_display_field': getattr(field, 'related_display_field', None),
+
+        # Universal virtual field metadata for template
+        'virtual': getattr(field, 'virtual', False),
+        'virtual_target': getattr(field, 'virtual_target', None),
+        'virtual_key': getattr(field, 'virtual_key', None)
+    }
+
+def _action_button(action) -> Dict[str, Any]:
+    button_type = getattr(action, 'button_type', None)
+    return {
+        'name': getattr(action, 'name', action.id),
+        'label': action.label,
+        'icon': action.icon,
+        'css_class': getattr(action, 'css_class', 'btn-sm'),
+        'button_type': button_type.value.replace('btn-', '') if button_type else 'info',
+        'url': None,
+        'confirmation_required': getattr(action, 'confirmation_required', False),
+        'confirmation_message': getattr(action, 'confirmation_message', ''),
+        'javascript_handler': getattr(action, 'javascript_handler', None)
+    }
+
+def compile_list_render_plan(config) -> ListRenderPlan:
+    """Compile the list fields and row actions of an entity configuration"""
+    list_fields = tuple(f for f in config.fields if getattr(f, 'show_in_list', False))
+
+    columns, table_columns, option_labels = [], [], {}
+    for field in list_fields:
+        field_type = field_type_name(field)
+        columns.append((field.name, compile_field_extractor(field), compile_field_formatter(field, field_type)))
+        table_columns.append(_table_column(field, field_type))
+        option_labels[field.name] = {opt.get('value'): opt.get('label') for opt in (field.options or [])
+                                     if isinstance(opt, dict)}
+
+    actions = tuple(
+        PlanAction(action=action, is_visible=compile_action_visibility(action), button=_action_button(action))
+        for action in config.actions if getattr(action, 'show_in_list', False)
+    )
+
+    return ListRenderPlan(
+        entity_type=config.entity_type,
+        config=config,
+        version=plan_version(config),
+        primary_key=config.primary_key,
+        list_fields=list_fields,
+        columns=tuple(columns),
+        actions=actions,
+        table_columns=tuple(table_columns),
+        option_labels=option_labels
+    )
+
+# =============================================================================
+# PLAN CACHE
+# =============================================================================
+
+_plans: Dict[str, ListRenderPlan] = {}
+_plans_lock = threading.Lock()
+
+def get_list_render_plan(config) -> ListRenderPlan:
+    """Cached plan of a configuration, recompiled when the configuration changed"""
+    plan = _plans.get(config.entity_type)
+    if plan is not None and plan.config is config and plan.version == plan_version(config):
+        return plan
+
+    plan = compile_list_render_plan(config)
+    with _plans_lock:
+        _plans[config.entity_type] = plan
+    logger.debug(f"Compiled list render plan for {config.entity_type}: "
+                 f"{len(plan.columns)} column(s), {len(plan.actions)} action(s)")
+    return plan
+
+def invalidate_list_render_plans(entity_type: Optional[str] = None):
+    """Drop the plan of one entity type, or all plans"""
+    with _plans_lock:
+        if entity_type is None:
+            _plans.clear()
+        else:
+            _plans.pop(entity_type, None)
@@ -0,0 +1,393 @@
+# =============================================================================
+# Service Cache Backends - Shared (L2) Storage for UniversalServiceCache
+# File: app/engine/service_cache_backend.py
+# =============================================================================
+
+"""
+Pluggable shared backends for the service cache.
+
+UniversalServiceCache keeps its in-process OrderedDict as L1. A backend adds
+an L2 tier that every gunicorn worker can see, and provides the two
+primitives the cache needs to behave correctly across processes:
+
+- Load locks: only one worker runs the loader for a given cache key, the
+  others wait for the shared value (single-flight).
+- Invalidation broadcast: an invalidation in one worker is published so
+  every other worker drops the matching L1 entries.
+
+Backends:
+- LocalServiceCacheBackend: in-process stand-in. Instances created with the
+  same namespace share state, so tests can simulate several workers.
+- RedisServiceCacheBackend: Redis strings for values, one set per tag for
+  the invalidation index, SET NX for load locks and pub/sub for
+  invalidations. Accepts any redis-py compatible client (e.g. fakeredis
+  in tests).
+
+Values are passed in and out as bytes; serialization stays in the cache.
+"""
+
+import json
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Callable
+
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# =============================================================================
+# BACKEND INTERFACE
+# =============================================================================
+
+class ServiceCacheBackend:
+    """
+    Interface for shared service cache storage.
+    All methods must be safe to call from multiple threads.
+    """
+
+    name = 'base'
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored payload for key, or None"""
+        raise NotImplementedError
+
+    def set(self, key: str, payload: bytes, ttl_seconds: int, tags: List[str]):
+        """Store payload for key and index it under each tag"""
+        raise NotImplementedError
+
+    def delete_tags(self, tags: List[str]) -> int:
+        """Delete every key indexed under any of tags, return count"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Delete all keys owned by this backend"""
+        raise NotImplementedError
+
+    def acquire_load_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        """Try to become the loader for key. Returns a token, or None if held"""
+        raise NotImplementedError
+
+    def release_load_lock(self, key: str, token: str):
+        """Release a load lock previously acquired with token"""
+        raise NotImplementedError
+
+    def is_load_locked(self, key: str) -> bool:
+        """Check whether another worker is currently loading key"""
+        raise NotImplementedError
+
+    def publish(self, message: Dict[str, Any]):
+        """Broadcast an invalidation message to all subscribers"""
+        raise NotImplementedError
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """Register callback for invalidation messages"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release connections and listener threads"""
+        pass
+
+# =============================================================================
+# LOCAL (IN-PROCESS) BACKEND
+# =============================================================================
+
+class _LocalNamespace:
+    """Shared state for all LocalServiceCacheBackend instances of a namespace"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[str, tuple] = {}       # key -> (payload, expires_at)
+        self.tag_index: Dict[str, set] = {}      # tag -> keys
+        self.load_locks: Dict[str, tuple] = {}   # key -> (token, expires_at)
+        self.subscribers: List[Callable] = []
+
+class LocalServiceCacheBackend(ServiceCacheBackend):
+    """
+    In-process stand-in for a shared backend.
+    Useful for tests and single-process deployments.
+    """
+
+    name = 'local'
+
+    _namespaces: Dict[str, _LocalNamespace] = {}
+    _namespaces_lock = threading.Lock()
+
+    def __init__(self, namespace: str = 'default'):
+        with self._namespaces_lock:
+            if namespace not in self._namespaces:
+                self._namespaces[namespace] = _LocalNamespace()
+            self._ns = self._namespaces[namespace]
+        self.namespace = namespace
+        self._callbacks: List[Callable] = []
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._ns.lock:
+            item = self._ns.values.get(key)
+            if not item:
+                return None
+            payload, expires_at = item
+            if expires_at < time.time():
+                del self._ns.values[key]
+                return None
+            return payload
+
+    def set(self, key: str, payload: bytes, ttl_seconds: int, tags: List[str]):
+        with self._ns.lock:
+            self._ns.values[key] = (payload, time.time() + ttl_seconds)
+            for tag in tags:
+                self._ns.tag_index.setdefault(tag, set()).add(key)
+
+    def delete_tags(self, tags: List[str]) -> int:
+        with self._ns.lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._ns.tag_index.pop(tag, set())
+            deleted = 0
+            for key in keys:
+                if self._ns.values.pop(key, None) is not None:
+                    deleted += 1
+            return deleted
+
+    def clear(self):
+        with self._ns.lock:
+            self._ns.values.clear()
+            self._ns.tag_index.clear()
+
+    def acquire_load_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        now = time.time()
+        with self._ns.lock:
+            held = self._ns.load_locks.get(key)
+            if held and held[1] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._ns.load_locks[key] = (token, now + ttl_seconds)
+            return token
+
+    def release_load_lock(self, key: str, token: str):
+        with self._ns.lock:
+            held = self._ns.load_locks.get(key)
+            if held and held[0] == token:
+                del self._ns.load_locks[key]
+
+    def is_load_locked(self, key: str) -> bool:
+        with self._ns.lock:
+            held = self._ns.load_locks.get(key)
+            return bool(held and held[1] > time.time())
+
+    def publish(self, message: Dict[str, Any]):
+        with self._ns.lock:
+            subscribers = list(self._ns.subscribers)
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.warning(f"⚠️ Service cache invalidation subscriber failed: {str(e)}")
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._ns.lock:
+            self._ns.subscribers.append(callback)
+        self._callbacks.append(callback)
+
+    def close(self):
+        with self._ns.lock:
+            for callback in self._callbacks:
+                if callback in self._ns.subscribers:
+                    self._ns.subscribers.remove(callback)
+        self._callbacks = []
+
+# =============================================================================
+# REDIS BACKEND
+# =============================================================================
+
+class RedisServiceCacheBackend(ServiceCacheBackend):
+    """
+    Redis-backed shared cache tier.
+    Redis errors are logged and treated as misses so the cache degrades to L1.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client=None, url: str = None, prefix: str = 'svc_cache'):
+        if client is None:
+            import redis
+            client = redis.from_url(url or 'redis://localhost:6379/0')
+        self.client = client
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidate"
+        self._pubsub = None
+        self._listener = None
+        self._callbacks: List[Callable] = []
+
+    def _data_key(self, key: str) -> str:
+        return f"{self.prefix}:data:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.prefix}:lock:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self._data_key(key))
+        except Exception as e:
+            logger.warning(f"⚠️ Redis service cache GET failed: {str(e)}")
+            return None
+
+    def set(self, key: str, payload: bytes, ttl_seconds: int, tags: List[str]):
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(self._data_key(key), payload, ex=int(ttl_seconds))
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                pipe.sadd(tag_key, key)
+                # Index lives at least as long as the longest-lived entry it points to:
+                # set a TTL on a new index, afterwards only ever extend it (Redis >= 7)
+                pipe.expire(tag_key, int(ttl_seconds), nx=True)
+                pipe.expire(tag_key, int(ttl_seconds), gt=True)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Redis service cache SET failed: {str(e)}")
+
+    def delete_tags(self, tags: List[str]) -> int:
+        try:
+            tag_keys = [self._tag_key(tag) for tag in tags]
+            keys = self.client.sunion(tag_keys)
+            if not keys:
+                return 0
+            data_keys = [self._data_key(k.decode() if isinstance(k, bytes) else k) for k in keys]
+            pipe = self.client.pipeline()
+            pipe.delete(*data_keys)
+            pipe.delete(*tag_keys)
+            deleted, _ = pipe.execute()
+            return deleted
+        except Exception as e:
+            logger.warning(f"⚠️ Redis service cache invalidation failed: {str(e)}")
+            return 0
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}:*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis service cache clear failed: {str(e)}")
+
+    def acquire_load_lock(self, key: str, ttl_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(self._lock_key(key), token, nx=True,
+                                       px=int(ttl_seconds * 1000))
+            return token if acquired else None
+        except Exception as e:
+            # Without Redis we cannot coordinate - let this worker load
+            logger.warning(f"⚠️ Redis load lock failed, loading locally: {str(e)}")
+            return token
+
+    def release_load_lock(self, key: str, token: str):
+        import redis
+        lock_key = self._lock_key(key)
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                held = pipe.get(lock_key)
+                if held is not None and (held.decode() if isinstance(held, bytes) else held) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except redis.WatchError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Redis load lock release failed: {str(e)}")
+
+    def is_load_locked(self, key: str) -> bool:
+        try:
+            return bool(self.client.exists(self._lock_key(key)))
+        except Exception:
+            return False
+
+    def publish(self, message: Dict[str, Any]):
+        try:
+            self.client.publish(self.channel, json.dumps(message, default=str))
+        except Exception as e:
+            logger.warning(f"⚠️ Redis invalidation broadcast failed: {str(e)}")
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        self._callbacks.append(callback)
+        if self._pubsub is not None:
+            return
+
+        def handle(raw_message):
+            try:
+                message = json.loads(raw_message['data'])
+            except Exception:
+                return
+            for registered in list(self._callbacks):
+                try:
+                    registered(message)
+                except Exception as e:
+                    logger.warning(f"⚠️ Service cache invalidation subscriber failed: {str(e)}")
+
+        try:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self.channel: handle})
+            self._listener = self._pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+        except Exception as e:
+            self._pubsub = None
+            logger.warning(f"⚠️ Redis invalidation listener not started: {str(e)}")
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+        self._callbacks = []
+
+# =============================================================================
+# FACTORY
+# =============================================================================
+
+def create_service_cache_backend(config: Dict[str, Any]) -> Optional[ServiceCacheBackend]:
+    """
+    Build the configured backend from app config.
+
+    SERVICE_CACHE_BACKEND:
+        'memory' (default) - L1 only, no shared tier
+        'local'            - in-process shared stand-in
+        'redis'            - Redis at SERVICE_CACHE_REDIS_URL (or settings.REDIS_URL)
+    """
+    backend_name = (config.get('SERVICE_CACHE_BACKEND') or 'memory').lower()
+
+    if backend_name == 'memory':
+        return None
+
+    if backend_name == 'local':
+        return LocalServiceCacheBackend(config.get('SERVICE_CACHE_NAMESPACE', 'default'))
+
+    if backend_name == 'redis':
+        url = config.get('SERVICE_CACHE_REDIS_URL')
+        if not url:
+            try:
+                from app.config.settings import settings
+                url = settings.REDIS_URL
+            except Exception:
+                url = None
+        try:
+            backend = RedisServiceCacheBackend(
+                url=url,
+                prefix=config.get('SERVICE_CACHE_NAMESPACE', 'svc_cache')
+            )
+            backend.client.ping()
+            logger.info(f"✅ Service cache L2 backend: redis ({url})")
+            return backend
+        except Exception as e:
+            logger.warning(f"⚠️ Redis service cache backend unavailable, using L1 only: {str(e)}")
+            return None
+
+    logger.warning(f"⚠️ Unknown SERVICE_CACHE_BACKEND '{backend_name}', using L1 only")
+    return None
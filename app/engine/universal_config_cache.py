@@ -22,6 +22,8 @@ from typing import Dict, Any, Optional, Set
 from datetime import datetime
 
 from app.config.core_definitions import EntityConfiguration, EntityFilterConfiguration, EntitySearchConfiguration
+from app.engine.condition_expressions import precompile_config_conditions
+from app.engine.list_render_plan import invalidate_list_render_plans
 from app.utils.unicode_logging import get_unicode_safe_logger
 
 logger = get_unicode_safe_logger(__name__)
@@ -292,6 +294,7 @@ class UniversalConfigurationCache:
                 if entity_type in self.entity_configs:
                     del self.entity_configs[entity_type]
                     invalidated_count += 1
+                invalidate_list_render_plans(entity_type)
             
             if config_type is None or config_type == 'filter':
                 if entity_type in self.filter_configs:
@@ -321,6 +324,7 @@ class UniversalConfigurationCache:
             self.entity_configs.clear()
             self.filter_configs.clear()
             self.search_configs.clear()
+            invalidate_list_render_plans()
             
             logger.info(f"🗑️ Cleared entire configuration cache ({total_count} entries)")
     
@@ -401,7 +405,11 @@ class CachedConfigurationLoader:
     def get_config(self, entity_type: str) -> Optional[EntityConfiguration]:
         """Get entity configuration with caching"""
         def loader():
-            return self._base_loader.get_config(entity_type)
+            config = self._base_loader.get_config(entity_type)
+            if config:
+                # Validate and compile conditional_display expressions once, at load
+                precompile_config_conditions(config)
+            return config
         
         return self._config_cache.get_cached_entity_config(entity_type, loader)
     
@@ -134,6 +134,19 @@ class UniversalCRUDService:
             logger.error(f"Error getting branch_id: {str(e)}")
             raise ValueError(f"Failed to determine branch: {str(e)}")
     
+    def _invalidate_cache(self, entity_type: str, context: dict, branch_id=None, record_id=None):
+        """
+        Invalidate service cache for a write, scoped to the written record's
+        hospital/branch so other hospitals' cached pages survive
+        """
+        invalidate_service_cache_for_entity(
+            entity_type,
+            cascade=True,
+            hospital_id=context.get('hospital_id'),
+            branch_id=branch_id,
+            record_id=record_id
+        )
+    
     def _load_model_class(self, config: EntityConfiguration):
         """Dynamically load model class from entity registry"""
         from app.config.entity_registry import get_entity_registration
@@ -190,7 +203,9 @@ class UniversalCRUDService:
                 service_args[f'{entity_singular}_data'] = data
                 
                 # Call service function
-                return service_function(**service_args)
+                result = service_function(**service_args)
+                self._invalidate_cache(entity_type, context)
+                return result
             
             # Generic CRUD implementation
             logger.info(f"Using generic CRUD for {entity_type}")
@@ -288,7 +303,9 @@ class UniversalCRUDService:
                 session.commit()
                 
                 logger.info(f"Created {entity_type} with ID {entity_data[pk_field]}")
-                invalidate_service_cache_for_entity(entity_type, cascade=True)
+                self._invalidate_cache(entity_type, context,
+                                       branch_id=entity_data.get('branch_id'),
+                                       record_id=entity_data[pk_field])
                 return entity
                 
         except IntegrityError as e:
@@ -328,7 +345,9 @@ class UniversalCRUDService:
                     'current_user_id': context.get('user_id')
                 }
                 
-                return service_function(**service_args)
+                result = service_function(**service_args)
+                self._invalidate_cache(entity_type, context, record_id=item_id)
+                return result
             
             # Generic update
             logger.info(f"Using generic CRUD update for {entity_type}")
@@ -346,6 +365,8 @@ class UniversalCRUDService:
                 if not entity:
                     raise ValueError(f"{config.name} not found")
                 
+                original_branch_id = getattr(entity, 'branch_id', None)
+                
                 # Transform form data using VirtualFieldTransformer
                 transformer = VirtualFieldTransformer()
                 transformed_data = transformer.transform_for_update(data, entity, config)
@@ -387,7 +408,11 @@ class UniversalCRUDService:
                 
                 session.commit()
                 logger.info(f"Updated {entity_type}/{item_id}")
-                invalidate_service_cache_for_entity(entity_type, cascade=True)
+                # A record moved between branches is stale in both - widen to hospital scope
+                branch_id = getattr(entity, 'branch_id', None)
+                self._invalidate_cache(entity_type, context,
+                                       branch_id=branch_id if branch_id == original_branch_id else None,
+                                       record_id=item_id)
                 return entity
                 
         except Exception as e:
@@ -418,7 +443,9 @@ class UniversalCRUDService:
                     'current_user_id': context.get('user_id')
                 }
                 
-                return service_function(**service_args)
+                result = service_function(**service_args)
+                self._invalidate_cache(entity_type, context, record_id=item_id)
+                return result
             
             # Generic delete
             logger.info(f"Using generic CRUD delete for {entity_type}")
@@ -434,6 +461,8 @@ class UniversalCRUDService:
                 if not entity:
                     raise ValueError(f"{config.name} not found")
                 
+                branch_id = getattr(entity, 'branch_id', None)
+                
                 # Soft or hard delete based on config
                 if getattr(config, 'enable_soft_delete', False):
                     # Check if entity has SoftDeleteMixin
@@ -465,7 +494,7 @@ class UniversalCRUDService:
                 
                 session.commit()
                 logger.info(f"Deleted {entity_type}/{item_id}")
-                invalidate_service_cache_for_entity(entity_type, cascade=True)
+                self._invalidate_cache(entity_type, context, branch_id=branch_id, record_id=item_id)
                 return {'success': True, 'message': f'{config.name} deleted successfully'}
                 
         except Exception as e:
@@ -517,6 +546,9 @@ class UniversalCRUDService:
                 
                 session.commit()
                 logger.info(f"Restored {entity_type}/{item_id}")
+                self._invalidate_cache(entity_type, context,
+                                       branch_id=getattr(entity, 'branch_id', None),
+                                       record_id=item_id)
                 return True
                 
         except Exception as e:
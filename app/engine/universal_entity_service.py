@@ -10,7 +10,9 @@ from typing import Dict, Any, Optional, List, Type, Tuple
 import uuid
 from datetime import datetime, date
 from decimal import Decimal
+from functools import lru_cache
 from sqlalchemy import desc, asc, func, and_, or_
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import Session
 from flask_login import current_user
 from abc import ABC, abstractmethod
@@ -21,11 +23,19 @@ from app.services.database_service import get_db_session, get_entity_dict
 from app.config.entity_configurations import get_entity_config
 from app.engine.categorized_filter_processor import get_categorized_filter_processor
 from app.engine.universal_service_cache import cache_service_method
+from app.engine.keyset_pagination import paginate_keyset, count_rows, DEFAULT_COUNT_CAP
 from app.utils import filters
 from app.utils.unicode_logging import get_unicode_safe_logger
 
 logger = get_unicode_safe_logger(__name__)
 
+@lru_cache(maxsize=None)
+def _import_model_class(model_path: str) -> Type:
+    """Import a model class from its registry path (e.g. 'app.models.master.Supplier')"""
+    module_path, class_name = model_path.rsplit('.', 1)
+    module = __import__(module_path, fromlist=[class_name])
+    return getattr(module, class_name)
+
 class UniversalEntityService(ABC):
     """
     Base class for all entity services
@@ -33,6 +43,8 @@ class UniversalEntityService(ABC):
     Entity-specific services override only what they need
     """
     
+    BATCH_FETCH_SIZE = 500  # ids per IN (...) query in get_by_ids
+    
     def __init__(self, entity_type: str, model_class: Type = None):
         """
         Initialize service
@@ -95,6 +107,10 @@ class UniversalEntityService(ABC):
             per_page = kwargs.get('per_page', 20)
             sort_by = kwargs.get('sort_by')
             sort_order = kwargs.get('sort_order', 'desc')
+            cursor = kwargs.get('cursor')
+            pagination_mode = kwargs.get('pagination_mode') or getattr(self.config, 'pagination_mode', 'offset')
+            count_mode = kwargs.get('count_mode') or getattr(self.config, 'count_mode', 'exact')
+            count_cap = getattr(self.config, 'count_cap', DEFAULT_COUNT_CAP)
             
             if not hospital_id:
                 return self._get_error_result("Hospital ID required")
@@ -121,16 +137,29 @@ class UniversalEntityService(ABC):
                 )
                 
                 # Get total count before pagination
-                total_count = query.count()
-                
-                # Apply sorting
-                query = self._apply_sorting(query, sort_by, sort_order)
+                total_count, count_info = count_rows(session, query, count_mode, count_cap)
                 
-                # Apply pagination
-                query = self._apply_pagination(query, page, per_page)
+                # Keyset mode seeks from a cursor; numbered page links (page > 1
+                # without a cursor) still use OFFSET so existing list pages work
+                keyset_columns = None
+                if pagination_mode == 'keyset' and (cursor or int(page) <= 1):
+                    keyset_columns = self._get_keyset_columns(sort_by, sort_order)
                 
-                # Execute query
-                items = query.all()
+                keyset_info = None
+                if keyset_columns:
+                    per_page = min(max(1, int(per_page)), 100)
+                    items, keyset_info = paginate_keyset(
+                        query, *keyset_columns, per_page=per_page, cursor=cursor
+                    )
+                else:
+                    # Apply sorting
+                    query = self._apply_sorting(query, sort_by, sort_order)
+                    
+                    # Apply pagination
+                    query = self._apply_pagination(query, page, per_page)
+                    
+                    # Execute query
+                    items = query.all()
                 
                 # Convert to dictionaries
                 items_dict = self._convert_items_to_dict(items, session)
@@ -143,7 +172,8 @@ class UniversalEntityService(ABC):
                 
                 # Build pagination info
                 pagination = self._build_pagination_info(
-                    total_count, page, per_page
+                    total_count, page, per_page,
+                    keyset_info=keyset_info, count_info=count_info
                 )
                 
                 return self._build_success_result(
@@ -254,6 +284,26 @@ class UniversalEntityService(ABC):
         
         return query
     
+    def _get_keyset_columns(self, sort_by: Optional[str], sort_order: str) -> Optional[Tuple]:
+        """
+        (sort_column, pk_column, descending) for keyset paging, or None if the
+        entity has no usable primary key. Sort falls back to the configured
+        default sort field, then to the primary key alone.
+        """
+        id_field = self._get_id_field()
+        if not id_field or not hasattr(self.model_class, id_field):
+            return None
+        pk_column = getattr(self.model_class, id_field)
+        
+        sort_field = sort_by or getattr(self.config, 'default_sort_field', None)
+        sort_field = self._get_db_column_name(sort_field) if sort_field else None
+        sort_column = getattr(self.model_class, sort_field) if sort_field and hasattr(self.model_class, sort_field) else pk_column
+        
+        if not sort_by and getattr(self.config, 'default_sort_direction', None):
+            sort_order = self.config.default_sort_direction
+        
+        return sort_column, pk_column, (sort_order or 'desc').lower() != 'asc'
+    
     def _apply_pagination(self, query, page: int, per_page: int):
         """Apply pagination to query"""
         # Ensure valid pagination values
@@ -293,11 +343,13 @@ class UniversalEntityService(ABC):
             if hasattr(item, 'deleted_by'):
                 item_dict['deleted_by'] = item.deleted_by
             
-            # Add any relationships
-            self._add_relationships(item_dict, item, session)
-            
             items_dict.append(item_dict)
         
+        # Resolve foreign key display names for the whole page at once
+        relationship_lookup = self._prefetch_relationships(items_dict, items, session)
+        for item_dict, item in zip(items_dict, items):
+            self._add_relationships(item_dict, item, session, relationship_lookup)
+        
         return items_dict
     
     def _calculate_summary(self, session: Session, hospital_id: uuid.UUID,
@@ -307,9 +359,6 @@ class UniversalEntityService(ABC):
         Universal summary calculation using configuration
         Reads summary_cards config and calculates each metric
         """
-        from sqlalchemy import func
-        from datetime import datetime
-        
         summary = {'total_count': total_count}
         
         # Check if we have summary cards configuration
@@ -331,27 +380,46 @@ class UniversalEntityService(ABC):
             self.config
         )
         
-        # Process each summary card from configuration
+        # Compute every configured card in one aggregate query
+        try:
+            summary.update(self._aggregate_summary_cards(session, filtered_query))
+        except Exception as e:
+            logger.warning(f"Single-pass summary failed for {self.entity_type}, "
+                           f"falling back to per-card queries: {str(e)}")
+            summary.update(self._calculate_summary_per_card(filtered_query))
+        
+        # NEW: Call the optional hook for complex calculations
+        summary = self._call_summary_hook_if_exists(
+            session, hospital_id, branch_id, filters, summary, applied_filters, filtered_query
+        )
+
+        return summary
+
+    def _calculate_summary_per_card(self, filtered_query) -> Dict:
+        """Previous per-card calculation - one query per card, kept as fallback"""
+        from sqlalchemy import func
+        
+        summary = {}
         for card in self.config.summary_cards:
             field_name = card.get('field')
             if not field_name:
                 continue
-            
+        
             try:
                 # Skip total_count as it's already added
                 if field_name == 'total_count':
                     continue
-                
+            
                 # Handle different card types based on field name patterns and type
                 card_type = card.get('type', 'number')
-                
+            
                 if card_type == 'currency' or field_name.endswith('_sum'):
                     # Sum calculation for currency/amount fields
                     actual_field = field_name.replace('_sum', '') if field_name.endswith('_sum') else field_name
-                    
+                
                     # Handle db_column mapping
                     db_field = self._get_db_column_name(actual_field)
-                    
+                
                     if hasattr(self.model_class, db_field):
                         value = filtered_query.with_entities(
                             func.sum(getattr(self.model_class, db_field))
@@ -359,24 +427,24 @@ class UniversalEntityService(ABC):
                         summary[field_name] = float(value)
                     else:
                         summary[field_name] = 0.0
-                        
+                    
                 elif field_name.endswith('_count'):
                     # Count calculation with optional status filter
                     count_query = filtered_query
-                    
+                
                     # Check if this card has a specific filter
                     if card.get('filter_field') and card.get('filter_value'):
                         filter_field = card['filter_field']
                         filter_value = card['filter_value']
-                        
+                    
                         # Handle db_column mapping for filter field
                         db_filter_field = self._get_db_column_name(filter_field)
-                        
+                    
                         if hasattr(self.model_class, db_filter_field):
                             count_query = count_query.filter(
                                 getattr(self.model_class, db_filter_field) == filter_value
                             )
-                    
+                
                     # Special handling for date-based counts
                     if 'current_month' in field_name or 'this_month' in field_name:
                         # Get the date field to use
@@ -388,9 +456,9 @@ class UniversalEntityService(ABC):
                                 func.extract('month', date_field) == current_month,
                                 func.extract('year', date_field) == current_year
                             )
-                    
+                
                     summary[field_name] = count_query.count()
-                    
+                
                 else:
                     # For other types, check if it's a simple count
                     if card_type == 'number':
@@ -400,16 +468,108 @@ class UniversalEntityService(ABC):
                                 getattr(self.model_class, self._get_db_column_name(card['filter_field'])) == card['filter_value']
                             )
                             summary[field_name] = count_query.count()
-                            
+                        
             except Exception as e:
                 logger.error(f"Error calculating {field_name} for {self.entity_type}: {str(e)}")
                 summary[field_name] = 0
         
-        # NEW: Call the optional hook for complex calculations
-        summary = self._call_summary_hook_if_exists(
-            session, hospital_id, branch_id, filters, summary, applied_filters, filtered_query
-        )
+        return summary
+
+    def _get_summary_plan(self) -> List[Dict[str, Any]]:
+        """
+        Resolve summary_cards into aggregate specs once per entity config.
+        Mirrors the card rules of _calculate_summary_per_card:
+        currency/_sum cards sum a column, _count cards count rows with an
+        optional filter_field/filter_value and current-month condition,
+        number cards with a filter count matching rows.
+        """
+        cached = getattr(self, '_summary_plan', None)
+        if cached is not None and cached[0] is self.config:
+            return cached[1]
+        
+        plan = []
+        for card in self.config.summary_cards:
+            field_name = card.get('field')
+            if not field_name or field_name == 'total_count':
+                continue
+            
+            card_type = card.get('type', 'number')
+            has_filter = bool(card.get('filter_field') and card.get('filter_value'))
+            filter_column = self._get_db_column_name(card['filter_field']) if has_filter else None
+            spec = {'field': field_name, 'kind': None, 'column': None,
+                    'filter': None, 'month_column': None}
+            
+            if card_type == 'currency' or field_name.endswith('_sum'):
+                actual_field = field_name.replace('_sum', '') if field_name.endswith('_sum') else field_name
+                db_field = self._get_db_column_name(actual_field)
+                if hasattr(self.model_class, db_field):
+                    spec.update(kind='sum', column=db_field)
+                else:
+                    spec.update(kind='constant', value=0.0)
+            
+            elif field_name.endswith('_count'):
+                spec['kind'] = 'count'
+                if has_filter and hasattr(self.model_class, filter_column):
+                    spec['filter'] = (filter_column, card['filter_value'])
+                if 'current_month' in field_name or 'this_month' in field_name:
+                    date_field = self._get_primary_date_field()
+                    if date_field is not None:
+                        spec['month_column'] = date_field.key
+            
+            elif card_type == 'number' and has_filter:
+                if hasattr(self.model_class, filter_column):
+                    spec.update(kind='count', filter=(filter_column, card['filter_value']))
+                else:
+                    spec.update(kind='constant', value=0)
+            
+            else:
+                continue
+            
+            plan.append(spec)
+        
+        self._summary_plan = (self.config, plan)
+        return plan
 
+    def _aggregate_summary_cards(self, session: Session, filtered_query) -> Dict:
+        """
+        Evaluate all summary cards in a single SELECT over the filtered
+        query, using SUM(...)/COUNT(*) with FILTER (WHERE ...) per card.
+        """
+        from sqlalchemy import func
+        from sqlalchemy.orm import aliased
+        
+        plan = self._get_summary_plan()
+        summary = {spec['field']: spec['value'] for spec in plan if spec['kind'] == 'constant'}
+        aggregate_specs = [spec for spec in plan if spec['kind'] != 'constant']
+        if not aggregate_specs:
+            return summary
+        
+        rows = aliased(self.model_class, filtered_query.subquery())
+        now = datetime.now()
+        
+        columns = []
+        for spec in aggregate_specs:
+            conditions = []
+            if spec['filter']:
+                filter_column, filter_value = spec['filter']
+                conditions.append(getattr(rows, filter_column) == filter_value)
+            if spec['month_column']:
+                date_column = getattr(rows, spec['month_column'])
+                conditions.append(func.extract('month', date_column) == now.month)
+                conditions.append(func.extract('year', date_column) == now.year)
+            
+            aggregate = func.sum(getattr(rows, spec['column'])) if spec['kind'] == 'sum' else func.count()
+            if conditions:
+                aggregate = aggregate.filter(and_(*conditions))
+            columns.append(aggregate)
+        
+        # Savepoint so a failed aggregate leaves the session usable for the fallback
+        with session.begin_nested():
+            values = session.query(*columns).select_from(rows).one()
+        
+        for spec, value in zip(aggregate_specs, values):
+            summary[spec['field']] = float(value or 0) if spec['kind'] == 'sum' else int(value or 0)
+        
         return summary
 
     def _get_db_column_name(self, field_name: str) -> str:
@@ -436,18 +596,34 @@ class UniversalEntityService(ABC):
         
         return None
     
-    def _build_pagination_info(self, total_count: int, page: int, per_page: int) -> Dict:
-        """Build pagination metadata"""
+    def _build_pagination_info(self, total_count: int, page: int, per_page: int,
+                               keyset_info: Optional[Dict] = None,
+                               count_info: Optional[Dict] = None) -> Dict:
+        """
+        Build pagination metadata
+        keyset_info: has_next/has_prev/next_cursor/prev_cursor from paginate_keyset
+        count_info: count_mode/count_is_exact/total_count_display from count_rows
+        """
         total_pages = (total_count + per_page - 1) // per_page if per_page > 0 else 1
         
-        return {
+        pagination = {
             'total_count': total_count,
             'page': page,
             'per_page': per_page,
             'total_pages': total_pages,
             'has_prev': page > 1,
-            'has_next': page < total_pages
+            'has_next': page < total_pages,
+            'pagination_mode': 'offset'
         }
+        
+        if count_info:
+            pagination.update(count_info)
+        
+        if keyset_info:
+            pagination.update(keyset_info)
+            pagination['pagination_mode'] = 'keyset'
+        
+        return pagination
     
     def _build_success_result(self, items: List[Dict], total_count: int,
                             pagination: Dict, summary: Dict,
@@ -529,6 +705,53 @@ class UniversalEntityService(ABC):
             logger.error(f"Error getting {self.entity_type} by id: {str(e)}")
             return None
 
+    def get_by_ids(self, item_ids: List[str], **kwargs) -> Dict[str, Dict]:
+        """
+        Batch counterpart of get_by_id (batch documents): items are loaded with
+        IN (...) queries of BATCH_FETCH_SIZE ids and their relationships resolved
+        together. Returns {str(item_id): item_dict}; missing ids are left out.
+        Services that override get_by_id keep their own lookup per item.
+        """
+        results = {}
+        if not item_ids or not kwargs.get('hospital_id'):
+            return results
+
+        if type(self).get_by_id is not UniversalEntityService.get_by_id:
+            for item_id in item_ids:
+                item_dict = self.get_by_id(item_id, **kwargs)
+                if item_dict:
+                    results[str(item_id)] = item_dict
+            return results
+
+        id_field = self._get_id_field()
+        if not id_field:
+            return results
+
+        try:
+            with get_db_session() as session:
+                for start in range(0, len(item_ids), self.BATCH_FETCH_SIZE):
+                    chunk = list(item_ids[start:start + self.BATCH_FETCH_SIZE])
+                    query = self._get_base_query(session, kwargs['hospital_id'],
+                                                 kwargs.get('branch_id'),
+                                                 user=kwargs.get('user'))
+                    items = query.filter(getattr(self.model_class, id_field).in_(chunk)).all()
+
+                    items_dict = [get_entity_dict(item) for item in items]
+                    relationship_lookup = self._prefetch_relationships(items_dict, items, session)
+                    for item_dict, item in zip(items_dict, items):
+                        self._add_relationships(item_dict, item, session, relationship_lookup)
+                        if self.config:
+                            item_dict = self._extract_virtual_fields_for_single_item(item_dict)
+                        item_id = str(getattr(item, id_field))
+                        results[item_id] = self._add_virtual_calculations(item_dict, item_id, **kwargs)
+
+            logger.info(f"[{self.entity_type}] get_by_ids: {len(results)} of {len(item_ids)} found")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error getting {self.entity_type} by ids: {str(e)}")
+            return results
+
     def _add_virtual_calculations(self, result: Dict, item_id: str, **kwargs) -> Dict:
         """
         PLACEHOLDER: Override in child classes to add virtual calculated fields
@@ -644,11 +867,14 @@ class UniversalEntityService(ABC):
     # =========================================================================
     # ENHANCEMENT 2: Automatic Relationship Loading Based on Field Type
     # =========================================================================
-    def _add_relationships(self, item_dict: Dict, item: Any, session: Session):
+    def _add_relationships(self, item_dict: Dict, item: Any, session: Session,
+                           relationship_lookup: Optional[Dict[str, Dict]] = None):
         """
         REPLACE/ENHANCE EXISTING METHOD
         Purpose: Automatically load foreign key relationships based on field configuration
         Backward Compatible: Yes - uses existing ENTITY_SEARCH, UUID, REFERENCE types
+        relationship_lookup: Optional {field_name: {fk_value: display_value}} from
+                             _prefetch_relationships; fields found there are not queried
         """
         try:
             config = self._get_entity_config()
@@ -665,7 +891,7 @@ class UniversalEntityService(ABC):
                         field.name.endswith('_id')):  # Convention
 
                         self._load_foreign_key_relationship(
-                            item_dict, item, session, field
+                            item_dict, item, session, field, relationship_lookup
                         )
             
             # Also process any virtual fields that need calculation
@@ -694,7 +920,8 @@ class UniversalEntityService(ABC):
         return {}
 
     def _load_foreign_key_relationship(self, item_dict: Dict, item: Any,
-                                    session: Session, field):
+                                    session: Session, field,
+                                    relationship_lookup: Optional[Dict[str, Dict]] = None):
         """
         NEW HELPER METHOD
         Purpose: Load a specific foreign key relationship using existing config
@@ -720,6 +947,13 @@ class UniversalEntityService(ABC):
                 logger.debug(f"Skipping relationship load for {field.name}: {target_field} already exists in item_dict")
                 return
             
+            # Batched path: value already resolved for the whole page
+            if relationship_lookup is not None and field.name in relationship_lookup:
+                value = relationship_lookup[field.name].get(fk_value)
+                if value is not None:
+                    item_dict[target_field] = value
+                return
+            
             # Determine the related entity
             related_entity = None
             display_field = 'name'  # default
@@ -797,6 +1031,153 @@ class UniversalEntityService(ABC):
             logger.warning(f"Could not load relationship for {field.name}: {e}")
 
 
+    # =========================================================================
+    # ENHANCEMENT 2b: Batched Relationship Resolution for List Pages
+    # =========================================================================
+    def _get_relationship_plan(self) -> List[Dict[str, Any]]:
+        """
+        Resolve, once per service, how each foreign key field maps to a related
+        model: key column to match on and attribute to display.
+        Driven by entity_search_config / related_display_field, same as
+        _load_foreign_key_relationship.
+        """
+        config = self._get_entity_config()
+        cached = getattr(self, '_relationship_plan', None)
+        if cached is not None and cached[0] is config:
+            return cached[1]
+        
+        plan = []
+        if config and config.fields:
+            for field in config.fields:
+                spec = self._build_relationship_spec(field)
+                if spec:
+                    plan.append(spec)
+        
+        self._relationship_plan = (config, plan)
+        return plan
+
+    def _build_relationship_spec(self, field) -> Optional[Dict[str, Any]]:
+        """Relationship spec for one field, or None if it cannot be batched"""
+        if field.field_type not in [FieldType.ENTITY_SEARCH, FieldType.UUID, FieldType.REFERENCE]:
+            return None
+        if field.name in ['created_by', 'updated_by', 'deleted_by', 'approved_by', 'rejected_by']:
+            return None
+        if not field.name.endswith('_id') and not getattr(field, 'entity_search_config', None) \
+                and not getattr(field, 'related_field', None):
+            return None
+        
+        relationship_name = field.name.replace('_id', '')
+        related_entity = None
+        display_field = 'name'
+        
+        search_config = getattr(field, 'entity_search_config', None)
+        if search_config:
+            if hasattr(search_config, 'target_entity'):
+                related_entity = search_config.target_entity
+            elif isinstance(search_config, dict):
+                related_entity = search_config.get('target_entity')
+            template = getattr(search_config, 'display_template', None)
+            if template and '{' in template and '}' in template:
+                display_field = template.replace('{', '').replace('}', '')
+        
+        if getattr(field, 'related_display_field', None):
+            display_field = field.related_display_field
+        
+        if not related_entity and field.name.endswith('_id'):
+            related_entity = f"{field.name[:-3]}s"
+        
+        # Mapped relationship on our own model wins over the registry lookup
+        related_model = None
+        try:
+            relationships = sa_inspect(self.model_class).relationships
+            if relationship_name in relationships:
+                related_model = relationships[relationship_name].mapper.class_
+        except Exception:
+            pass
+        
+        if related_model is None and related_entity:
+            from app.config.entity_registry import get_entity_registration
+            registration = get_entity_registration(related_entity)
+            if registration and registration.model_class:
+                related_model = _import_model_class(registration.model_class)
+        
+        if related_model is None:
+            return None
+        
+        related_mapper = sa_inspect(related_model)
+        key_column = getattr(related_model, f"{relationship_name}_id", None)
+        if key_column is None and len(related_mapper.primary_key) == 1:
+            key_column = getattr(related_model, related_mapper.primary_key[0].key, None)
+        if key_column is None:
+            return None
+        
+        display_attr = next(
+            (name for name in [display_field, f"{relationship_name}_name", 'name', 'title']
+             if hasattr(related_model, name)),
+            None
+        )
+        if not display_attr:
+            return None
+        
+        return {
+            'field_name': field.name,
+            'target_field': f"{relationship_name}_name",
+            'model_class': related_model,
+            'key_column': key_column,
+            'display_attr': display_attr,
+            'display_is_column': display_attr in related_mapper.column_attrs
+        }
+
+    def _prefetch_relationships(self, items_dict: List[Dict], items: List,
+                                session: Session) -> Dict[str, Dict]:
+        """
+        Load display values for every foreign key on the page with one
+        IN (...) query per related field instead of one query per row.
+        Returns {field_name: {fk_value: display_value}}.
+        """
+        lookup = {}
+        if not items:
+            return lookup
+        
+        try:
+            plan = self._get_relationship_plan()
+        except Exception as e:
+            logger.warning(f"Could not build relationship plan for {self.entity_type}: {e}")
+            return lookup
+        
+        for spec in plan:
+            target_field = spec['target_field']
+            fk_values = {
+                getattr(item, spec['field_name'], None)
+                for item_dict, item in zip(items_dict, items)
+                if item_dict.get(target_field) is None
+            }
+            fk_values.discard(None)
+            if not fk_values:
+                continue
+            
+            try:
+                key_column = spec['key_column']
+                if spec['display_is_column']:
+                    rows = session.query(
+                        key_column, getattr(spec['model_class'], spec['display_attr'])
+                    ).filter(key_column.in_(fk_values)).all()
+                    values = {key: display for key, display in rows}
+                else:
+                    related_objs = session.query(spec['model_class']).filter(
+                        key_column.in_(fk_values)
+                    ).all()
+                    values = {
+                        getattr(obj, key_column.key): getattr(obj, spec['display_attr'], None)
+                        for obj in related_objs
+                    }
+                lookup[spec['field_name']] = values
+            except Exception as e:
+                logger.warning(f"Could not batch load relationship for {spec['field_name']}: {e}")
+        
+        return lookup
+
+
     # =========================================================================
     # ENHANCEMENT 3: Automatic Filter Application Based on Field Configuration
     # =========================================================================
@@ -0,0 +1,288 @@
+# =============================================================================
+# File: app/engine/universal_export_service.py
+# Streaming CSV/XLSX export for universal entities
+# =============================================================================
+
+"""
+Universal Export Service - constant-memory list exports
+- Same base query and filters as the list page (CategorizedFilterProcessor)
+- Rows fetched as plain column tuples with a server-side cursor (yield_per)
+- Columns, labels and option labels from the entity's list render plan
+- CSV streamed in chunks; XLSX written with openpyxl write-only mode to a
+  temporary file and streamed back
+"""
+
+import csv
+import io
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple
+
+from sqlalchemy import asc, desc
+from sqlalchemy import inspect as sa_inspect
+
+from app.config.core_definitions import FieldType
+from app.config.entity_configurations import get_entity_config
+from app.engine.categorized_filter_processor import get_categorized_filter_processor
+from app.engine.list_render_plan import get_list_render_plan
+from app.services.database_service import get_db_session
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Filter keys that control the list page rather than the data
+NON_FILTER_ARGS = ('page', 'per_page', 'cursor', 'selected_ids', 'export_format',
+                   'sort', 'direction', 'sort_by', 'sort_order')
+
+
+@dataclass
+class ExportColumn:
+    """One exported column resolved against the model"""
+    attribute: str
+    label: str
+    field_type: Any
+    options: Dict[Any, str]
+
+
+class UniversalExportService:
+    """
+    Streams an entity list to CSV or XLSX without materializing it.
+    Usage:
+        exporter = UniversalExportService('patient_invoices')
+        for chunk in exporter.stream_csv(filters, hospital_id, branch_id, user): ...
+    """
+
+    def __init__(self, entity_type: str, yield_per: int = 1000, chunk_rows: int = 500):
+        self.entity_type = entity_type
+        self.config = get_entity_config(entity_type)
+        if not self.config:
+            raise ValueError(f"No configuration found for {entity_type}")
+
+        from app.engine.universal_services import get_universal_service
+        self.service = get_universal_service(entity_type)
+        self.model_class = getattr(self.service, 'model_class', None) or self._get_model_from_registry()
+        if self.model_class is None:
+            raise ValueError(f"No model class found for entity type: {entity_type}")
+
+        self.yield_per = yield_per
+        self.chunk_rows = chunk_rows
+        self.filter_processor = get_categorized_filter_processor()
+        self.columns = self._resolve_columns()
+
+    def _get_model_from_registry(self):
+        from app.config.entity_registry import get_entity_registration
+
+        registration = get_entity_registration(self.entity_type)
+        if not registration or not registration.model_class:
+            return None
+        module_path, class_name = registration.model_class.rsplit('.', 1)
+        module = __import__(module_path, fromlist=[class_name])
+        return getattr(module, class_name)
+
+    # =========================================================================
+    # COLUMNS AND FORMATTING
+    # =========================================================================
+
+    def _resolve_columns(self) -> List[ExportColumn]:
+        """List columns (show_in_list) that map to real model columns, in config order"""
+        column_attrs = sa_inspect(self.model_class).column_attrs
+        plan = get_list_render_plan(self.config)
+        columns = []
+        for field in plan.list_fields:
+            attribute = field.db_column or field.name
+            if attribute not in column_attrs:
+                continue
+            columns.append(ExportColumn(attribute, field.label, field.field_type, plan.option_labels[field.name]))
+
+        if not columns:
+            # No list definition - export every mapped column
+            columns = [ExportColumn(attr.key, attr.key.replace('_', ' ').title(), None, {})
+                       for attr in column_attrs]
+        return columns
+
+    def format_value(self, value: Any, column: ExportColumn, for_excel: bool = False) -> Any:
+        """Plain, machine-readable values; XLSX keeps numbers and dates native"""
+        if value is None:
+            return None if for_excel else ''
+        if column.options and value in column.options:
+            return column.options[value]
+        if isinstance(value, bool) or column.field_type == FieldType.BOOLEAN:
+            return 'Yes' if value else 'No'
+        if isinstance(value, Decimal):
+            return float(value) if for_excel else str(value)
+        if isinstance(value, (datetime, date)):
+            if for_excel:
+                return value.replace(tzinfo=None) if isinstance(value, datetime) else value
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            return str(value)
+        return value
+
+    # =========================================================================
+    # ROW STREAMING
+    # =========================================================================
+
+    def iter_rows(self, filters: Dict, hospital_id, branch_id=None, user=None,
+                  selected_ids: Optional[List[str]] = None,
+                  sort_by: Optional[str] = None, sort_order: Optional[str] = None) -> Iterator[Tuple]:
+        """
+        Yield raw column tuples for every row matching the list filters, in the
+        list's sort order. Uses a server-side cursor so only yield_per rows are
+        held at a time.
+        """
+        filters = {k: v for k, v in (filters or {}).items() if k not in NON_FILTER_ARGS}
+
+        with get_db_session(read_only=True) as session:
+            query = self._get_base_query(session, hospital_id, branch_id, user)
+
+            query, _, _ = self.filter_processor.process_entity_filters(
+                self.entity_type,
+                filters,
+                query,
+                self.model_class,
+                session,
+                hospital_id,
+                branch_id,
+                self.config
+            )
+
+            if selected_ids:
+                pk_column = getattr(self.model_class, self.config.primary_key)
+                query = query.filter(pk_column.in_(selected_ids))
+
+            query = self._apply_sorting(query, sort_by, sort_order)
+            query = query.with_entities(
+                *[getattr(self.model_class, column.attribute) for column in self.columns]
+            ).execution_options(stream_results=True, yield_per=self.yield_per)
+
+            for row in query:
+                yield tuple(row)
+
+    def _get_base_query(self, session, hospital_id, branch_id, user):
+        if hasattr(self.service, '_get_base_query'):
+            return self.service._get_base_query(session, hospital_id, branch_id, user=user)
+
+        query = session.query(self.model_class)
+        if hasattr(self.model_class, 'hospital_id'):
+            query = query.filter(self.model_class.hospital_id == hospital_id)
+        if branch_id and hasattr(self.model_class, 'branch_id'):
+            query = query.filter(self.model_class.branch_id == branch_id)
+        return query
+
+    def _apply_sorting(self, query, sort_by: Optional[str] = None, sort_order: Optional[str] = None):
+        """The list's sort field and direction, else the configured default sort"""
+        query = query.order_by(None)
+        sort_column = self._get_sort_column(sort_by)
+        if sort_column is None:
+            sort_column = self._get_sort_column(self.config.default_sort_field)
+            sort_order = self.config.default_sort_direction
+        if sort_column is not None:
+            direction = (sort_order or 'desc').lower()
+            query = query.order_by(asc(sort_column) if direction == 'asc' else desc(sort_column))
+        return query
+
+    def _get_sort_column(self, field_name: Optional[str]):
+        """Model column of a config field name (db_column mapping applied), or None"""
+        if not field_name:
+            return None
+        for field in getattr(self.config, 'fields', None) or []:
+            if field.name == field_name and getattr(field, 'db_column', None):
+                field_name = field.db_column
+                break
+        if field_name not in sa_inspect(self.model_class).column_attrs:
+            return None
+        return getattr(self.model_class, field_name)
+
+    # =========================================================================
+    # FORMAT WRITERS
+    # =========================================================================
+
+    def stream_csv(self, filters: Dict, hospital_id, branch_id=None, user=None,
+                   selected_ids: Optional[List[str]] = None,
+                   sort_by: Optional[str] = None, sort_order: Optional[str] = None) -> Generator[str, None, None]:
+        """CSV text in chunks of chunk_rows rows, with a BOM so Excel detects UTF-8"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        buffer.write('\ufeff')
+        writer.writerow([column.label for column in self.columns])
+
+        row_count = 0
+        for row in self.iter_rows(filters, hospital_id, branch_id, user, selected_ids, sort_by, sort_order):
+            writer.writerow([self.format_value(value, column)
+                             for value, column in zip(row, self.columns)])
+            row_count += 1
+            if row_count % self.chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        yield buffer.getvalue()
+        logger.info(f"✅ CSV export for {self.entity_type}: {row_count} rows")
+
+    def stream_xlsx(self, filters: Dict, hospital_id, branch_id=None, user=None,
+                    selected_ids: Optional[List[str]] = None,
+                    sort_by: Optional[str] = None, sort_order: Optional[str] = None,
+                    read_size: int = 64 * 1024) -> Generator[bytes, None, None]:
+        """
+        XLSX via openpyxl write-only mode. Rows go straight to the worksheet
+        XML on disk; the finished file is streamed back and deleted.
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=(self.config.plural_name or self.entity_type)[:31])
+
+        header = []
+        for column in self.columns:
+            cell = WriteOnlyCell(sheet, value=column.label)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        sheet.append(header)
+
+        row_count = 0
+        for row in self.iter_rows(filters, hospital_id, branch_id, user, selected_ids, sort_by, sort_order):
+            sheet.append([self.format_value(value, column, for_excel=True)
+                          for value, column in zip(row, self.columns)])
+            row_count += 1
+
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        try:
+            workbook.save(path)
+            with open(path, 'rb') as export_file:
+                while True:
+                    chunk = export_file.read(read_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            os.remove(path)
+
+        logger.info(f"✅ XLSX export for {self.entity_type}: {row_count} rows")
+
+    def stream(self, export_format: str, *args, **kwargs):
+        """Dispatch to the writer for export_format ('csv', 'excel'/'xlsx')"""
+        extension, _ = EXPORT_FORMATS[export_format]
+        if extension == 'csv':
+            return self.stream_csv(*args, **kwargs)
+        return self.stream_xlsx(*args, **kwargs)
+
+
+def get_export_filename(entity_type: str, export_format: str) -> str:
+    extension, _ = EXPORT_FORMATS[export_format]
+    return f"{entity_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
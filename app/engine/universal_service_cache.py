@@ -5,43 +5,252 @@
 
 """
 Service-Level Cache System - PRIMARY CACHING LAYER
-✅ FIXED: Properly handles filter parameters from request.args
-✅ ENHANCED: Better cache key generation for filter scenarios  
+✅ FIXED: Properly handles filter parameters passed by the calling service
+✅ ENHANCED: Canonical cache keys - parameters are frozen once and hashed
+   with blake2b; no Flask request/current_user access on the lookup path
 ✅ ENHANCED: Support for standalone functions
 ✅ DEBUG: Comprehensive logging for filter cache debugging
+✅ SHARED: Optional L2 backend (see service_cache_backend.py) with
+   single-flight loading and cross-worker invalidation broadcast
+✅ TAGS: Entries are indexed by entity/hospital/branch/record tags so
+   invalidation touches only the affected entries
 
 ISSUE FIXED: 
-- Cache now properly captures filter parameters from Flask request.args
-- Different filter combinations create different cache keys
+- Every explicit argument of the cached call is part of the key, so
+  different filter combinations create different cache keys
 - Initial load (no filters) vs filtered results are cached separately
+- Callers must pass hospital/branch/user context explicitly; hospital-scoped
+  calls without a hospital_id are not cached
 """
 
 import hashlib
 import json
 import time
 import pickle
+import sys
 import threading
 import inspect
+import uuid
 from typing import Dict, Any, List, Optional, Callable, Union, Set
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from decimal import Decimal
 from collections import OrderedDict
 from functools import wraps
-from flask import g, current_app, request
-from flask_login import current_user
+from flask import current_app, request
 
+from app.engine.service_cache_backend import ServiceCacheBackend, create_service_cache_backend
 from app.utils.unicode_logging import get_unicode_safe_logger
 
 logger = get_unicode_safe_logger(__name__)
 
 # =============================================================================
-# SERVICE CACHE ENTRY CLASS (UNCHANGED)
+# CANONICAL CACHE KEYS
+# =============================================================================
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+_STRINGIFIED_TYPES = (uuid.UUID, datetime, date, Decimal)
+
+def _is_empty(value: Any) -> bool:
+    if value is None or value == '':
+        return True
+    return type(value) in (dict, list, tuple) and not value
+
+def freeze_cache_params(value: Any) -> Any:
+    """
+    Normalize call parameters into a hashable, order-independent structure.
+    Dicts become sorted tuples with empty values dropped; UUIDs, dates and
+    Decimals become strings; user objects reduce to their user_id; any
+    other object reduces to its type name.
+    """
+    value_type = type(value)
+    if value_type in _SCALAR_TYPES:
+        return value
+    if value_type is dict or isinstance(value, dict):
+        return tuple(sorted(
+            (str(k), freeze_cache_params(v)) for k, v in value.items() if not _is_empty(v)
+        ))
+    if value_type is list or value_type is tuple:
+        return tuple([freeze_cache_params(v) for v in value])
+    if isinstance(value, _STRINGIFIED_TYPES):
+        return str(value)
+    if isinstance(value, _SCALAR_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple([freeze_cache_params(v) for v in value])
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((freeze_cache_params(v) for v in value), key=repr))
+    user_id = getattr(value, 'user_id', None)
+    if user_id is not None:
+        return ('user', str(user_id))
+    return ('object', type(value).__name__)
+
+def build_cache_key(entity_type: str, operation: str, service_params: Dict[str, Any]) -> str:
+    """
+    Canonical cache key: "<entity_type>:<operation>:<blake2b-128 of frozen params>".
+    Deterministic across processes, so L2 entries are shared between workers.
+    """
+    frozen = freeze_cache_params(service_params)
+    payload = json.dumps(frozen, separators=(',', ':'), ensure_ascii=False)
+    digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    return f"{entity_type}:{operation}:{digest}"
+
+# =============================================================================
+# SIZE ESTIMATION
+# =============================================================================
+
+_ATOMIC_TYPES = (str, bytes, int, float, bool, type(None), datetime)
+
+def estimate_size_bytes(obj: Any, sample_size: int = 32, max_depth: int = 8) -> int:
+    """
+    Approximate the deep in-memory size of a service result.
+    Walks containers with sys.getsizeof; large sequences and dicts are
+    sampled (evenly spaced elements) and extrapolated, so cost is bounded
+    by sample_size per level rather than by result size.
+    """
+    seen: Set[int] = set()
+    
+    def sizeof(value: Any, depth: int) -> int:
+        value_id = id(value)
+        if value_id in seen:
+            return 0
+        seen.add(value_id)
+        
+        size = sys.getsizeof(value, 64)
+        if isinstance(value, _ATOMIC_TYPES) or depth >= max_depth:
+            return size
+        
+        if isinstance(value, dict):
+            items = list(value.items())
+            count = len(items)
+            if count == 0:
+                return size
+            step = max(1, count // sample_size)
+            sampled = items[::step]
+            sampled_size = sum(sizeof(k, depth + 1) + sizeof(v, depth + 1) for k, v in sampled)
+            return size + int(sampled_size * count / len(sampled))
+        
+        if isinstance(value, (list, tuple, set, frozenset)):
+            elements = value if isinstance(value, (list, tuple)) else list(value)
+            count = len(elements)
+            if count == 0:
+                return size
+            step = max(1, count // sample_size)
+            sampled = elements[::step]
+            sampled_size = sum(sizeof(item, depth + 1) for item in sampled)
+            return size + int(sampled_size * count / len(sampled))
+        
+        attributes = getattr(value, '__dict__', None)
+        if attributes is not None and not callable(value):
+            # Skip SQLAlchemy instance state - it references the session graph
+            own = {k: v for k, v in attributes.items() if not k.startswith('_sa_')}
+            return size + sizeof(own, depth + 1)
+        
+        return size
+    
+    return sizeof(obj, 0)
+
+# =============================================================================
+# INVALIDATION TAGS
+# =============================================================================
+# Every entry is tagged with its entity type and, when known, its hospital,
+# branch and record scope:
+#   "suppliers"                     - all entries of the entity
+#   "suppliers|h=<hospital>"        - entries scoped to one hospital
+#   "suppliers|h=<hospital>|b=<b>"  - ... and one branch ('*' = all branches)
+#   "suppliers|h=*"                 - entries with no hospital scope
+#   "suppliers|r=<record>"          - entries for a single record
+# A write invalidates the union of the tags that could contain it.
+
+RECORD_ID_PARAMS = ('item_id', 'record_id', 'entity_id')
+
+def _tag_value(value: Any) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    return str(value)
+
+def build_entry_tags(entity_type: str, hospital_id: Any = None, branch_id: Any = None,
+                     record_id: Any = None) -> List[str]:
+    """Tags an entry is indexed under"""
+    hospital_id, branch_id, record_id = _tag_value(hospital_id), _tag_value(branch_id), _tag_value(record_id)
+    tags = [entity_type]
+    if hospital_id:
+        tags.append(f"{entity_type}|h={hospital_id}")
+        tags.append(f"{entity_type}|h={hospital_id}|b={branch_id or '*'}")
+    else:
+        tags.append(f"{entity_type}|h=*")
+    if record_id:
+        tags.append(f"{entity_type}|r={record_id}")
+    return tags
+
+def build_invalidation_tags(entity_type: str, hospital_id: Any = None, branch_id: Any = None,
+                            record_id: Any = None) -> List[str]:
+    """Tags whose entries may contain data written in the given scope"""
+    hospital_id, branch_id, record_id = _tag_value(hospital_id), _tag_value(branch_id), _tag_value(record_id)
+    if not hospital_id:
+        return [entity_type]
+    if branch_id:
+        tags = [f"{entity_type}|h={hospital_id}|b={branch_id}",
+                f"{entity_type}|h={hospital_id}|b=*"]
+    else:
+        tags = [f"{entity_type}|h={hospital_id}"]
+    tags.append(f"{entity_type}|h=*")
+    if record_id:
+        tags.append(f"{entity_type}|r={record_id}")
+    return tags
+
+def _tag_entity_type(tag: str) -> str:
+    return tag.split('|', 1)[0]
+
+# =============================================================================
+# ADMISSION FREQUENCY SKETCH (TinyLFU)
+# =============================================================================
+
+class FrequencySketch:
+    """
+    Count-min sketch of recent key frequency.
+    Counters saturate at 15 and are halved every sample_size increments,
+    so the sketch tracks recent popularity rather than all-time counts.
+    """
+    
+    def __init__(self, width: int = 4096, depth: int = 4, sample_size: int = None):
+        self.width = width
+        self.depth = depth
+        self.table = [[0] * width for _ in range(depth)]
+        self.sample_size = sample_size or width * 10
+        self.additions = 0
+    
+    def _indexes(self, key: str):
+        return [hash((row, key)) % self.width for row in range(self.depth)]
+    
+    def increment(self, key: str):
+        """Record one access to key"""
+        for row, index in enumerate(self._indexes(key)):
+            if self.table[row][index] < 15:
+                self.table[row][index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+    
+    def estimate(self, key: str) -> int:
+        """Estimated recent access count for key"""
+        return min(self.table[row][index] for row, index in enumerate(self._indexes(key)))
+    
+    def _age(self):
+        for row in self.table:
+            for i in range(self.width):
+                row[i] >>= 1
+        self.additions //= 2
+
+# =============================================================================
+# SERVICE CACHE ENTRY CLASS
 # =============================================================================
 
 class ServiceCacheEntry:
     """Service-level cache entry with metadata and access tracking"""
     
     def __init__(self, data: Any, entity_type: str, operation: str, 
-                 cache_key: str, ttl_seconds: int = 3600):
+                 cache_key: str, ttl_seconds: int = 3600, size_bytes: int = None,
+                 tags: List[str] = None):
         self.data = data
         self.entity_type = entity_type
         self.operation = operation
@@ -50,7 +259,9 @@ class ServiceCacheEntry:
         self.accessed_at = time.time()
         self.access_count = 1
         self.ttl_seconds = ttl_seconds
-        self.size_bytes = len(str(data))
+        self.size_bytes = size_bytes if size_bytes is not None else estimate_size_bytes(data)
+        self.segment = 'probation'  # SLRU segment: 'probation' or 'protected'
+        self.tags = tags or [entity_type]
     
     def is_expired(self) -> bool:
         """Check if cache entry is expired"""
@@ -76,6 +287,10 @@ class ServiceCacheStatistics:
         self.start_time = time.time()
         self.entity_stats = {}
         self.total_response_time = 0.0
+        self.l2_hits = 0            # Served from the shared backend
+        self.coalesced_loads = 0    # Misses that waited on another loader
+        self.broadcasts_received = 0
+        self.admission_rejections = 0  # Entries refused by the admission policy
     
     def record_hit(self, entity_type: str, response_time: float = 0):
         """Record cache hit"""
@@ -92,6 +307,11 @@ class ServiceCacheStatistics:
             self.entity_stats[entity_type] = {'hits': 0, 'misses': 0}
         self.entity_stats[entity_type]['misses'] += 1
     
+    def record_l2_hit(self, entity_type: str, response_time: float = 0):
+        """Record hit served from the shared backend"""
+        self.l2_hits += 1
+        self.record_hit(entity_type, response_time)
+    
     def get_hit_ratio(self) -> float:
         """Calculate hit ratio"""
         total = self.hits + self.misses
@@ -101,6 +321,14 @@ class ServiceCacheStatistics:
         """Calculate average response time"""
         return self.total_response_time / self.hits if self.hits > 0 else 0.0
 
+class _InflightLoad:
+    """A loader run that concurrent misses on the same key wait for"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.data = None
+        self.error = None
+
 # =============================================================================
 # ✅ ENHANCED UNIVERSAL SERVICE CACHE - FIXED FILTER HANDLING
 # =============================================================================
@@ -108,19 +336,41 @@ class ServiceCacheStatistics:
 class UniversalServiceCache:
     """
     Universal Service Cache with FIXED filter handling
-    ✅ FIXED: Properly captures filters from request.args
+    ✅ FIXED: Keys cover every explicit parameter of the cached call
     ✅ ENHANCED: Support for both class methods and standalone functions
     """
     
-    def __init__(self, max_memory_mb: int = 500, max_entries: int = 10000):
-        self.cache_store = OrderedDict()  # LRU cache
+    def __init__(self, max_memory_mb: int = 500, max_entries: int = 10000,
+                 backend: Optional[ServiceCacheBackend] = None):
+        self.cache_store = OrderedDict()  # LRU cache (L1)
         self.statistics = ServiceCacheStatistics()
         self._lock = threading.Lock()
         
-        # Memory management
+        # Shared L2 backend and single-flight state
+        self.backend = backend
+        self.instance_id = uuid.uuid4().hex
+        self._inflight: Dict[str, _InflightLoad] = {}
+        self._entity_generation: Dict[str, int] = {}  # Bumped on invalidation
+        self.load_lock_seconds = 30.0     # Max time a loader may hold the shared lock
+        self.load_wait_seconds = 30.0     # Max time a waiter blocks before loading itself
+        self.load_poll_interval = 0.05
+        
+        # Memory management - segmented LRU over a hard byte budget.
+        # New entries enter probation; a second hit promotes to protected.
+        # Eviction drains probation first, so one-off large results cannot
+        # flush frequently used pages, which live in protected.
         self.max_memory_bytes = max_memory_mb * 1024 * 1024
         self.current_memory_usage = 0
         self.max_entries = max_entries
+        self.protected_ratio = 0.8
+        self.max_entry_ratio = 0.2        # Larger entries are never admitted to L1
+        self._probation: OrderedDict = OrderedDict()
+        self._protected: OrderedDict = OrderedDict()
+        self._segment_bytes = {'probation': 0, 'protected': 0}
+        self._entity_bytes: Dict[str, int] = {}
+        self._entity_entries: Dict[str, int] = {}
+        self._tag_index: Dict[str, Set[str]] = {}  # tag -> cache keys
+        self._sketch = FrequencySketch(width=max(1024, min(max_entries * 4, 65536)))
         
         # TTL configuration by entity type
         self.default_ttl = {
@@ -139,156 +389,22 @@ class UniversalServiceCache:
             'users': ['audit_logs', 'user_sessions']
         }
         
+        if self.backend:
+            self.backend.subscribe(self._handle_broadcast)
+        
         # Start background cleanup
         self._start_cleanup_timer()
         
-        logger.info("✅ Universal Service Cache initialized with FIXED filter handling")
+        logger.info(f"✅ Universal Service Cache initialized with FIXED filter handling "
+                    f"(L2: {self.backend.name if self.backend else 'none'})")
     
     def _generate_cache_key(self, entity_type: str, operation: str, 
                        service_params: Dict[str, Any]) -> str:
         """
-        ✅ FIXED: Generate cache key using actual entity_type parameter
-        FIXES: Uses the entity_type passed to the method, not from service class
+        Generate cache key from the entity type, operation and the explicit
+        parameters of the call (see build_cache_key)
         """
-        # ✅ CRITICAL: Start with the ACTUAL entity type passed to this method
-        key_components = {
-            'entity_type': entity_type,  # This is the actual entity being processed
-            'operation': operation
-        }
-        
-        # ✅ ADDITIONAL SAFETY: Use actual_entity_type if provided
-        if 'actual_entity_type' in service_params:
-            key_components['actual_entity_type'] = service_params['actual_entity_type']
-        
-        # ✅ URL CONTEXT: Add URL path for extra distinction
-        try:
-            if request and hasattr(request, 'path'):
-                request_path = request.path
-                key_components['request_path'] = request_path
-                
-                # Extract URL entity for verification
-                if '/universal/' in request_path:
-                    path_parts = request_path.split('/')
-                    if len(path_parts) >= 3:
-                        url_entity = path_parts[2]
-                        key_components['url_entity'] = url_entity
-                        
-                        # ✅ VERIFICATION: Log if URL entity differs from parameter entity
-                        if url_entity != entity_type:
-                            logger.debug(f"🔍 Entity mismatch: URL={url_entity}, Parameter={entity_type}")
-                
-        except Exception as e:
-            logger.debug(f"Could not extract URL context: {str(e)}")
-        
-        # ✅ ENHANCED: Capture filters from multiple sources
-        self._capture_all_filter_parameters(service_params)
-        
-        # Add all parameters that affect query results
-        cache_relevant_params = [
-            'filters', 'hospital_id', 'branch_id', 'user_id', 
-            'page', 'per_page', 'sort_by', 'sort_order',
-            'search_params', 'current_user_id',
-            'entity_type_param', 'request_args', 'filter_state',
-            'search_term', 'date_range', 'status_filter',
-            'url_entity', 'request_path', 'actual_entity_type'
-        ]
-        
-        for param in cache_relevant_params:
-            if param in service_params and service_params[param] is not None:
-                value = service_params[param]
-                if isinstance(value, dict):
-                    if value:  # Only include non-empty dicts
-                        # Remove None values and empty strings before hashing
-                        cleaned_dict = {k: v for k, v in value.items() 
-                                    if v is not None and v != '' and v != []}
-                        if cleaned_dict:
-                            key_components[param] = json.dumps(cleaned_dict, sort_keys=True, default=str)
-                elif isinstance(value, (list, tuple)):
-                    if value:  # Only include non-empty lists
-                        key_components[param] = json.dumps(list(value), sort_keys=True, default=str)
-                else:
-                    key_components[param] = str(value)
-        
-        # ✅ ADDITIONAL CONTEXT: Include request args with entity context
-        try:
-            if request and hasattr(request, 'args') and request.args:
-                request_dict = request.args.to_dict()
-                if request_dict:
-                    key_components['_request_args'] = json.dumps(request_dict, sort_keys=True)
-        except:
-            pass
-            
-        # Generate final cache key
-        key_string = json.dumps(key_components, sort_keys=True)
-        cache_key = hashlib.sha256(key_string.encode()).hexdigest()[:16]
-        
-        # ✅ ENHANCED: Debug logging with actual entity info
-        try:
-            logger.debug(f"🔑 CACHE KEY GENERATED")
-            logger.debug(f"   Passed Entity Type: {entity_type}")
-            logger.debug(f"   Actual Entity Type: {service_params.get('actual_entity_type', 'None')}")
-            logger.debug(f"   URL Entity: {key_components.get('url_entity', 'None')}")
-            logger.debug(f"   Request Path: {key_components.get('request_path', 'None')}")
-            logger.debug(f"   Operation: {operation}")
-            logger.debug(f"   Filters: {service_params.get('filters', 'None')}")
-            logger.debug(f"   Final Cache Key: {cache_key}")
-        except:
-            pass
-        
-        return cache_key
-    
-    def _capture_all_filter_parameters(self, service_params: Dict[str, Any]):
-        """
-        ✅ ENHANCED: Capture filter parameters with entity context
-        FIXES: Ensures entity-specific filter capture
-        """
-        try:
-            # ✅ CRITICAL FIX: Capture filters from Flask request.args
-            if request and hasattr(request, 'args'):
-                request_args = request.args.to_dict()
-                if request_args:
-                    # Store request args separately for cache key
-                    service_params['request_args'] = request_args
-                    
-                    # ✅ MERGE: If filters param exists, merge with request args
-                    existing_filters = service_params.get('filters', {})
-                    if isinstance(existing_filters, dict):
-                        # Merge request args into filters for comprehensive caching
-                        merged_filters = {**existing_filters, **request_args}
-                        service_params['filters'] = merged_filters
-                    elif not existing_filters:
-                        # If no filters provided, use request args as filters
-                        service_params['filters'] = request_args
-                    
-                    logger.debug(f"🔍 FILTER CAPTURE: Request args captured: {request_args}")
-            
-            # ✅ ENHANCED: Capture URL-specific context
-            if request and hasattr(request, 'path'):
-                request_path = request.path
-                service_params['request_path'] = request_path
-                
-                # Extract entity from URL path for better cache key distinction
-                if '/universal/' in request_path:
-                    path_parts = request_path.split('/')
-                    if len(path_parts) >= 3:
-                        url_entity = path_parts[2]
-                        service_params['url_entity'] = url_entity
-                        logger.debug(f"🔗 URL Entity captured: {url_entity} from path: {request_path}")
-            
-            # ✅ ADDITIONAL: Capture other filter-related parameters
-            if current_user and hasattr(current_user, 'hospital_id'):
-                service_params['hospital_id'] = str(current_user.hospital_id)
-            
-            # ✅ CAPTURE: Additional context that affects filtering
-            if hasattr(request, 'form') and request.form:
-                form_data = request.form.to_dict()
-                if form_data:
-                    service_params['form_data'] = form_data
-                    
-        except Exception as e:
-            logger.warning(f"⚠️ Error capturing filter parameters: {str(e)}")
-            # Don't let filter capture errors break caching
-            pass
+        return build_cache_key(entity_type, operation, service_params)
     
     def _get_ttl_for_entity(self, entity_type: str) -> int:
         """Get TTL seconds for entity type"""
@@ -308,14 +424,18 @@ class UniversalServiceCache:
                                  loader_func: Callable = None) -> Any:
         """
         ✅ ENHANCED: Get cached service result with FIXED filter handling
+        Lookup order: L1 -> in-flight load in this worker -> L2 -> loader.
+        Concurrent misses on one key run the loader once (single-flight).
         """
         start_time = time.time()
         
         # Generate cache key (now properly captures filters)
         cache_key = self._generate_cache_key(entity_type, operation, service_params)
+        tags = self._tags_for_params(entity_type, service_params)
         
         # Try to get from cache
         with self._lock:
+            self._sketch.increment(cache_key)
             entry = self.cache_store.get(cache_key)
             
             if entry and not entry.is_expired():
@@ -327,6 +447,7 @@ class UniversalServiceCache:
                 
                 # Move to end for LRU
                 self.cache_store.move_to_end(cache_key)
+                self._touch_segment(entry)
                 
                 # ✅ ENHANCED: Better logging for filter scenarios
                 filter_info = service_params.get('filters', {})
@@ -339,6 +460,51 @@ class UniversalServiceCache:
             elif entry:
                 # Remove expired entry
                 self._remove_cache_entry(cache_key)
+            
+            # Single-flight: join a load already running in this worker
+            flight = self._inflight.get(cache_key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _InflightLoad()
+                self._inflight[cache_key] = flight
+        
+        if not is_leader:
+            if flight.event.wait(self.load_wait_seconds) and flight.error is None:
+                self.statistics.coalesced_loads += 1
+                self.statistics.record_hit(entity_type, time.time() - start_time)
+                logger.debug(f"SERVICE CACHE COALESCED: {entity_type}.{operation}")
+                return flight.data
+            # Leader failed or timed out - load independently
+            return self._load_and_cache(cache_key, entity_type, operation, tags,
+                                        service_params, loader_func, start_time)
+        
+        try:
+            flight.data = self._load_and_cache(cache_key, entity_type, operation, tags,
+                                               service_params, loader_func, start_time)
+            return flight.data
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+            flight.event.set()
+    
+    def _load_and_cache(self, cache_key: str, entity_type: str, operation: str,
+                        tags: List[str], service_params: Dict[str, Any], loader_func: Optional[Callable],
+                        start_time: float) -> Any:
+        """Resolve an L1 miss through the shared backend, then the loader"""
+        ttl = self._get_ttl_for_entity(entity_type)
+        generation = self._entity_generation.get(entity_type, 0)
+        
+        if self.backend:
+            found, data = self._get_from_backend(cache_key)
+            if found:
+                self._set_cache_entry(cache_key, data, entity_type, operation, ttl, tags)
+                self.statistics.record_l2_hit(entity_type, time.time() - start_time)
+                logger.info(f"🚀 SERVICE CACHE L2 HIT: {entity_type}.{operation} "
+                           f"({(time.time() - start_time)*1000:.1f}ms)")
+                return data
         
         # Cache miss - execute loader function
         self.statistics.record_miss(entity_type)
@@ -347,19 +513,34 @@ class UniversalServiceCache:
             logger.debug(f"SERVICE CACHE MISS: No loader function for {entity_type}.{operation}")
             return None
         
+        lock_token = None
+        if self.backend:
+            lock_token = self.backend.acquire_load_lock(cache_key, self.load_lock_seconds)
+            if lock_token is None:
+                # Another worker is loading this key - wait for its result
+                found, data = self._wait_for_backend(cache_key)
+                if found:
+                    self._set_cache_entry(cache_key, data, entity_type, operation, ttl, tags)
+                    self.statistics.coalesced_loads += 1
+                    logger.debug(f"SERVICE CACHE COALESCED (cross-worker): {entity_type}.{operation}")
+                    return data
+        
         # Execute loader function and cache result
         try:
             fresh_data = loader_func()
             
-            # Cache the result
-            ttl = self._get_ttl_for_entity(entity_type)
-            self._set_cache_entry(
-                cache_key=cache_key,
-                data=fresh_data,
-                entity_type=entity_type,
-                operation=operation,
-                ttl_seconds=ttl
-            )
+            # Cache the result, unless the entity was invalidated mid-load
+            if self._entity_generation.get(entity_type, 0) == generation:
+                self._set_cache_entry(
+                    cache_key=cache_key,
+                    data=fresh_data,
+                    entity_type=entity_type,
+                    operation=operation,
+                    ttl_seconds=ttl,
+                    tags=tags
+                )
+                if self.backend:
+                    self._set_in_backend(cache_key, fresh_data, entity_type, ttl, tags)
             
             response_time = time.time() - start_time
             filter_info = service_params.get('filters', {})
@@ -372,93 +553,260 @@ class UniversalServiceCache:
         except Exception as e:
             logger.error(f"Error executing loader function: {str(e)}")
             raise
+        finally:
+            if lock_token:
+                self.backend.release_load_lock(cache_key, lock_token)
+    
+    # =========================================================================
+    # SHARED BACKEND (L2) HELPERS
+    # =========================================================================
+    
+    def _get_from_backend(self, cache_key: str):
+        """Return (found, data) from the shared backend"""
+        payload = self.backend.get(cache_key)
+        if payload is None:
+            return False, None
+        try:
+            return True, pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not decode shared cache entry {cache_key}: {str(e)}")
+            return False, None
+    
+    def _set_in_backend(self, cache_key: str, data: Any, entity_type: str, ttl_seconds: int,
+                        tags: List[str]):
+        """Write to the shared backend; unpicklable results stay L1-only"""
+        try:
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Result for {entity_type} not shareable, keeping in L1 only: {str(e)}")
+            return
+        self.backend.set(cache_key, payload, ttl_seconds, tags)
+    
+    def _wait_for_backend(self, cache_key: str):
+        """Poll the shared backend while another worker holds the load lock"""
+        deadline = time.time() + self.load_wait_seconds
+        while time.time() < deadline:
+            found, data = self._get_from_backend(cache_key)
+            if found:
+                return True, data
+            if not self.backend.is_load_locked(cache_key):
+                # Loader finished without storing (error or unpicklable) - check once more
+                return self._get_from_backend(cache_key)
+            time.sleep(self.load_poll_interval)
+        return False, None
+    
+    def _broadcast(self, op: str, **payload):
+        """Tell other workers to drop their L1 copies"""
+        if self.backend:
+            message = {'op': op, 'origin': self.instance_id}
+            message.update(payload)
+            self.backend.publish(message)
+    
+    def _handle_broadcast(self, message: Dict[str, Any]):
+        """Apply an invalidation broadcast from another worker to L1"""
+        if message.get('origin') == self.instance_id:
+            return
+        self.statistics.broadcasts_received += 1
+        op = message.get('op')
+        if op == 'invalidate_tags':
+            self._invalidate_local_tags(message.get('tags', []))
+        elif op == 'clear':
+            self._clear_local()
+    
+    def _tags_for_params(self, entity_type: str, service_params: Dict[str, Any]) -> List[str]:
+        """Derive invalidation tags from the parameters that scope a result"""
+        filters = service_params.get('filters')
+        filters = filters if isinstance(filters, dict) else {}
+        record_id = next((service_params[p] for p in RECORD_ID_PARAMS if service_params.get(p)), None)
+        return build_entry_tags(
+            entity_type,
+            hospital_id=service_params.get('hospital_id'),
+            branch_id=service_params.get('branch_id') or filters.get('branch_id'),
+            record_id=record_id
+        )
     
     def _set_cache_entry(self, cache_key: str, data: Any, entity_type: str,
-                        operation: str, ttl_seconds: int):
+                        operation: str, ttl_seconds: int, tags: List[str] = None):
         """Set cache entry with memory management"""
+        # Size outside the lock - estimation walks the result
+        entry = ServiceCacheEntry(data, entity_type, operation, cache_key, ttl_seconds, tags=tags)
+        
         with self._lock:
-            # Calculate entry size
-            entry_size = len(str(data))
+            self._remove_cache_entry(cache_key)
             
-            # Check if we need to evict entries
-            if (len(self.cache_store) >= self.max_entries or 
-                (self.current_memory_usage + entry_size) > self.max_memory_bytes):
-                self._evict_lru_entries(entry_size)
+            if not self._make_room(entry):
+                self.statistics.admission_rejections += 1
+                logger.debug(f"Service cache admission rejected: {entity_type}.{operation} "
+                             f"({entry.size_bytes / 1024:.0f}KB)")
+                return
             
-            # Create new entry
-            entry = ServiceCacheEntry(data, entity_type, operation, cache_key, ttl_seconds)
             self.cache_store[cache_key] = entry
-            self.current_memory_usage += entry_size
-            
-            # Move to end (most recently used)
-            self.cache_store.move_to_end(cache_key)
+            self._probation[cache_key] = None
+            self._account(entry, 1)
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(cache_key)
     
-    def _evict_lru_entries(self, needed_bytes: int):
-        """Evict least recently used entries"""
-        evicted_count = 0
+    def _account(self, entry: ServiceCacheEntry, sign: int):
+        """Add (sign=1) or subtract (sign=-1) an entry from byte counters"""
+        self.current_memory_usage += sign * entry.size_bytes
+        self._segment_bytes[entry.segment] += sign * entry.size_bytes
+        entity_type = entry.entity_type
+        self._entity_bytes[entity_type] = self._entity_bytes.get(entity_type, 0) + sign * entry.size_bytes
+        self._entity_entries[entity_type] = self._entity_entries.get(entity_type, 0) + sign
+        if self._entity_entries[entity_type] <= 0:
+            self._entity_bytes.pop(entity_type, None)
+            self._entity_entries.pop(entity_type, None)
+    
+    def _touch_segment(self, entry: ServiceCacheEntry):
+        """SLRU hit handling: promote from probation, keep protected within budget"""
+        key = entry.cache_key
+        if entry.segment == 'protected':
+            self._protected.move_to_end(key)
+            return
         
-        while (len(self.cache_store) > 0 and 
-               (len(self.cache_store) >= self.max_entries or 
-                self.current_memory_usage + needed_bytes > self.max_memory_bytes)):
-            
-            # Remove least recently used (first item)
-            lru_key, lru_entry = self.cache_store.popitem(last=False)
-            self.current_memory_usage -= lru_entry.size_bytes
-            evicted_count += 1
-            
-            if evicted_count >= 100:  # Prevent infinite loop
-                break
+        self._probation.pop(key, None)
+        self._segment_bytes['probation'] -= entry.size_bytes
+        entry.segment = 'protected'
+        self._protected[key] = None
+        self._segment_bytes['protected'] += entry.size_bytes
+        
+        protected_budget = self.max_memory_bytes * self.protected_ratio
+        while self._segment_bytes['protected'] > protected_budget and len(self._protected) > 1:
+            demoted_key, _ = self._protected.popitem(last=False)
+            demoted = self.cache_store[demoted_key]
+            self._segment_bytes['protected'] -= demoted.size_bytes
+            demoted.segment = 'probation'
+            self._probation[demoted_key] = None
+            self._segment_bytes['probation'] += demoted.size_bytes
+    
+    def _make_room(self, candidate: ServiceCacheEntry) -> bool:
+        """
+        Evict until candidate fits both the byte and entry budgets.
+        Probation is drained first. Protected entries are only evicted for a
+        candidate the frequency sketch rates more popular (TinyLFU).
+        Returns False if the candidate should not be admitted.
+        """
+        if candidate.size_bytes > self.max_memory_bytes * self.max_entry_ratio:
+            return False
+        
+        def over_budget():
+            return (len(self.cache_store) >= self.max_entries or
+                    self.current_memory_usage + candidate.size_bytes > self.max_memory_bytes)
+        
+        if not over_budget():
+            return True
+        
+        # Plan victims before evicting so a rejected candidate costs nothing
+        candidate_frequency = self._sketch.estimate(candidate.cache_key)
+        freed_bytes = 0
+        freed_entries = 0
+        victims = []
+        for segment in (self._probation, self._protected):
+            for key in segment:
+                if (len(self.cache_store) - freed_entries < self.max_entries and
+                        self.current_memory_usage - freed_bytes + candidate.size_bytes <= self.max_memory_bytes):
+                    break
+                victim = self.cache_store[key]
+                if victim.segment == 'protected' and self._sketch.estimate(key) >= candidate_frequency:
+                    return False
+                victims.append(key)
+                freed_bytes += victim.size_bytes
+                freed_entries += 1
+        
+        for key in victims:
+            self._remove_cache_entry(key)
         
-        if evicted_count > 0:
-            self.statistics.evictions += evicted_count
-            logger.debug(f"🗑️ Evicted {evicted_count} LRU cache entries")
+        if victims:
+            self.statistics.evictions += len(victims)
+            logger.debug(f"🗑️ Evicted {len(victims)} cache entries ({freed_bytes / 1024:.0f}KB)")
+        
+        return not over_budget()
     
     def _remove_cache_entry(self, cache_key: str):
         """Remove cache entry and update memory usage"""
-        if cache_key in self.cache_store:
-            entry = self.cache_store.pop(cache_key)
-            self.current_memory_usage -= entry.size_bytes
+        entry = self.cache_store.pop(cache_key, None)
+        if entry is None:
+            return
+        if entry.segment == 'protected':
+            self._protected.pop(cache_key, None)
+        else:
+            self._probation.pop(cache_key, None)
+        self._account(entry, -1)
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(cache_key)
+                if not keys:
+                    del self._tag_index[tag]
+    
+    def _invalidate_local_tags(self, tags: List[str]) -> int:
+        """Drop L1 entries indexed under any of tags - cost is O(affected entries)"""
+        with self._lock:
+            for entity_type in {_tag_entity_type(tag) for tag in tags}:
+                self._entity_generation[entity_type] = self._entity_generation.get(entity_type, 0) + 1
+            keys_to_remove = set()
+            for tag in tags:
+                keys_to_remove |= self._tag_index.get(tag, set())
+            for key in keys_to_remove:
+                self._remove_cache_entry(key)
+        return len(keys_to_remove)
+    
+    def invalidate_tags(self, tags: List[str]) -> int:
+        """
+        Invalidate entries indexed under any of tags in L1 and L2,
+        then broadcast so other workers clear their L1.
+        """
+        count = self._invalidate_local_tags(tags)
+        if self.backend:
+            count = max(count, self.backend.delete_tags(tags))
+        self._broadcast('invalidate_tags', tags=tags)
+        if count > 0:
+            self.statistics.invalidations += count
+        return count
     
-    def invalidate_entity_cache(self, entity_type: str, cascade: bool = False) -> int:
+    def invalidate_entity_cache(self, entity_type: str, cascade: bool = False,
+                                hospital_id: Any = None, branch_id: Any = None,
+                                record_id: Any = None) -> int:
         """
         Invalidate cache entries for specific entity type
+        Optionally narrowed to a hospital, branch and record; dependent
+        entities (cascade) are invalidated in the same hospital/branch scope.
         Returns number of entries invalidated
         """
-        invalidated_count = 0
+        tags = build_invalidation_tags(entity_type, hospital_id, branch_id, record_id)
+        if cascade and entity_type in self.dependency_map:
+            for dependent_entity in self.dependency_map[entity_type]:
+                tags.extend(build_invalidation_tags(dependent_entity, hospital_id, branch_id))
         
-        with self._lock:
-            keys_to_remove = []
-            
-            # Find entries to invalidate
-            for key, entry in self.cache_store.items():
-                if entry.entity_type == entity_type:
-                    keys_to_remove.append(key)
-            
-            # Remove found entries
-            for key in keys_to_remove:
-                self._remove_cache_entry(key)
-                invalidated_count += 1
-            
-            # Cascade invalidation if requested
-            if cascade and entity_type in self.dependency_map:
-                for dependent_entity in self.dependency_map[entity_type]:
-                    cascade_count = self.invalidate_entity_cache(dependent_entity, False)
-                    invalidated_count += cascade_count
-                    logger.debug(f"↳ Cascade invalidated: {dependent_entity} ({cascade_count} entries)")
+        invalidated_count = self.invalidate_tags(tags)
         
         if invalidated_count > 0:
-            self.statistics.invalidations += invalidated_count
-            logger.info(f"🗑️ Invalidated {invalidated_count} service cache entries for {entity_type}")
+            scope = f" (hospital {hospital_id})" if hospital_id else ""
+            logger.info(f"🗑️ Invalidated {invalidated_count} service cache entries for {entity_type}{scope}")
         
         return invalidated_count
     
-    def clear_all_service_cache(self):
-        """Clear all service cache entries"""
+    def _clear_local(self) -> int:
+        """Clear L1 only"""
         with self._lock:
             entry_count = len(self.cache_store)
             self.cache_store.clear()
+            self._probation.clear()
+            self._protected.clear()
+            self._segment_bytes = {'probation': 0, 'protected': 0}
+            self._entity_bytes.clear()
+            self._entity_entries.clear()
+            self._tag_index.clear()
             self.current_memory_usage = 0
-            logger.info(f"🧹 Cleared all service cache entries ({entry_count} removed)")
+        return entry_count
+    
+    def clear_all_service_cache(self):
+        """Clear all service cache entries (all workers)"""
+        entry_count = self._clear_local()
+        if self.backend:
+            self.backend.clear()
+        self._broadcast('clear')
+        logger.info(f"🧹 Cleared all service cache entries ({entry_count} removed)")
     
     def _start_cleanup_timer(self):
         """Start background cleanup of expired entries"""
@@ -492,16 +840,25 @@ class UniversalServiceCache:
         """Get comprehensive cache statistics"""
         uptime = time.time() - self.statistics.start_time
         
-        # Calculate entity-specific hit ratios
+        with self._lock:
+            entity_bytes = dict(self._entity_bytes)
+            entity_entries = dict(self._entity_entries)
+            segment_bytes = dict(self._segment_bytes)
+        
+        # Calculate entity-specific hit ratios and resident memory
         entity_stats_enhanced = {}
-        for entity_type, stats in self.statistics.entity_stats.items():
+        for entity_type in set(self.statistics.entity_stats) | set(entity_bytes):
+            stats = self.statistics.entity_stats.get(entity_type, {'hits': 0, 'misses': 0})
             total = stats['hits'] + stats['misses']
             hit_ratio = stats['hits'] / total if total > 0 else 0.0
             entity_stats_enhanced[entity_type] = {
                 'hits': stats['hits'],
                 'misses': stats['misses'],
                 'hit_ratio': hit_ratio,
-                'total_requests': total
+                'total_requests': total,
+                'entries': entity_entries.get(entity_type, 0),
+                'memory_bytes': entity_bytes.get(entity_type, 0),
+                'memory_mb': entity_bytes.get(entity_type, 0) / (1024 * 1024)
             }
         
         return {
@@ -516,6 +873,14 @@ class UniversalServiceCache:
             'avg_response_time_ms': self.statistics.get_avg_response_time() * 1000,
             'uptime_hours': uptime / 3600,
             'entity_stats': entity_stats_enhanced,
+            'probation_memory_mb': segment_bytes['probation'] / (1024 * 1024),
+            'protected_memory_mb': segment_bytes['protected'] / (1024 * 1024),
+            'admission_rejections': self.statistics.admission_rejections,
+            'indexed_tags': len(self._tag_index),
+            'backend': self.backend.name if self.backend else 'memory',
+            'l2_hits': self.statistics.l2_hits,
+            'coalesced_loads': self.statistics.coalesced_loads,
+            'broadcasts_received': self.statistics.broadcasts_received,
             'requests_per_minute': (self.statistics.hits + self.statistics.misses) / (uptime / 60) if uptime > 0 else 0
         }
 
@@ -523,12 +888,38 @@ class UniversalServiceCache:
 # ✅ ENHANCED SERVICE CACHING DECORATORS
 # =============================================================================
 
+def _positional_param_names(func: Callable, skip_self: bool) -> List[str]:
+    """Names that positional arguments of func bind to"""
+    names = [
+        name for name, param in inspect.signature(func).parameters.items()
+        if param.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    ]
+    return names[1:] if skip_self else names
+
+def _is_hospital_scoped(func: Callable) -> bool:
+    """Functions that take hospital_id (or arbitrary kwargs) are tenant-scoped"""
+    params = inspect.signature(func).parameters
+    return 'hospital_id' in params or any(
+        p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values()
+    )
+
+def _bind_call_params(param_names: List[str], args: tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Explicit call parameters by name - the only input to the cache key"""
+    service_params = kwargs.copy()
+    for i, arg_value in enumerate(args):
+        name = param_names[i] if i < len(param_names) else f"_arg{i}"
+        service_params[name] = arg_value
+    return service_params
+
 def cache_service_method(entity_type: str = None, operation: str = None):
     """
     ✅ FIXED: Cache decorator that uses actual method parameters for entity type
     FIXES: Uses entity_type from method parameters, not service class property
     """
     def decorator(func: Callable):
+        param_names = _positional_param_names(func, skip_self=True)
+        hospital_scoped = _is_hospital_scoped(func)
+        
         @wraps(func)
         def wrapper(self, *args, **kwargs):
             try:
@@ -570,23 +961,16 @@ def cache_service_method(entity_type: str = None, operation: str = None):
                 cache_manager = get_service_cache_manager()
                 
                 # ✅ ENHANCED: Prepare service parameters for cache key
-                service_params = kwargs.copy()
+                service_params = _bind_call_params(param_names, args, kwargs)
+                
+                # ✅ SAFETY: Tenant-scoped calls without a hospital are not cached
+                if hospital_scoped and not service_params.get('hospital_id'):
+                    logger.debug(f"No hospital_id for {func.__name__}, executing directly")
+                    return func(self, *args, **kwargs)
                 
                 # ✅ CRITICAL: Include the actual entity type in cache parameters
                 service_params['actual_entity_type'] = determined_entity_type
                 
-                if args:
-                    # Map positional args to parameter names
-                    if len(args) > 0:
-                        # If first arg is entity_type, use it; otherwise it's probably filters
-                        if isinstance(args[0], str) and args[0] == determined_entity_type:
-                            # First arg is entity_type, second might be filters
-                            if len(args) > 1:
-                                service_params['filters'] = args[1]
-                        else:
-                            # First arg is probably filters
-                            service_params['filters'] = args[0]
-                
                 # Create loader function
                 def loader():
                     return func(self, *args, **kwargs)
@@ -616,8 +1000,8 @@ def cache_service_method_bypass(entity_type: str = None, operation: str = None):
 
 def cache_service_method_park(entity_type: str = None, operation: str = None):
     """
-    ✅ ORIGINAL decorator with FIXED filter handling
-    Now properly captures filters from request.args
+    ✅ ORIGINAL decorator, parked
+    Maps the first positional argument to filters
     """
     def decorator(func: Callable):
         @wraps(func)
@@ -673,6 +1057,8 @@ def cache_universal(entity_type: str = None, operation: str = None):
         sig = inspect.signature(func)
         params = list(sig.parameters.keys())
         is_class_method = len(params) > 0 and params[0] == 'self'
+        param_names = _positional_param_names(func, skip_self=False)
+        hospital_scoped = _is_hospital_scoped(func)
         
         if is_class_method:
             # Use existing fixed decorator for class methods
@@ -690,17 +1076,12 @@ def cache_universal(entity_type: str = None, operation: str = None):
                     cache_manager = get_service_cache_manager()
                     
                     # ✅ ENHANCED: Build service parameters for standalone functions
-                    sig = inspect.signature(func)
-                    param_names = list(sig.parameters.keys())
-                    
-                    service_params = kwargs.copy()
-                    for i, arg_value in enumerate(args):
-                        if i < len(param_names):
-                            service_params[param_names[i]] = arg_value
+                    service_params = _bind_call_params(param_names, args, kwargs)
                     
-                    # Add context for standalone functions
-                    if current_user and hasattr(current_user, 'hospital_id'):
-                        service_params['_context_hospital_id'] = str(current_user.hospital_id)
+                    # Context must be passed explicitly - no current_user fallback
+                    if hospital_scoped and not service_params.get('hospital_id'):
+                        logger.debug(f"No hospital_id for {func.__name__}, executing directly")
+                        return func(*args, **kwargs)
                     
                     def loader():
                         return func(*args, **kwargs)
@@ -737,20 +1118,25 @@ def get_service_cache_manager() -> UniversalServiceCache:
                 # Get configuration from Flask app
                 max_memory = 500  # default
                 max_entries = 10000  # default
+                backend = None
                 
                 if current_app:
                     max_memory = current_app.config.get('SERVICE_CACHE_MAX_MEMORY_MB', 500)
                     max_entries = current_app.config.get('SERVICE_CACHE_MAX_ENTRIES', 10000)
+                    backend = create_service_cache_backend(current_app.config)
                 
-                _service_cache_manager = UniversalServiceCache(max_memory, max_entries)
+                _service_cache_manager = UniversalServiceCache(max_memory, max_entries, backend)
                 logger.info("✅ Global Service Cache Manager initialized with FIXED filter handling")
     
     return _service_cache_manager
 
-def invalidate_service_cache_for_entity(entity_type: str, cascade: bool = False) -> int:
-    """Invalidate service cache for entity type"""
+def invalidate_service_cache_for_entity(entity_type: str, cascade: bool = False,
+                                        hospital_id: Any = None, branch_id: Any = None,
+                                        record_id: Any = None) -> int:
+    """Invalidate service cache for entity type, optionally scoped to hospital/branch/record"""
     cache_manager = get_service_cache_manager()
-    return cache_manager.invalidate_entity_cache(entity_type, cascade)
+    return cache_manager.invalidate_entity_cache(entity_type, cascade, hospital_id=hospital_id,
+                                                 branch_id=branch_id, record_id=record_id)
 
 def clear_all_service_cache():
     """Clear all service cache"""
@@ -774,6 +1160,7 @@ def init_service_cache(app):
         app.config.setdefault('SERVICE_CACHE_MAX_MEMORY_MB', 500)
         app.config.setdefault('SERVICE_CACHE_MAX_ENTRIES', 10000)
         app.config.setdefault('SERVICE_CACHE_DEFAULT_TTL', 1800)
+        app.config.setdefault('SERVICE_CACHE_BACKEND', 'memory')  # memory | local | redis
         
         if app.config.get('SERVICE_CACHE_ENABLED'):
             # Initialize cache manager
@@ -783,7 +1170,7 @@ def init_service_cache(app):
             app._service_cache_manager = cache_manager
             
             logger.info("✅ Service Cache initialized with FIXED filter handling")
-            logger.info("   ✅ Filters from request.args properly captured")
+            logger.info("   ✅ Keys built from explicit call parameters")
             logger.info("   ✅ Different filter combinations cached separately")
             logger.info("   ✅ Support for both class methods and standalone functions")
             
@@ -807,14 +1194,15 @@ def debug_cache_key_for_request():
         return "No active request"
     
     try:
-        # Simulate what the cache would capture
+        from flask_login import current_user
+        
+        # Simulate the parameters a list view passes to search_data
         service_params = {}
         if request.args:
-            service_params['request_args'] = request.args.to_dict()
             service_params['filters'] = request.args.to_dict()
         
         if current_user and hasattr(current_user, 'hospital_id'):
-            service_params['hospital_id'] = str(current_user.hospital_id)
+            service_params['hospital_id'] = current_user.hospital_id
         
         # Generate cache key
         cache_manager = get_service_cache_manager()
@@ -825,7 +1213,7 @@ def debug_cache_key_for_request():
             'request_args': request.args.to_dict() if request.args else {},
             'request_form': request.form.to_dict() if hasattr(request, 'form') and request.form else {},
             'captured_filters': service_params.get('filters', {}),
-            'hospital_id': service_params.get('hospital_id', 'None'),
+            'hospital_id': str(service_params.get('hospital_id')),
             'generated_cache_key': cache_key
         }
         
@@ -0,0 +1,237 @@
+# =============================================================================
+# Versioned Caches - per-worker structures built from the database
+# File: app/engine/versioned_cache.py
+# =============================================================================
+
+"""
+Shared plumbing of the per-worker caches that sit next to the service cache
+(permission matrices, promotion indexes, resource availability) and of the
+services that act when a transaction commits (appointment events, render jobs).
+
+- VersionStampedCache: entries served while younger than a TTL and built
+  under the current (global, scope) version stamp. invalidate() bumps a
+  stamp and broadcasts the bump to the other workers.
+- BroadcastChannel: one op on the pub/sub of the service cache's shared
+  backend (SERVICE_CACHE_BACKEND), subscribed on first use.
+- PendingCommitWork: work collected in session.info while a transaction is
+  open, run when the outermost transaction commits and dropped when it ends
+  without committing. Savepoints neither run nor drop it: a released
+  savepoint is not durable yet, and a rolled back one may sit inside a
+  transaction that still commits.
+"""
+
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+ALL_SCOPES = '*'
+
+
+def get_shared_backend():
+    """Shared backend of the process service cache, or None (no backend, or no cache yet)"""
+    from app.engine import universal_service_cache
+    manager = universal_service_cache._service_cache_manager
+    return manager.backend if manager is not None else None
+
+# =============================================================================
+# CROSS-WORKER BROADCAST
+# =============================================================================
+
+class BroadcastChannel:
+    """
+    Messages of one op on the shared backend. publish() tags a message with
+    the op and this channel's origin; handler receives the messages of the
+    same op published by other workers.
+    """
+
+    def __init__(self, op: str, handler: Callable[[Dict[str, Any]], None], backend=None):
+        self.op = op
+        self.instance_id = uuid.uuid4().hex
+        self._handler = handler
+        self._backend = backend
+        self._subscribed_backend = None
+        self._lock = threading.Lock()
+
+    def ensure_subscribed(self):
+        """Subscribe once the backend exists (the service cache is created lazily)"""
+        if self._subscribed_backend is not None:
+            return
+        try:
+            backend = self._backend if self._backend is not None else get_shared_backend()
+        except Exception:
+            return
+        if backend is None:
+            return
+        with self._lock:
+            if self._subscribed_backend is not None:
+                return
+            self._subscribed_backend = backend
+        backend.subscribe(self._receive)
+
+    def publish(self, **fields):
+        self.ensure_subscribed()
+        if self._subscribed_backend is None:
+            return
+        try:
+            self._subscribed_backend.publish(dict(fields, op=self.op, origin=self.instance_id))
+        except Exception as e:
+            logger.warning(f"⚠️ {self.op} broadcast failed: {str(e)}")
+
+    def _receive(self, message: Dict[str, Any]):
+        if message.get('op') != self.op or message.get('origin') == self.instance_id:
+            return
+        self._handler(message)
+
+# =============================================================================
+# VERSION-STAMPED CACHE
+# =============================================================================
+
+class VersionStampedCache:
+    """
+    Per-worker cache keyed by tuples whose element at scope_index is the
+    invalidation scope (a user, a hospital, a date).
+
+    Subclasses set:
+        op           broadcast op of the invalidations
+        scope_index  position of the scope in the key
+        ttl_config   app config name of the TTL in seconds, default_ttl its default
+        max_entries  oldest entries are evicted beyond it (None: unbounded)
+    Cached values need writable version and built_at attributes.
+    """
+
+    op = 'versioned_cache'
+    scope_index = 0
+    ttl_config: Optional[str] = None
+    default_ttl = 300
+    max_entries: Optional[int] = None
+
+    def __init__(self, ttl_seconds: Optional[int] = None, backend=None):
+        self._ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple, Any] = {}
+        self._global_version = 0
+        self._scope_versions: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._channel = BroadcastChannel(self.op, self._handle_broadcast, backend)
+
+    @property
+    def ttl_seconds(self) -> int:
+        if self._ttl_seconds is not None:
+            return self._ttl_seconds
+        try:
+            from flask import current_app
+            return int(current_app.config.get(self.ttl_config, self.default_ttl))
+        except RuntimeError:
+            return self.default_ttl
+
+    def normalize_scope(self, scope) -> Hashable:
+        return str(scope)
+
+    def encode_scope(self, scope) -> str:
+        return str(scope)
+
+    def decode_scope(self, value: str) -> Hashable:
+        return value
+
+    def version_for(self, scope) -> Tuple[int, int]:
+        """Current (global, scope) version stamp"""
+        return self._global_version, self._scope_versions.get(self.normalize_scope(scope), 0)
+
+    def get_or_build(self, key: Tuple, build: Callable[[Session], Any], session: Optional[Session] = None):
+        """
+        Cached value of key, or build(session) - with a read-only session when
+        none is given. A value built while its scope was invalidated is
+        returned but not cached.
+        """
+        scope = key[self.scope_index]
+        self._channel.ensure_subscribed()
+
+        with self._lock:
+            value = self._entries.get(key)
+            version = self.version_for(scope)
+            if (value is not None and value.version == version
+                    and time.monotonic() - value.built_at < self.ttl_seconds):
+                return value
+
+        if session is not None:
+            value = build(session)
+        else:
+            from app.services.database_service import get_db_session
+            with get_db_session(read_only=True) as read_session:
+                value = build(read_session)
+        value.version = version
+
+        with self._lock:
+            if self.version_for(scope) == version:
+                self._entries.pop(key, None)
+                while self.max_entries and len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = value
+        logger.debug(f"Built {self.op} entry for {key}")
+        return value
+
+    def invalidate(self, scope=None, broadcast: bool = True):
+        """Drop the entries of one scope, or every entry when scope is None"""
+        with self._lock:
+            if scope is None:
+                self._global_version += 1
+                self._entries.clear()
+            else:
+                scope = self.normalize_scope(scope)
+                self._scope_versions[scope] = self._scope_versions.get(scope, 0) + 1
+                for key in [k for k in self._entries if k[self.scope_index] == scope]:
+                    del self._entries[key]
+        if broadcast:
+            self._channel.publish(scope=ALL_SCOPES if scope is None else self.encode_scope(scope))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _handle_broadcast(self, message: Dict[str, Any]):
+        scope = message.get('scope')
+        self.invalidate(None if scope in (None, ALL_SCOPES) else self.decode_scope(scope), broadcast=False)
+
+# =============================================================================
+# COMMIT-TIME WORK
+# =============================================================================
+
+class PendingCommitWork:
+    """
+    Work a session collects under session.info[key] (a set or list) while its
+    transaction is open. apply(session, pending) runs after the outermost
+    transaction commits; a rollback or close of the outermost transaction
+    drops it, together with discard_keys.
+    """
+
+    def __init__(self, key: str, apply: Callable[[Session, Any], None], discard_keys: Iterable[str] = ()):
+        self.key = key
+        self._apply = apply
+        self._discard_keys = (key,) + tuple(discard_keys)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_transaction_end', self._after_transaction_end)
+
+    def collect(self, session: Session, factory=set):
+        """The session's pending collection, created on first use"""
+        return session.info.setdefault(self.key, factory())
+
+    def _after_commit(self, session: Session):
+        # Also fires when a savepoint is released; the outer transaction may still roll back
+        if session.in_nested_transaction():
+            return
+        pending = session.info.pop(self.key, None)
+        if pending:
+            self._apply(session, pending)
+
+    def _after_transaction_end(self, session: Session, transaction):
+        if transaction.parent is not None:
+            return
+        for key in self._discard_keys:
+            session.info.pop(key, None)
@@ -18,7 +18,7 @@ from sqlalchemy import (
     Numeric, CheckConstraint, UniqueConstraint, Index, func, event
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, timezone, time, date, timedelta
 
@@ -281,7 +281,8 @@ class Appointment(Base, TimestampMixin, SoftDeleteMixin):
 
     # References
     patient_id = Column(UUID(as_uuid=True), ForeignKey('patients.patient_id'), nullable=False)
-    staff_id = Column(UUID(as_uuid=True), ForeignKey('staff.staff_id'))  # Doctor
+    # Active history: live queue events report the doctor, date and status an appointment moved from
+    staff_id = column_property(Column(UUID(as_uuid=True), ForeignKey('staff.staff_id')), active_history=True)  # Doctor
     branch_id = Column(UUID(as_uuid=True), ForeignKey('branches.branch_id'), nullable=False)
     hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), nullable=False)
     slot_id = Column(UUID(as_uuid=True), ForeignKey('appointment_slots.slot_id'))
@@ -297,7 +298,7 @@ class Appointment(Base, TimestampMixin, SoftDeleteMixin):
     appointment_purpose = Column(String(30))  # consultation, follow_up, procedure, service, package_session
 
     # Scheduling
-    appointment_date = Column(Date, nullable=False)
+    appointment_date = column_property(Column(Date, nullable=False), active_history=True)
     start_time = Column(Time, nullable=False)
     end_time = Column(Time)
     estimated_duration_minutes = Column(Integer, default=30)
@@ -308,7 +309,7 @@ class Appointment(Base, TimestampMixin, SoftDeleteMixin):
     wait_time_minutes = Column(Integer)
 
     # Status workflow
-    status = Column(String(20), nullable=False, default='requested')
+    status = column_property(Column(String(20), nullable=False, default='requested'), active_history=True)
     # Values: requested, confirmed, checked_in, in_progress, completed, cancelled, no_show, rescheduled
 
     # Booking info
@@ -519,6 +520,37 @@ class Appointment(Base, TimestampMixin, SoftDeleteMixin):
         return self.status in [self.STATUS_REQUESTED, self.STATUS_CONFIRMED]
 
 
+# Cancelling, marking no-show or moving an appointment frees its resources:
+# resource availability indexes are invalidated for the old and new dates
+def _appointment_availability_changed(mapper, connection, target):
+    from sqlalchemy import inspect
+    from sqlalchemy.orm import object_session
+    from app.services.resource_availability_service import schedule_availability_invalidation
+    state = inspect(target)
+    if not (state.attrs.status.history.has_changes() or state.attrs.appointment_date.history.has_changes()):
+        return
+    for appointment_date in {target.appointment_date, *(state.attrs.appointment_date.history.deleted or ())}:
+        if appointment_date is not None:
+            schedule_availability_invalidation(object_session(target), appointment_date)
+
+event.listen(Appointment, 'after_update', _appointment_availability_changed)
+
+def _appointment_booked(mapper, connection, target):
+    from sqlalchemy import inspect
+    from sqlalchemy.orm import object_session
+    from app.services.appointment_event_service import record_appointment_change
+    record_appointment_change(object_session(target), target, inspect(target), is_new=True)
+
+def _appointment_changed(mapper, connection, target):
+    from sqlalchemy import inspect
+    from sqlalchemy.orm import object_session
+    from app.services.appointment_event_service import record_appointment_change
+    record_appointment_change(object_session(target), target, inspect(target))
+
+event.listen(Appointment, 'after_insert', _appointment_booked)
+event.listen(Appointment, 'after_update', _appointment_changed)
+
+
 class AppointmentStatusHistory(Base):
     """
     Audit trail for appointment status changes.
@@ -3,7 +3,8 @@
 
 from sqlalchemy import Column, String, ForeignKey, Boolean, Integer, Text, CheckConstraint, UniqueConstraint, Index, DateTime, Date, Numeric
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import event
+from sqlalchemy.orm import relationship, object_session
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, timezone, date
 from .base import Base, TimestampMixin, generate_uuid
@@ -173,6 +174,17 @@ class RoleModuleBranchAccess(Base, TimestampMixin):
     def __repr__(self):
         return f"<RoleModuleBranchAccess {self.role_id} - {self.module_id} - {self.branch_id or 'All Branches'}>"
 
+# Compiled permission matrices (permission_matrix_service) are invalidated when
+# the transaction that changes a role, mapping, grant or module commits
+def _permissions_changed(mapper, connection, target):
+    from app.services.permission_matrix_service import schedule_permission_matrix_invalidation
+    user_id = target.user_id if isinstance(target, UserRoleMapping) else None
+    schedule_permission_matrix_invalidation(object_session(target), user_id)
+
+for _model in (UserRoleMapping, RoleMaster, ModuleMaster, RoleModuleAccess, RoleModuleBranchAccess):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _permissions_changed)
+
 
 class InvoiceSequence(Base, TimestampMixin):
     """
@@ -2,7 +2,8 @@
 
 from sqlalchemy import Column, String, ForeignKey, Boolean, Text, Numeric, Date, Integer, DateTime, func, UniqueConstraint, CheckConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import event
+from sqlalchemy.orm import relationship, object_session
 from sqlalchemy.ext.hybrid import hybrid_property
 from .base import Base, TimestampMixin, TenantMixin, SoftDeleteMixin, ApprovalMixin, generate_uuid
 
@@ -1103,6 +1104,17 @@ class PromotionGroupItem(Base):
     # Relationships
     group = relationship("PromotionCampaignGroup", back_populates="items")
 
+# Promotion indexes (promotion_index_service) are invalidated when the
+# transaction that changes a campaign, campaign group or group item commits
+def _promotions_changed(mapper, connection, target):
+    from app.services.promotion_index_service import schedule_promotion_index_invalidation
+    hospital_id = getattr(target, 'hospital_id', None)  # group items carry no hospital
+    schedule_promotion_index_invalidation(object_session(target), hospital_id)
+
+for _model in (PromotionCampaign, PromotionCampaignGroup, PromotionGroupItem):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _promotions_changed)
+
 
 # =============================================================================
 # RESOURCE MANAGEMENT MODELS
@@ -1294,3 +1306,18 @@ class AppointmentResource(Base):
 
     def __repr__(self):
         return f"<AppointmentResource {self.resource_type} for appointment {self.appointment_id}>"
+
+
+# Resource availability indexes (resource_availability_service) are invalidated
+# for the allocation's date(s) when the transaction that changes it commits
+def _allocation_changed(mapper, connection, target):
+    from sqlalchemy import inspect
+    from app.services.resource_availability_service import schedule_availability_invalidation
+    session = object_session(target)
+    history = inspect(target).attrs.allocation_date.history
+    for allocation_date in {target.allocation_date, *(history.deleted or ())}:
+        if allocation_date is not None:
+            schedule_availability_invalidation(session, allocation_date)
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(AppointmentResource, _event_name, _allocation_changed)
@@ -1,10 +1,10 @@
 # app/models/transaction.py
 
 from werkzeug.security import generate_password_hash, check_password_hash    
-from sqlalchemy import text
+from sqlalchemy import text, event
 from sqlalchemy import Column, String, ForeignKey, Boolean, Integer, DateTime, Date, Text, Numeric
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship, backref, object_session
 from datetime import datetime, timezone
 from .base import Base, TimestampMixin, SoftDeleteMixin, generate_uuid, ApprovalMixin, TenantMixin
 from flask import current_app
@@ -305,6 +305,13 @@ class User(Base, TimestampMixin, SoftDeleteMixin, UserMixin):
         if not self.ui_preferences:
             self.ui_preferences = {}
         self.ui_preferences['show_deleted_records'] = value
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def user_after_change(mapper, connection, target):
+    """Cached principal and permission matrix of the user are rebuilt once the change commits"""
+    from app.services.permission_matrix_service import schedule_permission_matrix_invalidation
+    schedule_permission_matrix_invalidation(object_session(target), target.user_id)
     
 class LoginHistory(Base, TimestampMixin):
     """Track user login attempts and sessions"""
@@ -594,7 +601,7 @@ class InvoiceDocument(Base, TimestampMixin, TenantMixin):
     # === DOCUMENT CLASSIFICATION ===
     document_type = Column(String(50), nullable=False, default='invoice_pdf')  # invoice_pdf, revised_invoice, credit_note
     document_category = Column(String(30), default='billing')  # billing, audit, compliance
-    document_status = Column(String(20), default='generated')  # generated, archived, superseded
+    document_status = Column(String(20), default='generated')  # pending, generated, failed, archived, superseded
 
     # === FILE INFORMATION ===
     original_filename = Column(String(255), nullable=False)
@@ -646,6 +653,35 @@ class InvoiceDocument(Base, TimestampMixin, TenantMixin):
         """Check if this is the latest version"""
         return self.document_status != 'superseded'
 
+class DocumentRenderJob(Base, TimestampMixin, TenantMixin):
+    """
+    Queued PDF rendering of an invoice document (see document_render_service).
+    The document row is created 'pending' with its file name assigned; the job
+    renders the PDF outside the request and moves it to 'generated'.
+    idempotency_key ('invoice_pdf:<invoice_id>:v<version>') makes enqueueing repeatable.
+    """
+    __tablename__ = 'document_render_jobs'
+
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=generate_uuid)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), nullable=False)
+    invoice_id = Column(UUID(as_uuid=True), ForeignKey('invoice_header.invoice_id'), nullable=False)
+    document_id = Column(UUID(as_uuid=True), ForeignKey('invoice_documents.document_id'), nullable=False)
+    idempotency_key = Column(String(150), nullable=False, unique=True)
+    job_type = Column(String(30), nullable=False, default='invoice_pdf')
+
+    # queued -> running -> completed; back to queued for a retry, failed after max_attempts
+    status = Column(String(20), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    next_attempt_at = Column(DateTime(timezone=True))
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    base_url = Column(String(255))  # Resolves static URLs in the print template
+
+    # Relationships
+    document = relationship("InvoiceDocument")
+
 class PaymentDetail(Base, TimestampMixin, TenantMixin):
     """Payment details for invoices - Enhanced with workflow and approval tracking"""
     __tablename__ = 'payment_details'
@@ -1612,12 +1648,56 @@ class Inventory(Base, TimestampMixin, TenantMixin):
         except Exception:
             return False
 
+class StockPosition(Base, TimestampMixin, TenantMixin):
+    """
+    Current stock per hospital/branch/medicine/batch - snapshot of the inventory ledger.
+    Maintained by an after_insert hook on Inventory (see stock_position_service);
+    unique key (hospital_id, COALESCE(branch_id, nil uuid), medicine_id, batch)
+    is created in migrations/create_stock_position_table.sql.
+    """
+    __tablename__ = 'stock_position'
+
+    position_id = Column(UUID(as_uuid=True), primary_key=True, default=generate_uuid)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), nullable=False)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey('branches.branch_id'))
+    medicine_id = Column(UUID(as_uuid=True), ForeignKey('medicines.medicine_id'), nullable=False)
+    batch = Column(String(20), nullable=False)
+
+    # Attributes of the latest movement for the batch
+    medicine_name = Column(String(100), nullable=False)
+    medicine_category = Column(String(50))
+    expiry = Column(Date, nullable=False)
+    pack_purchase_price = Column(Numeric(12, 2))
+    pack_mrp = Column(Numeric(12, 2))
+    units_per_pack = Column(Numeric(10, 2))
+    unit_price = Column(Numeric(12, 2))
+    sale_price = Column(Numeric(12, 2))
+    cgst = Column(Numeric(12, 2), default=0)
+    sgst = Column(Numeric(12, 2), default=0)
+    igst = Column(Numeric(12, 2), default=0)
+    location = Column(String(50))
+
+    # Balance = SUM(inventory.units) for the key
+    current_stock = Column(Numeric(12, 2), nullable=False, default=0)
+    last_stock_id = Column(UUID(as_uuid=True))  # Latest inventory.stock_id applied
+    last_movement_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    medicine = relationship("Medicine")
+
+@event.listens_for(Inventory, 'after_insert')
+def inventory_after_insert(mapper, connection, target):
+    """Apply every new ledger row to stock_position in the same transaction"""
+    from app.services.stock_position_service import apply_stock_movement
+    apply_stock_movement(connection, target)
+
 class GLTransaction(Base, TimestampMixin, TenantMixin):
     """General Ledger Transactions"""
     __tablename__ = 'gl_transaction'
     
     transaction_id = Column(UUID(as_uuid=True), primary_key=True, default=generate_uuid)
     hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), nullable=False)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey('branches.branch_id'))  # Branch of the source document
     
     # Transaction Details
     transaction_date = Column(DateTime(timezone=True), nullable=False)  # With timezone
@@ -1731,6 +1811,34 @@ class GSTLedger(Base, TimestampMixin, TenantMixin):
     hospital = relationship("Hospital")
     gl_transaction = relationship("GLTransaction", foreign_keys=[gl_reference], back_populates="gst_ledger_entries")
 
+@event.listens_for(GLEntry, 'after_insert')
+def gl_entry_after_insert(mapper, connection, target):
+    """Add every posted GL line to its daily account balance in the same transaction"""
+    from app.services.gl_balance_service import apply_gl_entry
+    apply_gl_entry(connection, target)
+
+class GLAccountBalance(Base, TimestampMixin, TenantMixin):
+    """
+    Daily debit/credit totals per hospital/branch/account - rollup of gl_entry.
+    Maintained by an after_insert hook on GLEntry (see gl_balance_service);
+    unique key (hospital_id, COALESCE(branch_id, nil uuid), account_id, balance_date)
+    is created in migrations/create_gl_account_balance_table.sql.
+    """
+    __tablename__ = 'gl_account_balance'
+
+    balance_id = Column(UUID(as_uuid=True), primary_key=True, default=generate_uuid)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), nullable=False)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey('branches.branch_id'))
+    account_id = Column(UUID(as_uuid=True), ForeignKey('chart_of_accounts.account_id'), nullable=False)
+    balance_date = Column(Date, nullable=False)
+
+    debit_total = Column(Numeric(14, 2), nullable=False, default=0)
+    credit_total = Column(Numeric(14, 2), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    account = relationship("ChartOfAccounts")
+
 
 class PrescriptionInvoiceMap(Base, TimestampMixin, TenantMixin):
     """Maps prescription items to invoices for internal reference"""
@@ -2265,6 +2373,24 @@ class APSubledger(Base, TimestampMixin, TenantMixin):
     supplier = relationship("Supplier")
     gl_transaction = relationship("GLTransaction")
 
+class ARAgingSnapshot(Base):
+    """
+    Latest AR subledger balance per hospital/branch/patient, refreshed nightly
+    (and incrementally from new subledger entries) by aging_service.
+    Aging buckets are derived at read time from last_transaction_date.
+    """
+    __tablename__ = 'ar_aging_snapshot'
+
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), primary_key=True)
+    branch_id = Column(UUID(as_uuid=True), ForeignKey('branches.branch_id'), primary_key=True)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey('patients.patient_id'), primary_key=True)
+
+    current_balance = Column(Numeric(12, 2), nullable=False, default=0)
+    last_transaction_date = Column(DateTime(timezone=True), nullable=False)
+    last_entry_id = Column(UUID(as_uuid=True))
+    source_created_at = Column(DateTime(timezone=True))  # created_at of last_entry_id (refresh watermark)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+
 class PaymentDocument(Base, TimestampMixin, TenantMixin):
     """
     Document management for supplier payments
@@ -71,7 +71,7 @@ def require_permission(module, action):
             try:
                 # Import the correct models from their actual locations
                 from app.models.transaction import User
-                from app.models.config import RoleMaster, UserRoleMapping
+                from app.services.branch_service import check_superuser_status
                 
                 # Get a fresh user instance
                 user = session.query(User).filter_by(user_id=user_id).first()
@@ -81,11 +81,7 @@ def require_permission(module, action):
                 
                 # Check for superuser roles - both System Administrator and Hospital Administrator
                 try:
-                    is_superuser = session.query(UserRoleMapping)\
-                        .join(RoleMaster, UserRoleMapping.role_id == RoleMaster.role_id)\
-                        .filter(UserRoleMapping.user_id == user_id)\
-                        .filter(RoleMaster.role_name.in_(['System Administrator', 'Hospital Administrator']))\
-                        .first() is not None
+                    is_superuser = check_superuser_status(user_id, session, user.hospital_id)
                     
                     # If user is a superuser, allow access immediately
                     if is_superuser:
@@ -137,7 +133,7 @@ def require_branch_permission(module, action, branch_source='auto'):
                     return jsonify({'error': 'User not found'}), 404
                 
                 # Check for superuser roles
-                if check_superuser_status(user_id, session):
+                if check_superuser_status(user_id, session, user.hospital_id):
                     logger.info(f"Superuser branch access granted: {user_id} for {action} on {module}")
                     return f(user_id, session, *args, **kwargs)
                 
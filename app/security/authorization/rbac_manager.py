@@ -14,11 +14,15 @@ class RBACManager:
         self._permission_cache: Dict[str, Dict] = {}
         
     def _clear_cache(self, user_id: Optional[str] = None):
-        """Clear permission cache"""
+        """Clear permission cache (and the compiled permission matrices)"""
+        from app.services.permission_matrix_service import invalidate_permission_matrix
+
         if user_id:
-            self._permission_cache.pop(user_id, None)
+            for cache_key in [k for k in self._permission_cache if k.startswith(f"{user_id}:")]:
+                self._permission_cache.pop(cache_key, None)
         else:
             self._permission_cache.clear()
+        invalidate_permission_matrix(user_id)
     
     def get_user_permissions(self, user_id: str, hospital_id: str) -> Dict:
         """Get all permissions for a user"""
@@ -0,0 +1,270 @@
+# app/services/aging_service.py
+
+"""
+Aging Service - set-based AR/AP aging
+
+One SQL statement per report: the latest subledger row per (party, branch)
+is picked with ROW_NUMBER() (ties on transaction_date broken by created_at
+and entry_id, so each party appears once), joined to branch and party names,
+and bucketed with CASE against cut-off timestamps. Python only groups the
+rows into the report structure.
+
+AR can also be served from ar_aging_snapshot (latest balance per patient),
+refreshed nightly with refresh_ar_aging_snapshot - incrementally, only for
+patients with subledger entries created since the previous refresh.
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.master import Branch, Patient, Supplier
+from app.models.transaction import APSubledger, ARAgingSnapshot, ARSubledger
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# (label, upper bound in days); the last bucket is open ended
+AGING_BUCKETS = (('0-30', 30), ('31-60', 60), ('61-90', 90), ('90+', None))
+
+# Entries created this long before the last refresh are re-read, so rows
+# committed late (created_at set before commit) are not missed
+SNAPSHOT_REFRESH_OVERLAP = timedelta(minutes=15)
+
+
+@dataclass(frozen=True)
+class AgingSpec:
+    """Describes one subledger for the aging engine"""
+    ledger: Any                 # ARSubledger / APSubledger
+    party_column: str           # 'patient_id' / 'supplier_id'
+    party_model: Any            # Patient / Supplier
+    party_name: Any             # SQL expression for the party name
+    party_label: str            # Fallback label: 'Patient' / 'Supplier'
+    collection_key: str         # 'patients' / 'suppliers'
+    total_key: str              # 'total_ar' / 'total_ap'
+
+
+def ar_spec() -> AgingSpec:
+    return AgingSpec(ARSubledger, 'patient_id', Patient, Patient.full_name, 'Patient', 'patients', 'total_ar')
+
+def ap_spec() -> AgingSpec:
+    return AgingSpec(APSubledger, 'supplier_id', Supplier, Supplier.supplier_name, 'Supplier', 'suppliers', 'total_ap')
+
+
+def _bucket_expression(date_column, as_of_date: datetime):
+    """
+    CASE bucketing that matches (as_of_date - date).days <= upper: the row is in
+    a bucket while it is newer than as_of_date - (upper + 1) days
+    """
+    whens = [(date_column > as_of_date - timedelta(days=upper + 1), label)
+             for label, upper in AGING_BUCKETS if upper is not None]
+    return case(*whens, else_=AGING_BUCKETS[-1][0])
+
+def _latest_entries(spec: AgingSpec, hospital_id, branch_id=None, as_of_date: Optional[datetime] = None,
+                    party_keys: Optional[List[Tuple]] = None):
+    """Subquery: latest ledger row per (party, branch) as of as_of_date"""
+    ledger = spec.ledger
+    party = getattr(ledger, spec.party_column)
+
+    filters = [ledger.hospital_id == hospital_id]
+    if as_of_date is not None:
+        filters.append(ledger.transaction_date <= as_of_date)
+    if branch_id:
+        filters.append(ledger.branch_id == branch_id)
+    if party_keys:
+        filters.append(tuple_(party, ledger.branch_id).in_(party_keys))
+
+    return select(
+        ledger.entry_id,
+        ledger.branch_id,
+        party.label('party_id'),
+        ledger.current_balance,
+        ledger.transaction_date,
+        ledger.created_at,
+        func.row_number().over(
+            partition_by=(party, ledger.branch_id),
+            order_by=(ledger.transaction_date.desc(), ledger.created_at.desc(), ledger.entry_id.desc())
+        ).label('rn')
+    ).where(*filters).subquery('latest_entries')
+
+def _report_rows(spec: AgingSpec, source, as_of_date: datetime, balance_column, date_column):
+    """Join a (party_id, branch_id, balance, date) source to names and buckets in one statement"""
+    party_pk = getattr(spec.party_model, spec.party_column)
+    return select(
+        source.c.branch_id,
+        source.c.party_id,
+        balance_column.label('balance'),
+        date_column.label('last_transaction_date'),
+        Branch.name.label('branch_name'),
+        spec.party_name.label('party_name'),
+        _bucket_expression(date_column, as_of_date).label('aging_bucket')
+    ).select_from(source).outerjoin(
+        Branch, Branch.branch_id == source.c.branch_id
+    ).outerjoin(
+        spec.party_model, party_pk == source.c.party_id
+    )
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _build_report(spec: AgingSpec, rows, as_of_date: datetime) -> Dict:
+    """Group bucketed rows by branch in the shape the aging reports return"""
+    result = {}
+    for row in rows:
+        branch_name = row.branch_name or f"Branch {row.branch_id}"
+        party_name = row.party_name or f"{spec.party_label} {row.party_id}"
+        balance = Decimal(str(row.balance))
+        last_date = row.last_transaction_date
+
+        if branch_name not in result:
+            result[branch_name] = {
+                'branch_id': str(row.branch_id),
+                'branch_name': branch_name,
+                spec.total_key: Decimal('0'),
+                'aging_buckets': {label: Decimal('0') for label, _ in AGING_BUCKETS},
+                spec.collection_key: []
+            }
+        branch_data = result[branch_name]
+        branch_data[spec.total_key] += balance
+        branch_data['aging_buckets'][row.aging_bucket] += balance
+
+        branch_data[spec.collection_key].append({
+            spec.party_column: str(row.party_id),
+            f"{spec.party_label.lower()}_name": party_name,
+            'current_balance': float(balance),
+            'days_outstanding': (_as_utc(as_of_date) - _as_utc(last_date)).days if last_date else None,
+            'aging_bucket': row.aging_bucket,
+            'last_transaction_date': last_date.isoformat() if last_date else None
+        })
+
+    summary = {
+        spec.total_key: float(sum(b[spec.total_key] for b in result.values())),
+        'aging_buckets': {
+            label: float(sum(b['aging_buckets'][label] for b in result.values()))
+            for label, _ in AGING_BUCKETS
+        }
+    }
+    for branch_data in result.values():
+        branch_data[spec.total_key] = float(branch_data[spec.total_key])
+        for label, amount in branch_data['aging_buckets'].items():
+            branch_data['aging_buckets'][label] = float(amount)
+
+    return {'branches': result, 'summary': summary}
+
+# =============================================================================
+# REPORTS
+# =============================================================================
+
+def compute_aging(
+    session: Session,
+    spec: AgingSpec,
+    hospital_id: uuid.UUID,
+    branch_id: Optional[uuid.UUID] = None,
+    as_of_date: Optional[datetime] = None
+) -> Dict:
+    """Aging report from the subledger in a single query"""
+    as_of_date = as_of_date or datetime.now(timezone.utc)
+    latest = _latest_entries(spec, hospital_id, branch_id, as_of_date)
+
+    statement = _report_rows(
+        spec, latest, as_of_date, latest.c.current_balance, latest.c.transaction_date
+    ).where(latest.c.rn == 1, latest.c.current_balance > 0)
+
+    return _build_report(spec, session.execute(statement), as_of_date)
+
+def compute_ar_aging_from_snapshot(
+    session: Session,
+    hospital_id: uuid.UUID,
+    branch_id: Optional[uuid.UUID] = None,
+    as_of_date: Optional[datetime] = None
+) -> Dict:
+    """AR aging from ar_aging_snapshot (balances as of the last refresh)"""
+    as_of_date = as_of_date or datetime.now(timezone.utc)
+    snapshot = ARAgingSnapshot.__table__
+    source = select(
+        snapshot.c.branch_id,
+        snapshot.c.patient_id.label('party_id'),
+        snapshot.c.current_balance,
+        snapshot.c.last_transaction_date
+    ).where(snapshot.c.hospital_id == hospital_id)
+    if branch_id:
+        source = source.where(snapshot.c.branch_id == branch_id)
+    source = source.subquery('snapshot')
+
+    statement = _report_rows(
+        ar_spec(), source, as_of_date, source.c.current_balance, source.c.last_transaction_date
+    ).where(source.c.current_balance > 0)
+
+    return _build_report(ar_spec(), session.execute(statement), as_of_date)
+
+# =============================================================================
+# AR SNAPSHOT
+# =============================================================================
+
+def refresh_ar_aging_snapshot(
+    session: Session,
+    hospital_id: uuid.UUID,
+    full: bool = False,
+    chunk_size: int = 1000
+) -> int:
+    """
+    Bring ar_aging_snapshot up to date for a hospital.
+    Incremental by default: only patients with subledger entries created since
+    the previous refresh (minus SNAPSHOT_REFRESH_OVERLAP) are recomputed.
+    Returns the number of snapshot rows written.
+    """
+    snapshot = ARAgingSnapshot.__table__
+    spec = ar_spec()
+
+    watermark = None
+    if not full:
+        watermark = session.execute(
+            select(func.max(snapshot.c.source_created_at)).where(snapshot.c.hospital_id == hospital_id)
+        ).scalar()
+
+    party_keys = None
+    if watermark is not None:
+        party_keys = [tuple(row) for row in session.execute(
+            select(ARSubledger.patient_id, ARSubledger.branch_id).distinct().where(
+                ARSubledger.hospital_id == hospital_id,
+                ARSubledger.created_at > watermark - SNAPSHOT_REFRESH_OVERLAP
+            )
+        )]
+        if not party_keys:
+            logger.info(f"AR aging snapshot for hospital {hospital_id} is up to date")
+            return 0
+
+    now = datetime.now(timezone.utc)
+    written = 0
+    key_chunks = ([party_keys[i:i + chunk_size] for i in range(0, len(party_keys), chunk_size)]
+                  if party_keys is not None else [None])
+
+    for keys in key_chunks:
+        latest = _latest_entries(spec, hospital_id, party_keys=keys)
+        rows = [{
+            'hospital_id': hospital_id,
+            'branch_id': row.branch_id,
+            'patient_id': row.party_id,
+            'current_balance': row.current_balance or 0,
+            'last_transaction_date': row.transaction_date,
+            'last_entry_id': row.entry_id,
+            'source_created_at': row.created_at,
+            'refreshed_at': now
+        } for row in session.execute(select(latest).where(latest.c.rn == 1))]
+
+        clear = delete(snapshot).where(snapshot.c.hospital_id == hospital_id)
+        if keys is not None:
+            clear = clear.where(tuple_(snapshot.c.patient_id, snapshot.c.branch_id).in_(keys))
+        session.execute(clear)
+        if rows:
+            session.execute(insert(snapshot), rows)
+        written += len(rows)
+
+    logger.info(f"✅ Refreshed {written} AR aging snapshot rows for hospital {hospital_id}"
+                f" ({'full' if party_keys is None else 'incremental'})")
+    return written
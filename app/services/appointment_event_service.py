@@ -0,0 +1,307 @@
+# app/services/appointment_event_service.py
+
+"""
+Appointment Event Service - live queue and calendar deltas
+
+Reception and doctor screens subscribe to a server-sent event stream
+(/api/appointment/web/queue/stream) instead of polling the queue and
+calendar feeds. Every committed appointment change is pushed to them once as
+a delta: the queue item and calendar event of the appointment plus what it
+changed from (status, doctor, date).
+
+Flow:
+- Mapper hooks in app/models/appointment.py snapshot an appointment when it
+  is booked or its status, doctor, date, time, token or priority changes
+  (AppointmentService.book_appointment, check_in, start_consultation,
+  complete, cancel, mark_no_show, reschedule and the web action handlers).
+- After each flush the snapshots are formatted with the feed formatters of
+  appointment_feed_service, resolving patient and doctor names in one query
+  each.
+- When the transaction commits the deltas are published to the
+  AppointmentEventBroker; a rollback discards them.
+
+The broker fans events out in-process to subscriber queues filtered by
+hospital and, optionally, branch and doctor. When the service cache has a
+shared backend (SERVICE_CACHE_BACKEND = 'redis') events are also published
+on its pub/sub channel so screens connected to other workers receive them.
+
+Each worker keeps the last APPOINTMENT_EVENT_BUFFER events (default 500).
+A client reconnecting with Last-Event-ID gets the events it missed; when the
+id has already left the buffer it gets a 'reset' event and refetches the
+full feed.
+"""
+
+import json
+import queue
+import threading
+import time as _time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.engine.versioned_cache import BroadcastChannel, PendingCommitWork
+from app.services.appointment_feed_service import FEED_COLUMNS, calendar_event, queue_item, resolve_names
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+DEFAULT_BUFFER_SIZE = 500
+DEFAULT_KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 200
+RECONNECT_DELAY_MS = 3000
+
+# session.info keys: snapshots of the current flush, deltas waiting for commit
+SNAPSHOT_KEY = 'appointment_event_snapshots'
+PENDING_KEY = 'appointment_events'
+
+# Event type of an appointment that moved into a status
+STATUS_EVENTS = {
+    'requested': 'booked',
+    'confirmed': 'confirmed',
+    'checked_in': 'checked_in',
+    'in_progress': 'started',
+    'completed': 'completed',
+    'cancelled': 'cancelled',
+    'no_show': 'no_show',
+    'rescheduled': 'rescheduled'
+}
+
+# Appointment attributes whose change is pushed to the screens
+TRACKED_ATTRIBUTES = ('status', 'staff_id', 'appointment_date', 'start_time', 'end_time', 'token_number',
+                      'priority')
+
+RESET_EVENT = 'reset'
+
+
+@dataclass(eq=False)
+class Subscription:
+    """One connected screen: a hospital, optionally a branch and doctor, and its event queue"""
+    hospital_id: str
+    branch_id: Optional[str] = None
+    staff_id: Optional[str] = None
+    replay: Optional[List[Dict[str, Any]]] = None
+    reset: bool = False
+    events: queue.Queue = field(default_factory=lambda: queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+
+    def matches(self, appointment_event: Dict[str, Any]) -> bool:
+        if appointment_event.get('hospital_id') != self.hospital_id:
+            return False
+        if self.branch_id is not None and appointment_event.get('branch_id') != self.branch_id:
+            return False
+        return self.staff_id is None or self.staff_id in appointment_event.get('staff_ids', ())
+
+    def offer(self, appointment_event: Dict[str, Any]):
+        try:
+            self.events.put_nowait(appointment_event)
+        except queue.Full:
+            # A screen this far behind refetches instead of catching up
+            self.reset = True
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, a reset event when the queue overflowed, or None on timeout"""
+        if self.reset:
+            self.reset = False
+            while not self.events.empty():
+                self.events.get_nowait()
+            return {'id': None, 'type': RESET_EVENT}
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AppointmentEventBroker:
+    """
+    In-process fan-out of appointment events with a replay buffer, bridged
+    across workers through the service cache backend's pub/sub.
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None, backend=None):
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._buffer = deque(maxlen=buffer_size or self._configured('APPOINTMENT_EVENT_BUFFER',
+                                                                   DEFAULT_BUFFER_SIZE))
+        self._sequence = 0
+        # Cross-worker delivery through the service cache backend
+        self._channel = BroadcastChannel('appointment_event', self._handle_broadcast, backend)
+
+    @staticmethod
+    def _configured(key: str, default: int) -> int:
+        try:
+            from flask import current_app
+            return int(current_app.config.get(key, default))
+        except RuntimeError:
+            return default
+
+    @property
+    def keepalive_seconds(self) -> int:
+        return self._configured('APPOINTMENT_EVENT_KEEPALIVE', DEFAULT_KEEPALIVE_SECONDS)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def subscribe(self, hospital_id, branch_id=None, staff_id=None,
+                  last_event_id: Optional[str] = None) -> Subscription:
+        """
+        Register a screen. With last_event_id the subscription's replay holds
+        the buffered events after it, or reset is set when it is unknown.
+        """
+        self._channel.ensure_subscribed()
+        subscription = Subscription(hospital_id=str(hospital_id), branch_id=str(branch_id) if branch_id else None,
+                                    staff_id=str(staff_id) if staff_id else None)
+        with self._lock:
+            if last_event_id:
+                ids = [buffered['id'] for buffered in self._buffer]
+                if last_event_id in ids:
+                    missed = list(self._buffer)[ids.index(last_event_id) + 1:]
+                    subscription.replay = [buffered for buffered in missed if subscription.matches(buffered)]
+                else:
+                    subscription.reset = True
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, appointment_event: Dict[str, Any]) -> Dict[str, Any]:
+        """Stamp an event with an id, deliver it here and broadcast it to the other workers"""
+        with self._lock:
+            self._sequence += 1
+            appointment_event = dict(appointment_event,
+                                     id=f"{_time.time_ns():x}-{self._channel.instance_id[:8]}-{self._sequence}")
+        self._deliver(appointment_event)
+        self._channel.publish(event=appointment_event)
+        return appointment_event
+
+    def _deliver(self, appointment_event: Dict[str, Any]):
+        with self._lock:
+            self._buffer.append(appointment_event)
+            subscriptions = [s for s in self._subscriptions if s.matches(appointment_event)]
+        for subscription in subscriptions:
+            subscription.offer(appointment_event)
+
+    def _handle_broadcast(self, message: Dict[str, Any]):
+        if isinstance(message.get('event'), dict):
+            self._deliver(message['event'])
+
+
+def format_sse(appointment_event: Dict[str, Any]) -> str:
+    """Server-sent event frame of an appointment event"""
+    lines = []
+    if appointment_event.get('id'):
+        lines.append(f"id: {appointment_event['id']}")
+    lines.append(f"event: {appointment_event['type']}")
+    lines.append(f"data: {json.dumps(appointment_event, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def event_stream(broker: 'AppointmentEventBroker', subscription: Subscription, keepalive_seconds: float):
+    """SSE body of a subscription: missed events, then live ones with keep-alive comments"""
+    try:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        for appointment_event in subscription.replay or ():
+            yield format_sse(appointment_event)
+        while True:
+            appointment_event = subscription.get(timeout=keepalive_seconds)
+            yield ': keep-alive\n\n' if appointment_event is None else format_sse(appointment_event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+_event_broker = None
+_event_broker_lock = threading.Lock()
+
+def get_event_broker() -> AppointmentEventBroker:
+    """Process-wide broker"""
+    global _event_broker
+    if _event_broker is None:
+        with _event_broker_lock:
+            if _event_broker is None:
+                _event_broker = AppointmentEventBroker()
+    return _event_broker
+
+# =============================================================================
+# COMMIT-TIME PUBLISHING
+# =============================================================================
+
+def record_appointment_change(session: Optional[Session], appointment, state, is_new: bool = False):
+    """
+    Snapshot a booked or changed appointment (called from the mapper hooks).
+    Returns without recording when no tracked attribute changed.
+    """
+    if session is None:
+        return
+    previous = {}
+    if not is_new:
+        for name in TRACKED_ATTRIBUTES:
+            history = getattr(state.attrs, name).history
+            if history.has_changes():
+                previous[name] = history.deleted[0] if history.deleted else None
+        if not previous:
+            return
+
+    row = SimpleNamespace(**{column.key: getattr(appointment, column.key) for column in FEED_COLUMNS})
+    if is_new:
+        event_type = 'booked'
+    elif 'status' in previous:
+        event_type = STATUS_EVENTS.get(appointment.status, 'updated')
+    else:
+        event_type = 'rescheduled' if 'appointment_date' in previous or 'start_time' in previous else 'updated'
+
+    session.info.setdefault(SNAPSHOT_KEY, []).append({
+        'type': event_type,
+        'hospital_id': str(appointment.hospital_id),
+        'branch_id': str(appointment.branch_id) if appointment.branch_id else None,
+        'row': row,
+        'previous': previous
+    })
+
+
+def _as_event(snapshot: Dict[str, Any], names) -> Dict[str, Any]:
+    row = snapshot['row']
+    previous = snapshot['previous']
+    staff_ids = {str(staff_id) for staff_id in (row.staff_id, previous.get('staff_id')) if staff_id}
+    previous_date = previous.get('appointment_date')
+
+    return {
+        'type': snapshot['type'],
+        'hospital_id': snapshot['hospital_id'],
+        'branch_id': snapshot['branch_id'],
+        'staff_ids': sorted(staff_ids),
+        'appointment_id': str(row.appointment_id),
+        'appointment_date': row.appointment_date.isoformat(),
+        'previous_status': previous.get('status'),
+        'previous_date': previous_date.isoformat() if isinstance(previous_date, date) else None,
+        'appointment': queue_item(row, names),
+        'calendar_event': calendar_event(row, names)
+    }
+
+def _publish_pending_events(session: Session, pending):
+    broker = get_event_broker()
+    for appointment_event in pending:
+        broker.publish(appointment_event)
+
+# Snapshots of a flush that is rolled back with the transaction go too
+_pending_events = PendingCommitWork(PENDING_KEY, _publish_pending_events, discard_keys=(SNAPSHOT_KEY,))
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _format_snapshots(session, flush_context):
+    snapshots = session.info.pop(SNAPSHOT_KEY, None)
+    if not snapshots:
+        return
+    try:
+        names = resolve_names(session, [s['row'].patient_id for s in snapshots],
+                              [s['row'].staff_id for s in snapshots])
+        _pending_events.collect(session, list).extend(_as_event(s, names) for s in snapshots)
+    except Exception as e:
+        # Screens fall back to their periodic refresh; never fail the flush
+        logger.warning(f"⚠️ Could not format appointment events: {str(e)}")
@@ -0,0 +1,286 @@
+# app/services/appointment_feed_service.py
+"""
+Appointment Feed Service
+Shared builder for the calendar, resource calendar and queue feeds.
+
+Each feed runs a fixed number of queries regardless of its size:
+- one column projection of the appointments (or allocations) in range
+- one query each for the patient and staff names they reference
+
+feed_etag() fingerprints a range from the count and latest updated_at of its
+appointments (plus any caller supplied parts), so the endpoints can answer
+unchanged refreshes with 304 Not Modified before loading anything else.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, load_only
+
+from app.models.appointment import Appointment
+from app.models.master import AppointmentResource, Patient, Staff
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# Bump when the shape of a feed changes so cached responses are not reused
+FEED_VERSION = 1
+
+# FullCalendar colours by appointment status
+STATUS_COLORS = {
+    'requested': '#fbbf24',
+    'confirmed': '#3b82f6',
+    'checked_in': '#a855f7',
+    'in_progress': '#f97316',
+    'completed': '#22c55e',
+    'cancelled': '#ef4444',
+    'no_show': '#6b7280',
+    'rescheduled': '#64748b'
+}
+DEFAULT_COLOR = '#3b82f6'
+
+# Appointment columns the feeds render
+FEED_COLUMNS = (
+    Appointment.appointment_id,
+    Appointment.appointment_number,
+    Appointment.patient_id,
+    Appointment.staff_id,
+    Appointment.appointment_date,
+    Appointment.start_time,
+    Appointment.end_time,
+    Appointment.estimated_duration_minutes,
+    Appointment.status,
+    Appointment.priority,
+    Appointment.token_number,
+    Appointment.chief_complaint,
+    Appointment.booking_source,
+    Appointment.is_follow_up,
+    Appointment.checked_in_at
+)
+
+
+@dataclass
+class FeedNames:
+    """Patients and staff referenced by a feed, resolved in one query each"""
+    patients: Dict[UUID, Patient] = field(default_factory=dict)
+    staff: Dict[UUID, Staff] = field(default_factory=dict)
+
+    def patient_name(self, patient_id) -> str:
+        patient = self.patients.get(patient_id)
+        return patient.full_name if patient else 'Unknown'
+
+    def patient_phone(self, patient_id) -> str:
+        patient = self.patients.get(patient_id)
+        if patient and isinstance(patient.contact_info, dict):
+            return patient.contact_info.get('phone', '')
+        return ''
+
+    def patient_mrn(self, patient_id) -> Optional[str]:
+        patient = self.patients.get(patient_id)
+        return patient.mrn if patient else None
+
+    def staff_first_name(self, staff_id) -> Optional[str]:
+        staff = self.staff.get(staff_id)
+        return staff.first_name if staff else None
+
+    def staff_name(self, staff_id) -> Optional[str]:
+        staff = self.staff.get(staff_id)
+        return f"{staff.first_name} {staff.last_name or ''}".strip() if staff else None
+
+
+def resolve_names(session: Session, patient_ids: Iterable = (), staff_ids: Iterable = ()) -> FeedNames:
+    """Load the given patients and staff (name columns only)"""
+    names = FeedNames()
+    patient_ids = {pid for pid in patient_ids if pid}
+    staff_ids = {sid for sid in staff_ids if sid}
+
+    if patient_ids:
+        patients = session.query(Patient).options(
+            load_only(Patient.patient_id, Patient.mrn, Patient.personal_info, Patient.contact_info)
+        ).filter(Patient.patient_id.in_(patient_ids)).all()
+        names.patients = {patient.patient_id: patient for patient in patients}
+
+    if staff_ids:
+        staff = session.query(Staff).options(
+            load_only(Staff.staff_id, Staff.first_name, Staff.last_name)
+        ).filter(Staff.staff_id.in_(staff_ids)).all()
+        names.staff = {member.staff_id: member for member in staff}
+
+    return names
+
+
+def appointment_conditions(
+    hospital_id: UUID,
+    start_date: date,
+    end_date: date,
+    branch_id: Optional[UUID] = None,
+    staff_id: Optional[UUID] = None,
+    staff_ids: Optional[List[UUID]] = None,
+    status: Optional[str] = None,
+    exclude_statuses: Iterable[str] = ()
+) -> list:
+    """WHERE clause of an appointment feed"""
+    conditions = [
+        Appointment.hospital_id == hospital_id,
+        Appointment.appointment_date >= start_date,
+        Appointment.appointment_date <= end_date,
+        Appointment.is_deleted == False
+    ]
+    if branch_id:
+        conditions.append(Appointment.branch_id == branch_id)
+    if staff_id:
+        conditions.append(Appointment.staff_id == staff_id)
+    if staff_ids is not None:
+        conditions.append(Appointment.staff_id.in_(staff_ids))
+    if status:
+        conditions.append(Appointment.status == status)
+    if exclude_statuses:
+        conditions.append(Appointment.status.notin_(list(exclude_statuses)))
+    return conditions
+
+
+def feed_etag(session: Session, conditions: list, *parts: Any, join_allocations: bool = False) -> str:
+    """
+    Fingerprint of a feed: count and latest updated_at of its appointments
+    (and allocations when join_allocations), plus the caller's parts - the
+    feed name and its parameters.
+    """
+    columns = [func.count(), func.max(Appointment.updated_at)]
+    query = select(*columns).select_from(Appointment)
+    if join_allocations:
+        query = select(*columns, func.max(AppointmentResource.updated_at)).select_from(AppointmentResource).join(
+            Appointment, AppointmentResource.appointment_id == Appointment.appointment_id
+        )
+    fingerprint = session.execute(query.where(*conditions)).one()
+    digest = hashlib.sha1(repr((FEED_VERSION, tuple(fingerprint), parts)).encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def load_appointments(session: Session, conditions: list, order_by: Iterable = ()) -> list:
+    """Project the feed columns of the appointments matching conditions"""
+    return session.execute(select(*FEED_COLUMNS).where(*conditions).order_by(*order_by)).all()
+
+
+def load_allocations(session: Session, hospital_id: UUID, resource_type: str, target_date: date) -> list:
+    """Active allocations of one resource type on a date with their appointment columns"""
+    return session.execute(
+        select(
+            AppointmentResource.resource_id,
+            AppointmentResource.start_time.label('allocation_start'),
+            AppointmentResource.end_time.label('allocation_end'),
+            *FEED_COLUMNS
+        ).join(
+            Appointment, AppointmentResource.appointment_id == Appointment.appointment_id
+        ).where(*allocation_conditions(hospital_id, resource_type, target_date))
+    ).all()
+
+
+def allocation_conditions(hospital_id: UUID, resource_type: str, target_date: date) -> list:
+    return [
+        Appointment.hospital_id == hospital_id,
+        AppointmentResource.resource_type == resource_type,
+        AppointmentResource.allocation_date == target_date,
+        AppointmentResource.status.in_(['allocated', 'in_use'])
+    ]
+
+# =============================================================================
+# ROW FORMATTERS
+# =============================================================================
+
+def _clock(value, default: str) -> str:
+    """HH:MM of a time or 'HH:MM:SS' string"""
+    if value is None:
+        return default
+    if hasattr(value, 'strftime'):
+        return value.strftime('%H:%M')
+    if isinstance(value, str):
+        return value[:5]
+    return default
+
+
+def calendar_event(row, names: FeedNames) -> Dict[str, Any]:
+    """FullCalendar event of an appointment row"""
+    patient_name = names.patient_name(row.patient_id)
+    doctor_name = names.staff_name(row.staff_id) or 'Unassigned'
+
+    start_datetime = datetime.combine(row.appointment_date, row.start_time or time(9, 0))
+    if row.end_time:
+        end_datetime = datetime.combine(row.appointment_date, row.end_time)
+    else:
+        # Default 30 min duration
+        end_datetime = start_datetime + timedelta(minutes=row.estimated_duration_minutes or 30)
+
+    color = STATUS_COLORS.get(row.status, DEFAULT_COLOR)
+    return {
+        'id': str(row.appointment_id),
+        'title': f"{patient_name} - {doctor_name}",
+        'start': start_datetime.isoformat(),
+        'end': end_datetime.isoformat(),
+        'backgroundColor': color,
+        'borderColor': color,
+        'extendedProps': {
+            'patient_id': str(row.patient_id),
+            'patient_name': patient_name,
+            'doctor_id': str(row.staff_id) if row.staff_id else None,
+            'doctor_name': doctor_name,
+            'status': row.status,
+            'priority': row.priority,
+            'appointment_number': row.appointment_number,
+            'token_number': row.token_number,
+            'chief_complaint': row.chief_complaint,
+            'is_walk_in': row.booking_source == 'walk_in',
+            'is_follow_up': row.is_follow_up
+        }
+    }
+
+
+def queue_item(row, names: FeedNames, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Queue entry of an appointment row"""
+    waiting_minutes = None
+    if row.status == 'checked_in' and row.checked_in_at:
+        checked_in_at = row.checked_in_at
+        if checked_in_at.tzinfo is None:
+            checked_in_at = checked_in_at.replace(tzinfo=timezone.utc)
+        waiting_minutes = int(((now or datetime.now(timezone.utc)) - checked_in_at).total_seconds() / 60)
+
+    doctor_name = names.staff_name(row.staff_id)
+    return {
+        'appointment_id': str(row.appointment_id),
+        'appointment_number': row.appointment_number,
+        'patient_name': names.patient_name(row.patient_id),
+        'patient_phone': names.patient_phone(row.patient_id),
+        'patient_mrn': names.patient_mrn(row.patient_id),
+        'doctor_name': f"Dr. {doctor_name}" if doctor_name else '',
+        'appointment_date': row.appointment_date.strftime('%Y-%m-%d'),
+        'appointment_time': row.start_time.strftime('%H:%M') if row.start_time else None,
+        'status': row.status,
+        'priority': row.priority or 'normal',
+        'token_number': row.token_number,
+        'chief_complaint': row.chief_complaint,
+        'is_walk_in': row.booking_source == 'walk_in',
+        'is_follow_up': row.is_follow_up,
+        'waiting_minutes': waiting_minutes
+    }
+
+
+def resource_booking(row, names: FeedNames) -> Dict[str, Any]:
+    """Resource calendar booking of an allocation row (or, for doctors, an appointment row)"""
+    allocation_start = getattr(row, 'allocation_start', None)
+    allocation_end = getattr(row, 'allocation_end', None)
+    is_allocation = allocation_start is not None
+    doctor = names.staff_first_name(row.staff_id) if is_allocation else None
+
+    return {
+        'resource_id': str(row.resource_id if is_allocation else row.staff_id),
+        'appointment_id': str(row.appointment_id),
+        'patient_name': names.patient_name(row.patient_id),
+        'doctor_name': f"Dr. {doctor}" if doctor else None,
+        'service_name': None,
+        'start_time': _clock(allocation_start if is_allocation else row.start_time, '09:00'),
+        'end_time': _clock(allocation_end if is_allocation else row.end_time, '09:30'),
+        'status': row.status
+    }
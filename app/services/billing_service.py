@@ -37,7 +37,9 @@ from app.models.transaction import (
     InvoiceHeader, InvoiceLineItem, PaymentDetail, GLTransaction, GLEntry, GSTLedger,
     Inventory, PatientAdvancePayment, AdvanceAdjustment
 )
-from app.models.config import InvoiceSequence
+from app.services.sequence_allocator_service import (
+    get_sequence_allocator, get_financial_year, format_document_number, last_number_from_documents
+)
 from app.services.gl_service import (
     create_invoice_gl_entries,
     create_payment_gl_entries,
@@ -1138,23 +1140,16 @@ def _create_single_invoice_with_category(
 
     logger.info(f"Created {config.name} invoice: {invoice_number} with {len(processed_line_items)} items")
 
-    # Save invoice PDF to EMR-compliant document folder
+    # Queue the invoice PDF - rendered by the document render queue after commit,
+    # so WeasyPrint does not run inside the billing transaction
     try:
-        pdf_path = save_invoice_pdf_to_file(
-            invoice_id=invoice.invoice_id,
-            hospital_id=hospital_id,
-            patient_id=patient_id,
-            invoice_number=invoice_number,
-            session=session,
-            current_user_id=current_user_id
+        from app.services.invoice_document_service import get_invoice_document_service
+        get_invoice_document_service().enqueue_invoice_pdf(
+            session, invoice, trigger='on_creation', user_id=current_user_id
         )
-        if pdf_path:
-            logger.info(f"✅ Saved invoice document to {pdf_path}")
-        else:
-            logger.warning(f"⚠️ Failed to save invoice document for {invoice_number}")
     except Exception as e:
-        logger.error(f"❌ Error saving invoice document for {invoice_number}: {str(e)}")
-        # Don't fail the entire invoice creation if PDF saving fails
+        logger.error(f"❌ Error queueing invoice document for {invoice_number}: {str(e)}")
+        # Don't fail the entire invoice creation if PDF queueing fails
 
     return invoice
 
@@ -1750,14 +1745,7 @@ def generate_invoice_number(
     Returns:
         Formatted invoice number
     """
-    # Get current financial year (April-March in India)
-    now = datetime.now(timezone.utc)
-    current_month = now.month
-    
-    if current_month >= 4:  # April onwards is new financial year
-        fin_year = f"{now.year}-{now.year + 1}"
-    else:
-        fin_year = f"{now.year - 1}-{now.year}"
+    fin_year = get_financial_year()
         
     # Get hospital information
     hospital = session.query(Hospital).filter_by(hospital_id=hospital_id).first()
@@ -1773,24 +1761,16 @@ def generate_invoice_number(
     else:
         prefix = "NGS"  # Non-GST invoice
     
-    # Get the latest invoice number for this type and financial year
-    # Include both active and cancelled/voided invoices
-    latest_invoice = session.query(InvoiceHeader).filter(
-        InvoiceHeader.hospital_id == hospital_id,
-        InvoiceHeader.is_gst_invoice == is_gst_invoice,
-        InvoiceHeader.invoice_type == invoice_type,
-        InvoiceHeader.invoice_number.like(f"{prefix}/{fin_year}/%")
-    ).order_by(InvoiceHeader.created_at.desc()).first()
-    
-    if latest_invoice:
-        # Extract the sequence number and increment
-        seq_num = int(latest_invoice.invoice_number.split('/')[-1]) + 1
-    else:
-        # Start with 1 if no invoices exist for this type and year
-        seq_num = 1
+    # Next number from the sequence allocator; the first allocation of a series
+    # continues from existing invoices (active and cancelled/voided)
+    seq_num = get_sequence_allocator().allocate(
+        hospital_id, prefix, fin_year,
+        session=session,
+        seed=last_number_from_documents(InvoiceHeader.invoice_number, prefix, fin_year)
+    )
         
     # Format: GST/2024-2025/00001 or NGS/2024-2025/00001 or DRG/2024-2025/00001
-    invoice_number = f"{prefix}/{fin_year}/{seq_num:05d}"
+    invoice_number = format_document_number(prefix, fin_year, seq_num)
 
     return invoice_number
 
@@ -1803,7 +1783,10 @@ def get_next_invoice_sequence(
     user_id: Optional[str] = None
 ) -> int:
     """
-    Thread-safe sequence generation using row-level locking
+    Thread-safe sequence generation via the sequence allocator.
+    The number is reserved with a single UPDATE ... RETURNING in the caller's
+    transaction, so a rolled back invoice returns it (series configured in
+    DOCUMENT_SEQUENCE_MODES as 'separate'/'block' reserve outside it).
 
     Args:
         hospital_id: Hospital UUID
@@ -1816,34 +1799,13 @@ def get_next_invoice_sequence(
     Returns:
         Next sequence number
     """
-    # Lock the row for this hospital/prefix/year combination
-    sequence_record = session.query(InvoiceSequence).filter(
-        InvoiceSequence.hospital_id == hospital_id,
-        InvoiceSequence.prefix == prefix,
-        InvoiceSequence.financial_year == financial_year
-    ).with_for_update().first()
-
-    if sequence_record:
-        # Increment existing sequence
-        sequence_record.current_sequence += 1
-        sequence_record.updated_by = user_id
-        next_seq = sequence_record.current_sequence
-        logger.info(f"Incremented sequence {prefix}/{financial_year} to {next_seq}")
-    else:
-        # Create new sequence record
-        sequence_record = InvoiceSequence(
-            hospital_id=hospital_id,
-            prefix=prefix,
-            financial_year=financial_year,
-            current_sequence=starting_number,
-            created_by=user_id,
-            updated_by=user_id
-        )
-        session.add(sequence_record)
-        next_seq = starting_number
-        logger.info(f"Created new sequence {prefix}/{financial_year} starting at {next_seq}")
-
-    session.flush()  # Ensure sequence is written before returning
+    next_seq = get_sequence_allocator().allocate(
+        hospital_id, prefix, financial_year,
+        session=session,
+        starting_number=starting_number,
+        user_id=user_id
+    )
+    logger.info(f"Allocated sequence {prefix}/{financial_year}: {next_seq}")
     return next_seq
 
 
@@ -1868,18 +1830,10 @@ def generate_invoice_number_with_category(
     Returns:
         Formatted invoice number (e.g., SVC/2024-2025/00001)
     """
-    # Get financial year
-    now = datetime.now(timezone.utc)
-    current_month = now.month
-
-    if current_month >= 4:
-        fin_year = f"{now.year}-{now.year + 1}"
-    else:
-        fin_year = f"{now.year - 1}-{now.year}"
-
+    fin_year = get_financial_year()
     prefix = config.prefix
 
-    # Get next sequence number using thread-safe locking
+    # Get next sequence number from the sequence allocator
     seq_num = get_next_invoice_sequence(
         hospital_id=hospital_id,
         prefix=prefix,
@@ -1890,7 +1844,7 @@ def generate_invoice_number_with_category(
     )
 
     # Format: PREFIX/FIN_YEAR/SEQ (e.g., SVC/2024-2025/00001)
-    invoice_number = f"{prefix}/{fin_year}/{seq_num:05d}"
+    invoice_number = format_document_number(prefix, fin_year, seq_num)
 
     logger.info(f"Generated thread-safe invoice number for {category.value}: {invoice_number}")
 
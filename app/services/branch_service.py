@@ -937,15 +937,20 @@ def get_entity_branch_id(entity_type: str, entity_id: str, session_or_hospital_i
         logger.error(f"Error getting {entity_type} branch_id: {str(e)}")
         return None
 
-def check_superuser_status(user_id: str, session) -> bool:
+def check_superuser_status(user_id: str, session, hospital_id=None) -> bool:
     """
     Check if user has superuser roles
     Centralized superuser checking for decorators
+    With hospital_id the answer comes from the cached permission matrix
     """
     try:
         # Testing bypass
         if user_id == '7777777777':
             return True
+        
+        if hospital_id:
+            from app.services.permission_matrix_service import get_permission_matrix
+            return get_permission_matrix(user_id, hospital_id, session).is_superuser
             
         from app.models.config import RoleMaster, UserRoleMapping
         
@@ -523,6 +523,7 @@ def _create_credit_note_gl_entries(
         
         gl_transaction = GLTransaction(
             hospital_id=credit_note.hospital_id,
+            branch_id=credit_note.branch_id,
             transaction_date=credit_note.invoice_date,
             transaction_type='CREDIT_NOTE_PAYMENT_ADJ',  # New transaction type
             reference_id=str(credit_note.invoice_id),
@@ -793,6 +794,7 @@ def _create_credit_payment_gl_entries(
         # Create GL Transaction for payment
         gl_transaction = GLTransaction(
             hospital_id=credit_payment.hospital_id,
+            branch_id=credit_payment.branch_id,
             transaction_date=credit_payment.payment_date,
             transaction_type='CREDIT_NOTE_PAYMENT',
             reference_id=str(credit_payment.payment_id),
@@ -7,17 +7,17 @@ from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
 from datetime import date, datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, func
 import logging
 
 logger = logging.getLogger(__name__)
 
 from app.models.master import (
     Service, Hospital, Medicine, Package, LoyaltyCardType,
-    DiscountApplicationLog, PromotionCampaign, PromotionUsageLog, Patient,
-    PromotionCampaignGroup, PromotionGroupItem
+    DiscountApplicationLog, PromotionCampaign, PromotionUsageLog, Patient
 )
 from app.models.transaction import PatientLoyaltyWallet
+from app.services.promotion_index_service import PromotionContext, load_promotion_context
 # NOTE: CampaignHookConfig removed - now using promotion_campaigns table for all promotions
 # NOTE: PatientLoyaltyCard removed - now using PatientLoyaltyWallet from NEW wallet system
 
@@ -643,7 +643,8 @@ class DiscountService:
         quantity: int = 1,
         invoice_date: date = None,
         invoice_items: List[Dict] = None,  # Full invoice context for buy_x_get_y
-        excluded_campaign_ids: List[str] = None  # Campaign IDs to skip (Added 2025-12-02)
+        excluded_campaign_ids: List[str] = None,  # Campaign IDs to skip (Added 2025-12-02)
+        promotion_context: PromotionContext = None  # Indexed campaigns for this invoice calculation
     ) -> Optional[DiscountCalculationResult]:
         """
         Calculate promotion/campaign discount from promotion_campaigns table
@@ -666,6 +667,7 @@ class DiscountService:
             quantity: Quantity of this item
             invoice_date: Invoice date (defaults to today)
             excluded_campaign_ids: List of campaign IDs to exclude from consideration
+            promotion_context: Per-invoice PromotionContext (loaded here when not given)
 
         Returns:
             DiscountCalculationResult if promotion applies
@@ -674,26 +676,15 @@ class DiscountService:
         if invoice_date is None:
             invoice_date = date.today()
 
-        # Get active promotions applicable to this item type
-        # NOTE: Personalized promotions (is_personalized=True) are excluded from auto-apply
-        # They require manual code entry by staff at billing counter
-        promotions = session.query(PromotionCampaign).filter(
-            and_(
-                PromotionCampaign.hospital_id == hospital_id,
-                PromotionCampaign.is_active == True,
-                PromotionCampaign.is_deleted == False,
-                PromotionCampaign.is_personalized == False,  # Skip personalized promos - require manual entry
-                PromotionCampaign.status == 'approved',  # Only approved promotions
-                PromotionCampaign.start_date <= invoice_date,
-                PromotionCampaign.end_date >= invoice_date,
-                or_(
-                    PromotionCampaign.applies_to == 'all',
-                    PromotionCampaign.applies_to == item_type.lower() + 's'  # 'services', 'medicines', 'packages'
-                )
-            )
-        ).all()
+        # Candidate promotions come from the hospital's promotion index: applies_to,
+        # target_groups, specific_items and special-group targeting are already applied.
+        # NOTE: Personalized promotions (is_personalized=True) are not indexed -
+        # they require manual code entry by staff at billing counter
+        if promotion_context is None or promotion_context.invoice_date != invoice_date:
+            promotion_context = load_promotion_context(session, hospital_id, patient_id, invoice_date)
+        promotions = promotion_context.candidates(item_type, item_id)
 
-        logger.info(f"🎁 Found {len(promotions)} promotions for {item_type} (applies_to='all' or '{item_type.lower()}s')")
+        logger.info(f"🎁 Found {len(promotions)} promotions for {item_type} {item_id}")
         for p in promotions:
             logger.info(f"   - {p.campaign_name}: applies_to={p.applies_to}, target_special_group={p.target_special_group}, target_groups={p.target_groups is not None}")
 
@@ -710,13 +701,6 @@ class DiscountService:
             if not promotions:
                 return None
 
-        # Check if patient is in special group (Added 2025-11-27)
-        patient_is_special_group = False
-        if patient_id:
-            patient = session.query(Patient).filter_by(patient_id=patient_id).first()
-            if patient and hasattr(patient, 'is_special_group'):
-                patient_is_special_group = patient.is_special_group
-
         # Check each promotion for eligibility
         # PRIORITY: Check buy_x_get_y promotions FIRST (they should take precedence for reward items)
         # This ensures that if an item is a reward in a Buy X Get Y campaign, it gets 100% discount
@@ -726,35 +710,11 @@ class DiscountService:
 
         # First pass: Check buy_x_get_y promotions
         for promotion in buy_x_get_y_promotions:
-            # Check special group targeting (Added 2025-11-27)
-            if hasattr(promotion, 'target_special_group') and promotion.target_special_group:
-                # This promotion only applies to special group patients
-                if not patient_is_special_group:
-                    continue  # Skip - patient is not in special group
-
             # Handle Buy X Get Y promotions
             if invoice_items is None:
                 logger.debug(f"Skipping buy_x_get_y promotion {promotion.campaign_name} - no invoice context provided")
                 continue  # Need invoice context for buy_x_get_y
 
-            # Check if campaign targets specific groups (Added 2025-11-28)
-            if promotion.target_groups:
-                target_group_ids = promotion.target_groups.get('group_ids', [])
-                if target_group_ids:
-                    # Check if item belongs to any of the target groups
-                    item_in_group = session.query(PromotionGroupItem).join(
-                        PromotionCampaignGroup,
-                        PromotionGroupItem.group_id == PromotionCampaignGroup.group_id
-                    ).filter(
-                        PromotionCampaignGroup.is_active == True,
-                        PromotionGroupItem.group_id.in_(target_group_ids),
-                        PromotionGroupItem.item_type == item_type.lower(),
-                        PromotionGroupItem.item_id == item_id
-                    ).first()
-
-                    if not item_in_group:
-                        continue  # Item not in any target group
-
             result = DiscountService.handle_buy_x_get_y(
                 session=session,
                 promotion=promotion,
@@ -775,39 +735,6 @@ class DiscountService:
         logger.info(f"📋 Checking {len(simple_discount_promotions)} simple_discount promotions for eligibility...")
         for promotion in simple_discount_promotions:
             logger.info(f"   Evaluating: {promotion.campaign_name}")
-            # Check special group targeting (Added 2025-11-27)
-            if hasattr(promotion, 'target_special_group') and promotion.target_special_group:
-                # This promotion only applies to special group patients
-                if not patient_is_special_group:
-                    logger.info(f"      ❌ Skipped: target_special_group=True but patient not in special group")
-                    continue  # Skip - patient is not in special group
-
-            # Handle simple discount promotions (original logic)
-
-            # Check if campaign targets specific groups (Added 2025-11-28)
-            if promotion.target_groups:
-                target_group_ids = promotion.target_groups.get('group_ids', [])
-                if target_group_ids:
-                    # Check if item belongs to any of the target groups
-                    item_in_group = session.query(PromotionGroupItem).join(
-                        PromotionCampaignGroup,
-                        PromotionGroupItem.group_id == PromotionCampaignGroup.group_id
-                    ).filter(
-                        PromotionCampaignGroup.is_active == True,
-                        PromotionGroupItem.group_id.in_(target_group_ids),
-                        PromotionGroupItem.item_type == item_type.lower(),
-                        PromotionGroupItem.item_id == item_id
-                    ).first()
-
-                    if not item_in_group:
-                        logger.info(f"      ❌ Skipped: item not in target_groups {target_group_ids}")
-                        continue  # Item not in any target group
-
-            # Check if specific items list (if set) - for fine-grained override
-            if promotion.specific_items:
-                specific_item_ids = promotion.specific_items.get('item_ids', [])
-                if specific_item_ids and item_id not in specific_item_ids:
-                    continue  # This promotion doesn't apply to this specific item
 
             # Check max total uses
             if promotion.max_total_uses and promotion.current_uses >= promotion.max_total_uses:
@@ -815,12 +742,7 @@ class DiscountService:
 
             # Check max uses per patient
             if promotion.max_uses_per_patient:
-                patient_usage_count = session.query(PromotionUsageLog).filter(
-                    and_(
-                        PromotionUsageLog.campaign_id == promotion.campaign_id,
-                        PromotionUsageLog.patient_id == patient_id
-                    )
-                ).count()
+                patient_usage_count = promotion_context.patient_usage_count(session, promotion.campaign_id)
                 if patient_usage_count >= promotion.max_uses_per_patient:
                     continue  # Patient has reached usage limit for this campaign
 
@@ -911,7 +833,7 @@ class DiscountService:
 
         Args:
             session: Database session
-            promotion: PromotionCampaign object with buy_x_get_y type
+            promotion: PromotionCampaign (or indexed CampaignRule) with buy_x_get_y type
             invoice_items: Full invoice line items for checking trigger
             current_item_type: Type of current item being evaluated
             current_item_id: ID of current item being evaluated
@@ -1114,7 +1036,8 @@ class DiscountService:
         staff_discretionary: Dict = None,  # Staff discretionary discount - stacks incrementally (Added 2025-11-29)
         exclude_campaign: bool = False,  # Staff unchecked ALL campaign discounts (Added 2025-11-29)
         excluded_campaign_ids: List[str] = None,  # Per-campaign exclusion list
-        exclude_vip: bool = False  # Staff manually unchecked VIP discount (Added 2025-11-29)
+        exclude_vip: bool = False,  # Staff manually unchecked VIP discount (Added 2025-11-29)
+        promotion_context: PromotionContext = None  # Shared across the lines of one invoice
     ) -> DiscountCalculationResult:
         """
         Calculate all applicable discounts using CENTRALIZED stacking configuration.
@@ -1153,6 +1076,7 @@ class DiscountService:
             exclude_bulk: If True, skip bulk discount (staff manually unchecked) - ignored in simulation_mode
             exclude_loyalty: If True, skip loyalty discount (staff manually unchecked) - ignored in simulation_mode
             simulation_mode: If True, assume bulk eligible and ignore staff overrides
+            promotion_context: Per-invoice PromotionContext from load_promotion_context
 
         Returns:
             DiscountCalculationResult with the calculated discount based on stacking config
@@ -1177,7 +1101,8 @@ class DiscountService:
             auto_promotion_discount = DiscountService.calculate_promotion_discount(
                 session, hospital_id, patient_id, item_type, item_id, unit_price, quantity, invoice_date,
                 invoice_items=invoice_items,
-                excluded_campaign_ids=excluded_campaign_ids  # Filter excluded campaigns during selection
+                excluded_campaign_ids=excluded_campaign_ids,  # Filter excluded campaigns during selection
+                promotion_context=promotion_context
             )
 
         # Then, calculate manual promo code discount if provided
@@ -1689,6 +1614,11 @@ class DiscountService:
         total_service_count = sum(int(item.get('quantity', 1)) for item in service_items)
         total_medicine_count = sum(int(item.get('quantity', 1)) for item in medicine_items)
 
+        # Campaigns and patient targeting are loaded once for all lines
+        promotion_context = None
+        if not exclude_campaign:
+            promotion_context = load_promotion_context(session, hospital_id, patient_id, invoice_date or date.today())
+
         logger.info(f"Multi-discount: Service count={total_service_count} ({len(service_items)} items), "
                     f"Medicine count={total_medicine_count} ({len(medicine_items)} items), "
                     f"Package count={len(package_items)} items, exclude_bulk={exclude_bulk}, exclude_loyalty={exclude_loyalty}")
@@ -1729,7 +1659,8 @@ class DiscountService:
                 staff_discretionary=staff_discretionary,  # Staff discretionary discount (Added 2025-11-29)
                 exclude_campaign=exclude_campaign,  # Exclude ALL campaigns
                 excluded_campaign_ids=excluded_campaign_ids,  # Per-campaign exclusion
-                exclude_vip=exclude_vip  # Staff manually unchecked VIP discount (Added 2025-11-29)
+                exclude_vip=exclude_vip,  # Staff manually unchecked VIP discount (Added 2025-11-29)
+                promotion_context=promotion_context
             )
 
             # Apply max_discount cap (EXCEPT for promotions and stacked discounts)
@@ -1795,7 +1726,8 @@ class DiscountService:
                 staff_discretionary=staff_discretionary,  # Staff discretionary discount (Added 2025-11-29)
                 exclude_campaign=exclude_campaign,  # Exclude ALL campaigns
                 excluded_campaign_ids=excluded_campaign_ids,  # Per-campaign exclusion
-                exclude_vip=exclude_vip  # Staff manually unchecked VIP discount (Added 2025-11-29)
+                exclude_vip=exclude_vip,  # Staff manually unchecked VIP discount (Added 2025-11-29)
+                promotion_context=promotion_context
             )
 
             # Log calculated discount for medicine
@@ -1858,7 +1790,8 @@ class DiscountService:
                 staff_discretionary=staff_discretionary,  # Staff discretionary discount (Added 2025-11-29)
                 exclude_campaign=exclude_campaign,  # Exclude ALL campaigns
                 excluded_campaign_ids=excluded_campaign_ids,  # Per-campaign exclusion
-                exclude_vip=exclude_vip  # Staff manually unchecked VIP discount (Added 2025-11-29)
+                exclude_vip=exclude_vip,  # Staff manually unchecked VIP discount (Added 2025-11-29)
+                promotion_context=promotion_context
             )
 
             # Apply max_discount cap (EXCEPT for promotions and stacked discounts)
@@ -0,0 +1,419 @@
+# app/services/document_render_service.py
+
+"""
+Document Render Service - invoice PDFs rendered outside the request
+
+Invoice creation and regeneration only enqueue: InvoiceDocumentService
+.enqueue_invoice_pdf() adds a 'pending' InvoiceDocument (file name already
+assigned) and a DocumentRenderJob to the caller's session. When that
+transaction commits, the jobs are handed to this worker's render queue:
+
+    claim       UPDATE ... WHERE status = 'queued'    short transaction
+    render      billing/print_invoice.html            dispatcher thread, own session
+    convert     HTML -> PDF with WeasyPrint           process pool (CPU bound, not thread-safe)
+    store       write file, document -> 'generated'   short transaction
+
+A failed attempt goes back to 'queued' with exponential backoff until
+max_attempts, then the job and its document are marked 'failed'. Jobs left
+'running' by a worker that died, and retries whose worker went away, are
+picked up by process_due_jobs() (scripts/manage_db.py process-render-jobs).
+
+Configuration (app config):
+- DOCUMENT_RENDER_EXECUTOR:     'process' (default), 'thread' or 'inline'
+- DOCUMENT_RENDER_WORKERS:      render workers per process (default 2)
+- DOCUMENT_RENDER_MAX_ATTEMPTS: attempts per job (default 3)
+- DOCUMENT_RENDER_RETRY_SECONDS: first retry delay, doubled per attempt (default 30)
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.engine.versioned_cache import PendingCommitWork
+from app.models.transaction import DocumentRenderJob, InvoiceDocument
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+EXECUTOR_KINDS = ('process', 'thread', 'inline')
+DEFAULT_EXECUTOR = 'process'
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_SECONDS = 30
+RENDER_TIMEOUT_SECONDS = 300
+STALE_RUNNING_SECONDS = 900   # a running job older than this lost its worker
+
+# session.info key: job ids waiting for the enqueueing transaction to commit
+PENDING_KEY = 'document_render_jobs'
+
+_jobs = DocumentRenderJob.__table__
+_documents = InvoiceDocument.__table__
+
+# render_html(session, job) -> HTML of the document
+RenderFunction = Callable[[Session, DocumentRenderJob], str]
+
+
+def invoice_pdf_key(invoice_id, version: int) -> str:
+    """Idempotency key of an invoice PDF job: one job per (invoice, version)"""
+    return f"invoice_pdf:{invoice_id}:v{version}"
+
+def html_to_pdf(html: str, base_url: Optional[str] = None) -> bytes:
+    """WeasyPrint conversion. Module level so the process pool can pickle it."""
+    from weasyprint import HTML
+    return HTML(string=html, base_url=base_url or '/').write_pdf()
+
+def render_invoice_html(session: Session, job: DocumentRenderJob) -> str:
+    """Default renderer: the invoice print template, as InvoiceDocumentService renders it"""
+    from app.services.invoice_document_service import get_invoice_document_service
+
+    html = get_invoice_document_service().render_invoice_html(
+        job.invoice_id, job.hospital_id, session, base_url=job.base_url
+    )
+    if html is None:
+        raise LookupError(f"Invoice {job.invoice_id} could not be rendered")
+    return html
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DocumentRenderQueue:
+    """
+    Renders queued invoice documents for this worker process.
+    Usage:
+        queue = get_render_queue()
+        queue.track(session, job)        # enqueueing transaction
+        queue.process_due_jobs()         # sweeper (cron / CLI)
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, app=None, executor: Optional[str] = None,
+                 workers: Optional[int] = None, max_attempts: Optional[int] = None,
+                 retry_seconds: Optional[int] = None, storage_path: Optional[Path] = None,
+                 render_html: Optional[RenderFunction] = None,
+                 convert: Callable[[str, Optional[str]], bytes] = html_to_pdf):
+        self._engine = engine
+        self._app = app
+        self._executor = executor
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._retry_seconds = retry_seconds
+        self._storage_path = storage_path
+        self._render_html = render_html or render_invoice_html
+        self._convert = convert
+        self._dispatcher: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # CONFIGURATION
+    # =========================================================================
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from app.services.database_service import get_db_engine
+            self._engine = get_db_engine()
+        return self._engine
+
+    def _app_config(self, name: str, default):
+        if self._app is not None:
+            return self._app.config.get(name, default)
+        try:
+            from flask import current_app
+            return current_app.config.get(name, default)
+        except RuntimeError:
+            return default
+
+    @property
+    def executor_kind(self) -> str:
+        kind = self._executor or self._app_config('DOCUMENT_RENDER_EXECUTOR', DEFAULT_EXECUTOR)
+        if kind not in EXECUTOR_KINDS:
+            logger.warning(f"⚠️ Unknown render executor '{kind}', using {DEFAULT_EXECUTOR}")
+            return DEFAULT_EXECUTOR
+        return kind
+
+    @property
+    def workers(self) -> int:
+        if self._workers is not None:
+            return self._workers
+        return max(1, int(self._app_config('DOCUMENT_RENDER_WORKERS', DEFAULT_WORKERS)))
+
+    @property
+    def max_attempts(self) -> int:
+        if self._max_attempts is not None:
+            return self._max_attempts
+        return int(self._app_config('DOCUMENT_RENDER_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+
+    @property
+    def retry_seconds(self) -> int:
+        if self._retry_seconds is not None:
+            return self._retry_seconds
+        return int(self._app_config('DOCUMENT_RENDER_RETRY_SECONDS', DEFAULT_RETRY_SECONDS))
+
+    @property
+    def storage_path(self) -> Path:
+        if self._storage_path is None:
+            from app.services.invoice_document_service import get_invoice_document_service
+            self._storage_path = get_invoice_document_service().storage_base_path
+        return self._storage_path
+
+    @contextmanager
+    def _app_context(self):
+        from flask import has_app_context
+        if self._app is None or has_app_context():
+            yield
+        else:
+            with self._app.app_context():
+                yield
+
+    # =========================================================================
+    # EXECUTORS
+    # =========================================================================
+
+    def _get_dispatcher(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = ThreadPoolExecutor(max_workers=self.workers,
+                                                      thread_name_prefix='document-render')
+            return self._dispatcher
+
+    def get_process_pool(self) -> ProcessPoolExecutor:
+        """
+        WeasyPrint process pool. 'spawn' so children do not inherit the web
+        worker's threads, locks and database connections.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _to_pdf(self, html: str, base_url: Optional[str]) -> bytes:
+        if self.executor_kind != 'process':
+            return self._convert(html, base_url)
+        try:
+            return self.get_process_pool().submit(self._convert, html, base_url).result(
+                timeout=RENDER_TIMEOUT_SECONDS
+            )
+        except BrokenProcessPool:
+            # A render process died (e.g. out of memory); start a fresh pool for the next job
+            with self._lock:
+                self._pool = None
+            raise
+
+    def submit_render(self, fn: Callable, *args) -> Future:
+        """
+        Run fn(*args) on this worker's render executor (batch documents): the
+        process pool, the dispatcher threads, or right away for 'inline'.
+        For 'process', fn must be module level and its arguments picklable.
+        """
+        kind = self.executor_kind
+        if kind == 'process':
+            pool = self.get_process_pool()
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                pool = self.get_process_pool()
+                future = pool.submit(fn, *args)
+
+            def discard_if_broken(done: Future):
+                if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                    self._discard_pool(pool)
+
+            future.add_done_callback(discard_if_broken)
+            return future
+        if kind == 'thread':
+            return self._get_dispatcher().submit(fn, *args)
+
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Forget a broken pool; the next render starts a fresh one"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            dispatcher, pool = self._dispatcher, self._pool
+            self._dispatcher = self._pool = None
+        if dispatcher:
+            dispatcher.shutdown(wait=wait)
+        if pool:
+            pool.shutdown(wait=wait)
+
+    # =========================================================================
+    # QUEUE
+    # =========================================================================
+
+    def track(self, session: Session, job: DocumentRenderJob):
+        """Submit job once the session's outermost transaction commits"""
+        _pending_jobs.collect(session, list).append(job.job_id)
+
+    def submit(self, job_ids: Iterable):
+        """Render committed jobs in the background ('inline': now, in this thread)"""
+        for job_id in job_ids:
+            if self.executor_kind == 'inline':
+                self.process_job(job_id)
+            else:
+                self._get_dispatcher().submit(self.process_job, job_id)
+
+    def process_job(self, job_id) -> bool:
+        """Claim, render and store one job. True when its document was generated."""
+        with self._app_context():
+            job = self._claim(job_id)
+            if job is None:
+                return False   # finished, running elsewhere or not due yet
+            try:
+                with Session(self.engine) as session:
+                    html = self._render_html(session, session.get(DocumentRenderJob, job['job_id']))
+                pdf_content = self._to_pdf(html, job['base_url'])
+                self._store(job, pdf_content)
+                return True
+            except Exception as e:
+                self._fail(job, e)
+                return False
+
+    def process_due_jobs(self, limit: int = 100) -> int:
+        """
+        Re-queue jobs whose worker died and render every job that is due.
+        Returns the number of documents generated.
+        """
+        now = _now()
+        with self.engine.begin() as connection:
+            stale = connection.execute(
+                update(_jobs)
+                .where(_jobs.c.status == 'running',
+                       _jobs.c.started_at < now - timedelta(seconds=STALE_RUNNING_SECONDS))
+                .values(status='queued', next_attempt_at=None)
+            ).rowcount
+            due = connection.execute(
+                select(_jobs.c.job_id)
+                .where(_jobs.c.status == 'queued',
+                       or_(_jobs.c.next_attempt_at.is_(None), _jobs.c.next_attempt_at <= now))
+                .order_by(_jobs.c.created_at)
+                .limit(limit)
+            ).scalars().all()
+        if stale:
+            logger.warning(f"⚠️ Re-queued {stale} render job(s) left running by a stopped worker")
+        return sum(1 for job_id in due if self.process_job(job_id))
+
+    # =========================================================================
+    # JOB STATE
+    # =========================================================================
+
+    def _claim(self, job_id) -> Optional[Dict]:
+        now = _now()
+        with self.engine.begin() as connection:
+            claimed = connection.execute(
+                update(_jobs)
+                .where(_jobs.c.job_id == job_id, _jobs.c.status == 'queued',
+                       or_(_jobs.c.next_attempt_at.is_(None), _jobs.c.next_attempt_at <= now))
+                .values(status='running', attempts=_jobs.c.attempts + 1, started_at=now)
+            ).rowcount
+            if not claimed:
+                return None
+            row = connection.execute(
+                select(_jobs.c.job_id, _jobs.c.document_id, _jobs.c.attempts, _jobs.c.max_attempts,
+                       _jobs.c.base_url, _documents.c.file_path, _documents.c.parent_document_id)
+                .join(_documents, _documents.c.document_id == _jobs.c.document_id)
+                .where(_jobs.c.job_id == job_id)
+            ).mappings().one()
+        return dict(row)
+
+    def _store(self, job: Dict, pdf_content: bytes):
+        file_path = self.storage_path / job['file_path']
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so the print endpoint never serves a partial file
+        partial_path = file_path.with_name(file_path.name + '.part')
+        partial_path.write_bytes(pdf_content)
+        partial_path.replace(file_path)
+
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(_documents).where(_documents.c.document_id == job['document_id'])
+                .values(document_status='generated', file_size=len(pdf_content))
+            )
+            if job['parent_document_id']:
+                # A regenerated version replaces its parent only once it exists
+                connection.execute(
+                    update(_documents)
+                    .where(_documents.c.document_id == job['parent_document_id'],
+                           _documents.c.document_status == 'generated')
+                    .values(document_status='superseded')
+                )
+            connection.execute(
+                update(_jobs).where(_jobs.c.job_id == job['job_id'])
+                .values(status='completed', completed_at=_now(), last_error=None)
+            )
+        logger.info(f"✅ Rendered document {job['document_id']} ({len(pdf_content)} bytes, "
+                    f"attempt {job['attempts']})")
+
+    def _fail(self, job: Dict, error: Exception):
+        retry = job['attempts'] < job['max_attempts']
+        delay = self.retry_seconds * 2 ** (job['attempts'] - 1)
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(_jobs).where(_jobs.c.job_id == job['job_id'])
+                .values(status='queued' if retry else 'failed',
+                        next_attempt_at=_now() + timedelta(seconds=delay) if retry else None,
+                        last_error=f"{type(error).__name__}: {error}"[:2000])
+            )
+            if not retry:
+                connection.execute(
+                    update(_documents).where(_documents.c.document_id == job['document_id'])
+                    .values(document_status='failed')
+                )
+
+        if not retry:
+            logger.error(f"❌ Rendering document {job['document_id']} failed after "
+                         f"{job['attempts']} attempts: {str(error)}")
+            return
+        logger.warning(f"⚠️ Rendering document {job['document_id']} failed (attempt {job['attempts']}), "
+                       f"retrying in {delay}s: {str(error)}")
+        if self.executor_kind != 'inline':
+            timer = threading.Timer(delay, self.submit, args=([job['job_id']],))
+            timer.daemon = True
+            timer.start()
+
+
+# Singleton instance (one render queue per worker process)
+_render_queue: Optional[DocumentRenderQueue] = None
+_render_queue_lock = threading.Lock()
+
+def get_render_queue() -> DocumentRenderQueue:
+    """Get the render queue of this worker, bound to the current Flask app"""
+    global _render_queue
+    if _render_queue is None:
+        with _render_queue_lock:
+            if _render_queue is None:
+                from flask import current_app, has_app_context
+                app = current_app._get_current_object() if has_app_context() else None
+                _render_queue = DocumentRenderQueue(app=app)
+    return _render_queue
+
+
+def _submit_pending_jobs(session: Session, pending):
+    try:
+        get_render_queue().submit(pending)
+    except Exception as e:
+        # The jobs are committed; process-render-jobs or the on-demand print path covers them
+        logger.warning(f"⚠️ Could not submit render jobs: {str(e)}")
+
+# Ids of jobs rolled back with a savepoint are never claimed, so keeping them is harmless
+_pending_jobs = PendingCommitWork(PENDING_KEY, _submit_pending_jobs)
@@ -0,0 +1,318 @@
+# app/services/gl_balance_service.py
+
+"""
+GL Balance Service - daily account-balance rollup of the general ledger
+
+gl_account_balance holds the debit and credit totals of gl_entry per
+(hospital, branch, account, day). Report periods are answered from the
+rollup: the opening balance is the sum of the days before the period and the
+movement is the sum of the days inside it, so no report scans gl_entry.
+
+- apply_gl_entry: called from the GLEntry after_insert hook, so every posting
+  path (invoices, payments, reversals, credit notes...) updates the rollup in
+  its own transaction
+- get_account_activity / get_account_balances: read paths used by
+  gl_report_service
+- rebuild_gl_balances / verify_gl_balances: maintenance, exposed as
+  manage_db.py commands
+
+The branch of an entry is the branch_id of its GL transaction; transactions
+posted without one roll up under branch NULL (counted in "all branches").
+"""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, delete, func, insert, literal_column, select, update
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.util import identity_key
+
+from app.models.transaction import GLAccountBalance, GLEntry, GLTransaction
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# Must match the unique index in migrations/create_gl_account_balance_table.sql
+NIL_BRANCH = "'00000000-0000-0000-0000-000000000000'::uuid"
+
+# Day boundaries of the rollup (Hospital.timezone default)
+REPORTING_TIMEZONE = ZoneInfo('Asia/Kolkata')
+
+ZERO = Decimal('0')
+
+
+def _amount(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
+
+def balance_date_for(entry_date) -> date:
+    """Reporting day of an entry_date (aware values are converted to REPORTING_TIMEZONE)"""
+    if entry_date is None:
+        entry_date = datetime.now(timezone.utc)
+    if isinstance(entry_date, datetime):
+        if entry_date.tzinfo is not None:
+            entry_date = entry_date.astimezone(REPORTING_TIMEZONE)
+        return entry_date.date()
+    return entry_date
+
+def _key_condition(table, hospital_id, branch_id, account_id, balance_date):
+    branch_condition = table.c.branch_id.is_(None) if branch_id is None else table.c.branch_id == branch_id
+    return and_(
+        table.c.hospital_id == hospital_id,
+        branch_condition,
+        table.c.account_id == account_id,
+        table.c.balance_date == balance_date
+    )
+
+# =============================================================================
+# INCREMENTAL MAINTENANCE
+# =============================================================================
+
+def _entry_branch(connection, entry: GLEntry) -> Optional[uuid.UUID]:
+    """Branch of the entry's GL transaction - from the session when it was posted there"""
+    session = object_session(entry)
+    if session is not None:
+        transaction = session.identity_map.get(identity_key(GLTransaction, entry.transaction_id))
+        if transaction is not None:
+            return transaction.branch_id
+    return connection.execute(
+        select(GLTransaction.branch_id).where(GLTransaction.transaction_id == entry.transaction_id)
+    ).scalar()
+
+def apply_gl_entry(connection, entry: GLEntry) -> None:
+    """
+    Add one GL line to its daily balance on the inserting connection.
+    PostgreSQL uses a single INSERT ... ON CONFLICT, other databases UPDATE
+    then INSERT.
+    """
+    table = GLAccountBalance.__table__
+    branch_id = _entry_branch(connection, entry)
+    balance_date = balance_date_for(entry.entry_date)
+    debit = _amount(entry.debit_amount)
+    credit = _amount(entry.credit_amount)
+    now = datetime.now(timezone.utc)
+
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        stmt = pg_insert(table).values(
+            balance_id=uuid.uuid4(),
+            hospital_id=entry.hospital_id,
+            branch_id=branch_id,
+            account_id=entry.account_id,
+            balance_date=balance_date,
+            debit_total=debit,
+            credit_total=credit,
+            entry_count=1,
+            created_at=now,
+            updated_at=now,
+            created_by=entry.created_by,
+            updated_by=entry.created_by
+        )
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[
+                table.c.hospital_id,
+                func.coalesce(table.c.branch_id, literal_column(NIL_BRANCH)),
+                table.c.account_id,
+                table.c.balance_date
+            ],
+            set_=dict(
+                debit_total=table.c.debit_total + stmt.excluded.debit_total,
+                credit_total=table.c.credit_total + stmt.excluded.credit_total,
+                entry_count=table.c.entry_count + 1,
+                updated_at=stmt.excluded.updated_at,
+                updated_by=stmt.excluded.updated_by
+            )
+        ))
+        return
+
+    result = connection.execute(
+        update(table)
+        .where(_key_condition(table, entry.hospital_id, branch_id, entry.account_id, balance_date))
+        .values(
+            debit_total=table.c.debit_total + debit,
+            credit_total=table.c.credit_total + credit,
+            entry_count=table.c.entry_count + 1,
+            updated_at=now,
+            updated_by=entry.created_by
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(
+            balance_id=uuid.uuid4(),
+            hospital_id=entry.hospital_id,
+            branch_id=branch_id,
+            account_id=entry.account_id,
+            balance_date=balance_date,
+            debit_total=debit,
+            credit_total=credit,
+            entry_count=1,
+            created_at=now,
+            updated_at=now,
+            created_by=entry.created_by,
+            updated_by=entry.created_by
+        ))
+
+# =============================================================================
+# READ PATHS
+# =============================================================================
+
+def get_account_activity(
+    session: Session,
+    hospital_id: uuid.UUID,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    branch_id: Optional[uuid.UUID] = None
+) -> Dict[uuid.UUID, Tuple[Decimal, Decimal]]:
+    """
+    Debit and credit totals per account for the days start_date..end_date
+    (inclusive; either end open). Returns {account_id: (debit, credit)}.
+    """
+    # Pending GL lines reach gl_account_balance through the after_insert hook
+    session.flush()
+
+    table = GLAccountBalance.__table__
+    query = select(
+        table.c.account_id,
+        func.sum(table.c.debit_total).label('debit'),
+        func.sum(table.c.credit_total).label('credit')
+    ).where(table.c.hospital_id == hospital_id).group_by(table.c.account_id)
+    if branch_id is not None:
+        query = query.where(table.c.branch_id == branch_id)
+    if start_date is not None:
+        query = query.where(table.c.balance_date >= start_date)
+    if end_date is not None:
+        query = query.where(table.c.balance_date <= end_date)
+
+    return {row.account_id: (_amount(row.debit), _amount(row.credit)) for row in session.execute(query)}
+
+def get_account_balances(
+    session: Session,
+    hospital_id: uuid.UUID,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    branch_id: Optional[uuid.UUID] = None
+) -> Dict[uuid.UUID, Dict[str, Decimal]]:
+    """
+    Opening rollup plus period deltas per account:
+    {account_id: {opening, debit, credit, closing}} with balances as debit - credit.
+    Without start_date the whole history is movement and opening is zero.
+    """
+    opening = {}
+    if start_date is not None:
+        opening = get_account_activity(session, hospital_id, end_date=start_date - timedelta(days=1),
+                                       branch_id=branch_id)
+    movement = get_account_activity(session, hospital_id, start_date, end_date, branch_id)
+
+    balances = {}
+    for account_id in opening.keys() | movement.keys():
+        opening_debit, opening_credit = opening.get(account_id, (ZERO, ZERO))
+        debit, credit = movement.get(account_id, (ZERO, ZERO))
+        opening_balance = opening_debit - opening_credit
+        balances[account_id] = {
+            'opening': opening_balance,
+            'debit': debit,
+            'credit': credit,
+            'closing': opening_balance + debit - credit
+        }
+    return balances
+
+# =============================================================================
+# REBUILD AND VERIFY
+# =============================================================================
+
+def _ledger_totals(session: Session, hospital_id: Optional[uuid.UUID] = None) -> Dict[Tuple, list]:
+    """[debit, credit, count] per rollup key, aggregated from gl_entry"""
+    query = select(
+        GLEntry.hospital_id, GLTransaction.branch_id, GLEntry.account_id, GLEntry.entry_date,
+        GLEntry.debit_amount, GLEntry.credit_amount
+    ).join(GLTransaction, GLTransaction.transaction_id == GLEntry.transaction_id)
+    if hospital_id is not None:
+        query = query.where(GLEntry.hospital_id == hospital_id)
+
+    totals: Dict[Tuple, list] = {}
+    for row in session.execute(query.execution_options(yield_per=5000)):
+        key = (row.hospital_id, row.branch_id, row.account_id, balance_date_for(row.entry_date))
+        bucket = totals.setdefault(key, [ZERO, ZERO, 0])
+        bucket[0] += _amount(row.debit_amount)
+        bucket[1] += _amount(row.credit_amount)
+        bucket[2] += 1
+    return totals
+
+def rebuild_gl_balances(
+    session: Session,
+    hospital_id: Optional[uuid.UUID] = None,
+    chunk_size: int = 1000
+) -> int:
+    """Recreate gl_account_balance from gl_entry (all hospitals unless hospital_id). Returns rows written."""
+    table = GLAccountBalance.__table__
+    totals = _ledger_totals(session, hospital_id)
+
+    clear = delete(table)
+    if hospital_id is not None:
+        clear = clear.where(table.c.hospital_id == hospital_id)
+    session.execute(clear)
+
+    now = datetime.now(timezone.utc)
+    rows = [{
+        'balance_id': uuid.uuid4(),
+        'hospital_id': key[0],
+        'branch_id': key[1],
+        'account_id': key[2],
+        'balance_date': key[3],
+        'debit_total': debit,
+        'credit_total': credit,
+        'entry_count': count,
+        'created_at': now,
+        'updated_at': now,
+        'created_by': 'system',
+        'updated_by': 'system'
+    } for key, (debit, credit, count) in totals.items()]
+    for start in range(0, len(rows), chunk_size):
+        session.execute(insert(table), rows[start:start + chunk_size])
+
+    logger.info(f"✅ Rebuilt {len(rows)} GL account balances"
+                f"{f' for hospital {hospital_id}' if hospital_id else ''}")
+    return len(rows)
+
+def verify_gl_balances(session: Session, hospital_id: Optional[uuid.UUID] = None) -> Dict:
+    """
+    Compare gl_account_balance against gl_entry.
+
+    Returns:
+        Dict with checked (keys compared), ok (bool) and mismatches: one dict per
+        (hospital, branch, account, day) whose rollup differs, is missing, or has
+        no entries
+    """
+    table = GLAccountBalance.__table__
+    ledger = {key: (debit, credit) for key, (debit, credit, _) in _ledger_totals(session, hospital_id).items()}
+
+    query = select(table.c.hospital_id, table.c.branch_id, table.c.account_id, table.c.balance_date,
+                   table.c.debit_total, table.c.credit_total)
+    if hospital_id is not None:
+        query = query.where(table.c.hospital_id == hospital_id)
+    rollup = {
+        (row.hospital_id, row.branch_id, row.account_id, row.balance_date):
+            (_amount(row.debit_total), _amount(row.credit_total))
+        for row in session.execute(query)
+    }
+
+    mismatches = []
+    keys = ledger.keys() | rollup.keys()
+    for key in keys:
+        if ledger.get(key) == rollup.get(key):
+            continue
+        mismatches.append({
+            'hospital_id': key[0],
+            'branch_id': key[1],
+            'account_id': key[2],
+            'balance_date': key[3],
+            'ledger': ledger.get(key),
+            'rollup': rollup.get(key)
+        })
+
+    if mismatches:
+        logger.warning(f"⚠️ {len(mismatches)} GL account balances differ from gl_entry")
+    return {'checked': len(keys), 'ok': not mismatches, 'mismatches': mismatches}
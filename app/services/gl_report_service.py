@@ -0,0 +1,450 @@
+# app/services/gl_report_service.py
+
+"""
+GL Report Service - trial balance, profit & loss, balance sheet, GSTR-1, GSTR-2A
+
+Financial statements read the gl_account_balance rollup (gl_balance_service):
+balances as of a date are the sum of the daily rows up to that date, period
+movements the sum of the rows inside the period. GST returns read the
+gst_ledger rows of the return month and the documents they reference.
+
+Account classification follows the chart of accounts: account_group decides
+the side of the statement, gl_account_no prefixes split fixed/long-term items
+on the balance sheet (see the constants below).
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.master import ChartOfAccounts, Supplier
+from app.models.transaction import GLTransaction, GSTLedger, InvoiceHeader, InvoiceLineItem, SupplierInvoice
+from app.services.gl_balance_service import get_account_activity, get_account_balances
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+ZERO = Decimal('0')
+
+# Statement order of account groups; debit-normal groups carry opening balances as debits
+GROUP_ORDER = ('Assets', 'Liabilities', 'Equity', 'Income', 'Expenses')
+DEBIT_NORMAL_GROUPS = ('Assets', 'Expenses', 'Expense')
+INCOME_GROUPS = ('Income', 'Revenue')
+EXPENSE_GROUPS = ('Expenses', 'Expense')
+
+# Balance sheet sub-sections by gl_account_no prefix
+FIXED_ASSET_PREFIXES = ('15',)
+OTHER_ASSET_PREFIXES = ('19',)
+LONG_TERM_LIABILITY_PREFIXES = ('26', '27')
+
+# GSTR-1: inter-state B2C invoices above this value are reported invoice-wise (B2CL)
+B2C_LARGE_THRESHOLD = Decimal('100000')
+
+
+def _money(value) -> float:
+    return float(value or 0)
+
+def _financial_year_start(as_of: date) -> date:
+    return date(as_of.year if as_of.month >= 4 else as_of.year - 1, 4, 1)
+
+def _load_accounts(session: Session, hospital_id: uuid.UUID) -> List[ChartOfAccounts]:
+    accounts = session.query(ChartOfAccounts).filter(ChartOfAccounts.hospital_id == hospital_id).all()
+    group_rank = {group: rank for rank, group in enumerate(GROUP_ORDER)}
+    return sorted(accounts, key=lambda a: (group_rank.get(a.account_group, len(GROUP_ORDER)),
+                                           a.gl_account_no or '', a.account_name or ''))
+
+def _opening_balance(account: ChartOfAccounts, as_of: date, branch_id) -> Decimal:
+    """Chart-of-accounts opening balance as debit - credit (hospital level, so not per branch)"""
+    if branch_id is not None or not account.opening_balance:
+        return ZERO
+    if account.opening_balance_date and account.opening_balance_date > as_of:
+        return ZERO
+    amount = Decimal(str(account.opening_balance))
+    return amount if account.account_group in DEBIT_NORMAL_GROUPS else -amount
+
+def _depths(accounts: List[ChartOfAccounts]) -> Dict:
+    parents = {a.account_id: a.parent_account_id for a in accounts}
+    depths = {}
+    for account_id in parents:
+        depth, parent, seen = 0, parents[account_id], {account_id}
+        while parent in parents and parent not in seen:
+            seen.add(parent)
+            depth += 1
+            parent = parents[parent]
+        depths[account_id] = depth
+    return depths
+
+def _gst_totals() -> Dict:
+    return {'taxable_value': ZERO, 'cgst': ZERO, 'sgst': ZERO, 'igst': ZERO, 'cess': ZERO}
+
+def _add_gst(totals: Dict, row: Dict):
+    for key in ('taxable_value', 'cgst', 'sgst', 'igst'):
+        totals[key] += Decimal(str(row.get(key) or 0))
+
+def _float_totals(totals: Dict) -> Dict:
+    return {key: _money(value) for key, value in totals.items()}
+
+# =============================================================================
+# FINANCIAL STATEMENTS
+# =============================================================================
+
+def generate_trial_balance(
+    session: Session,
+    hospital_id: uuid.UUID,
+    as_of_date: Optional[date] = None,
+    branch_id: Optional[uuid.UUID] = None,
+    include_zero_balances: bool = False
+) -> Dict:
+    """Closing balance of every account as of as_of_date, on its debit or credit side"""
+    as_of_date = as_of_date or datetime.now(timezone.utc).date()
+    balances = get_account_balances(session, hospital_id, end_date=as_of_date, branch_id=branch_id)
+    accounts = _load_accounts(session, hospital_id)
+    depths = _depths(accounts)
+    parent_ids = {a.parent_account_id for a in accounts if a.parent_account_id}
+
+    rows = []
+    total_debit = total_credit = ZERO
+    for account in accounts:
+        closing = _opening_balance(account, as_of_date, branch_id)
+        if account.account_id in balances:
+            closing += balances[account.account_id]['closing']
+        if closing == 0 and not include_zero_balances and account.account_id not in parent_ids:
+            continue
+
+        debit = closing if closing > 0 else ZERO
+        credit = -closing if closing < 0 else ZERO
+        total_debit += debit
+        total_credit += credit
+        rows.append({
+            'account_id': str(account.account_id),
+            'gl_account_no': account.gl_account_no,
+            'account_name': account.account_name,
+            'account_group': account.account_group,
+            'indent_level': depths.get(account.account_id, 0),
+            'is_parent': account.account_id in parent_ids,
+            'debit_amount': _money(debit),
+            'credit_amount': _money(credit),
+            'transactions': []
+        })
+
+    return {
+        'title': 'Trial Balance',
+        'as_of_date': as_of_date,
+        'accounts': rows,
+        'total_debit': _money(total_debit),
+        'total_credit': _money(total_credit),
+        'total_difference': _money(total_debit - total_credit)
+    }
+
+def generate_profit_loss(
+    session: Session,
+    hospital_id: uuid.UUID,
+    start_date: date,
+    end_date: date,
+    branch_id: Optional[uuid.UUID] = None,
+    include_zero_balances: bool = False
+) -> Dict:
+    """Income and expense movement for start_date..end_date"""
+    activity = get_account_activity(session, hospital_id, start_date, end_date, branch_id)
+    revenue, expenses = [], []
+    total_revenue = total_expenses = ZERO
+
+    for account in _load_accounts(session, hospital_id):
+        debit, credit = activity.get(account.account_id, (ZERO, ZERO))
+        if account.account_group in INCOME_GROUPS:
+            amount, target = credit - debit, revenue
+            total_revenue += amount
+        elif account.account_group in EXPENSE_GROUPS:
+            amount, target = debit - credit, expenses
+            total_expenses += amount
+        else:
+            continue
+        if amount == 0 and not include_zero_balances:
+            continue
+        target.append({
+            'account_id': str(account.account_id),
+            'gl_account_no': account.gl_account_no,
+            'account_name': account.account_name,
+            'amount': _money(amount),
+            'is_category': not account.is_posting_account
+        })
+
+    net_profit = total_revenue - total_expenses
+    profit_margin = round(_money(net_profit / total_revenue * 100), 2) if total_revenue else 0.0
+    statement = {
+        'revenue': revenue,
+        'expenses': expenses,
+        'total_revenue': _money(total_revenue),
+        'total_expenses': _money(total_expenses),
+        'net_profit': _money(net_profit),
+        'profit_margin': profit_margin
+    }
+    return {
+        'title': 'Profit and Loss',
+        'start_date': start_date,
+        'end_date': end_date,
+        'statement_data': statement,
+        'total_revenue': statement['total_revenue'],
+        'total_expenses': statement['total_expenses'],
+        'net_profit': statement['net_profit'],
+        'profit_margin': profit_margin
+    }
+
+def generate_balance_sheet(
+    session: Session,
+    hospital_id: uuid.UUID,
+    as_of_date: Optional[date] = None,
+    branch_id: Optional[uuid.UUID] = None
+) -> Dict:
+    """
+    Assets, liabilities and equity as of as_of_date. Income and expense are
+    closed into retained earnings (before the financial year) and current
+    year earnings.
+    """
+    as_of_date = as_of_date or datetime.now(timezone.utc).date()
+    fy_start = _financial_year_start(as_of_date)
+    balances = get_account_balances(session, hospital_id, fy_start, as_of_date, branch_id)
+
+    sections = {name: [] for name in ('current_assets', 'fixed_assets', 'other_assets',
+                                      'current_liabilities', 'longterm_liabilities', 'equity')}
+    retained = current_year = ZERO
+
+    for account in _load_accounts(session, hospital_id):
+        balance = balances.get(account.account_id, {'opening': ZERO, 'closing': ZERO, 'debit': ZERO, 'credit': ZERO})
+        group, number = account.account_group, account.gl_account_no or ''
+
+        if group in INCOME_GROUPS or group in EXPENSE_GROUPS:
+            retained -= balance['opening']
+            current_year -= balance['debit'] - balance['credit']
+            continue
+
+        closing = balance['closing'] + _opening_balance(account, as_of_date, branch_id)
+        if closing == 0:
+            continue
+        if group == 'Assets':
+            section = ('fixed_assets' if number.startswith(FIXED_ASSET_PREFIXES)
+                       else 'other_assets' if number.startswith(OTHER_ASSET_PREFIXES)
+                       else 'current_assets')
+            amount = closing
+        elif group == 'Liabilities':
+            section = 'longterm_liabilities' if number.startswith(LONG_TERM_LIABILITY_PREFIXES) else 'current_liabilities'
+            amount = -closing
+        else:
+            section, amount = 'equity', -closing
+        sections[section].append({
+            'account_id': str(account.account_id),
+            'gl_account_no': number,
+            'name': account.account_name,
+            'balance': _money(amount)
+        })
+
+    totals = {f"total_{name}": sum(Decimal(str(a['balance'])) for a in items) for name, items in sections.items()}
+    total_assets = totals['total_current_assets'] + totals['total_fixed_assets'] + totals['total_other_assets']
+    total_liabilities = totals['total_current_liabilities'] + totals['total_longterm_liabilities']
+    total_equity = totals['total_equity'] + retained + current_year
+
+    report = dict(sections)
+    report.update({key: _money(value) for key, value in totals.items()})
+    report.update(
+        title='Balance Sheet',
+        as_of_date=as_of_date,
+        retained_earnings=_money(retained),
+        current_year_earnings=_money(current_year),
+        total_equity=_money(total_equity),
+        total_assets=_money(total_assets),
+        total_liabilities=_money(total_liabilities),
+        total_liabilities_and_equity=_money(total_liabilities + total_equity)
+    )
+    return report
+
+# =============================================================================
+# GST RETURNS
+# =============================================================================
+
+def _gst_ledger_rows(session: Session, hospital_id, month: int, year: int, transaction_type: str, branch_id=None):
+    query = select(
+        GSTLedger.transaction_reference,
+        GSTLedger.cgst_output, GSTLedger.sgst_output, GSTLedger.igst_output,
+        GSTLedger.cgst_input, GSTLedger.sgst_input, GSTLedger.igst_input,
+        GSTLedger.itc_claimed,
+        GLTransaction.reference_id
+    ).outerjoin(GLTransaction, GLTransaction.transaction_id == GSTLedger.gl_reference).where(
+        GSTLedger.hospital_id == hospital_id,
+        GSTLedger.entry_month == month,
+        GSTLedger.entry_year == year,
+        GSTLedger.transaction_type == transaction_type
+    )
+    if branch_id is not None:
+        query = query.where(GLTransaction.branch_id == branch_id)
+    return session.execute(query).all()
+
+def generate_gstr1(
+    session: Session,
+    hospital_id: uuid.UUID,
+    month: int,
+    year: int,
+    branch_id: Optional[uuid.UUID] = None
+) -> Dict:
+    """
+    GSTR-1 (outward supplies) for a month from gst_ledger SALES rows.
+    Patient invoices carry no recipient GSTIN, so supplies are B2C: inter-state
+    invoices above B2C_LARGE_THRESHOLD invoice-wise (B2CL), the rest summarised
+    by place of supply and rate (B2CS).
+    """
+    ledger = {row.transaction_reference: row
+              for row in _gst_ledger_rows(session, hospital_id, month, year, 'SALES', branch_id)}
+    summary = {key: _gst_totals() for key in ('b2b', 'b2c_large', 'b2c_small',
+                                              'credit_debit_registered', 'credit_debit_unregistered')}
+    report = {'title': 'GSTR-1 Report', 'month': month, 'year': year,
+              'b2b_invoices': [], 'b2c_large_invoices': [], 'b2c_small_summary': [], 'hsn_summary': []}
+    if not ledger:
+        report['summary'] = {key: _float_totals(value) for key, value in summary.items()}
+        return report
+
+    invoices = session.query(InvoiceHeader).filter(
+        InvoiceHeader.hospital_id == hospital_id,
+        InvoiceHeader.invoice_number.in_(list(ledger.keys()))
+    ).all()
+
+    large_ids = set()
+    for invoice in invoices:
+        entry = ledger[invoice.invoice_number]
+        value = Decimal(str(invoice.grand_total or 0))
+        if not (invoice.is_interstate and value > B2C_LARGE_THRESHOLD):
+            continue
+        large_ids.add(invoice.invoice_id)
+        row = {
+            'invoice_number': invoice.invoice_number,
+            'invoice_date': invoice.invoice_date.strftime('%d-%m-%Y') if invoice.invoice_date else None,
+            'invoice_value': _money(value),
+            'place_of_supply': invoice.place_of_supply,
+            'rate': None,
+            'taxable_value': _money(invoice.total_taxable_value),
+            'cgst': _money(entry.cgst_output),
+            'sgst': _money(entry.sgst_output),
+            'igst': _money(entry.igst_output)
+        }
+        report['b2c_large_invoices'].append(row)
+        _add_gst(summary['b2c_large'], row)
+
+    invoice_ids = [invoice.invoice_id for invoice in invoices]
+    lines = select(
+        InvoiceHeader.place_of_supply,
+        InvoiceHeader.is_interstate,
+        InvoiceLineItem.gst_rate,
+        func.sum(InvoiceLineItem.taxable_amount).label('taxable_value'),
+        func.sum(InvoiceLineItem.cgst_amount).label('cgst'),
+        func.sum(InvoiceLineItem.sgst_amount).label('sgst'),
+        func.sum(InvoiceLineItem.igst_amount).label('igst')
+    ).join(InvoiceHeader, InvoiceHeader.invoice_id == InvoiceLineItem.invoice_id).where(
+        InvoiceLineItem.invoice_id.in_([i for i in invoice_ids if i not in large_ids])
+    ).group_by(InvoiceHeader.place_of_supply, InvoiceHeader.is_interstate, InvoiceLineItem.gst_rate)
+    for line in session.execute(lines):
+        row = {
+            'type': 'OE',
+            'place_of_supply': line.place_of_supply,
+            'rate': _money(line.gst_rate),
+            'taxable_value': _money(line.taxable_value),
+            'cgst': _money(line.cgst),
+            'sgst': _money(line.sgst),
+            'igst': _money(line.igst)
+        }
+        report['b2c_small_summary'].append(row)
+        _add_gst(summary['b2c_small'], row)
+
+    hsn = select(
+        InvoiceLineItem.hsn_sac_code,
+        func.min(InvoiceLineItem.item_name).label('description'),
+        func.sum(InvoiceLineItem.quantity).label('total_quantity'),
+        func.sum(InvoiceLineItem.line_total).label('total_value'),
+        func.sum(InvoiceLineItem.taxable_amount).label('taxable_value'),
+        func.sum(InvoiceLineItem.cgst_amount).label('cgst'),
+        func.sum(InvoiceLineItem.sgst_amount).label('sgst'),
+        func.sum(InvoiceLineItem.igst_amount).label('igst')
+    ).where(InvoiceLineItem.invoice_id.in_(invoice_ids)).group_by(InvoiceLineItem.hsn_sac_code)
+    for line in session.execute(hsn):
+        report['hsn_summary'].append({
+            'hsn': line.hsn_sac_code,
+            'description': line.description,
+            'uqc': 'NOS',
+            'total_quantity': _money(line.total_quantity),
+            'total_value': _money(line.total_value),
+            'taxable_value': _money(line.taxable_value),
+            'cgst': _money(line.cgst),
+            'sgst': _money(line.sgst),
+            'igst': _money(line.igst)
+        })
+
+    report['summary'] = {key: _float_totals(value) for key, value in summary.items()}
+    return report
+
+def generate_gstr2a(
+    session: Session,
+    hospital_id: uuid.UUID,
+    month: int,
+    year: int,
+    branch_id: Optional[uuid.UUID] = None
+) -> Dict:
+    """GSTR-2A (inward supplies) for a month from gst_ledger PURCHASE rows and their supplier invoices"""
+    ledger = _gst_ledger_rows(session, hospital_id, month, year, 'PURCHASE', branch_id)
+
+    invoice_ids = []
+    for row in ledger:
+        try:
+            invoice_ids.append(uuid.UUID(row.reference_id))
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ GST purchase entry {row.transaction_reference} has no supplier invoice reference")
+    invoices = {
+        invoice.invoice_id: (invoice, supplier)
+        for invoice, supplier in session.query(SupplierInvoice, Supplier)
+        .join(Supplier, Supplier.supplier_id == SupplierInvoice.supplier_id)
+        .filter(SupplierInvoice.invoice_id.in_(invoice_ids))
+    } if invoice_ids else {}
+
+    b2b = defaultdict(list)
+    totals = _gst_totals()
+    for row in ledger:
+        try:
+            invoice, supplier = invoices[uuid.UUID(row.reference_id)]
+        except (KeyError, TypeError, ValueError):
+            continue
+        gstin = invoice.supplier_gstin or supplier.gst_registration_number
+        tax_type = (supplier.tax_type or '').lower()
+        category = 'composition' if tax_type == 'composition' else 'registered' if gstin else 'unregistered'
+        total = Decimal(str(invoice.total_amount or 0))
+        item = {
+            'supplier_name': supplier.supplier_name,
+            'trade_name': supplier.supplier_name,
+            'gstin': gstin,
+            'invoice_number': invoice.supplier_invoice_number,
+            'invoice_date': invoice.invoice_date.strftime('%d-%m-%Y') if invoice.invoice_date else None,
+            'invoice_value': _money(total),
+            'taxable_value': _money(total - Decimal(str(invoice.total_gst_amount or 0))),
+            'place_of_supply': invoice.place_of_supply,
+            'cgst': _money(row.cgst_input),
+            'sgst': _money(row.sgst_input),
+            'igst': _money(row.igst_input),
+            'eligible_for_itc': bool(row.itc_claimed)
+        }
+        b2b[category].append(item)
+        _add_gst(totals, item)
+
+    empty = _float_totals(_gst_totals())
+    return {
+        'title': 'GSTR-2A Report',
+        'month': month,
+        'year': year,
+        'b2b_invoices': {key: b2b.get(key, []) for key in ('registered', 'unregistered', 'composition')},
+        'credit_debit_notes': [],
+        'summary': {
+            'b2b': _float_totals(totals),
+            'credit_debit_notes': dict(empty),
+            'tds_credits': dict(empty),
+            'total': _float_totals(totals)
+        }
+    }
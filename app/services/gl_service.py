@@ -17,6 +17,7 @@ from app.models.transaction import (
     PatientCreditNote, ARSubledger
 )
 from app.services.database_service import get_db_session, get_entity_dict
+from app.engine.keyset_pagination import paginate_keyset, count_rows, encode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +69,7 @@ def _create_invoice_gl_entries(
         # Create a GL transaction
         gl_transaction = GLTransaction(
             hospital_id=invoice.hospital_id,
+            branch_id=invoice.branch_id,
             transaction_date=invoice.invoice_date,
             transaction_type="SALES_INVOICE",
             reference_id=str(invoice.invoice_id),
@@ -438,7 +440,9 @@ def search_gl_transactions(
     page: int = 1,
     per_page: int = 20,
     include_entries: bool = False,
-    session: Optional[Session] = None
+    session: Optional[Session] = None,
+    cursor: Optional[str] = None,
+    count_mode: str = 'exact'
 ) -> Dict:
     """
     Search GL transactions with filtering and pagination
@@ -456,6 +460,8 @@ def search_gl_transactions(
         per_page: Number of items per page
         include_entries: Whether to include GL entries in results
         session: Database session (optional)
+        cursor: Keyset cursor from a previous page (seek instead of OFFSET)
+        count_mode: 'exact', 'capped' or 'estimated' total count
         
     Returns:
         Dictionary containing transaction list, pagination info
@@ -463,13 +469,15 @@ def search_gl_transactions(
     if session is not None:
         return _search_gl_transactions(
             session, hospital_id, start_date, end_date, transaction_type,
-            reference_id, account_id, min_amount, max_amount, page, per_page, include_entries
+            reference_id, account_id, min_amount, max_amount, page, per_page, include_entries,
+            cursor, count_mode
         )
     
     with get_db_session() as new_session:
         return _search_gl_transactions(
             new_session, hospital_id, start_date, end_date, transaction_type,
-            reference_id, account_id, min_amount, max_amount, page, per_page, include_entries
+            reference_id, account_id, min_amount, max_amount, page, per_page, include_entries,
+            cursor, count_mode
         )
 
 def _search_gl_transactions(
@@ -484,7 +492,9 @@ def _search_gl_transactions(
     max_amount: Optional[Decimal] = None,
     page: int = 1,
     per_page: int = 20,
-    include_entries: bool = False
+    include_entries: bool = False,
+    cursor: Optional[str] = None,
+    count_mode: str = 'exact'
 ) -> Dict:
     """
     Internal function to search GL transactions within a session
@@ -521,14 +531,29 @@ def _search_gl_transactions(
             query = query.filter(GLTransaction.transaction_id.in_(entry_subquery))
             
         # Count total for pagination
-        total_count = query.count()
-        
-        # Apply pagination
-        query = query.order_by(desc(GLTransaction.transaction_date))
-        query = query.offset((page - 1) * per_page).limit(per_page)
-        
-        # Execute query
-        transactions = query.all()
+        total_count, count_info = count_rows(session, query, count_mode)
+        
+        # Apply pagination - seek from the cursor when given, OFFSET otherwise
+        keyset_info = None
+        if cursor:
+            transactions, keyset_info = paginate_keyset(
+                query, GLTransaction.transaction_date, GLTransaction.transaction_id,
+                descending=True, per_page=per_page, cursor=cursor
+            )
+        else:
+            query = query.order_by(desc(GLTransaction.transaction_date), desc(GLTransaction.transaction_id))
+            transactions = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+            has_next = len(transactions) > per_page
+            transactions = transactions[:per_page]
+            if page == 1:
+                # First page also hands out a cursor so callers can switch to seeking
+                keyset_info = {
+                    'has_next': has_next,
+                    'has_prev': False,
+                    'next_cursor': encode_cursor(transactions[-1].transaction_date,
+                                                 transactions[-1].transaction_id) if has_next else None,
+                    'prev_cursor': None
+                }
         
         # Convert to dictionaries
         results = []
@@ -564,6 +589,9 @@ def _search_gl_transactions(
             'total_count': total_count,
             'total_pages': (total_count + per_page - 1) // per_page
         }
+        pagination.update(count_info)
+        if keyset_info:
+            pagination.update(keyset_info)
         
         return {
             'transactions': results,
@@ -623,6 +651,7 @@ def _create_payment_gl_entries(
         # Create a GL transaction
         gl_transaction = GLTransaction(
             hospital_id=payment.hospital_id,
+            branch_id=payment.branch_id,
             transaction_date=payment.payment_date,
             transaction_type="PAYMENT_RECEIPT",
             reference_id=str(payment.payment_id),
@@ -884,6 +913,7 @@ def _create_multi_invoice_payment_gl_entries(
         # Create GL transaction
         gl_transaction = GLTransaction(
             hospital_id=payment.hospital_id,
+            branch_id=payment.branch_id,
             transaction_date=payment.payment_date,
             transaction_type="PAYMENT_RECEIPT",
             reference_id=str(payment.payment_id),
@@ -1051,6 +1081,7 @@ def _create_supplier_invoice_gl_entries(
         # Create a GL transaction
         gl_transaction = GLTransaction(
             hospital_id=invoice.hospital_id,
+            branch_id=invoice.branch_id,
             transaction_date=invoice.invoice_date,
             transaction_type="PURCHASE_INVOICE",
             reference_id=str(invoice.invoice_id),
@@ -1328,6 +1359,7 @@ def _create_supplier_payment_gl_entries(
         # Create a GL transaction
         gl_transaction = GLTransaction(
             hospital_id=payment.hospital_id,
+            branch_id=payment.branch_id,
             transaction_date=payment.payment_date,
             transaction_type="SUPPLIER_PAYMENT",
             reference_id=str(payment.payment_id),
@@ -1660,6 +1692,7 @@ def _reverse_supplier_payment_gl_entries(
         # Create reversal GL transaction
         reversal_gl = GLTransaction(
             hospital_id=payment.hospital_id,
+            branch_id=payment.branch_id,
             transaction_date=datetime.now(),
             transaction_type="SUPPLIER_PAYMENT_REVERSAL",
             reference_id=str(payment.payment_id),
@@ -1825,6 +1858,7 @@ def _create_refund_gl_entries(
         # Create a GL transaction
         gl_transaction = GLTransaction(
             hospital_id=payment.hospital_id,
+            branch_id=payment.branch_id,
             transaction_date=payment.refund_date or datetime.now(timezone.utc),
             transaction_type="PAYMENT_REFUND",
             reference_id=str(payment.payment_id),
@@ -2063,6 +2097,7 @@ def _create_advance_payment_gl_entries(
         # Create a GL transaction
         gl_transaction = GLTransaction(
             hospital_id=advance.hospital_id,
+            branch_id=advance.branch_id,
             transaction_date=advance.payment_date,
             transaction_type="ADVANCE_PAYMENT",
             reference_id=str(advance.advance_id),
@@ -2328,9 +2363,12 @@ def create_advance_adjustment_gl_entries(
         if not advance_account:
             raise ValueError("Advance from Patients GL account not found")
 
+        advance = session.query(PatientAdvancePayment).filter_by(advance_id=advance_id).first()
+
         # Create GL transaction
         gl_transaction = GLTransaction(
             hospital_id=hospital_id,
+            branch_id=advance.branch_id if advance else None,
             transaction_date=adjustment_date,
             transaction_type="ADVANCE_ADJUSTMENT",
             reference_id=str(invoice_id),
@@ -2642,6 +2680,7 @@ def _create_patient_credit_note_gl_entries(
         gl_transaction = GLTransaction(
             transaction_id=uuid.uuid4(),
             hospital_id=credit_note.hospital_id,
+            branch_id=credit_note.branch_id,
             transaction_date=credit_note.credit_note_date,
             transaction_type='credit_note',
             reference_id=str(credit_note.credit_note_id),
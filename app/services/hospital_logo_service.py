@@ -2,7 +2,9 @@
 import os
 import uuid
 import logging
+import threading
 from datetime import datetime
+from io import BytesIO
 from typing import Dict, Any, Optional
 
 from PIL import Image
@@ -13,6 +15,10 @@ from app.models.master import Hospital
 
 logger = logging.getLogger(__name__)
 
+# Resized logos for documents, per process: {(hospital_id, variant): ((path, mtime, size), png_bytes)}
+_logo_variants: Dict[tuple, tuple] = {}
+_logo_variants_lock = threading.Lock()
+
 class HospitalLogoService:
     """Service for managing hospital logos"""
     
@@ -94,6 +100,62 @@ class HospitalLogoService:
         image.thumbnail(size, Image.Resampling.LANCZOS)
         return image
 
+    @classmethod
+    def get_logo_variant(cls, hospital_id: str, logo_file: str, variant: str = 'medium') -> Optional[bytes]:
+        """
+        Logo file resized to a LOGO_SIZES variant, as PNG bytes
+        
+        Decoded once per process and logo version (file path, mtime, size), so
+        documents reuse it instead of decoding the upload for every page.
+        
+        Args:
+            hospital_id: Hospital ID
+            logo_file: Path of the logo image
+            variant: Key of LOGO_SIZES
+        
+        Returns:
+            PNG bytes, or None when the file is missing or cannot be decoded
+        """
+        try:
+            stat = os.stat(logo_file)
+        except OSError:
+            return None
+        
+        key = (str(hospital_id), variant)
+        version = (os.path.abspath(logo_file), stat.st_mtime_ns, stat.st_size)
+        cached = _logo_variants.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        
+        try:
+            with Image.open(logo_file) as image:
+                resized = cls.resize_image(image.copy(), cls.LOGO_SIZES[variant])
+            if resized.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                resized = resized.convert('RGBA')
+            buffer = BytesIO()
+            resized.save(buffer, format='PNG')
+        except Exception as e:
+            logger.warning(f"Could not prepare {variant} logo from {logo_file}: {str(e)}")
+            return None
+        
+        logo_image = buffer.getvalue()
+        with _logo_variants_lock:
+            _logo_variants[key] = (version, logo_image)
+        return logo_image
+
+    @classmethod
+    def clear_logo_variants(cls, hospital_id: Optional[str] = None):
+        """
+        Forget resized logos of one hospital (or all) in this process
+        
+        Args:
+            hospital_id: Hospital ID, None for every hospital
+        """
+        with _logo_variants_lock:
+            for key in list(_logo_variants):
+                if hospital_id is None or key[0] == str(hospital_id):
+                    del _logo_variants[key]
+
     @classmethod
     def save_logo_variants(cls, logo_file, unique_filename: str, upload_dir: str) -> Dict[str, Any]:
         """
@@ -197,6 +259,8 @@ class HospitalLogoService:
                 # Commit changes
                 session.commit()
             
+            cls.clear_logo_variants(hospital_id)
+            
             return {
                 'success': True, 
                 'message': 'Logo uploaded successfully',
@@ -225,4 +289,5 @@ class HospitalLogoService:
                     logger.error(f"Error removing logo file: {str(e)}")
             
             # Clear logo information
-            hospital.logo = None
\ No newline at end of file
+            hospital.logo = None
+            cls.clear_logo_variants(hospital.hospital_id)
\ No newline at end of file
@@ -1,6 +1,6 @@
 # app/services/inventory_service.py
 
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone, timedelta, date
 import uuid
 from typing import Dict, List, Optional, Tuple, Union
 from decimal import Decimal
@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 from app.models.master import Medicine, ChartOfAccounts
 from app.models.transaction import Inventory, SupplierInvoice, SupplierInvoiceLine
 from app.services.database_service import get_db_session, get_entity_dict
+from app.services.stock_position_service import get_batch_positions, get_batch_position
 
 logger = logging.getLogger(__name__)
 
@@ -189,12 +190,10 @@ def _record_stock_adjustment(
         if not medicine:
             raise ValueError(f"Medicine with ID {medicine_id} not found")
         
-        # Get the latest inventory entry for this medicine and batch
-        latest_inventory = session.query(Inventory).filter(
-            Inventory.hospital_id == hospital_id,
-            Inventory.medicine_id == medicine_id,
-            Inventory.batch == batch
-        ).order_by(Inventory.created_at.desc()).first()
+        # Current position of this medicine and batch (row locked until commit)
+        latest_inventory = get_batch_position(
+            session, hospital_id, medicine_id, batch, for_update=True
+        )
         
         if not latest_inventory:
             raise ValueError(f"No inventory found for medicine {medicine.medicine_name}, batch {batch}")
@@ -316,11 +315,9 @@ def _record_stock_from_supplier_invoice(
             unit_price = item.pack_purchase_price / item.units_per_pack if item.units_per_pack > 0 else item.pack_purchase_price
             
             # Check if there's existing stock for this batch
-            latest_inventory = session.query(Inventory).filter(
-                Inventory.hospital_id == hospital_id,
-                Inventory.medicine_id == item.medicine_id,
-                Inventory.batch == item.batch_number
-            ).order_by(Inventory.created_at.desc()).first()
+            latest_inventory = get_batch_position(
+                session, hospital_id, item.medicine_id, item.batch_number, for_update=True
+            )
             
             current_stock = (latest_inventory.current_stock if latest_inventory else 0) + item.units
             
@@ -440,39 +437,11 @@ def _get_stock_details(
     Internal function to get current stock details with batch information within a session
     """
     try:
-        # Get latest inventory for each medicine by batch
-        # We'll use a window function to find the latest entry for each medicine/batch
-        from sqlalchemy.sql import text
-        
-        query = text("""
-            WITH latest_inventory AS (
-                SELECT 
-                    i.*,
-                    ROW_NUMBER() OVER (PARTITION BY i.medicine_id, i.batch ORDER BY i.created_at DESC) as rn
-                FROM inventory i
-                WHERE i.hospital_id = :hospital_id
-                    AND (:medicine_id IS NULL OR i.medicine_id = :medicine_id)
-                    AND (:batch IS NULL OR i.batch = :batch)
-            )
-            SELECT * FROM latest_inventory
-            WHERE rn = 1 AND current_stock > 0
-            ORDER BY medicine_name, expiry
-        """)
-        
-        result = session.execute(query, {
-            'hospital_id': hospital_id,
-            'medicine_id': medicine_id,
-            'batch': batch
-        })
-        
-        # Convert to list of dictionaries
-        stock_details = []
-        for row in result:
-            # Create a dict from the row
-            row_dict = {column: getattr(row, column) for column in row._mapping.keys()}
-            stock_details.append(row_dict)
-            
-        return stock_details
+        # Current stock per medicine/batch from the stock_position snapshot
+        positions = get_batch_positions(session, hospital_id, medicine_id=medicine_id, batch=batch)
+        positions.sort(key=lambda p: (p.medicine_name or '', p.expiry or date.max))
+
+        return [position.to_dict() for position in positions]
         
     except Exception as e:
         logger.error(f"Error getting stock details: {str(e)}")
@@ -561,39 +530,16 @@ def _get_expiring_medicines(
         today = datetime.now(timezone.utc).date()
         expiry_date = today + timedelta(days=days)
         
-        # We'll use a window function to find the latest entry for each medicine/batch
-        from sqlalchemy.sql import text
-        
-        query = text("""
-            WITH latest_inventory AS (
-                SELECT 
-                    i.*,
-                    ROW_NUMBER() OVER (PARTITION BY i.medicine_id, i.batch ORDER BY i.created_at DESC) as rn
-                FROM inventory i
-                WHERE i.hospital_id = :hospital_id
-            )
-            SELECT li.* FROM latest_inventory li
-            WHERE li.rn = 1 
-              AND li.current_stock > 0 
-              AND li.expiry BETWEEN :today AND :expiry_date
-            ORDER BY li.expiry
-        """)
-        
-        result = session.execute(query, {
-            'hospital_id': hospital_id,
-            'today': today,
-            'expiry_date': expiry_date
-        })
+        positions = get_batch_positions(
+            session, hospital_id, expiry_from=today, expiry_to=expiry_date
+        )
         
-        # Convert to list of dictionaries
         expiring_items = []
-        for row in result:
-            # Create a dict from the row
-            row_dict = {column: getattr(row, column) for column in row._mapping.keys()}
+        for position in positions:
+            row_dict = position.to_dict()
             
             # Calculate days until expiry
-            days_until_expiry = (row_dict['expiry'] - today).days
-            row_dict['days_until_expiry'] = days_until_expiry
+            row_dict['days_until_expiry'] = (row_dict['expiry'] - today).days
             
             expiring_items.append(row_dict)
             
@@ -732,33 +678,8 @@ def _get_available_batches_for_item(
     Internal function to get all available batches for an item
     """
     try:
-        from sqlalchemy.sql import text
-
-        # Query to get latest inventory for each batch with available stock
-        query = text("""
-            WITH latest_inventory AS (
-                SELECT
-                    i.*,
-                    ROW_NUMBER() OVER (PARTITION BY i.batch ORDER BY i.created_at DESC) as rn
-                FROM inventory i
-                WHERE i.hospital_id = :hospital_id
-                  AND i.medicine_id = :item_id
-            )
-            SELECT
-                batch,
-                expiry,
-                current_stock,
-                unit_price,
-                sale_price
-            FROM latest_inventory
-            WHERE rn = 1 AND current_stock > 0
-            ORDER BY expiry ASC  -- FIFO: oldest expiry first
-        """)
-
-        result = session.execute(query, {
-            'hospital_id': hospital_id,
-            'item_id': item_id
-        })
+        # Batches with available stock, oldest expiry first (FIFO)
+        result = get_batch_positions(session, hospital_id, medicine_id=item_id, branch_id=branch_id)
 
         # Format batches for dropdown display
         batches = []
@@ -817,40 +738,15 @@ def _get_batch_selection_for_invoice(
     Internal function to get batch selection for invoice based on FIFO
     """
     try:
-        # CONSOLIDATE multiple inventory records for same batch
-        # Aggregate stock across all records, allocate FIFO by earliest expiry
-        from sqlalchemy.sql import text
-
-        query = text("""
-            SELECT
-                i.batch,
-                MIN(i.expiry) as expiry,  -- Earliest expiry for FIFO
-                SUM(i.current_stock) as current_stock,  -- Total stock across all records
-                -- Weighted average price based on stock
-                SUM(i.sale_price * i.current_stock) / NULLIF(SUM(i.current_stock), 0) as sale_price,
-                SUM(i.unit_price * i.current_stock) / NULLIF(SUM(i.current_stock), 0) as unit_price,
-                MAX(i.pack_mrp) as pack_mrp
-            FROM inventory i
-            WHERE i.hospital_id = :hospital_id
-              AND i.medicine_id = :medicine_id
-              AND i.current_stock > 0  -- Only batches with stock
-            GROUP BY i.batch
-            ORDER BY MIN(i.expiry)  -- FIFO based on earliest expiry
-        """)
-        
-        result = session.execute(query, {
-            'hospital_id': hospital_id,
-            'medicine_id': medicine_id
-        })
+        # One row per batch with stock, earliest expiry first (FIFO)
+        result = [position.to_dict() for position in
+                  get_batch_positions(session, hospital_id, medicine_id=medicine_id)]
         
         # Process batches based on FIFO
         remaining_quantity = quantity_needed
         batch_selection = []
         
-        for row in result:
-            # Convert row to dict
-            batch_info = {column: getattr(row, column) for column in row._mapping.keys()}
-            
+        for batch_info in result:
             if remaining_quantity <= 0:
                 break
                 
@@ -1089,11 +985,9 @@ def _consume_medicine_for_procedure(
                     inventory_entry.created_by = current_user_id
                 
                 # Get the latest inventory for this batch to update current stock
-                latest_inventory = session.query(Inventory).filter(
-                    Inventory.hospital_id == hospital_id,
-                    Inventory.medicine_id == standard.medicine_id,
-                    Inventory.batch == batch['batch']
-                ).order_by(Inventory.created_at.desc()).first()
+                latest_inventory = get_batch_position(
+                    session, hospital_id, standard.medicine_id, batch['batch'], for_update=True
+                )
                 
                 if latest_inventory:
                     inventory_entry.current_stock = latest_inventory.current_stock - batch['quantity']
@@ -1197,11 +1091,9 @@ def _update_inventory_for_invoice(
                 continue
             
             # Get the latest inventory for this batch
-            latest_inventory = session.query(Inventory).filter(
-                Inventory.hospital_id == hospital_id,
-                Inventory.medicine_id == medicine_id,
-                Inventory.batch == batch
-            ).order_by(Inventory.created_at.desc()).first()
+            latest_inventory = get_batch_position(
+                session, hospital_id, medicine_id, batch, for_update=True
+            )
             
             if not latest_inventory:
                 logger.warning(f"No inventory found for medicine {medicine.medicine_name}, batch {batch}")
@@ -1,6 +1,7 @@
 # File: app/services/invoice_document_service.py
 # Invoice-specific document service for generating and storing invoice PDFs
 # Extends existing UniversalDocumentService with invoice-specific functionality
+# PDFs are rendered by the document render queue (document_render_service)
 
 import os
 import uuid
@@ -9,11 +10,14 @@ from datetime import datetime, timezone
 from typing import Dict, Optional
 from pathlib import Path
 
-from flask import current_app, render_template
+from flask import current_app, has_request_context, render_template, request
 from flask_login import current_user
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 
-from app.models.transaction import InvoiceHeader, InvoiceDocument
-from app.services.database_service import get_db_session
+from app.models.transaction import InvoiceHeader, InvoiceDocument, DocumentRenderJob
+from app.services.database_service import get_db_session, get_detached_copy
+from app.services.document_render_service import get_render_queue, html_to_pdf, invoice_pdf_key
 from app.engine.document_service import get_document_service
 
 logger = logging.getLogger(__name__)
@@ -21,7 +25,7 @@ logger = logging.getLogger(__name__)
 class InvoiceDocumentService:
     """
     Service for generating and storing invoice PDFs
-    Uses existing UniversalDocumentService for PDF generation
+    Queues rendering on the document render queue; renders on demand for print
     Adds invoice-specific metadata tracking and storage
     """
 
@@ -39,6 +43,99 @@ class InvoiceDocumentService:
 
         return base_path
 
+    def enqueue_invoice_pdf(
+        self,
+        session,
+        invoice: InvoiceHeader,
+        trigger: str = 'on_creation',
+        user_id: Optional[str] = None,
+        version: int = 1,
+        parent_document: Optional[InvoiceDocument] = None,
+        description: Optional[str] = None
+    ) -> InvoiceDocument:
+        """
+        Queue the invoice PDF in the caller's transaction: a 'pending' InvoiceDocument
+        with its file name assigned, and a DocumentRenderJob rendered once it commits.
+        Idempotent per (invoice, version) - a repeated call returns the queued document.
+
+        Args:
+            session: Session of the invoice transaction
+            invoice: Invoice header (flushed)
+            trigger: What triggered generation (on_creation, manual_regenerate, revision)
+            user_id: User ID who triggered generation
+            version: Document version (1 on creation)
+            parent_document: Document this version replaces once generated
+
+        Returns:
+            InvoiceDocument (document_status 'pending' until rendered)
+        """
+        idempotency_key = invoice_pdf_key(invoice.invoice_id, version)
+
+        existing_job = session.query(DocumentRenderJob).filter_by(idempotency_key=idempotency_key).first()
+        if existing_job:
+            return existing_job.document
+
+        hospital_id = invoice.hospital_id
+        from app.models.master import Hospital
+        hospital = session.query(Hospital).filter_by(hospital_id=hospital_id).first()
+        metadata = self._snapshot_metadata(invoice, hospital)
+        file_info = self._assign_file_storage(invoice, hospital_id)
+        queued_at = datetime.now(timezone.utc).strftime('%d-%b-%Y %H:%M')
+
+        invoice_doc = InvoiceDocument(
+            document_id=uuid.uuid4(),
+            hospital_id=hospital_id,
+            branch_id=invoice.branch_id,
+            invoice_id=invoice.invoice_id,
+            document_type='invoice_pdf',
+            document_category='billing',
+            document_status='pending',
+            original_filename=file_info['original_filename'],
+            stored_filename=file_info['stored_filename'],
+            file_path=file_info['file_path'],
+            mime_type='application/pdf',
+            file_extension='pdf',
+            is_original=True,
+            parent_document_id=parent_document.document_id if parent_document else None,
+            version_number=version,
+            description=description or f"Invoice {invoice.invoice_number} generated on {queued_at}",
+            generation_trigger=trigger,
+            tags=[],
+            created_by=user_id,
+            **metadata
+        )
+        job = DocumentRenderJob(
+            job_id=uuid.uuid4(),
+            hospital_id=hospital_id,
+            invoice_id=invoice.invoice_id,
+            document_id=invoice_doc.document_id,
+            idempotency_key=idempotency_key,
+            job_type='invoice_pdf',
+            status='queued',
+            attempts=0,
+            max_attempts=get_render_queue().max_attempts,
+            base_url=self._base_url(),
+            created_by=user_id
+        )
+
+        try:
+            # Savepoint: a concurrent enqueue of the same version must not break the invoice transaction
+            with session.begin_nested():
+                session.add(invoice_doc)
+                session.flush()
+                session.add(job)
+                session.flush()
+        except IntegrityError:
+            existing_job = session.query(DocumentRenderJob).filter_by(idempotency_key=idempotency_key).one()
+            return existing_job.document
+
+        get_render_queue().track(session, job)
+        logger.info(f"Queued invoice PDF: {invoice.invoice_number} v{version} (document_id: {invoice_doc.document_id})")
+        logger.info(f"   Drug License: {metadata['hospital_had_drug_license']}, "
+                    f"Rx Items: {metadata['prescription_items_count']}, "
+                    f"Consolidated: {metadata['consolidated_prescription']}")
+        return invoice_doc
+
     def generate_and_store_invoice_pdf(
         self,
         invoice_id: uuid.UUID,
@@ -47,7 +144,7 @@ class InvoiceDocumentService:
         trigger: str = 'on_creation'
     ) -> Optional[InvoiceDocument]:
         """
-        Generate invoice PDF and store in database with metadata
+        Queue generation of the invoice PDF (rendered by the document render queue)
 
         Args:
             invoice_id: Invoice UUID
@@ -56,11 +153,10 @@ class InvoiceDocumentService:
             trigger: What triggered generation (on_creation, manual_regenerate, revision)
 
         Returns:
-            InvoiceDocument record or None if failed
+            InvoiceDocument record ('pending' until rendered) or None if failed
         """
         try:
             with get_db_session() as session:
-                # Get invoice header with line items
                 invoice = session.query(InvoiceHeader).filter(
                     InvoiceHeader.invoice_id == invoice_id,
                     InvoiceHeader.hospital_id == hospital_id
@@ -70,82 +166,36 @@ class InvoiceDocumentService:
                     logger.error(f"Invoice not found: {invoice_id}")
                     return None
 
-                # Get hospital to check drug license status
-                from app.models.master import Hospital
-                hospital = session.query(Hospital).filter_by(
-                    hospital_id=hospital_id
-                ).first()
-
-                if not hospital:
-                    logger.error(f"Hospital not found: {hospital_id}")
-                    return None
-
-                # Check drug license status (snapshot for this document)
-                has_drug_license = self._check_drug_license(hospital)
-
-                # Count prescription items and check if consolidated
-                prescription_count = 0
-                is_consolidated = False
-
-                for line_item in invoice.line_items:
-                    if line_item.is_prescription_item:
-                        prescription_count += 1
-                        if line_item.print_as_consolidated:
-                            is_consolidated = True
-
-                # Generate PDF using existing print template
-                pdf_content = self._render_invoice_pdf(invoice_id, hospital_id, session)
-
-                if not pdf_content:
-                    logger.error(f"Failed to generate PDF for invoice {invoice_id}")
-                    return None
-
-                # Prepare file storage
-                file_info = self._prepare_file_storage(
-                    invoice=invoice,
-                    hospital_id=hospital_id,
-                    pdf_content=pdf_content
-                )
-
-                # Create InvoiceDocument record
-                invoice_doc = InvoiceDocument(
-                    hospital_id=hospital_id,
-                    branch_id=invoice.branch_id,
-                    invoice_id=invoice_id,
-                    document_type='invoice_pdf',
-                    document_category='billing',
-                    document_status='generated',
-                    original_filename=file_info['original_filename'],
-                    stored_filename=file_info['stored_filename'],
-                    file_path=file_info['file_path'],
-                    file_size=file_info['file_size'],
-                    mime_type='application/pdf',
-                    file_extension='pdf',
-                    is_original=True,
-                    version_number=1,
-                    # Snapshot metadata
-                    hospital_had_drug_license=has_drug_license,
-                    prescription_items_count=prescription_count,
-                    consolidated_prescription=is_consolidated,
-                    description=f"Invoice {invoice.invoice_number} generated on {datetime.now(timezone.utc).strftime('%d-%b-%Y %H:%M')}",
-                    generation_trigger=trigger,
-                    tags=[]
-                )
+                invoice_doc = self.enqueue_invoice_pdf(session, invoice, trigger=trigger, user_id=user_id)
+                session.commit()
+                return get_detached_copy(invoice_doc)
 
-                if user_id:
-                    invoice_doc.created_by = user_id
+        except Exception as e:
+            logger.error(f"Error queueing invoice PDF: {str(e)}", exc_info=True)
+            return None
 
-                session.add(invoice_doc)
-                session.commit()
+    def _snapshot_metadata(self, invoice, hospital) -> Dict:
+        """What was printed at the time: drug license status and prescription items"""
+        prescription_count = 0
+        is_consolidated = False
 
-                logger.info(f"✅ Generated and stored invoice PDF: {invoice.invoice_number} (document_id: {invoice_doc.document_id})")
-                logger.info(f"   Drug License: {has_drug_license}, Rx Items: {prescription_count}, Consolidated: {is_consolidated}")
+        for line_item in invoice.line_items:
+            if line_item.is_prescription_item:
+                prescription_count += 1
+                if line_item.print_as_consolidated:
+                    is_consolidated = True
 
-                return invoice_doc
+        return {
+            'hospital_had_drug_license': self._check_drug_license(hospital) if hospital else False,
+            'prescription_items_count': prescription_count,
+            'consolidated_prescription': is_consolidated
+        }
 
-        except Exception as e:
-            logger.error(f"Error generating invoice PDF: {str(e)}", exc_info=True)
-            return None
+    def _base_url(self) -> str:
+        """Base URL for static assets in the rendered template"""
+        if has_request_context():
+            return request.host_url
+        return current_app.config.get('BASE_URL', '/')
 
     def _check_drug_license(self, hospital) -> bool:
         """Check if hospital has valid pharmacy registration"""
@@ -166,73 +216,93 @@ class InvoiceDocumentService:
 
         return True
 
-    def _render_invoice_pdf(
+    def render_invoice_html(
         self,
         invoice_id: uuid.UUID,
         hospital_id: uuid.UUID,
-        session
-    ) -> Optional[bytes]:
+        session,
+        base_url: Optional[str] = None
+    ) -> Optional[str]:
         """
-        Render invoice as PDF using existing print template
+        Render the invoice print template for PDF conversion. Outside a request
+        (render queue workers) a request context on base_url is pushed so the
+        template's url_for() calls build absolute static URLs.
 
         Returns:
-            PDF bytes or None if failed
+            HTML string or None if the invoice or hospital is not found
         """
-        try:
-            from weasyprint import HTML, CSS
-            from app.models.master import Hospital, Branch
+        from app.models.master import Hospital, Branch
 
-            # Get invoice with all relationships
-            invoice = session.query(InvoiceHeader).filter(
-                InvoiceHeader.invoice_id == invoice_id,
-                InvoiceHeader.hospital_id == hospital_id
-            ).first()
+        # Get invoice with all relationships
+        invoice = session.query(InvoiceHeader).filter(
+            InvoiceHeader.invoice_id == invoice_id,
+            InvoiceHeader.hospital_id == hospital_id
+        ).first()
 
-            if not invoice:
-                logger.error(f"Invoice not found: {invoice_id}")
-                return None
+        if not invoice:
+            logger.error(f"Invoice not found: {invoice_id}")
+            return None
+
+        # Get hospital information
+        hospital = session.query(Hospital).filter_by(
+            hospital_id=hospital_id
+        ).first()
+
+        if not hospital:
+            logger.error(f"Hospital not found: {hospital_id}")
+            return None
 
-            # Get hospital information
-            hospital = session.query(Hospital).filter_by(
-                hospital_id=hospital_id
+        # Get branch information
+        branch = None
+        if invoice.branch_id:
+            branch = session.query(Branch).filter_by(
+                branch_id=invoice.branch_id
             ).first()
 
-            if not hospital:
-                logger.error(f"Hospital not found: {hospital_id}")
-                return None
+        # Get hospital logo URL (if exists)
+        logo_url = None
+        if hasattr(hospital, 'logo_url') and hospital.logo_url:
+            logo_url = hospital.logo_url
+        elif hasattr(hospital, 'logo_path') and hospital.logo_path:
+            # Convert file path to URL if needed
+            logo_url = f"/static/logos/{Path(hospital.logo_path).name}"
+
+        # Prepare context for template
+        context = {
+            'invoice': invoice,
+            'hospital': hospital,
+            'branch': branch,
+            'logo_url': logo_url,
+            'current_date': datetime.now(timezone.utc)
+        }
 
-            # Get branch information
-            branch = None
-            if invoice.branch_id:
-                branch = session.query(Branch).filter_by(
-                    branch_id=invoice.branch_id
-                ).first()
+        if has_request_context():
+            return render_template('billing/print_invoice.html', **context)
+        with current_app.test_request_context(base_url=base_url if base_url and base_url != '/' else None):
+            return render_template('billing/print_invoice.html', **context)
+
+    def _render_invoice_pdf(
+        self,
+        invoice_id: uuid.UUID,
+        hospital_id: uuid.UUID,
+        session
+    ) -> Optional[bytes]:
+        """
+        Render invoice as PDF in this thread (on-demand fallback for documents not rendered yet)
 
-            # Get hospital logo URL (if exists)
-            logo_url = None
-            if hasattr(hospital, 'logo_url') and hospital.logo_url:
-                logo_url = hospital.logo_url
-            elif hasattr(hospital, 'logo_path') and hospital.logo_path:
-                # Convert file path to URL if needed
-                logo_url = f"/static/logos/{Path(hospital.logo_path).name}"
-
-            # Prepare context for template
-            context = {
-                'invoice': invoice,
-                'hospital': hospital,
-                'branch': branch,
-                'logo_url': logo_url,
-                'current_date': datetime.now(timezone.utc)
-            }
-
-            # Render HTML template
-            html_string = render_template('billing/print_invoice.html', **context)
+        Returns:
+            PDF bytes or None if failed
+        """
+        try:
+            html_string = self.render_invoice_html(invoice_id, hospital_id, session)
+            if html_string is None:
+                return None
 
             # Convert HTML to PDF using WeasyPrint
-            logger.info(f"Converting invoice {invoice.invoice_number} HTML to PDF...")
-            pdf_bytes = HTML(string=html_string, base_url=current_app.config.get('BASE_URL', '/')).write_pdf()
+            logger.info(f"Converting invoice {invoice_id} HTML to PDF on demand...")
+            pdf_bytes = html_to_pdf(html_string, base_url=self._base_url())
 
-            logger.info(f"✅ Successfully generated PDF for invoice {invoice.invoice_number} ({len(pdf_bytes)} bytes)")
+            logger.info(f"✅ Successfully generated PDF for invoice {invoice_id} ({len(pdf_bytes)} bytes)")
             return pdf_bytes
 
         except ImportError as e:
@@ -243,22 +313,20 @@ class InvoiceDocumentService:
             logger.error(f"Error rendering invoice PDF: {str(e)}", exc_info=True)
             return None
 
-    def _prepare_file_storage(
+    def _assign_file_storage(
         self,
         invoice,
-        hospital_id: uuid.UUID,
-        pdf_content: bytes
+        hospital_id: uuid.UUID
     ) -> Dict:
         """
-        Prepare file storage location and save PDF
+        Assign the storage location of an invoice PDF (written by the render queue)
 
         Returns:
-            Dict with file info (original_filename, stored_filename, file_path, file_size)
+            Dict with file info (original_filename, stored_filename, file_path relative to storage)
         """
-        # Create directory structure: YYYY/MM/hospital_id/
+        # Directory structure: YYYY/MM/hospital_id/
         now = datetime.now(timezone.utc)
-        year_month_path = self.storage_base_path / str(now.year) / f"{now.month:02d}" / str(hospital_id)
-        year_month_path.mkdir(parents=True, exist_ok=True)
+        year_month_path = Path(str(now.year)) / f"{now.month:02d}" / str(hospital_id)
 
         # Generate filenames
         invoice_number_safe = invoice.invoice_number.replace('/', '-').replace('\\', '-')
@@ -267,51 +335,100 @@ class InvoiceDocumentService:
         original_filename = f"INV-{invoice_number_safe}.pdf"
         stored_filename = f"INV-{invoice_number_safe}_{timestamp}_{uuid.uuid4().hex[:8]}.pdf"
 
-        # Full file path
-        file_path = year_month_path / stored_filename
-
-        # Save PDF content
-        with open(file_path, 'wb') as f:
-            f.write(pdf_content)
-
-        file_size = len(pdf_content)
-
-        # Return relative path for database storage
-        relative_path = str(file_path.relative_to(self.storage_base_path))
-
         return {
             'original_filename': original_filename,
             'stored_filename': stored_filename,
-            'file_path': relative_path,
-            'file_size': file_size
+            'file_path': str(year_month_path / stored_filename)
         }
 
     def get_latest_invoice_document(
         self,
         invoice_id: uuid.UUID,
-        hospital_id: uuid.UUID
+        hospital_id: uuid.UUID,
+        status: Optional[str] = None
     ) -> Optional[InvoiceDocument]:
         """
-        Get the latest (most recent) invoice document
+        Get the latest (highest version) invoice document
+
+        Args:
+            status: Only documents in this status (e.g. 'generated'); default any but superseded
 
         Returns:
             InvoiceDocument or None
         """
         try:
             with get_db_session() as session:
-                doc = session.query(InvoiceDocument).filter(
+                query = session.query(InvoiceDocument).filter(
                     InvoiceDocument.invoice_id == invoice_id,
                     InvoiceDocument.hospital_id == hospital_id,
-                    InvoiceDocument.is_original == True,
-                    InvoiceDocument.document_status != 'superseded'
-                ).order_by(InvoiceDocument.created_at.desc()).first()
+                    InvoiceDocument.is_original == True
+                )
+                if status:
+                    query = query.filter(InvoiceDocument.document_status == status)
+                else:
+                    query = query.filter(InvoiceDocument.document_status != 'superseded')
+
+                doc = query.order_by(
+                    InvoiceDocument.version_number.desc(),
+                    InvoiceDocument.created_at.desc()
+                ).first()
 
-                return doc
+                return get_detached_copy(doc) if doc else None
 
         except Exception as e:
             logger.error(f"Error getting latest invoice document: {str(e)}")
             return None
 
+    def get_invoice_pdf(
+        self,
+        invoice_id: uuid.UUID,
+        hospital_id: uuid.UUID,
+        user_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        PDF for the print endpoints: the stored file of the latest generated document,
+        or - while it is still pending, failed or missing - a PDF rendered on demand
+
+        Returns:
+            Dict with filename and either file_path (stored) or content (on demand), or None
+        """
+        doc = self.get_latest_invoice_document(invoice_id, hospital_id, status='generated')
+        if doc:
+            file_path = self.storage_base_path / doc.file_path
+            if file_path.is_file():
+                self._record_access(doc.document_id, user_id)
+                return {'filename': doc.original_filename, 'file_path': file_path, 'content': None}
+            logger.warning(f"⚠️ Stored invoice PDF missing: {file_path}")
+
+        with get_db_session(read_only=True) as session:
+            invoice = session.query(InvoiceHeader.invoice_number).filter(
+                InvoiceHeader.invoice_id == invoice_id,
+                InvoiceHeader.hospital_id == hospital_id
+            ).first()
+            if not invoice:
+                return None
+            pdf_content = self._render_invoice_pdf(invoice_id, hospital_id, session)
+
+        if not pdf_content:
+            return None
+        invoice_number_safe = invoice.invoice_number.replace('/', '-').replace('\\', '-')
+        return {'filename': f"INV-{invoice_number_safe}.pdf", 'file_path': None, 'content': pdf_content}
+
+    def _record_access(self, document_id: uuid.UUID, user_id: Optional[str]):
+        """Access tracking for served documents (never blocks serving)"""
+        try:
+            with get_db_session() as session:
+                session.query(InvoiceDocument).filter(
+                    InvoiceDocument.document_id == document_id
+                ).update({
+                    InvoiceDocument.last_accessed_at: datetime.now(timezone.utc),
+                    InvoiceDocument.last_accessed_by: user_id,
+                    InvoiceDocument.access_count: func.coalesce(InvoiceDocument.access_count, 0) + 1
+                }, synchronize_session=False)
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Could not record invoice document access: {str(e)}")
+
     def regenerate_invoice_pdf(
         self,
         invoice_id: uuid.UUID,
@@ -320,37 +437,45 @@ class InvoiceDocumentService:
         reason: str = 'Manual regeneration'
     ) -> Optional[InvoiceDocument]:
         """
-        Regenerate invoice PDF and mark previous version as superseded
+        Queue a new version of the invoice PDF. The previous version stays the
+        served document until the new one is generated, then it is superseded.
 
         Returns:
-            New InvoiceDocument or None
+            New InvoiceDocument ('pending') or None
         """
         try:
             with get_db_session() as session:
-                # Mark existing document as superseded
-                existing_doc = self.get_latest_invoice_document(invoice_id, hospital_id)
-
-                if existing_doc:
-                    existing_doc.document_status = 'superseded'
-                    session.add(existing_doc)
-                    session.commit()
-
-                # Generate new document
-                new_doc = self.generate_and_store_invoice_pdf(
-                    invoice_id=invoice_id,
-                    hospital_id=hospital_id,
+                invoice = session.query(InvoiceHeader).filter(
+                    InvoiceHeader.invoice_id == invoice_id,
+                    InvoiceHeader.hospital_id == hospital_id
+                ).first()
+
+                if not invoice:
+                    logger.error(f"Invoice not found: {invoice_id}")
+                    return None
+
+                existing_doc = session.query(InvoiceDocument).filter(
+                    InvoiceDocument.invoice_id == invoice_id,
+                    InvoiceDocument.hospital_id == hospital_id,
+                    InvoiceDocument.document_status == 'generated'
+                ).order_by(InvoiceDocument.version_number.desc()).first()
+
+                latest_version = session.query(func.max(InvoiceDocument.version_number)).filter(
+                    InvoiceDocument.invoice_id == invoice_id
+                ).scalar() or 0
+
+                description = f"{reason} - Previous version superseded" if existing_doc else reason
+                new_doc = self.enqueue_invoice_pdf(
+                    session, invoice,
+                    trigger='manual_regenerate',
                     user_id=user_id,
-                    trigger='manual_regenerate'
+                    version=latest_version + 1,
+                    parent_document=existing_doc,
+                    description=description
                 )
+                session.commit()
 
-                if new_doc:
-                    new_doc.description = f"{reason} - Previous version superseded"
-                    new_doc.parent_document_id = existing_doc.document_id if existing_doc else None
-                    new_doc.version_number = (existing_doc.version_number + 1) if existing_doc else 1
-                    session.add(new_doc)
-                    session.commit()
-
-                return new_doc
+                return get_detached_copy(new_doc)
 
         except Exception as e:
             logger.error(f"Error regenerating invoice PDF: {str(e)}", exc_info=True)
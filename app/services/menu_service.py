@@ -1,5 +1,13 @@
 # app/services/menu_service.py
 
+import threading
+from collections import OrderedDict
+
+# Built menus per principal version (see get_menu_for_principal)
+MENU_CACHE_SIZE = 1024
+_menu_cache = OrderedDict()
+_menu_cache_lock = threading.Lock()
+
 class MenuService:
     """Service for generating menus based on user roles and permissions."""
     
@@ -174,6 +182,32 @@ class MenuService:
             }
         ]
 
+def get_menu_for_principal(user):
+    """
+    Menu items for an authenticated user, memoized per principal version.
+    The menu depends only on the user's role, so it is rebuilt only when the
+    principal is (role/user changes bump its version).
+    """
+    from app.utils.menu_utils import get_menu_items
+    from app.services.user_principal_service import UserPrincipal
+
+    if not isinstance(user, UserPrincipal):
+        return get_menu_items(user)
+
+    key = (user.user_id, user.version, user.entity_type)
+    with _menu_cache_lock:
+        menu = _menu_cache.get(key)
+        if menu is not None:
+            _menu_cache.move_to_end(key)
+            return menu
+
+    menu = get_menu_items(user)
+    with _menu_cache_lock:
+        _menu_cache[key] = menu
+        while len(_menu_cache) > MENU_CACHE_SIZE:
+            _menu_cache.popitem(last=False)
+    return menu
+
 def register_menu_context_processor(app):
     """Register menu context processor with Flask app.
 
@@ -185,13 +219,12 @@ def register_menu_context_processor(app):
     @app.context_processor
     def inject_menu():
         from flask_login import current_user
-        from app.utils.menu_utils import get_menu_items
 
         # Use the correct menu function from menu_utils.py
         # which includes all the proper menu items including Appointments
         if current_user and current_user.is_authenticated:
             return {
-                'menu_items': get_menu_items(current_user)
+                'menu_items': get_menu_for_principal(current_user._get_current_object())
             }
         else:
             # Fallback for unauthenticated users
@@ -23,6 +23,7 @@ from sqlalchemy.orm import Session
 from app.models.transaction import PatientCreditNote, InvoiceHeader, PackagePaymentPlan, GLTransaction, GLEntry, ARSubledger
 from app.models.master import Patient, ChartOfAccounts
 from app.services.database_service import get_db_session
+from app.services.sequence_allocator_service import next_document_number
 
 logger = logging.getLogger(__name__)
 
@@ -44,33 +45,11 @@ class PatientCreditNoteService:
             Credit note number string
         """
         def _generate_number(db_session):
-            # Get current financial year
-            today = date.today()
-            if today.month >= 4:  # April onwards = current FY
-                fy_start = today.year
-                fy_end = today.year + 1
-            else:  # Jan-Mar = previous FY
-                fy_start = today.year - 1
-                fy_end = today.year
-
-            fy_string = f"{fy_start}-{fy_end}"
-
-            # Get last credit note number for this FY
-            last_credit_note = db_session.query(PatientCreditNote).filter(
-                and_(
-                    PatientCreditNote.hospital_id == hospital_id,
-                    PatientCreditNote.credit_note_number.like(f'CN/{fy_string}/%')
-                )
-            ).order_by(PatientCreditNote.credit_note_number.desc()).first()
-
-            if last_credit_note:
-                # Extract sequence number and increment
-                last_number = last_credit_note.credit_note_number.split('/')[-1]
-                next_sequence = int(last_number) + 1
-            else:
-                next_sequence = 1
-
-            credit_note_number = f"CN/{fy_string}/{next_sequence:05d}"
+            credit_note_number = next_document_number(
+                hospital_id, 'CN',
+                session=db_session,
+                seed_column=PatientCreditNote.credit_note_number
+            )
             logger.info(f"Generated credit note number: {credit_note_number}")
 
             return credit_note_number
@@ -145,7 +124,7 @@ class PatientCreditNoteService:
                     }
 
                 # Generate credit note number
-                credit_note_number = self.generate_credit_note_number(hospital_id, branch_id)
+                credit_note_number = self.generate_credit_note_number(hospital_id, branch_id, session=session)
 
                 # Create credit note
                 credit_note = PatientCreditNote(
@@ -347,6 +326,7 @@ class PatientCreditNoteService:
             gl_transaction = GLTransaction(
                 transaction_id=uuid.uuid4(),
                 hospital_id=credit_note.hospital_id,
+                branch_id=credit_note.branch_id,
                 transaction_date=credit_note.credit_note_date,
                 transaction_type='credit_note',
                 reference_id=str(credit_note.credit_note_id),
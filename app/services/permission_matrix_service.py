@@ -0,0 +1,325 @@
+# app/services/permission_matrix_service.py
+
+"""
+Permission Matrix Service - compiled per-user permissions
+
+Everything permission_service and the authorization decorators need to answer
+a check for one (user, hospital) is compiled into a PermissionMatrix:
+
+- branch-aware grants (role_module_branch_access): module -> branch -> action
+  bits, branch None meaning "all branches"
+- cross-branch flags per module (can_view/export_cross_branch)
+- legacy grants (role_module_access): module -> action bits
+- superuser flag, assigned/default branch and the accessible branch list
+
+All role/module grants come from one query; branches and the assigned branch
+are two more small lookups. Matrices are cached per worker with a TTL
+(app config PERMISSION_MATRIX_TTL, seconds) and version stamps: a global
+version and one per user. Role, mapping, module and user changes bump them
+when the changing transaction commits (hooks in app/models/config.py and on
+User), and
+RBACManager bumps them after its bulk updates. When the service cache has a
+shared backend the bump is broadcast, so every worker drops stale matrices.
+Staff and branch edits are picked up when the TTL expires. The same stamps
+validate the cached request principals (user_principal_service).
+"""
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, literal, or_, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from app.engine.versioned_cache import ALL_SCOPES, PendingCommitWork, VersionStampedCache
+from app.models.config import ModuleMaster, RoleMaster, RoleModuleAccess, RoleModuleBranchAccess, UserRoleMapping
+from app.models.master import Branch, Staff
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+ACTIONS = ('view', 'add', 'edit', 'delete', 'export')
+ACTION_BITS = {action: 1 << index for index, action in enumerate(ACTIONS)}
+CROSS_BRANCH_ACTIONS = ('view', 'export')
+
+SUPERUSER_ROLES = ('System Administrator', 'Hospital Administrator')
+
+DEFAULT_MATRIX_TTL = 300  # seconds
+
+# session.info key for invalidations waiting for the transaction to commit
+PENDING_KEY = 'permission_matrix_invalidations'
+ALL_USERS = ALL_SCOPES
+
+
+def _key(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+def _as_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+def _bits(row, prefix: str = 'can_', suffix: str = '', actions=ACTIONS) -> int:
+    bits = 0
+    for action in actions:
+        if getattr(row, f"{prefix}{action}{suffix}", False):
+            bits |= ACTION_BITS[action]
+    return bits
+
+
+@dataclass
+class PermissionMatrix:
+    """Compiled permissions of one user in one hospital"""
+    user_id: str
+    hospital_id: Optional[str]
+    has_active_roles: bool = False
+    is_superuser: bool = False
+    branch_grants: Dict[str, Dict[Optional[str], int]] = field(default_factory=dict)
+    cross_branch_grants: Dict[str, int] = field(default_factory=dict)
+    legacy_grants: Dict[str, int] = field(default_factory=dict)
+    has_all_branch_access: bool = False
+    assigned_branch_id: Optional[str] = None
+    default_branch_id: Optional[str] = None
+    accessible_branches: List[Dict[str, Any]] = field(default_factory=list)
+    version: Tuple[int, int] = (0, 0)
+    built_at: float = 0.0
+
+    def allows(self, module_name: str, action: str, branch_id=None) -> bool:
+        """
+        Same rule as the role_module_branch_access check: a grant on the target
+        branch, an all-branch grant, or (view/export) an all-branch cross-branch grant
+        """
+        bit = ACTION_BITS.get(action)
+        if bit is None:
+            return False
+        branches = self.branch_grants.get(module_name)
+        if not branches:
+            return False
+        target = _key(branch_id)
+        if target is not None and branches.get(target, 0) & bit:
+            return True
+        if branches.get(None, 0) & bit:
+            return True
+        return bool(self.cross_branch_grants.get(module_name, 0) & bit)
+
+    def allows_cross_branch(self, module_name: str, action: str = 'view') -> bool:
+        return bool(self.cross_branch_grants.get(module_name, 0) & ACTION_BITS.get(action, 0))
+
+    def allows_legacy(self, module_name: str, action: str) -> bool:
+        return bool(self.legacy_grants.get(module_name, 0) & ACTION_BITS.get(action, 0))
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _grant_rows_query(user_id: str, hospital_id):
+    """
+    One statement for all grants of the user's active roles: branch-aware rows
+    (module resolved like the per-check lookup - the hospital's own active
+    module, else the global one) and legacy rows, tagged by source
+    """
+    active_roles = select(UserRoleMapping.role_id).where(
+        UserRoleMapping.user_id == user_id,
+        UserRoleMapping.is_active == True
+    )
+
+    hospital_module = aliased(ModuleMaster)
+    own_module_exists = exists().where(
+        hospital_module.module_name == ModuleMaster.module_name,
+        hospital_module.hospital_id == hospital_id,
+        hospital_module.is_active == True
+    )
+    module_in_scope = and_(
+        ModuleMaster.is_active == True,
+        or_(ModuleMaster.hospital_id == hospital_id,
+            and_(ModuleMaster.hospital_id.is_(None), ~own_module_exists))
+    )
+    branch_rows = select(
+        literal('branch').label('source'),
+        ModuleMaster.module_name,
+        RoleModuleBranchAccess.branch_id,
+        RoleModuleBranchAccess.can_view,
+        RoleModuleBranchAccess.can_add,
+        RoleModuleBranchAccess.can_edit,
+        RoleModuleBranchAccess.can_delete,
+        RoleModuleBranchAccess.can_export,
+        RoleModuleBranchAccess.can_view_cross_branch,
+        RoleModuleBranchAccess.can_export_cross_branch
+    ).select_from(RoleModuleBranchAccess).outerjoin(
+        ModuleMaster, and_(ModuleMaster.module_id == RoleModuleBranchAccess.module_id, module_in_scope)
+    ).where(
+        RoleModuleBranchAccess.role_id.in_(active_roles),
+        RoleModuleBranchAccess.hospital_id == hospital_id
+    )
+
+    legacy_rows = select(
+        literal('legacy').label('source'),
+        ModuleMaster.module_name,
+        literal(None, RoleModuleBranchAccess.branch_id.type).label('branch_id'),
+        RoleModuleAccess.can_view,
+        RoleModuleAccess.can_add,
+        RoleModuleAccess.can_edit,
+        RoleModuleAccess.can_delete,
+        RoleModuleAccess.can_export,
+        literal(False).label('can_view_cross_branch'),
+        literal(False).label('can_export_cross_branch')
+    ).select_from(RoleModuleAccess).join(
+        ModuleMaster, ModuleMaster.module_id == RoleModuleAccess.module_id
+    ).where(RoleModuleAccess.role_id.in_(active_roles))
+
+    return union_all(branch_rows, legacy_rows)
+
+def _assigned_branch_id(session: Session, user_id: str, hospital_id) -> Optional[str]:
+    from app.models.transaction import User
+
+    branch_id = session.execute(
+        select(Staff.branch_id).select_from(User).join(
+            Staff, Staff.staff_id == User.entity_id
+        ).where(
+            User.user_id == user_id,
+            User.entity_type == 'staff',
+            Staff.hospital_id == hospital_id,
+            Staff.is_active == True
+        ).limit(1)
+    ).scalar()
+    return _key(branch_id)
+
+def _default_branch_id(branches) -> Optional[str]:
+    """First created branch with 'main' in its name, else the first created"""
+    by_age = sorted(branches, key=lambda b: (b.created_at is None, b.created_at))
+    for branch in by_age:
+        if 'main' in (branch.name or '').lower():
+            return _key(branch.branch_id)
+    return _key(by_age[0].branch_id) if by_age else None
+
+def build_permission_matrix(session: Session, user_id: str, hospital_id) -> PermissionMatrix:
+    """Compile the matrix from the database (no caching)"""
+    hospital_uuid = _as_uuid(hospital_id)
+    matrix = PermissionMatrix(user_id=user_id, hospital_id=_key(hospital_id), built_at=time.monotonic())
+
+    roles = session.execute(
+        select(UserRoleMapping.is_active, RoleMaster.role_name).select_from(UserRoleMapping).outerjoin(
+            RoleMaster, RoleMaster.role_id == UserRoleMapping.role_id
+        ).where(UserRoleMapping.user_id == user_id)
+    ).all()
+    matrix.has_active_roles = any(row.is_active for row in roles)
+    matrix.is_superuser = any(row.role_name in SUPERUSER_ROLES for row in roles)
+    if not matrix.has_active_roles:
+        return matrix
+
+    accessible_branch_ids = set()
+    for row in session.execute(_grant_rows_query(user_id, hospital_uuid)):
+        if row.source == 'legacy':
+            if row.module_name is not None:
+                matrix.legacy_grants[row.module_name] = matrix.legacy_grants.get(row.module_name, 0) | _bits(row)
+            continue
+
+        # Branch reach counts every row of the user's roles, whatever the module
+        if row.branch_id is None:
+            matrix.has_all_branch_access = True
+        else:
+            accessible_branch_ids.add(_key(row.branch_id))
+        if row.module_name is None:
+            continue
+
+        branches = matrix.branch_grants.setdefault(row.module_name, {})
+        branch_key = _key(row.branch_id)
+        branches[branch_key] = branches.get(branch_key, 0) | _bits(row)
+        if row.branch_id is None:
+            cross = _bits(row, suffix='_cross_branch', actions=CROSS_BRANCH_ACTIONS)
+            if cross:
+                matrix.cross_branch_grants[row.module_name] = matrix.cross_branch_grants.get(row.module_name, 0) | cross
+
+    if hospital_uuid is None:
+        return matrix
+
+    branches = session.execute(
+        select(Branch.branch_id, Branch.name, Branch.created_at).where(
+            Branch.hospital_id == hospital_uuid,
+            Branch.is_active == True
+        )
+    ).all()
+    matrix.default_branch_id = _default_branch_id(branches)
+    matrix.assigned_branch_id = _assigned_branch_id(session, user_id, hospital_uuid)
+
+    matrix.accessible_branches = [{
+        'branch_id': _key(branch.branch_id),
+        'name': branch.name,
+        'is_default': _key(branch.branch_id) == matrix.default_branch_id,
+        'is_user_branch': _key(branch.branch_id) == matrix.assigned_branch_id,
+        'has_all_access': matrix.has_all_branch_access
+    } for branch in sorted(branches, key=lambda b: b.name or '')
+        if matrix.has_all_branch_access or _key(branch.branch_id) in accessible_branch_ids]
+
+    return matrix
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class PermissionMatrixCache(VersionStampedCache):
+    """
+    Per-worker matrix cache keyed by (user_id, hospital_id).
+    A cached matrix is used while it is younger than the TTL and its version
+    stamp (global version, user version) is still current.
+    """
+
+    op = 'permission_matrix'
+    scope_index = 0
+    ttl_config = 'PERMISSION_MATRIX_TTL'
+    default_ttl = DEFAULT_MATRIX_TTL
+
+    def get(self, user_id: str, hospital_id, session: Optional[Session] = None) -> PermissionMatrix:
+        user_id = str(user_id)
+        return self.get_or_build(
+            (user_id, _key(hospital_id)),
+            lambda build_session: build_permission_matrix(build_session, user_id, hospital_id),
+            session
+        )
+
+
+_permission_matrix_cache = None
+_permission_matrix_cache_lock = threading.Lock()
+
+def get_permission_matrix_cache() -> PermissionMatrixCache:
+    """Process-wide matrix cache"""
+    global _permission_matrix_cache
+    if _permission_matrix_cache is None:
+        with _permission_matrix_cache_lock:
+            if _permission_matrix_cache is None:
+                _permission_matrix_cache = PermissionMatrixCache()
+    return _permission_matrix_cache
+
+def get_permission_matrix(user_id: str, hospital_id, session: Optional[Session] = None) -> PermissionMatrix:
+    """Cached matrix for (user, hospital); session is only used when it has to be built"""
+    return get_permission_matrix_cache().get(user_id, hospital_id, session)
+
+def invalidate_permission_matrix(user_id: Optional[str] = None):
+    """Invalidate now - use after a commit that changed roles, mappings or modules"""
+    get_permission_matrix_cache().invalidate(user_id)
+
+# =============================================================================
+# COMMIT-TIME INVALIDATION
+# =============================================================================
+
+def _apply_pending_invalidations(session: Session, pending):
+    if ALL_USERS in pending:
+        invalidate_permission_matrix()
+        return
+    for user_id in pending:
+        invalidate_permission_matrix(user_id)
+
+_pending_invalidations = PendingCommitWork(PENDING_KEY, _apply_pending_invalidations)
+
+def schedule_permission_matrix_invalidation(session: Optional[Session], user_id: Optional[str] = None):
+    """
+    Invalidate when session's outermost transaction commits (dropped on
+    rollback), so a matrix is never rebuilt from the rows the change is
+    replacing. Without a session the invalidation is immediate.
+    """
+    if session is None:
+        invalidate_permission_matrix(user_id)
+        return
+    _pending_invalidations.collect(session).add(ALL_USERS if user_id is None else str(user_id))
@@ -8,7 +8,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from app.services.database_service import get_db_session
 from app.models.config import RoleModuleBranchAccess, ModuleMaster, RoleMaster, UserRoleMapping
-from app.models.master import Branch, Staff
+from app.models.master import Branch
+from app.services.permission_matrix_service import get_permission_matrix
 from flask import current_app
 
 logger = logging.getLogger(__name__)
@@ -53,13 +54,14 @@ def determine_target_branch(user_id: str, hospital_id: str, explicit_branch_id:
         return explicit_branch_id
     
     # Priority 2: User's assigned branch (from Staff/Patient record)
-    user_assigned_branch = get_user_assigned_branch_id(user_id, hospital_id)
+    matrix = get_permission_matrix(user_id, hospital_id)
+    user_assigned_branch = matrix.assigned_branch_id
     if user_assigned_branch:
         logger.debug(f"Using user's assigned branch {user_assigned_branch} for user {user_id}")
         return user_assigned_branch
     
     # Priority 3: Hospital's main/default branch  
-    main_branch = get_default_branch_id(hospital_id)
+    main_branch = matrix.default_branch_id
     if main_branch:
         logger.debug(f"Using hospital's main branch {main_branch} for user {user_id}")
         return main_branch
@@ -92,77 +94,25 @@ def has_branch_permission(user, module_name: str, permission_type: str, branch_i
             logger.info(f"TESTING BYPASS: User {user_id} granted branch access to {module_name}.{permission_type}")
             return True
         
-        # ENHANCED: Determine target branch using Implementation Document logic
-        target_branch_id = determine_target_branch(user_id, hospital_id, branch_id)
-
         if not hospital_id:
             logger.error(f"No hospital_id found for user {user_id}")
             return False
         
+        # Compiled grants of the user's roles (cached, see permission_matrix_service)
+        matrix = get_permission_matrix(user_id, hospital_id)
+        if not matrix.has_active_roles:
+            logger.warning(f"No active roles found for user {user_id}")
+            return False
+        
         # Determine target branch - Implementation Document branch context logic
-        target_branch_id = branch_id or get_user_assigned_branch_id(user_id, hospital_id)
+        target_branch_id = branch_id or matrix.assigned_branch_id
         
-        with get_db_session(read_only=True) as session:
-            # Get module ID
-            module = session.query(ModuleMaster).filter_by(
-                module_name=module_name,
-                hospital_id=hospital_id,
-                is_active=True
-            ).first()
-            
-            if not module:
-                # Try global module (hospital_id is null)
-                module = session.query(ModuleMaster).filter_by(
-                    module_name=module_name,
-                    hospital_id=None,
-                    is_active=True
-                ).first()
-            
-            if not module:
-                logger.warning(f"Module {module_name} not found for hospital {hospital_id}")
-                return False
-            
-            # Get user's active roles
-            role_mappings = session.query(UserRoleMapping).filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
-            
-            if not role_mappings:
-                logger.warning(f"No active roles found for user {user_id}")
-                return False
-            
-            role_ids = [mapping.role_id for mapping in role_mappings]
-            
-            # Check branch-specific permissions
-            permissions = session.query(RoleModuleBranchAccess).filter(
-                RoleModuleBranchAccess.role_id.in_(role_ids),
-                RoleModuleBranchAccess.module_id == module.module_id,
-                RoleModuleBranchAccess.hospital_id == hospital_id
-            ).all()
-            
-            for permission in permissions:
-                # Check for specific branch access
-                if permission.branch_id and target_branch_id and str(permission.branch_id) == str(target_branch_id):
-                    if getattr(permission, f"can_{permission_type}", False):
-                        logger.debug(f"User {user_id} granted {permission_type} access to {module_name} in branch {target_branch_id}")
-                        return True
-                
-                # Check for all-branch access (branch_id = NULL)
-                elif permission.branch_id is None:
-                    if getattr(permission, f"can_{permission_type}", False):
-                        logger.debug(f"User {user_id} granted all-branch {permission_type} access to {module_name}")
-                        return True
-                    
-                    # Check cross-branch permission for view/export
-                    if permission_type in ['view', 'export']:
-                        cross_branch_attr = f"can_{permission_type}_cross_branch"
-                        if getattr(permission, cross_branch_attr, False):
-                            logger.debug(f"User {user_id} granted cross-branch {permission_type} access to {module_name}")
-                            return True
-            
-            logger.debug(f"User {user_id} denied {permission_type} access to {module_name} in branch {target_branch_id}")
-            return False
+        if matrix.allows(module_name, permission_type, target_branch_id):
+            logger.debug(f"User {user_id} granted {permission_type} access to {module_name} in branch {target_branch_id}")
+            return True
+        
+        logger.debug(f"User {user_id} denied {permission_type} access to {module_name} in branch {target_branch_id}")
+        return False
             
     except Exception as e:
         logger.error(f"Error checking branch permission: {str(e)}")
@@ -175,40 +125,10 @@ def has_legacy_permission(user, module_name: str, permission_type: str) -> bool:
     Preserved for backward compatibility
     """
     try:
-        # Import here to avoid circular imports
-        from app.models.config import RoleModuleAccess
-        
         user_id = user.user_id if hasattr(user, 'user_id') else user
         hospital_id = user.hospital_id if hasattr(user, 'hospital_id') else None
         
-        with get_db_session(read_only=True) as session:
-            # Get module
-            module = session.query(ModuleMaster).filter_by(
-                module_name=module_name
-            ).first()
-            
-            if not module:
-                return False
-            
-            # Get user's roles
-            role_mappings = session.query(UserRoleMapping).filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
-            
-            role_ids = [mapping.role_id for mapping in role_mappings]
-            
-            # Check legacy permissions
-            permissions = session.query(RoleModuleAccess).filter(
-                RoleModuleAccess.role_id.in_(role_ids),
-                RoleModuleAccess.module_id == module.module_id
-            ).all()
-            
-            for permission in permissions:
-                if getattr(permission, f"can_{permission_type}", False):
-                    return True
-            
-            return False
+        return get_permission_matrix(user_id, hospital_id).allows_legacy(module_name, permission_type)
             
     except Exception as e:
         logger.error(f"Error checking legacy permission: {str(e)}")
@@ -224,60 +144,8 @@ def get_user_accessible_branches(user_id: str, hospital_id: str) -> List[Dict[st
     Implementation Document: Service Layer Support for Branch Context
     """
     try:
-        with get_db_session(read_only=True) as session:
-            # Get user's active roles
-            role_mappings = session.query(UserRoleMapping).filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
-            
-            if not role_mappings:
-                return []
-            
-            role_ids = [mapping.role_id for mapping in role_mappings]
-            
-            # Get all branch permissions for user's roles
-            branch_permissions = session.query(RoleModuleBranchAccess).filter(
-                RoleModuleBranchAccess.role_id.in_(role_ids),
-                RoleModuleBranchAccess.hospital_id == hospital_id
-            ).all()
-            
-            accessible_branch_ids = set()
-            has_all_branch_access = False
-            
-            for permission in branch_permissions:
-                if permission.branch_id is None:
-                    has_all_branch_access = True
-                    break
-                else:
-                    accessible_branch_ids.add(permission.branch_id)
-            
-            # Get branch details
-            if has_all_branch_access:
-                branches = session.query(Branch).filter_by(
-                    hospital_id=hospital_id,
-                    is_active=True
-                ).order_by(Branch.name).all()
-            else:
-                branches = session.query(Branch).filter(
-                    Branch.branch_id.in_(accessible_branch_ids),
-                    Branch.is_active == True
-                ).order_by(Branch.name).all()
-            
-            default_branch_id = get_default_branch_id(hospital_id)
-            user_assigned_branch_id = get_user_assigned_branch_id(user_id, hospital_id)
-            
-            result = []
-            for branch in branches:
-                result.append({
-                    'branch_id': str(branch.branch_id),
-                    'name': branch.name,
-                    'is_default': str(branch.branch_id) == default_branch_id,
-                    'is_user_branch': str(branch.branch_id) == user_assigned_branch_id,
-                    'has_all_access': has_all_branch_access
-                })
-            
-            return result
+        matrix = get_permission_matrix(user_id, hospital_id)
+        return [dict(branch) for branch in matrix.accessible_branches]
             
     except Exception as e:
         logger.error(f"Error getting accessible branches: {str(e)}")
@@ -289,22 +157,7 @@ def get_user_assigned_branch_id(user_id: str, hospital_id: str) -> Optional[str]
     Implementation Document: User Branch Context
     """
     try:
-        with get_db_session(read_only=True) as session:
-            # Get user record
-            from app.models.transaction import User
-            user = session.query(User).filter_by(user_id=user_id).first()
-            
-            if not user or user.entity_type != 'staff':
-                return None
-            
-            # Get staff record
-            staff = session.query(Staff).filter_by(
-                staff_id=user.entity_id,
-                hospital_id=hospital_id,
-                is_active=True
-            ).first()
-            
-            return str(staff.branch_id) if staff and staff.branch_id else None
+        return get_permission_matrix(user_id, hospital_id).assigned_branch_id
             
     except Exception as e:
         logger.error(f"Error getting user assigned branch: {str(e)}")
@@ -352,46 +205,7 @@ def has_cross_branch_permission(user, module_name: str, action: str = 'view') ->
         if user_id == '7777777777':
             return True
         
-        with get_db_session(read_only=True) as session:
-            # Get module
-            module = session.query(ModuleMaster).filter_by(
-                module_name=module_name,
-                hospital_id=hospital_id,
-                is_active=True
-            ).first()
-            
-            if not module:
-                module = session.query(ModuleMaster).filter_by(
-                    module_name=module_name,
-                    hospital_id=None,
-                    is_active=True
-                ).first()
-            
-            if not module:
-                return False
-            
-            # Get user's roles
-            role_mappings = session.query(UserRoleMapping).filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
-            
-            role_ids = [mapping.role_id for mapping in role_mappings]
-            
-            # Check for cross-branch permissions
-            permissions = session.query(RoleModuleBranchAccess).filter(
-                RoleModuleBranchAccess.role_id.in_(role_ids),
-                RoleModuleBranchAccess.module_id == module.module_id,
-                RoleModuleBranchAccess.hospital_id == hospital_id,
-                RoleModuleBranchAccess.branch_id.is_(None)  # NULL = all branches
-            ).all()
-            
-            for permission in permissions:
-                cross_branch_attr = f"can_{action}_cross_branch"
-                if getattr(permission, cross_branch_attr, False):
-                    return True
-            
-            return False
+        return get_permission_matrix(user_id, hospital_id).allows_cross_branch(module_name, action)
             
     except Exception as e:
         logger.error(f"Error checking cross-branch permission: {str(e)}")
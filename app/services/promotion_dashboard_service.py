@@ -26,6 +26,7 @@ from app.models.master import (
 from app.models.transaction import PatientLoyaltyWallet
 from app.services.database_service import get_db_session
 from app.services.discount_service import DiscountService, DiscountCalculationResult
+from app.services.promotion_index_service import schedule_promotion_index_invalidation
 
 
 class PromotionDashboardService:
@@ -2235,6 +2236,49 @@ class PromotionDashboardService:
                 'final_discount': None
             }
 
+    @staticmethod
+    def simulate_promotions_bulk(
+        hospital_id: str,
+        campaign_ids: Optional[List[str]] = None,
+        simulation_date: Optional[date] = None,
+        history_days: int = 30,
+        patient_is_special_group: bool = False
+    ) -> Dict[str, Any]:
+        """
+        What-if simulation of campaigns (typically drafts awaiting approval)
+        across the whole catalogue and the invoices of the last history_days
+
+        Args:
+            hospital_id: Hospital ID
+            campaign_ids: Campaigns to add to the live ones, whatever their status
+            simulation_date: Date to simulate (defaults to today)
+            history_days: Days of invoice history to re-price
+            patient_is_special_group: Price the catalogue for a special group patient
+
+        Returns:
+            Dictionary with per-item discounts and margin impact, and the
+            baseline vs projected discount over the invoice history
+        """
+        try:
+            from app.services.promotion_simulation_service import simulate_catalogue_promotions
+
+            with get_db_session(read_only=True) as session:
+                return simulate_catalogue_promotions(
+                    session, hospital_id,
+                    campaign_ids=campaign_ids or [],
+                    simulation_date=simulation_date,
+                    history_days=history_days,
+                    patient_is_special_group=patient_is_special_group
+                )
+
+        except Exception as e:
+            logger.error(f"Error in bulk promotion simulation: {e}", exc_info=True)
+            return {
+                'error': str(e),
+                'items': [],
+                'history': None
+            }
+
     # ==========================================================================
     # BULK CONFIGURATION
     # ==========================================================================
@@ -3061,6 +3105,8 @@ class PromotionDashboardService:
                     PromotionGroupItem.group_item_id.in_(group_item_ids)
                 ).delete(synchronize_session=False)
 
+                # Bulk delete bypasses the mapper hooks that refresh promotion indexes
+                schedule_promotion_index_invalidation(session, hospital_id)
                 session.commit()
 
                 logger.info(f"Removed {removed_count} items from group {group_id}")
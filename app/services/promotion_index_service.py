@@ -0,0 +1,346 @@
+# app/services/promotion_index_service.py
+
+"""
+Promotion Index Service - pre-indexed promotion rules for discount evaluation
+
+The auto-applicable campaigns of one hospital on one date are loaded once into
+a PromotionIndex: immutable CampaignRule snapshots bucketed by applies_to,
+with group-targeted and item-targeted campaigns keyed by (item_type, item_id).
+Campaign-group membership is resolved while building (one query), so finding
+the candidate campaigns of an invoice line is a few dictionary lookups.
+
+Indexes are cached per worker with a TTL (app config PROMOTION_INDEX_TTL,
+seconds) and a version stamp per hospital. Campaign, campaign group and group
+item changes bump the stamp when the changing transaction commits (hooks in
+app/models/master.py) - this covers approve, update, toggle, delete and usage
+counter updates. When the service cache has a shared backend the bump is
+broadcast, so every worker drops its stale indexes.
+
+A PromotionContext is created per invoice calculation. It holds the index, the
+patient's special-group flag and per-patient usage counts, so the patient and
+usage lookups run at most once per invoice instead of once per line.
+"""
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.engine.versioned_cache import ALL_SCOPES, PendingCommitWork, VersionStampedCache
+from app.models.master import Patient, PromotionCampaign, PromotionCampaignGroup, PromotionGroupItem, PromotionUsageLog
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+DEFAULT_INDEX_TTL = 300  # seconds
+MAX_CACHED_INDEXES = 256
+
+# session.info key for invalidations waiting for the transaction to commit
+PENDING_KEY = 'promotion_index_invalidations'
+ALL_HOSPITALS = ALL_SCOPES
+
+# Key part for item-targeted campaigns with applies_to='all'
+ANY_ITEM_TYPE = '*'
+
+
+def _key(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+@dataclass(frozen=True)
+class CampaignRule:
+    """
+    Snapshot of the PromotionCampaign columns used by discount evaluation.
+    Attribute names match the model, so handle_buy_x_get_y accepts either.
+    """
+    campaign_id: Any
+    campaign_name: str
+    campaign_code: Optional[str]
+    promotion_type: Optional[str]
+    promotion_rules: Optional[Dict]
+    discount_type: str
+    discount_value: Decimal
+    applies_to: str
+    specific_items: Optional[Dict]
+    target_groups: Optional[Dict]
+    target_special_group: bool
+    min_purchase_amount: Optional[Decimal]
+    max_discount_amount: Optional[Decimal]
+    max_uses_per_patient: Optional[int]
+    max_total_uses: Optional[int]
+    current_uses: int
+    auto_apply: bool
+    end_date: Optional[date]
+    ordinal: int = 0
+
+    @classmethod
+    def from_campaign(cls, campaign: PromotionCampaign, ordinal: int) -> 'CampaignRule':
+        return cls(
+            campaign_id=campaign.campaign_id,
+            campaign_name=campaign.campaign_name,
+            campaign_code=campaign.campaign_code,
+            promotion_type=campaign.promotion_type,
+            promotion_rules=campaign.promotion_rules,
+            discount_type=campaign.discount_type,
+            discount_value=campaign.discount_value,
+            applies_to=campaign.applies_to,
+            specific_items=campaign.specific_items,
+            target_groups=campaign.target_groups,
+            target_special_group=bool(campaign.target_special_group),
+            min_purchase_amount=campaign.min_purchase_amount,
+            max_discount_amount=campaign.max_discount_amount,
+            max_uses_per_patient=campaign.max_uses_per_patient,
+            max_total_uses=campaign.max_total_uses,
+            current_uses=campaign.current_uses or 0,
+            auto_apply=bool(campaign.auto_apply),
+            end_date=campaign.end_date,
+            ordinal=ordinal
+        )
+
+    @property
+    def target_group_ids(self) -> List[str]:
+        if not self.target_groups:
+            return []
+        return [str(group_id) for group_id in self.target_groups.get('group_ids', []) or []]
+
+    @property
+    def specific_item_ids(self) -> List[str]:
+        """Item restriction of simple discounts (buy_x_get_y uses its promotion_rules instead)"""
+        if self.promotion_type == 'buy_x_get_y' or not self.specific_items:
+            return []
+        return [str(item_id) for item_id in self.specific_items.get('item_ids', []) or []]
+
+
+@dataclass
+class PromotionIndex:
+    """Auto-applicable campaigns of one hospital on one date, indexed by item"""
+    hospital_id: Optional[str]
+    invoice_date: date
+    by_scope: Dict[str, List[CampaignRule]] = field(default_factory=dict)
+    by_item: Dict[Tuple[str, str], List[CampaignRule]] = field(default_factory=dict)
+    campaign_count: int = 0
+    version: Tuple[int, int] = (0, 0)
+    built_at: float = 0.0
+
+    def candidates(self, item_type: str, item_id, patient_is_special_group: bool = False) -> List[CampaignRule]:
+        """
+        Campaigns whose applies_to, target groups and specific items cover the
+        item, in load order. Special-group campaigns are dropped for other patients.
+        """
+        item_type = (item_type or '').lower()
+        item_id = _key(item_id)
+        matches = (
+            self.by_scope.get('all', [])
+            + self.by_scope.get(item_type + 's', [])
+            + self.by_item.get((item_type, item_id), [])
+            + self.by_item.get((ANY_ITEM_TYPE, item_id), [])
+        )
+        if not patient_is_special_group:
+            matches = [rule for rule in matches if not rule.target_special_group]
+        return sorted(matches, key=lambda rule: rule.ordinal)
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def load_group_members(session: Session, group_ids) -> Dict[str, List[Tuple[str, str]]]:
+    """group_id -> [(item_type, item_id)] for the active groups among group_ids"""
+    members: Dict[str, List[Tuple[str, str]]] = {}
+    group_uuids = []
+    for group_id in group_ids:
+        try:
+            group_uuids.append(uuid.UUID(group_id))
+        except ValueError:
+            logger.warning(f"Ignoring invalid campaign group id in target_groups: {group_id}")
+    if not group_uuids:
+        return members
+    rows = session.execute(
+        select(PromotionGroupItem.group_id, PromotionGroupItem.item_type, PromotionGroupItem.item_id)
+        .join(PromotionCampaignGroup, PromotionGroupItem.group_id == PromotionCampaignGroup.group_id)
+        .where(
+            PromotionCampaignGroup.is_active == True,
+            PromotionGroupItem.group_id.in_(group_uuids)
+        )
+    )
+    for row in rows:
+        members.setdefault(str(row.group_id), []).append(((row.item_type or '').lower(), str(row.item_id)))
+    return members
+
+def _scope_type(applies_to: str) -> Optional[str]:
+    """Item type an applies_to value is limited to ('services' -> 'service'), None for 'all'"""
+    if applies_to == 'all':
+        return None
+    return applies_to[:-1] if applies_to and applies_to.endswith('s') else applies_to
+
+def load_campaign_rules(session: Session, hospital_id, invoice_date: date) -> List[CampaignRule]:
+    """Snapshots of the campaigns auto-applied on invoice_date, in load order"""
+    # Personalized promotions need manual code entry, so they are never auto-applied
+    campaigns = session.query(PromotionCampaign).filter(
+        PromotionCampaign.hospital_id == hospital_id,
+        PromotionCampaign.is_active == True,
+        PromotionCampaign.is_deleted == False,
+        PromotionCampaign.is_personalized == False,
+        PromotionCampaign.status == 'approved',
+        PromotionCampaign.start_date <= invoice_date,
+        PromotionCampaign.end_date >= invoice_date
+    ).order_by(PromotionCampaign.created_at, PromotionCampaign.campaign_id).all()
+    return [CampaignRule.from_campaign(campaign, ordinal) for ordinal, campaign in enumerate(campaigns)]
+
+def index_campaign_rules(hospital_id, invoice_date: date, rules: List[CampaignRule],
+                         members: Dict[str, List[Tuple[str, str]]]) -> PromotionIndex:
+    """Bucket rules by scope and targeted item; members is load_group_members() output"""
+    index = PromotionIndex(hospital_id=_key(hospital_id), invoice_date=invoice_date,
+                           campaign_count=len(rules), built_at=time.monotonic())
+
+    for rule in rules:
+        scope_type = _scope_type(rule.applies_to)
+        specific_ids = set(rule.specific_item_ids)
+
+        if rule.target_group_ids:
+            # Items of the target groups, within applies_to and specific_items
+            keys = set()
+            for group_id in rule.target_group_ids:
+                for item_type, item_id in members.get(group_id, []):
+                    if scope_type is not None and item_type != scope_type:
+                        continue
+                    if specific_ids and item_id not in specific_ids:
+                        continue
+                    keys.add((item_type, item_id))
+            for key in keys:
+                index.by_item.setdefault(key, []).append(rule)
+        elif specific_ids:
+            item_type = scope_type if scope_type is not None else ANY_ITEM_TYPE
+            for item_id in specific_ids:
+                index.by_item.setdefault((item_type, item_id), []).append(rule)
+        else:
+            index.by_scope.setdefault(rule.applies_to, []).append(rule)
+
+    return index
+
+def build_promotion_index(session: Session, hospital_id, invoice_date: date) -> PromotionIndex:
+    """Load and index the campaigns from the database (no caching)"""
+    rules = load_campaign_rules(session, hospital_id, invoice_date)
+    members = load_group_members(session, {group_id for rule in rules for group_id in rule.target_group_ids})
+    return index_campaign_rules(hospital_id, invoice_date, rules, members)
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class PromotionIndexCache(VersionStampedCache):
+    """
+    Per-worker index cache keyed by (hospital_id, invoice_date).
+    A cached index is used while it is younger than the TTL and its version
+    stamp (global version, hospital version) is still current.
+    """
+
+    op = 'promotion_index'
+    scope_index = 0
+    ttl_config = 'PROMOTION_INDEX_TTL'
+    default_ttl = DEFAULT_INDEX_TTL
+    max_entries = MAX_CACHED_INDEXES
+
+    def get(self, hospital_id, invoice_date: date, session: Optional[Session] = None) -> PromotionIndex:
+        return self.get_or_build(
+            (_key(hospital_id), invoice_date),
+            lambda build_session: build_promotion_index(build_session, hospital_id, invoice_date),
+            session
+        )
+
+
+_promotion_index_cache = None
+_promotion_index_cache_lock = threading.Lock()
+
+def get_promotion_index_cache() -> PromotionIndexCache:
+    """Process-wide index cache"""
+    global _promotion_index_cache
+    if _promotion_index_cache is None:
+        with _promotion_index_cache_lock:
+            if _promotion_index_cache is None:
+                _promotion_index_cache = PromotionIndexCache()
+    return _promotion_index_cache
+
+def get_promotion_index(hospital_id, invoice_date: Optional[date] = None,
+                        session: Optional[Session] = None) -> PromotionIndex:
+    """Cached index for (hospital, date); session is only used when it has to be built"""
+    return get_promotion_index_cache().get(hospital_id, invoice_date or date.today(), session)
+
+def invalidate_promotion_index(hospital_id=None):
+    """Invalidate now - use after a commit that changed campaigns or campaign groups"""
+    get_promotion_index_cache().invalidate(hospital_id)
+
+# =============================================================================
+# PER-INVOICE CONTEXT
+# =============================================================================
+
+class PromotionContext:
+    """
+    Promotion state of one invoice calculation: the index plus the patient
+    lookups every line would otherwise repeat
+    """
+
+    def __init__(self, index: PromotionIndex, patient_id=None, patient_is_special_group: bool = False):
+        self.index = index
+        self.patient_id = patient_id
+        self.patient_is_special_group = patient_is_special_group
+        self._usage_counts: Dict[str, int] = {}
+
+    @property
+    def invoice_date(self) -> date:
+        return self.index.invoice_date
+
+    def candidates(self, item_type: str, item_id) -> List[CampaignRule]:
+        return self.index.candidates(item_type, item_id, self.patient_is_special_group)
+
+    def patient_usage_count(self, session: Session, campaign_id) -> int:
+        """Times the patient has used the campaign (one query per campaign per invoice)"""
+        key = str(campaign_id)
+        if key not in self._usage_counts:
+            self._usage_counts[key] = session.execute(
+                select(func.count()).select_from(PromotionUsageLog).where(
+                    PromotionUsageLog.campaign_id == campaign_id,
+                    PromotionUsageLog.patient_id == self.patient_id
+                )
+            ).scalar() or 0
+        return self._usage_counts[key]
+
+def load_promotion_context(session: Session, hospital_id, patient_id=None,
+                           invoice_date: Optional[date] = None) -> PromotionContext:
+    """Index for the invoice date plus the patient's special-group flag"""
+    index = get_promotion_index(hospital_id, invoice_date, session)
+    patient_is_special_group = False
+    if patient_id:
+        patient_is_special_group = bool(session.execute(
+            select(Patient.is_special_group).where(Patient.patient_id == patient_id)
+        ).scalar())
+    return PromotionContext(index, patient_id, patient_is_special_group)
+
+# =============================================================================
+# COMMIT-TIME INVALIDATION
+# =============================================================================
+
+def _apply_pending_invalidations(session: Session, pending):
+    if ALL_HOSPITALS in pending:
+        invalidate_promotion_index()
+        return
+    for hospital_id in pending:
+        invalidate_promotion_index(hospital_id)
+
+_pending_invalidations = PendingCommitWork(PENDING_KEY, _apply_pending_invalidations)
+
+def schedule_promotion_index_invalidation(session: Optional[Session], hospital_id=None):
+    """
+    Invalidate when session's outermost transaction commits (dropped on
+    rollback). hospital_id None invalidates every hospital. Without a session
+    the invalidation is immediate.
+    """
+    if session is None:
+        invalidate_promotion_index(hospital_id)
+        return
+    _pending_invalidations.collect(session).add(ALL_HOSPITALS if hospital_id is None else _key(hospital_id))
@@ -0,0 +1,430 @@
+# app/services/promotion_simulation_service.py
+
+"""
+Promotion Simulation Service - bulk what-if evaluation of promotions
+
+simulate_promotions() prices one item for one patient through the discount
+service. This module answers the marketing question "what does this draft
+campaign do?" for the whole catalogue and for the invoice lines of the last
+N days at once:
+
+- catalogue, campaigns (live ones plus the drafts under review), stacking
+  config and historical invoice lines are loaded with a handful of queries
+  into polars frames
+- campaign applicability comes from the promotion index (applies_to, target
+  groups, specific items), expanded into (item, campaign) candidate pairs
+- the best campaign per line and the stacking rules of
+  DiscountService.calculate_stacked_discount are evaluated as column
+  expressions, once without and once with the drafts
+
+Scope of the simulation: loyalty cards and per-patient usage limits are not
+evaluated (they depend on the individual patient), and buy_x_get_y campaigns
+are reported but not priced (they depend on the rest of the invoice).
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+import uuid
+
+import polars as pl
+from sqlalchemy import Numeric, and_, case, func, literal, null, select
+from sqlalchemy.orm import Session
+
+from app.models.master import Hospital, Medicine, Package, Patient, PromotionCampaign, Service
+from app.models.transaction import InvoiceHeader, InvoiceLineItem
+from app.services.discount_service import DiscountService
+from app.services.promotion_index_service import (
+    ANY_ITEM_TYPE, CampaignRule, index_campaign_rules, load_campaign_rules, load_group_members
+)
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+ITEM_TYPES = ('service', 'medicine', 'package')
+STACKING_SOURCES = ('campaign', 'bulk', 'loyalty', 'vip')
+DEFAULT_HISTORY_DAYS = 30
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+def _frame(rows: Sequence, schema: Dict[str, Any]) -> pl.DataFrame:
+    """Rows (tuples) to a typed frame, Decimals as floats and UUIDs as strings"""
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pl.DataFrame(
+        {name: [_plain(value) for value in column] for name, column in zip(schema, columns)},
+        schema=schema
+    )
+
+# =============================================================================
+# STACKING
+# =============================================================================
+
+def stacked_percent_expr(stacking_config: Dict) -> pl.Expr:
+    """
+    Column-wise DiscountService.calculate_stacked_discount: total percent from
+    campaign/bulk/loyalty/vip/standard _percent columns (missing values are 0).
+    Modes are per hospital, so they select the expression, not a per-row branch.
+    """
+    def percent(source):
+        return pl.col(f'{source}_percent').fill_null(0.0)
+
+    def mode(source, default=None):
+        return stacking_config.get(source, {}).get('mode', default)
+
+    # 1. Exclusive: the best exclusive discount replaces everything else
+    exclusive = [percent(source) for source in STACKING_SOURCES if mode(source) == 'exclusive']
+
+    # 2./3. Incremental discounts add up, the best absolute one is added on top
+    campaign_applied = percent('campaign') > 0
+    stackable = {source: percent(source) for source in STACKING_SOURCES}
+    if stacking_config.get('bulk', {}).get('exclude_with_campaign', False):
+        stackable['bulk'] = pl.when(campaign_applied).then(0.0).otherwise(stackable['bulk'])
+
+    incremental = [stackable[s] for s in STACKING_SOURCES if mode(s, 'incremental') == 'incremental']
+    absolute = [stackable[s] for s in STACKING_SOURCES if mode(s, 'incremental') == 'absolute']
+    total = pl.sum_horizontal(incremental) if incremental else pl.lit(0.0)
+    if absolute:
+        total = total + pl.max_horizontal(absolute)
+    if exclusive:
+        best_exclusive = pl.max_horizontal(exclusive)
+        total = pl.when(best_exclusive > 0).then(best_exclusive).otherwise(total)
+
+    # Standard discount is the fallback when nothing else applies
+    total = pl.when(total > 0).then(total).otherwise(percent('standard'))
+
+    max_cap = stacking_config.get('max_total_discount')
+    if max_cap is not None:
+        total = pl.when(total > float(max_cap)).then(float(max_cap)).otherwise(total)
+    return total.cast(pl.Float64)
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+CATALOGUE_SCHEMA = {
+    'item_type': pl.Utf8, 'item_id': pl.Utf8, 'item_name': pl.Utf8, 'unit_price': pl.Float64,
+    'cost_price': pl.Float64, 'standard_percent': pl.Float64, 'bulk_percent': pl.Float64,
+    'max_discount': pl.Float64
+}
+
+HISTORY_SCHEMA = {
+    'invoice_id': pl.Utf8, 'invoice_date': pl.Date, 'item_type': pl.Utf8, 'item_id': pl.Utf8,
+    'quantity': pl.Float64, 'unit_price': pl.Float64, 'line_cost_price': pl.Float64,
+    'recorded_discount': pl.Float64, 'is_special_group': pl.Boolean
+}
+
+CAMPAIGN_SCHEMA = {
+    'ordinal': pl.Int64, 'discount_type': pl.Utf8, 'discount_value': pl.Float64,
+    'max_discount_amount': pl.Float64, 'min_purchase_amount': pl.Float64,
+    'target_special_group': pl.Boolean, 'exhausted': pl.Boolean, 'is_draft': pl.Boolean
+}
+
+def load_catalogue(session: Session, hospital_id) -> pl.DataFrame:
+    """Active services, medicines and packages with their list price and discount settings"""
+    def capped(percent_column, max_column):
+        return case((and_(max_column.is_not(None), percent_column > max_column), max_column), else_=percent_column)
+
+    services = select(
+        Service.service_id, Service.service_name, Service.price, null(),
+        capped(func.coalesce(Service.standard_discount_percent, 0), Service.max_discount),
+        case((Service.bulk_discount_eligible == True,
+              capped(func.coalesce(Service.bulk_discount_percent, 0), Service.max_discount)), else_=0),
+        Service.max_discount
+    ).where(Service.hospital_id == hospital_id, Service.is_active == True, Service.is_deleted == False)
+
+    medicines = select(
+        Medicine.medicine_id, Medicine.medicine_name, func.coalesce(Medicine.mrp, Medicine.selling_price),
+        Medicine.cost_price,
+        capped(func.coalesce(Medicine.standard_discount_percent, 0), Medicine.max_discount),
+        case((Medicine.bulk_discount_eligible == True,
+              capped(func.coalesce(Medicine.bulk_discount_percent, 0), Medicine.max_discount)), else_=0),
+        Medicine.max_discount
+    ).where(Medicine.hospital_id == hospital_id, Medicine.status == 'active', Medicine.is_deleted == False)
+
+    packages = select(
+        Package.package_id, Package.package_name, func.coalesce(Package.selling_price, Package.price), null(),
+        capped(func.coalesce(Package.standard_discount_percent, 0), Package.max_discount),
+        literal(0, Numeric),  # packages have no bulk discount
+        Package.max_discount
+    ).where(Package.hospital_id == hospital_id, Package.status == 'active', Package.is_deleted == False)
+
+    rows = []
+    for item_type, statement in (('service', services), ('medicine', medicines), ('package', packages)):
+        rows.extend((item_type, *row) for row in session.execute(statement))
+    return _frame(rows, CATALOGUE_SCHEMA)
+
+def load_history(session: Session, hospital_id, date_from: date, date_to: date) -> pl.DataFrame:
+    """Invoice lines billed between date_from and date_to (free and sample lines excluded)"""
+    item_type = case(
+        (InvoiceLineItem.medicine_id.is_not(None), 'medicine'),
+        (InvoiceLineItem.service_id.is_not(None), 'service'),
+        (InvoiceLineItem.package_id.is_not(None), 'package'),
+        else_=None
+    )
+    statement = select(
+        InvoiceHeader.invoice_id,
+        func.date(InvoiceHeader.invoice_date),
+        item_type,
+        func.coalesce(InvoiceLineItem.medicine_id, InvoiceLineItem.service_id, InvoiceLineItem.package_id),
+        InvoiceLineItem.quantity,
+        InvoiceLineItem.unit_price,
+        InvoiceLineItem.cost_price,
+        InvoiceLineItem.discount_amount,
+        func.coalesce(Patient.is_special_group, False)
+    ).select_from(InvoiceLineItem).join(
+        InvoiceHeader, InvoiceHeader.invoice_id == InvoiceLineItem.invoice_id
+    ).outerjoin(
+        Patient, Patient.patient_id == InvoiceHeader.patient_id
+    ).where(
+        InvoiceHeader.hospital_id == hospital_id,
+        InvoiceHeader.is_cancelled == False,
+        InvoiceHeader.invoice_date >= datetime.combine(date_from, datetime.min.time()),
+        InvoiceHeader.invoice_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()),
+        func.coalesce(InvoiceLineItem.is_free_item, False) == False,
+        func.coalesce(InvoiceLineItem.is_sample, False) == False,
+        item_type.is_not(None)
+    )
+    rows = []
+    for row in session.execute(statement):
+        row = list(row)
+        if isinstance(row[1], str):
+            row[1] = date.fromisoformat(row[1])
+        rows.append(row)
+    return _frame(rows, HISTORY_SCHEMA)
+
+def load_draft_rules(session: Session, hospital_id, campaign_ids: Sequence, first_ordinal: int) -> List[CampaignRule]:
+    """Campaigns under review, whatever their status, active flag or period"""
+    if not campaign_ids:
+        return []
+    campaigns = session.query(PromotionCampaign).filter(
+        PromotionCampaign.hospital_id == hospital_id,
+        PromotionCampaign.campaign_id.in_([uuid.UUID(str(campaign_id)) for campaign_id in campaign_ids]),
+        PromotionCampaign.is_deleted == False
+    ).order_by(PromotionCampaign.created_at, PromotionCampaign.campaign_id).all()
+    return [CampaignRule.from_campaign(campaign, first_ordinal + offset) for offset, campaign in enumerate(campaigns)]
+
+# =============================================================================
+# EVALUATION
+# =============================================================================
+
+def _candidate_frames(rules: List[CampaignRule], members, hospital_id, simulation_date: date):
+    """(item_type, ordinal) scope rows and (item_type, item_id, ordinal) targeted rows"""
+    index = index_campaign_rules(hospital_id, simulation_date, rules, members)
+    scope_rows = [
+        (item_type, rule.ordinal)
+        for item_type in ITEM_TYPES
+        for rule in index.by_scope.get('all', []) + index.by_scope.get(item_type + 's', [])
+    ]
+    item_rows = [
+        (item_type, item_id, rule.ordinal)
+        for (key_type, item_id), key_rules in index.by_item.items()
+        for item_type in (ITEM_TYPES if key_type == ANY_ITEM_TYPE else (key_type,))
+        for rule in key_rules
+    ]
+    return (
+        _frame(scope_rows, {'item_type': pl.Utf8, 'ordinal': pl.Int64}),
+        _frame(item_rows, {'item_type': pl.Utf8, 'item_id': pl.Utf8, 'ordinal': pl.Int64})
+    )
+
+def best_campaign(lines: pl.DataFrame, scope: pl.DataFrame, targeted: pl.DataFrame,
+                  campaigns: pl.DataFrame) -> pl.DataFrame:
+    """
+    row_id -> campaign_percent/campaign_amount/campaign_ordinal of the best
+    eligible campaign (highest amount, then load order), as in calculate_promotion_discount
+    """
+    keys = lines.select('row_id', 'item_type', 'item_id', 'gross_amount', 'is_special_group')
+    pairs = pl.concat([
+        keys.join(scope, on='item_type'),
+        keys.join(targeted, on=['item_type', 'item_id'])
+    ]).join(campaigns, on='ordinal')
+
+    pairs = pairs.filter(
+        ~pl.col('exhausted')
+        & (~pl.col('target_special_group') | pl.col('is_special_group'))
+        & (pl.col('min_purchase_amount').is_null() | (pl.col('gross_amount') >= pl.col('min_purchase_amount')))
+        & pl.col('discount_type').is_in(['percentage', 'fixed_amount'])
+    )
+
+    amount = pl.when(pl.col('discount_type') == 'percentage').then(
+        pl.col('gross_amount') * pl.col('discount_value') / 100
+    ).otherwise(pl.col('discount_value'))
+    cap = pl.col('max_discount_amount')
+    pairs = pairs.with_columns(
+        campaign_amount=pl.when((cap > 0) & (amount > cap)).then(cap).otherwise(amount)
+    ).with_columns(
+        campaign_percent=pl.when(pl.col('gross_amount') > 0).then(
+            pl.col('campaign_amount') / pl.col('gross_amount') * 100
+        ).otherwise(pl.when(pl.col('discount_type') == 'percentage').then(pl.col('discount_value')).otherwise(0.0))
+    )
+
+    return pairs.sort(
+        ['row_id', 'campaign_amount', 'ordinal'], descending=[False, True, False]
+    ).unique(subset='row_id', keep='first', maintain_order=True).select(
+        'row_id', 'campaign_percent', 'campaign_amount', pl.col('ordinal').alias('campaign_ordinal')
+    )
+
+def price_lines(lines: pl.DataFrame, scope: pl.DataFrame, targeted: pl.DataFrame, campaigns: pl.DataFrame,
+                stacking_config: Dict, prefix: str) -> pl.DataFrame:
+    """Adds <prefix>_percent, _discount, _campaign and _margin columns for one campaign set"""
+    best = best_campaign(lines, scope, targeted, campaigns)
+    priced = lines.join(best, on='row_id', how='left').with_columns(
+        loyalty_percent=pl.lit(0.0), vip_percent=pl.lit(0.0)
+    ).with_columns(total_percent=stacked_percent_expr(stacking_config))
+
+    discount = pl.col('gross_amount') * pl.col('total_percent') / 100
+    return priced.with_columns(
+        pl.col('total_percent').alias(f'{prefix}_percent'),
+        discount.alias(f'{prefix}_discount'),
+        pl.col('campaign_ordinal').alias(f'{prefix}_campaign'),
+        (pl.col('gross_amount') - discount - pl.col('cost_amount')).alias(f'{prefix}_margin')
+    ).drop('campaign_percent', 'campaign_amount', 'campaign_ordinal', 'loyalty_percent', 'vip_percent',
+           'total_percent')
+
+def _bulk_policy(session: Session, hospital_id) -> Dict[str, Any]:
+    hospital = session.execute(
+        select(Hospital.bulk_discount_enabled, Hospital.bulk_discount_min_service_count,
+               Hospital.bulk_discount_effective_from).where(Hospital.hospital_id == hospital_id)
+    ).first()
+    if not hospital:
+        return {'enabled': False, 'min_count': 5, 'effective_from': None}
+    return {
+        'enabled': bool(hospital.bulk_discount_enabled),
+        'min_count': hospital.bulk_discount_min_service_count or 0,
+        'effective_from': hospital.bulk_discount_effective_from
+    }
+
+def _history_lines(history: pl.DataFrame, catalogue: pl.DataFrame, bulk_policy: Dict) -> pl.DataFrame:
+    """
+    History lines with the current discount settings of their item. Bulk applies
+    when the invoice reaches the hospital's minimum service/medicine count.
+    """
+    type_counts = history.group_by(['invoice_id', 'item_type']).agg(pl.col('quantity').sum().alias('type_count'))
+    bulk_applies = (
+        pl.lit(bulk_policy['enabled'])
+        & pl.col('item_type').is_in(['service', 'medicine'])
+        & (pl.col('type_count') >= bulk_policy['min_count'])
+    )
+    if bulk_policy['effective_from']:
+        bulk_applies = bulk_applies & (pl.col('invoice_date') >= bulk_policy['effective_from'])
+
+    return history.join(type_counts, on=['invoice_id', 'item_type']).join(
+        catalogue.select('item_type', 'item_id', 'cost_price', 'standard_percent', 'bulk_percent'),
+        on=['item_type', 'item_id'], how='left'
+    ).with_row_count('row_id').with_columns(
+        gross_amount=pl.col('unit_price') * pl.col('quantity'),
+        cost_amount=pl.coalesce('line_cost_price', 'cost_price') * pl.col('quantity'),
+        bulk_percent=pl.when(bulk_applies).then(pl.col('bulk_percent')).otherwise(0.0)
+    )
+
+def simulate_catalogue_promotions(session: Session, hospital_id, campaign_ids: Sequence = (),
+                                  simulation_date: Optional[date] = None,
+                                  history_days: int = DEFAULT_HISTORY_DAYS,
+                                  patient_is_special_group: bool = False) -> Dict[str, Any]:
+    """
+    Price every catalogue item and every invoice line of the last history_days
+    with the live campaigns (baseline) and with the live campaigns plus
+    campaign_ids (scenario)
+    """
+    started = time.perf_counter()
+    simulation_date = simulation_date or date.today()
+
+    live_rules = load_campaign_rules(session, hospital_id, simulation_date)
+    live_ids = {str(rule.campaign_id) for rule in live_rules}
+    draft_rules = [rule for rule in load_draft_rules(session, hospital_id, campaign_ids, len(live_rules))
+                   if str(rule.campaign_id) not in live_ids]
+    all_rules = live_rules + draft_rules
+    priced_rules = [rule for rule in all_rules if rule.promotion_type != 'buy_x_get_y']
+    members = load_group_members(session, {group_id for rule in priced_rules for group_id in rule.target_group_ids})
+    stacking_config = DiscountService.get_stacking_config(session, hospital_id)
+    bulk_policy = _bulk_policy(session, hospital_id)
+
+    draft_ordinals = {rule.ordinal for rule in draft_rules}
+    campaigns = _frame([
+        (rule.ordinal, rule.discount_type, rule.discount_value, rule.max_discount_amount,
+         rule.min_purchase_amount, rule.target_special_group,
+         bool(rule.max_total_uses and rule.current_uses >= rule.max_total_uses), rule.ordinal in draft_ordinals)
+        for rule in priced_rules
+    ], CAMPAIGN_SCHEMA)
+    scope, targeted = _candidate_frames(priced_rules, members, hospital_id, simulation_date)
+    live_campaigns = campaigns.filter(~pl.col('is_draft'))
+
+    # Catalogue: one unit of each item, bulk assumed reached (as in simulate_promotions)
+    catalogue = load_catalogue(session, hospital_id)
+    items = catalogue.with_row_count('row_id').with_columns(
+        gross_amount=pl.col('unit_price').fill_null(0.0),
+        cost_amount=pl.col('cost_price'),
+        is_special_group=pl.lit(patient_is_special_group),
+        bulk_percent=pl.col('bulk_percent') if bulk_policy['enabled'] else pl.lit(0.0)
+    )
+    items = price_lines(items, scope, targeted, live_campaigns, stacking_config, 'baseline')
+    items = price_lines(items, scope, targeted, campaigns, stacking_config, 'scenario')
+
+    # History: the same engine over the invoice lines of the period
+    date_from = simulation_date - timedelta(days=history_days)
+    history = _history_lines(load_history(session, hospital_id, date_from, simulation_date), catalogue, bulk_policy)
+    history = price_lines(history, scope, targeted, live_campaigns, stacking_config, 'baseline')
+    history = price_lines(history, scope, targeted, campaigns, stacking_config, 'scenario')
+
+    per_item_history = history.group_by(['item_type', 'item_id']).agg(
+        pl.col('quantity').sum().alias('history_quantity'),
+        pl.col('baseline_discount').sum().alias('history_baseline_discount'),
+        pl.col('scenario_discount').sum().alias('history_scenario_discount')
+    )
+    items = items.join(per_item_history, on=['item_type', 'item_id'], how='left').with_columns(
+        discount_change=pl.col('scenario_discount') - pl.col('baseline_discount'),
+        margin_impact=pl.col('baseline_discount') - pl.col('scenario_discount'),
+        history_margin_impact=(pl.col('history_baseline_discount') - pl.col('history_scenario_discount')).fill_null(0.0)
+    ).sort(['history_margin_impact', 'margin_impact', 'item_name'])
+
+    ordinal_codes = {rule.ordinal: rule.campaign_code for rule in all_rules}
+    item_rows = items.select(
+        'item_type', 'item_id', 'item_name', 'unit_price', 'cost_price',
+        'baseline_percent', 'scenario_percent', 'baseline_discount', 'scenario_discount', 'discount_change',
+        'baseline_margin', 'scenario_margin', 'margin_impact', 'baseline_campaign', 'scenario_campaign',
+        'history_quantity', 'history_baseline_discount', 'history_scenario_discount', 'history_margin_impact'
+    ).to_dicts()
+    for row in item_rows:
+        row['baseline_campaign'] = ordinal_codes.get(row['baseline_campaign'])
+        row['scenario_campaign'] = ordinal_codes.get(row['scenario_campaign'])
+
+    def total(frame, column):
+        return round(float(frame.select(pl.col(column).fill_null(0.0).sum()).item() or 0.0), 2)
+
+    baseline_total = total(history, 'baseline_discount')
+    scenario_total = total(history, 'scenario_discount')
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    logger.info(f"Bulk promotion simulation for hospital {hospital_id}: {items.height} items, "
+                f"{history.height} history lines, {len(draft_rules)} draft campaign(s) in {elapsed_ms}ms")
+
+    return {
+        'simulation_date': simulation_date.isoformat(),
+        'campaigns': [{
+            'campaign_id': str(rule.campaign_id),
+            'campaign_code': rule.campaign_code,
+            'campaign_name': rule.campaign_name,
+            'is_draft': rule.ordinal in draft_ordinals,
+            'simulated': rule.promotion_type != 'buy_x_get_y'
+        } for rule in all_rules],
+        'stacking_config': stacking_config,
+        'items': item_rows,
+        'history': {
+            'date_from': date_from.isoformat(),
+            'date_to': simulation_date.isoformat(),
+            'lines': history.height,
+            'invoices': history.select(pl.col('invoice_id').n_unique()).item() if history.height else 0,
+            'recorded_discount': total(history, 'recorded_discount'),
+            'baseline_discount': baseline_total,
+            'projected_discount': scenario_total,
+            'projected_change': round(scenario_total - baseline_total, 2),
+            'baseline_margin': total(history, 'baseline_margin'),
+            'projected_margin': total(history, 'scenario_margin')
+        },
+        'elapsed_ms': elapsed_ms
+    }
@@ -4,7 +4,8 @@ Resource Allocation Service
 Part of the Resource Management System
 
 Handles resource (rooms, staff) allocation for appointments:
-- Finding available rooms and staff for time slots
+- Finding available rooms and staff for time slots (in memory, from the
+  per-date availability index of resource_availability_service)
 - Allocating resources to appointments
 - Checking for conflicts
 - Auto-suggesting resources based on service requirements
@@ -23,6 +24,7 @@ from app.models.master import (
     Staff, Service, Branch
 )
 from app.models.appointment import Appointment
+from app.services.resource_availability_service import get_availability_index
 
 logger = logging.getLogger(__name__)
 
@@ -95,17 +97,14 @@ class ResourceAllocationService:
             query = query.filter(Room.room_type == room_type)
 
         all_rooms = query.all()
+        if not all_rooms:
+            return []
 
         # Filter out rooms that have conflicting allocations
-        available_rooms = []
-        start_str = start_time.strftime('%H:%M:%S') if isinstance(start_time, time) else start_time
-        end_str = end_time.strftime('%H:%M:%S') if isinstance(end_time, time) else end_time
-
-        for room in all_rooms:
-            if self._is_room_available(session, room.room_id, target_date, start_str, end_str):
-                available_rooms.append(room)
+        index = get_availability_index(all_rooms[0].hospital_id, target_date, session)
+        free_ids = set(index.free_resources('room', [room.room_id for room in all_rooms], start_time, end_time))
 
-        return available_rooms
+        return [room for room in all_rooms if room.room_id in free_ids]
 
     def _is_room_available(
         self,
@@ -115,7 +114,10 @@ class ResourceAllocationService:
         start_time: str,
         end_time: str
     ) -> bool:
-        """Check if a specific room is available for the given time slot."""
+        """
+        Check if a specific room is available for the given time slot.
+        Queries the database directly - used to guard allocations.
+        """
         # Check for conflicting room allocations
         conflict = session.query(AppointmentResource).filter(
             AppointmentResource.resource_type == 'room',
@@ -220,15 +222,10 @@ class ResourceAllocationService:
         all_staff = query.all()
 
         # Filter out staff that have conflicting allocations
-        available_staff = []
-        start_str = start_time.strftime('%H:%M:%S') if isinstance(start_time, time) else start_time
-        end_str = end_time.strftime('%H:%M:%S') if isinstance(end_time, time) else end_time
+        index = get_availability_index(hospital_id, target_date, session)
+        free_ids = set(index.free_resources('staff', [staff.staff_id for staff in all_staff], start_time, end_time))
 
-        for staff in all_staff:
-            if self._is_staff_available(session, staff.staff_id, target_date, start_str, end_str):
-                available_staff.append(staff)
-
-        return available_staff
+        return [staff for staff in all_staff if staff.staff_id in free_ids]
 
     def _is_staff_available(
         self,
@@ -238,7 +235,10 @@ class ResourceAllocationService:
         start_time: str,
         end_time: str
     ) -> bool:
-        """Check if a specific staff member is available for the given time slot."""
+        """
+        Check if a specific staff member is available for the given time slot.
+        Queries the database directly - used to guard allocations.
+        """
         # Check for conflicting staff allocations
         conflict = session.query(AppointmentResource).filter(
             AppointmentResource.resource_type == 'staff',
@@ -288,6 +288,49 @@ class ResourceAllocationService:
 
         return schedule
 
+    # =========================================================================
+    # FREE WINDOWS
+    # =========================================================================
+
+    def get_free_windows(
+        self,
+        session: Session,
+        hospital_id: UUID,
+        resource_type: str,
+        resource_id: UUID,
+        target_date: date,
+        duration_minutes: int,
+        limit: int = 5,
+        day_start: Optional[str] = None,
+        day_end: Optional[str] = None,
+        step_minutes: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Get the first free windows of a room or staff member on a date.
+
+        Rooms default to their operating hours and slot duration as the grid
+        step; staff default to 08:00-20:00 on a 15 minute grid.
+
+        Returns:
+            List of {'start_time': 'HH:MM', 'end_time': 'HH:MM'}
+        """
+        if resource_type == 'room':
+            room = session.query(Room).filter_by(room_id=resource_id).first()
+            if not room:
+                raise ResourceAllocationError(f"Room not found: {resource_id}")
+            day_start = day_start or room.operating_start_time
+            day_end = day_end or room.operating_end_time
+            step_minutes = step_minutes or room.default_slot_duration_minutes
+
+        index = get_availability_index(hospital_id, target_date, session)
+        return index.free_windows(
+            resource_type, resource_id, duration_minutes,
+            day_start=day_start or '08:00',
+            day_end=day_end or '20:00',
+            step_minutes=step_minutes or 15,
+            limit=limit
+        )
+
     # =========================================================================
     # SERVICE RESOURCE REQUIREMENTS
     # =========================================================================
@@ -349,11 +392,6 @@ class ResourceAllocationService:
         if not appointment.service_id:
             return {'room': None, 'staff': [], 'message': 'No service linked to appointment'}
 
-        # Get service requirements
-        requirements = self.get_service_requirements(session, appointment.service_id)
-
-        suggestions = {'room': None, 'staff': [], 'warnings': []}
-
         # Get appointment timing
         appt_date = appointment.appointment_date
         start_time = appointment.start_time
@@ -362,20 +400,59 @@ class ResourceAllocationService:
             timedelta(minutes=appointment.estimated_duration_minutes or 30)
         ).time()
 
+        return self.suggest_resources_for_slot(
+            session=session,
+            service_id=appointment.service_id,
+            branch_id=appointment.branch_id,
+            hospital_id=appointment.hospital_id,
+            target_date=appt_date,
+            start_time=start_time,
+            end_time=end_time,
+            exclude_appointment_id=appointment.appointment_id
+        )
+
+    def suggest_resources_for_slot(
+        self,
+        session: Session,
+        service_id: UUID,
+        branch_id: UUID,
+        hospital_id: UUID,
+        target_date: date,
+        start_time: time,
+        end_time: time,
+        exclude_appointment_id: Optional[UUID] = None
+    ) -> Dict[str, Any]:
+        """
+        Suggest resources for every requirement of a service at once.
+
+        Rooms, staff and the day's allocations are each loaded once; each
+        requirement then takes free resources of its type in memory. A staff
+        member is suggested for one requirement only, and quantity_required
+        staff are suggested per requirement. Allocations of
+        exclude_appointment_id (the appointment being resourced) are ignored.
+
+        Returns dict with suggested room and staff, plus warnings for
+        mandatory requirements that cannot be met.
+        """
+        requirements = self.get_service_requirements(session, service_id)
+        suggestions = {'room': None, 'staff': [], 'warnings': []}
+
+        index = get_availability_index(hospital_id, target_date, session)
+
+        def is_free(resource_type, resource_id):
+            return index.is_free(resource_type, resource_id, start_time, end_time, exclude_appointment_id)
+
         # Suggest room
         if requirements['room']:
+            rooms = self.get_rooms(session, branch_id)
             for room_req in requirements['room']:
-                available_rooms = self.get_available_rooms(
-                    session=session,
-                    branch_id=appointment.branch_id,
-                    target_date=appt_date,
-                    start_time=start_time,
-                    end_time=end_time,
-                    room_type=room_req.get('room_type')
-                )
+                room = next((
+                    r for r in rooms
+                    if (not room_req.get('room_type') or r.room_type == room_req['room_type'])
+                    and is_free('room', r.room_id)
+                ), None)
 
-                if available_rooms:
-                    room = available_rooms[0]
+                if room:
                     suggestions['room'] = {
                         'room_id': str(room.room_id),
                         'room_code': room.room_code,
@@ -389,28 +466,34 @@ class ResourceAllocationService:
 
         # Suggest staff
         if requirements['staff']:
-            for staff_req in requirements['staff']:
-                available_staff = self.get_available_staff(
-                    session=session,
-                    branch_id=appointment.branch_id,
-                    hospital_id=appointment.hospital_id,
-                    target_date=appt_date,
-                    start_time=start_time,
-                    end_time=end_time,
-                    staff_type=staff_req.get('staff_type')
-                )
+            all_staff = session.query(Staff).filter(
+                Staff.hospital_id == hospital_id,
+                Staff.is_active == True,
+                Staff.is_deleted == False
+            ).all()
+            suggested_ids = set()
 
-                if available_staff:
-                    staff = available_staff[0]
+            for staff_req in requirements['staff']:
+                staff_type = staff_req.get('staff_type')
+                candidates = [
+                    s for s in all_staff
+                    if (s.staff_type == staff_type if staff_type else s.staff_type != 'doctor')
+                    and s.staff_id not in suggested_ids
+                    and is_free('staff', s.staff_id)
+                ][:staff_req.get('quantity_required') or 1]
+
+                for staff in candidates:
+                    suggested_ids.add(staff.staff_id)
                     suggestions['staff'].append({
                         'staff_id': str(staff.staff_id),
                         'staff_name': f"{staff.first_name} {staff.last_name or ''}".strip(),
                         'staff_type': staff.staff_type,
                         'role': staff_req.get('staff_role')
                     })
-                elif staff_req.get('is_mandatory'):
+
+                if not candidates and staff_req.get('is_mandatory'):
                     suggestions['warnings'].append(
-                        f"No {staff_req.get('staff_type')} available for this time slot"
+                        f"No {staff_type} available for this time slot"
                     )
 
         return suggestions
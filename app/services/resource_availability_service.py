@@ -0,0 +1,296 @@
+# app/services/resource_availability_service.py
+
+"""
+Resource Availability Service - in-memory availability of rooms and staff
+
+All active room and staff allocations of one hospital on one date are loaded
+with a single query into an AvailabilityIndex: a ResourceTimeline per
+resource holding its bookings as minute intervals, sorted by start, with a
+running maximum of end times. "Is this resource free for [start, end)" is a
+bisect, "which of these resources are free" is one bisect per resource, and
+the first free windows of a resource are found by walking its gaps.
+
+Indexes are cached per worker with a TTL (app config
+RESOURCE_AVAILABILITY_TTL, seconds) and a version stamp per date. Allocation
+changes (allocate_room, allocate_staff, deallocate_resource and direct
+AppointmentResource writes) and appointment status/date changes bump the
+stamp when the changing transaction commits (hooks in app/models/master.py
+and app/models/appointment.py). Until then a session with pending changes for
+a date reads a fresh index built from the session itself, so a booking flow
+sees its own allocations. When the service cache has a shared backend the
+bump is broadcast to the other workers.
+"""
+
+import threading
+import time as _time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.engine.versioned_cache import ALL_SCOPES, PendingCommitWork, VersionStampedCache
+from app.models.appointment import Appointment
+from app.models.master import AppointmentResource
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+DEFAULT_INDEX_TTL = 60  # seconds
+MAX_CACHED_INDEXES = 256
+
+# Allocations that occupy a resource, and appointment states that release them
+ACTIVE_ALLOCATION_STATUSES = ('allocated', 'in_use')
+RELEASED_APPOINTMENT_STATUSES = ('cancelled', 'no_show')
+
+# session.info key for invalidations waiting for the transaction to commit
+PENDING_KEY = 'resource_availability_invalidations'
+ALL_DATES = ALL_SCOPES
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value) -> Optional[int]:
+    """Minutes since midnight of a time, datetime or 'HH:MM[:SS]' string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        value = value.time()
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    parts = str(value).split(':')
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@dataclass(frozen=True)
+class Booking:
+    """One allocation of a resource; start/end are minutes since midnight"""
+    start: int
+    end: int
+    allocation_id: Any
+    appointment_id: Any
+    start_time: str
+    end_time: str
+    role: Optional[str] = None
+
+
+class ResourceTimeline:
+    """Bookings of one resource on one date, sorted by start"""
+
+    def __init__(self, bookings: Iterable[Booking]):
+        self.bookings = sorted(bookings, key=lambda b: (b.start, b.end))
+        self._starts = [b.start for b in self.bookings]
+        # _max_ends[i] is the latest end among bookings[0..i]; bookings may overlap
+        self._max_ends = []
+        latest = -1
+        for booking in self.bookings:
+            latest = max(latest, booking.end)
+            self._max_ends.append(latest)
+
+    def conflict(self, start: int, end: int, exclude_appointment_id=None) -> Optional[Booking]:
+        """A booking overlapping [start, end), or None; bookings of exclude_appointment_id are ignored"""
+        # Only bookings starting before end can overlap
+        position = bisect_left(self._starts, end)
+        if position == 0 or self._max_ends[position - 1] <= start:
+            return None
+        for index in range(position - 1, -1, -1):
+            booking = self.bookings[index]
+            if booking.end > start and (exclude_appointment_id is None
+                                        or booking.appointment_id != exclude_appointment_id):
+                return booking
+        return None
+
+    def is_free(self, start: int, end: int, exclude_appointment_id=None) -> bool:
+        return self.conflict(start, end, exclude_appointment_id) is None
+
+    def free_windows(self, duration: int, day_start: int, day_end: int,
+                     step: int, limit: int) -> List[Tuple[int, int]]:
+        """First `limit` free [start, start + duration) windows on a step grid"""
+        windows = []
+        start = day_start
+        while start + duration <= day_end and len(windows) < limit:
+            booking = self.conflict(start, start + duration)
+            if booking is None:
+                windows.append((start, start + duration))
+                start += step
+            else:
+                # Jump to the first grid point at or after the blocking booking ends
+                start = day_start + -(-(booking.end - day_start) // step) * step
+        return windows
+
+
+EMPTY_TIMELINE = ResourceTimeline([])
+
+
+@dataclass
+class AvailabilityIndex:
+    """Resource timelines of one hospital on one date"""
+    hospital_id: Any
+    target_date: date
+    timelines: Dict[Tuple[str, str], ResourceTimeline] = field(default_factory=dict)
+    allocation_count: int = 0
+    built_at: float = field(default_factory=_time.monotonic)
+    version: Tuple[int, int] = (0, 0)
+
+    def timeline(self, resource_type: str, resource_id) -> ResourceTimeline:
+        return self.timelines.get((resource_type, str(resource_id)), EMPTY_TIMELINE)
+
+    def conflict(self, resource_type: str, resource_id, start_time, end_time,
+                 exclude_appointment_id=None) -> Optional[Booking]:
+        return self.timeline(resource_type, resource_id).conflict(
+            to_minutes(start_time), to_minutes(end_time), exclude_appointment_id
+        )
+
+    def is_free(self, resource_type: str, resource_id, start_time, end_time,
+                exclude_appointment_id=None) -> bool:
+        return self.conflict(resource_type, resource_id, start_time, end_time, exclude_appointment_id) is None
+
+    def free_resources(self, resource_type: str, resource_ids: Iterable, start_time, end_time,
+                       exclude_appointment_id=None) -> List:
+        """The resource_ids (in the given order) free for [start_time, end_time)"""
+        start, end = to_minutes(start_time), to_minutes(end_time)
+        return [
+            resource_id for resource_id in resource_ids
+            if self.timeline(resource_type, resource_id).is_free(start, end, exclude_appointment_id)
+        ]
+
+    def free_windows(self, resource_type: str, resource_id, duration_minutes: int,
+                     day_start='08:00', day_end='20:00', step_minutes: int = 15,
+                     limit: int = 5) -> List[Dict[str, str]]:
+        """First `limit` free windows of duration_minutes, on a step_minutes grid"""
+        windows = self.timeline(resource_type, resource_id).free_windows(
+            duration_minutes, to_minutes(day_start), to_minutes(day_end) or MINUTES_PER_DAY,
+            max(step_minutes, 1), limit
+        )
+        return [{'start_time': format_minutes(start), 'end_time': format_minutes(end)} for start, end in windows]
+
+
+def build_availability_index(session: Session, hospital_id, target_date: date) -> AvailabilityIndex:
+    """One query: the hospital's occupying allocations on target_date"""
+    rows = session.execute(
+        select(
+            AppointmentResource.allocation_id,
+            AppointmentResource.appointment_id,
+            AppointmentResource.resource_type,
+            AppointmentResource.resource_id,
+            AppointmentResource.start_time,
+            AppointmentResource.end_time,
+            AppointmentResource.role
+        ).join(
+            Appointment, AppointmentResource.appointment_id == Appointment.appointment_id
+        ).where(
+            Appointment.hospital_id == hospital_id,
+            Appointment.status.notin_(RELEASED_APPOINTMENT_STATUSES),
+            AppointmentResource.allocation_date == target_date,
+            AppointmentResource.status.in_(ACTIVE_ALLOCATION_STATUSES)
+        )
+    ).all()
+
+    bookings: Dict[Tuple[str, str], List[Booking]] = {}
+    for row in rows:
+        start, end = to_minutes(row.start_time), to_minutes(row.end_time)
+        if start is None or end is None:
+            continue
+        bookings.setdefault((row.resource_type, str(row.resource_id)), []).append(Booking(
+            start=start, end=end, allocation_id=row.allocation_id, appointment_id=row.appointment_id,
+            start_time=row.start_time, end_time=row.end_time, role=row.role
+        ))
+
+    return AvailabilityIndex(
+        hospital_id=hospital_id,
+        target_date=target_date,
+        timelines={key: ResourceTimeline(items) for key, items in bookings.items()},
+        allocation_count=len(rows)
+    )
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class AvailabilityIndexCache(VersionStampedCache):
+    """
+    Per-worker index cache keyed by (hospital_id, date).
+    A cached index is used while it is younger than the TTL and its version
+    stamp (global version, date version) is still current. Invalidation is
+    per date, across hospitals.
+    """
+
+    op = 'resource_availability'
+    scope_index = 1
+    ttl_config = 'RESOURCE_AVAILABILITY_TTL'
+    default_ttl = DEFAULT_INDEX_TTL
+    max_entries = MAX_CACHED_INDEXES
+
+    def normalize_scope(self, target_date: date) -> date:
+        return target_date
+
+    def encode_scope(self, target_date: date) -> str:
+        return target_date.isoformat()
+
+    def decode_scope(self, value: str) -> date:
+        return date.fromisoformat(value)
+
+    def get(self, hospital_id, target_date: date, session: Optional[Session] = None) -> AvailabilityIndex:
+        return self.get_or_build(
+            (str(hospital_id), target_date),
+            lambda build_session: build_availability_index(build_session, hospital_id, target_date),
+            session
+        )
+
+
+_availability_cache = None
+_availability_cache_lock = threading.Lock()
+
+def get_availability_cache() -> AvailabilityIndexCache:
+    """Process-wide index cache"""
+    global _availability_cache
+    if _availability_cache is None:
+        with _availability_cache_lock:
+            if _availability_cache is None:
+                _availability_cache = AvailabilityIndexCache()
+    return _availability_cache
+
+def get_availability_index(hospital_id, target_date: date, session: Optional[Session] = None) -> AvailabilityIndex:
+    """
+    Availability of (hospital, date). A session with uncommitted allocation
+    changes for the date gets an uncached index built from the session.
+    """
+    if session is not None:
+        pending = session.info.get(PENDING_KEY) or ()
+        if target_date in pending or ALL_DATES in pending:
+            return build_availability_index(session, hospital_id, target_date)
+    return get_availability_cache().get(hospital_id, target_date, session)
+
+def invalidate_availability(target_date: Optional[date] = None):
+    """Invalidate now - use after a commit that changed allocations outside the ORM"""
+    get_availability_cache().invalidate(target_date)
+
+# =============================================================================
+# COMMIT-TIME INVALIDATION
+# =============================================================================
+
+def _apply_pending_invalidations(session: Session, pending):
+    if ALL_DATES in pending:
+        invalidate_availability()
+        return
+    for target_date in pending:
+        invalidate_availability(target_date)
+
+_pending_invalidations = PendingCommitWork(PENDING_KEY, _apply_pending_invalidations)
+
+def schedule_availability_invalidation(session: Optional[Session], target_date: Optional[date] = None):
+    """
+    Invalidate when session's outermost transaction commits (dropped on
+    rollback). target_date None invalidates every date. Without a session
+    the invalidation is immediate.
+    """
+    if session is None:
+        invalidate_availability(target_date)
+        return
+    _pending_invalidations.collect(session).add(ALL_DATES if target_date is None else target_date)
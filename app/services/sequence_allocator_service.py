@@ -0,0 +1,317 @@
+# app/services/sequence_allocator_service.py
+
+"""
+Sequence Allocator Service - document numbers (invoices, POs, credit notes)
+
+Counters live in invoice_sequences, one row per (hospital, prefix, financial
+year). Numbers are reserved with a single UPDATE ... RETURNING instead of a
+SELECT ... FOR UPDATE held for the whole document transaction.
+
+Allocation modes (per prefix, see DEFAULT_SEQUENCE_MODES / app config
+DOCUMENT_SEQUENCE_MODES):
+- 'gapless':  reserve in the caller's transaction, so a rollback returns the
+  number. Concurrent documents of the same series wait for that transaction.
+  Required for the statutory invoice and credit note series (GST Rule 46:
+  consecutive serial numbers) and used for them by default.
+- 'separate': reserve in a short transaction of its own. The counter row is
+  locked only for that statement; a document that later rolls back leaves a
+  gap in the series. The default for every other series (e.g. PO numbers).
+- 'block':    hi/lo - each worker reserves DOCUMENT_SEQUENCE_BLOCK_SIZE
+  numbers at a time and hands them out from memory. Fastest, but numbers are
+  not in creation order across workers and unused ones are lost on restart.
+  Opt-in for internal series only.
+
+The first allocation of a series seeds the counter from existing documents
+(seed callable), so switching an old LIKE-scan generator over keeps the series
+continuous.
+"""
+
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.models.config import InvoiceSequence
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+SEQUENCE_MODES = ('separate', 'block', 'gapless')
+
+# Tax invoice and credit note series must stay gap-free
+STATUTORY_SEQUENCE_PREFIXES = ('GST', 'DRG', 'NGS', 'CN')
+
+# Prefix -> mode; prefixes not listed use DEFAULT_SEQUENCE_MODE.
+# Override via app config, e.g. DOCUMENT_SEQUENCE_MODES = {'PO': 'block'}
+DEFAULT_SEQUENCE_MODES: Dict[str, str] = {prefix: 'gapless' for prefix in STATUTORY_SEQUENCE_PREFIXES}
+DEFAULT_SEQUENCE_MODE = 'separate'
+DEFAULT_BLOCK_SIZE = 20
+
+# seed(connection, hospital_id) -> last number already used in the series (0 if none)
+SeedFunction = Callable[[Connection, uuid.UUID], int]
+
+
+def get_financial_year(today: Optional[date] = None, short: bool = False) -> str:
+    """Indian financial year (April-March): '2025-2026', or '25-26' when short"""
+    today = today or datetime.now(timezone.utc).date()
+    start = today.year if today.month >= 4 else today.year - 1
+    if short:
+        return f"{start % 100:02d}-{(start + 1) % 100:02d}"
+    return f"{start}-{start + 1}"
+
+def format_document_number(prefix: str, financial_year: str, sequence: int, width: int = 5) -> str:
+    """PREFIX/FIN_YEAR/SEQ, e.g. GST/2025-2026/00042"""
+    return f"{prefix}/{financial_year}/{sequence:0{width}d}"
+
+def last_number_from_documents(column, prefix: str, financial_year: str, hospital_column=None) -> SeedFunction:
+    """
+    Seed that finds the highest sequence a hospital already used in column for
+    PREFIX/FIN_YEAR/NNNNN numbers. Runs once per series, when its counter row
+    is first created. hospital_column defaults to the model's hospital_id.
+    """
+    pattern = f"{prefix}/{financial_year}/%"
+    if hospital_column is None:
+        hospital_column = column.class_.hospital_id
+
+    def seed(connection: Connection, hospital_id) -> int:
+        numbers = connection.execute(
+            select(column).where(hospital_column == hospital_id, column.like(pattern))
+        ).scalars()
+        highest = 0
+        for number in numbers:
+            try:
+                highest = max(highest, int(number.rsplit('/', 1)[-1]))
+            except (ValueError, AttributeError):
+                continue
+        return highest
+
+    return seed
+
+
+class SequenceAllocator:
+    """
+    Reserves document numbers from invoice_sequences.
+    Usage:
+        allocator = get_sequence_allocator()
+        seq = allocator.allocate(hospital_id, 'GST', '2025-2026')
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, modes: Optional[Dict[str, str]] = None,
+                 block_size: Optional[int] = None):
+        self._engine = engine
+        self._modes = modes
+        self._block_size = block_size
+        self._blocks: Dict[Tuple, list] = {}   # key -> [next, last] reserved by this worker
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # CONFIGURATION
+    # =========================================================================
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from app.services.database_service import get_db_engine
+            self._engine = get_db_engine()
+        return self._engine
+
+    def _app_config(self, name: str, default):
+        try:
+            from flask import current_app
+            return current_app.config.get(name, default)
+        except RuntimeError:
+            return default
+
+    def mode_for(self, prefix: str) -> str:
+        modes = dict(DEFAULT_SEQUENCE_MODES)
+        modes.update(self._modes if self._modes is not None
+                     else self._app_config('DOCUMENT_SEQUENCE_MODES', {}) or {})
+        mode = modes.get(prefix, DEFAULT_SEQUENCE_MODE)
+        if mode != 'gapless' and prefix in STATUTORY_SEQUENCE_PREFIXES:
+            logger.warning(f"⚠️ Statutory series {prefix} configured as '{mode}': rolled back documents leave gaps")
+        if mode not in SEQUENCE_MODES:
+            logger.warning(f"⚠️ Unknown sequence mode '{mode}' for {prefix}, using {DEFAULT_SEQUENCE_MODE}")
+            return DEFAULT_SEQUENCE_MODE
+        return mode
+
+    @property
+    def block_size(self) -> int:
+        if self._block_size is not None:
+            return self._block_size
+        return int(self._app_config('DOCUMENT_SEQUENCE_BLOCK_SIZE', DEFAULT_BLOCK_SIZE))
+
+    # =========================================================================
+    # COUNTER STATEMENTS
+    # =========================================================================
+
+    @staticmethod
+    def _key_condition(hospital_id, prefix, financial_year):
+        table = InvoiceSequence.__table__
+        return and_(
+            table.c.hospital_id == hospital_id,
+            table.c.prefix == prefix,
+            table.c.financial_year == financial_year
+        )
+
+    def _increment(self, connection: Connection, hospital_id, prefix, financial_year,
+                   count: int, user_id: Optional[str]) -> Optional[int]:
+        """Advance the counter by count and return the new value, or None if no row"""
+        table = InvoiceSequence.__table__
+        return connection.execute(
+            update(table)
+            .where(self._key_condition(hospital_id, prefix, financial_year))
+            .values(current_sequence=table.c.current_sequence + count, updated_by=user_id)
+            .returning(table.c.current_sequence)
+        ).scalar()
+
+    def _create_counter(self, connection: Connection, hospital_id, prefix, financial_year,
+                        starting_number: int, seed: Optional[SeedFunction], user_id: Optional[str]):
+        """Insert the counter row positioned after the last used number (concurrent creators are ignored)"""
+        table = InvoiceSequence.__table__
+        last_used = max(starting_number - 1, seed(connection, hospital_id) if seed else 0)
+        values = dict(
+            hospital_id=hospital_id,
+            prefix=prefix,
+            financial_year=financial_year,
+            current_sequence=last_used,
+            created_by=user_id,
+            updated_by=user_id
+        )
+
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            connection.execute(pg_insert(table).values(**values)
+                               .on_conflict_do_nothing(constraint='uq_invoice_sequence'))
+        else:
+            exists = connection.execute(
+                select(func.count()).select_from(table)
+                .where(self._key_condition(hospital_id, prefix, financial_year))
+            ).scalar()
+            if not exists:
+                connection.execute(insert(table).values(**values))
+
+        logger.info(f"Created sequence {prefix}/{financial_year} after {last_used}")
+
+    def _reserve(self, connection: Connection, hospital_id, prefix, financial_year, count: int,
+                 starting_number: int, seed: Optional[SeedFunction], user_id: Optional[str]) -> int:
+        """Reserve count numbers on connection; returns the last one reserved"""
+        last = self._increment(connection, hospital_id, prefix, financial_year, count, user_id)
+        if last is None:
+            self._create_counter(connection, hospital_id, prefix, financial_year,
+                                 starting_number, seed, user_id)
+            last = self._increment(connection, hospital_id, prefix, financial_year, count, user_id)
+        return last
+
+    # =========================================================================
+    # PUBLIC API
+    # =========================================================================
+
+    def allocate(
+        self,
+        hospital_id: uuid.UUID,
+        prefix: str,
+        financial_year: str,
+        session: Optional[Session] = None,
+        starting_number: int = 1,
+        seed: Optional[SeedFunction] = None,
+        user_id: Optional[str] = None,
+        mode: Optional[str] = None
+    ) -> int:
+        """
+        Reserve the next number of a series.
+
+        Args:
+            session: Caller's session - required for 'gapless' mode, where the
+                number is reserved inside the caller's transaction
+            starting_number: First number of a new series
+            seed: Finds the last number already used when the series is new
+            mode: Override the configured mode for this prefix
+        """
+        mode = mode or self.mode_for(prefix)
+
+        if mode == 'gapless':
+            if session is None:
+                raise ValueError(f"Gap-free sequence {prefix} needs the caller's session")
+            return self._reserve(session.connection(), hospital_id, prefix, financial_year, 1,
+                                 starting_number, seed, user_id)
+
+        if mode == 'block':
+            return self._allocate_from_block(hospital_id, prefix, financial_year,
+                                             starting_number, seed, user_id)
+
+        with self.engine.begin() as connection:
+            return self._reserve(connection, hospital_id, prefix, financial_year, 1,
+                                 starting_number, seed, user_id)
+
+    def _allocate_from_block(self, hospital_id, prefix, financial_year, starting_number, seed, user_id) -> int:
+        key = (hospital_id, prefix, financial_year)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None or block[0] > block[1]:
+                size = max(1, self.block_size)
+                with self.engine.begin() as connection:
+                    last = self._reserve(connection, hospital_id, prefix, financial_year, size,
+                                         starting_number, seed, user_id)
+                block = self._blocks[key] = [last - size + 1, last]
+                logger.debug(f"Reserved {prefix}/{financial_year} block {block[0]}-{block[1]}")
+            number = block[0]
+            block[0] += 1
+            return number
+
+    def peek(self, hospital_id: uuid.UUID, prefix: str, financial_year: str,
+             starting_number: int = 1, seed: Optional[SeedFunction] = None) -> int:
+        """Number the next allocation would most likely get, without reserving it"""
+        table = InvoiceSequence.__table__
+        with self.engine.connect() as connection:
+            current = connection.execute(
+                select(table.c.current_sequence)
+                .where(self._key_condition(hospital_id, prefix, financial_year))
+            ).scalar()
+            if current is None:
+                current = max(starting_number - 1, seed(connection, hospital_id) if seed else 0)
+        return current + 1
+
+    def reset_blocks(self):
+        """Forget reserved blocks (numbers still unused in them are skipped)"""
+        with self._lock:
+            self._blocks.clear()
+
+
+_sequence_allocator = None
+_sequence_allocator_lock = threading.Lock()
+
+def get_sequence_allocator() -> SequenceAllocator:
+    """Process-wide allocator (blocks are per worker process)"""
+    global _sequence_allocator
+    if _sequence_allocator is None:
+        with _sequence_allocator_lock:
+            if _sequence_allocator is None:
+                _sequence_allocator = SequenceAllocator()
+    return _sequence_allocator
+
+def next_document_number(
+    hospital_id: uuid.UUID,
+    prefix: str,
+    session: Optional[Session] = None,
+    seed_column=None,
+    starting_number: int = 1,
+    user_id: Optional[str] = None,
+    financial_year: Optional[str] = None,
+    width: int = 5
+) -> str:
+    """
+    Allocate and format the next PREFIX/FIN_YEAR/NNNNN number.
+    seed_column (e.g. InvoiceHeader.invoice_number) continues an existing
+    series the first time it is allocated from.
+    """
+    financial_year = financial_year or get_financial_year()
+    seed = last_number_from_documents(seed_column, prefix, financial_year) if seed_column is not None else None
+    sequence = get_sequence_allocator().allocate(
+        hospital_id, prefix, financial_year,
+        session=session, starting_number=starting_number, seed=seed, user_id=user_id
+    )
+    return format_document_number(prefix, financial_year, sequence, width)
@@ -5,26 +5,96 @@ Phase 1 of Patient Lifecycle System
 
 Generates appointment slots from doctor schedules.
 Handles:
-- Batch slot generation for date ranges
+- Batch slot generation for date ranges (computed in memory, diffed against
+  existing slots in one query and bulk inserted)
+- Dry-run diffs of what a generation would create or replace
 - Schedule exception handling (leaves, holidays)
 - Slot cleanup for past dates
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, date, time, timedelta, timezone
 from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 import logging
 
-from sqlalchemy import and_, or_, func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, func, insert
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.models.appointment import (
     AppointmentSlot, DoctorSchedule, DoctorScheduleException
 )
+from app.models.base import generate_uuid
 from app.models.master import Staff, Branch
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT / DELETE statement
+SLOT_BATCH_SIZE = 1000
+
+# Columns that make two slots at the same (staff, branch, date, start) identical
+SLOT_KEY_COLUMNS = ('staff_id', 'branch_id', 'slot_date', 'start_time')
+SLOT_COMPARE_COLUMNS = ('schedule_id', 'end_time', 'max_bookings', 'is_blocked', 'block_reason')
+
+
+@dataclass
+class SlotGenerationResult:
+    """Outcome (or, for a dry run, the plan) of a slot generation"""
+    dry_run: bool = False
+    to_create: List[Dict[str, Any]] = field(default_factory=list)
+    to_delete: List[Dict[str, Any]] = field(default_factory=list)
+    created: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    booked: int = 0
+    by_staff: Dict[UUID, int] = field(default_factory=dict)
+
+    def merge(self, other: 'SlotGenerationResult'):
+        self.to_create.extend(other.to_create)
+        self.to_delete.extend(other.to_delete)
+        self.created += other.created
+        self.deleted += other.deleted
+        self.unchanged += other.unchanged
+        self.booked += other.booked
+        self.by_staff.update(other.by_staff)
+
+    def to_dict(self, include_diff: bool = False) -> Dict[str, Any]:
+        summary = {
+            'dry_run': self.dry_run,
+            'slots_created': len(self.to_create) if self.dry_run else self.created,
+            'slots_deleted': len(self.to_delete) if self.dry_run else self.deleted,
+            'slots_unchanged': self.unchanged,
+            'booked_slots_kept': self.booked,
+            'by_staff': {str(staff_id): count for staff_id, count in self.by_staff.items()}
+        }
+        if include_diff:
+            summary['diff'] = {
+                'create': [_describe_slot(row) for row in self.to_create],
+                'delete': [_describe_slot(row) for row in self.to_delete]
+            }
+        return summary
+
+
+def _describe_slot(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'staff_id': str(row['staff_id']),
+        'slot_date': row['slot_date'].isoformat(),
+        'start_time': row['start_time'].strftime('%H:%M'),
+        'end_time': row['end_time'].strftime('%H:%M'),
+        'is_blocked': bool(row['is_blocked']),
+        'block_reason': row['block_reason']
+    }
+
+
+def _slot_key(row) -> Tuple:
+    return tuple(row[column] for column in SLOT_KEY_COLUMNS)
+
+
+def _batches(rows: List, size: int = SLOT_BATCH_SIZE):
+    for offset in range(0, len(rows), size):
+        yield rows[offset:offset + size]
+
 
 class SlotGeneratorService:
     """
@@ -36,6 +106,79 @@ class SlotGeneratorService:
     - Hospital settings
     """
 
+    def generate_slots(
+        self,
+        session: Session,
+        branch_id: UUID,
+        start_date: date,
+        end_date: date,
+        staff_ids: Optional[List[UUID]] = None,
+        regenerate: bool = False,
+        dry_run: bool = False,
+        max_workers: int = 1
+    ) -> SlotGenerationResult:
+        """
+        Generate slots for the doctors of a branch in bulk.
+
+        Candidate slots are computed in memory from the schedules, diffed
+        against the existing slots of the range (one query) and the difference
+        is inserted in batches with ON CONFLICT DO NOTHING on unique_slot, so
+        concurrent generations cannot create duplicates.
+
+        Args:
+            session: Database session
+            branch_id: Branch UUID
+            start_date: Start date (inclusive)
+            end_date: End date (inclusive)
+            staff_ids: Limit to these doctors (all doctors with schedules if None)
+            regenerate: If True, replace unbooked slots that no longer match the schedule
+            dry_run: If True, only compute the diff; nothing is written
+            max_workers: Doctors processed in parallel, each on its own session
+                and transaction (committed per doctor); 1 keeps everything on
+                the caller's session
+
+        Returns:
+            SlotGenerationResult with the diff and counts
+        """
+        schedules_by_staff = self._get_schedules(session, branch_id, staff_ids)
+        if not schedules_by_staff:
+            logger.warning(f"No schedules found at branch {branch_id}")
+            return SlotGenerationResult(dry_run=dry_run)
+
+        exceptions_by_staff = self._get_branch_exceptions(
+            session, list(schedules_by_staff), branch_id, start_date, end_date
+        )
+        candidates_by_staff = {
+            staff_id: self._candidate_slots(schedules, exceptions_by_staff.get(staff_id, []),
+                                            start_date, end_date)
+            for staff_id, schedules in schedules_by_staff.items()
+        }
+
+        if max_workers > 1 and len(candidates_by_staff) > 1:
+            result = self._generate_parallel(
+                session, branch_id, start_date, end_date, candidates_by_staff,
+                regenerate, dry_run, max_workers
+            )
+        else:
+            existing_by_staff = self._get_existing_slots(
+                session, branch_id, list(candidates_by_staff), start_date, end_date
+            )
+            result = SlotGenerationResult(dry_run=dry_run)
+            for staff_id, candidates in candidates_by_staff.items():
+                plan = self._plan(staff_id, candidates, existing_by_staff.get(staff_id, {}), regenerate, dry_run)
+                if not dry_run:
+                    self._apply(session, plan)
+                result.merge(plan)
+            if not dry_run:
+                session.flush()
+
+        logger.info(
+            f"{'Planned' if dry_run else 'Generated'} slots for branch {branch_id} "
+            f"({start_date} - {end_date}): {len(result.to_create)} new, {len(result.to_delete)} replaced, "
+            f"{result.unchanged} unchanged"
+        )
+        return result
+
     def generate_slots_for_doctor(
         self,
         session: Session,
@@ -44,7 +187,7 @@ class SlotGeneratorService:
         start_date: date,
         end_date: date,
         regenerate: bool = False
-    ) -> List[AppointmentSlot]:
+    ) -> List[Dict[str, Any]]:
         """
         Generate slots for a doctor within a date range.
 
@@ -54,60 +197,15 @@ class SlotGeneratorService:
             branch_id: Branch UUID
             start_date: Start date (inclusive)
             end_date: End date (inclusive)
-            regenerate: If True, delete existing unbooked slots and regenerate
+            regenerate: If True, replace unbooked slots that no longer match the schedule
 
         Returns:
-            List of created slots
+            List of created slot rows
         """
-        # Get doctor's schedules
-        schedules = session.query(DoctorSchedule).filter(
-            DoctorSchedule.staff_id == staff_id,
-            DoctorSchedule.branch_id == branch_id,
-            DoctorSchedule.is_active == True,
-            DoctorSchedule.is_deleted == False
-        ).all()
-
-        if not schedules:
-            logger.warning(f"No schedules found for doctor {staff_id} at branch {branch_id}")
-            return []
-
-        # Get exceptions for this period
-        exceptions = self._get_exceptions(session, staff_id, branch_id, start_date, end_date)
-
-        # Delete existing unbooked slots if regenerating
-        if regenerate:
-            self._delete_unbooked_slots(session, staff_id, branch_id, start_date, end_date)
-
-        # Generate slots for each day
-        created_slots = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            # Convert weekday to our format (0=Sunday)
-            day_of_week = (current_date.weekday() + 1) % 7
-
-            # Find applicable schedules for this day
-            day_schedules = [s for s in schedules if s.day_of_week == day_of_week]
-
-            for schedule in day_schedules:
-                # Check effective dates
-                if schedule.effective_from and current_date < schedule.effective_from:
-                    continue
-                if schedule.effective_until and current_date > schedule.effective_until:
-                    continue
-
-                # Generate slots for this schedule
-                slots = self._generate_slots_for_schedule(
-                    session, schedule, current_date, exceptions
-                )
-                created_slots.extend(slots)
-
-            current_date += timedelta(days=1)
-
-        session.flush()
-        logger.info(f"Generated {len(created_slots)} slots for doctor {staff_id}")
-
-        return created_slots
+        result = self.generate_slots(
+            session, branch_id, start_date, end_date, staff_ids=[staff_id], regenerate=regenerate
+        )
+        return result.to_create
 
     def generate_slots_for_branch(
         self,
@@ -116,27 +214,18 @@ class SlotGeneratorService:
         start_date: date,
         end_date: date,
         regenerate: bool = False
-    ) -> Dict[UUID, List[AppointmentSlot]]:
+    ) -> Dict[UUID, List[Dict[str, Any]]]:
         """
         Generate slots for all doctors in a branch.
 
         Returns:
-            Dictionary mapping staff_id to list of created slots
+            Dictionary mapping staff_id to list of created slot rows
         """
-        # Get all doctors with schedules in this branch
-        doctor_ids = session.query(DoctorSchedule.staff_id).filter(
-            DoctorSchedule.branch_id == branch_id,
-            DoctorSchedule.is_active == True,
-            DoctorSchedule.is_deleted == False
-        ).distinct().all()
-
-        results = {}
-        for (staff_id,) in doctor_ids:
-            slots = self.generate_slots_for_doctor(
-                session, staff_id, branch_id, start_date, end_date, regenerate
-            )
-            results[staff_id] = slots
+        result = self.generate_slots(session, branch_id, start_date, end_date, regenerate=regenerate)
 
+        results = {staff_id: [] for staff_id in result.by_staff}
+        for row in result.to_create:
+            results[row['staff_id']].append(row)
         return results
 
     def generate_next_week_slots(
@@ -154,23 +243,19 @@ class SlotGeneratorService:
         today = date.today()
         end_date = today + timedelta(days=7)
 
-        total_slots = 0
-
         if branch_id:
-            results = self.generate_slots_for_branch(session, branch_id, today, end_date)
-            total_slots = sum(len(slots) for slots in results.values())
+            branch_ids = [branch_id]
         else:
             # Generate for all branches
-            branches = session.query(Branch).filter(
+            branch_ids = [branch.branch_id for branch in session.query(Branch).filter(
                 Branch.is_active == True,
                 Branch.is_deleted == False
-            ).all()
+            ).all()]
 
-            for branch in branches:
-                results = self.generate_slots_for_branch(
-                    session, branch.branch_id, today, end_date
-                )
-                total_slots += sum(len(slots) for slots in results.values())
+        total_slots = sum(
+            self.generate_slots(session, branch, today, end_date).created
+            for branch in branch_ids
+        )
 
         logger.info(f"Generated {total_slots} slots for next 7 days")
         return total_slots
@@ -331,87 +416,234 @@ class SlotGeneratorService:
     # PRIVATE HELPER METHODS
     # =========================================================================
 
-    def _generate_slots_for_schedule(
+    def _candidate_slots(
         self,
-        session: Session,
-        schedule: DoctorSchedule,
-        target_date: date,
-        exceptions: List[DoctorScheduleException]
-    ) -> List[AppointmentSlot]:
-        """Generate slots for a single schedule on a specific date."""
-        # Check if this date has a full-day exception
+        schedules: List[DoctorSchedule],
+        exceptions: List[DoctorScheduleException],
+        start_date: date,
+        end_date: date
+    ) -> Dict[Tuple, Dict[str, Any]]:
+        """Compute the slots a doctor's schedules yield for a date range, keyed like unique_slot."""
+        exceptions_by_date: Dict[date, List[DoctorScheduleException]] = {}
         for exc in exceptions:
-            if exc.exception_date == target_date:
-                if exc.start_time is None or exc.end_time is None:
-                    # Full day blocked
-                    return []
+            exceptions_by_date.setdefault(exc.exception_date, []).append(exc)
+
+        schedules_by_day: Dict[int, List[DoctorSchedule]] = {}
+        for schedule in schedules:
+            schedules_by_day.setdefault(schedule.day_of_week, []).append(schedule)
+
+        candidates = {}
+        current_date = start_date
+        while current_date <= end_date:
+            # Convert weekday to our format (0=Sunday)
+            day_of_week = (current_date.weekday() + 1) % 7
+            day_exceptions = exceptions_by_date.get(current_date, [])
+
+            # A full-day exception blocks every schedule of the day
+            if any(exc.start_time is None or exc.end_time is None for exc in day_exceptions):
+                current_date += timedelta(days=1)
+                continue
+
+            for schedule in schedules_by_day.get(day_of_week, []):
+                # Check effective dates
+                if schedule.effective_from and current_date < schedule.effective_from:
+                    continue
+                if schedule.effective_until and current_date > schedule.effective_until:
+                    continue
+
+                for row in self._slots_for_schedule(schedule, current_date, day_exceptions):
+                    # The first schedule claiming a start time wins
+                    candidates.setdefault(_slot_key(row), row)
 
-        created_slots = []
+            current_date += timedelta(days=1)
+
+        return candidates
+
+    def _slots_for_schedule(
+        self,
+        schedule: DoctorSchedule,
+        target_date: date,
+        day_exceptions: List[DoctorScheduleException]
+    ) -> List[Dict[str, Any]]:
+        """Slot rows for a single schedule on a specific date."""
+        rows = []
         duration = timedelta(minutes=schedule.slot_duration_minutes)
 
         current = datetime.combine(target_date, schedule.start_time)
         end = datetime.combine(target_date, schedule.end_time)
 
+        break_start = break_end = None
+        if schedule.break_start_time and schedule.break_end_time:
+            break_start = datetime.combine(target_date, schedule.break_start_time)
+            break_end = datetime.combine(target_date, schedule.break_end_time)
+
         while current + duration <= end:
+            # Skip past the break when the slot overlaps it
+            if break_start and current < break_end and current + duration > break_start:
+                current = break_end
+                continue
+
             slot_start = current.time()
-            slot_end = (current + duration).time()
-
-            # Check if slot overlaps with break
-            if schedule.break_start_time and schedule.break_end_time:
-                break_start = datetime.combine(target_date, schedule.break_start_time)
-                break_end = datetime.combine(target_date, schedule.break_end_time)
-                if current < break_end and current + duration > break_start:
-                    current = break_end
-                    continue
 
-            # Check if slot overlaps with any exception
-            is_blocked = False
+            # Block slots starting inside a partial exception
             block_reason = None
-            for exc in exceptions:
-                if exc.exception_date == target_date and exc.start_time and exc.end_time:
-                    if slot_start >= exc.start_time and slot_start < exc.end_time:
-                        is_blocked = True
-                        block_reason = exc.reason or exc.exception_type
-                        break
-
-            # Check if slot already exists
-            existing = session.query(AppointmentSlot).filter(
-                AppointmentSlot.staff_id == schedule.staff_id,
-                AppointmentSlot.branch_id == schedule.branch_id,
-                AppointmentSlot.slot_date == target_date,
-                AppointmentSlot.start_time == slot_start
-            ).first()
-
-            if not existing:
-                slot = AppointmentSlot(
-                    staff_id=schedule.staff_id,
-                    branch_id=schedule.branch_id,
-                    schedule_id=schedule.schedule_id,
-                    slot_date=target_date,
-                    start_time=slot_start,
-                    end_time=slot_end,
-                    max_bookings=schedule.max_patients_per_slot,
-                    is_blocked=is_blocked,
-                    block_reason=block_reason
-                )
-                session.add(slot)
-                created_slots.append(slot)
-
+            is_blocked = False
+            for exc in day_exceptions:
+                if exc.start_time <= slot_start < exc.end_time:
+                    is_blocked = True
+                    block_reason = exc.reason or exc.exception_type
+                    break
+
+            rows.append({
+                'staff_id': schedule.staff_id,
+                'branch_id': schedule.branch_id,
+                'schedule_id': schedule.schedule_id,
+                'slot_date': target_date,
+                'start_time': slot_start,
+                'end_time': (current + duration).time(),
+                'max_bookings': schedule.max_patients_per_slot or 1,
+                'is_blocked': is_blocked,
+                'block_reason': block_reason
+            })
             current += duration
 
-        return created_slots
+        return rows
 
-    def _get_exceptions(
+    def _plan(
         self,
-        session: Session,
         staff_id: UUID,
+        candidates: Dict[Tuple, Dict[str, Any]],
+        existing: Dict[Tuple, Dict[str, Any]],
+        regenerate: bool,
+        dry_run: bool
+    ) -> SlotGenerationResult:
+        """
+        Diff a doctor's candidate slots against the existing ones.
+
+        Without regenerate only missing slots are created. With regenerate,
+        unbooked slots are deleted unless they already match a candidate
+        exactly; booked slots are never touched.
+        """
+        plan = SlotGenerationResult(dry_run=dry_run)
+
+        for key, row in existing.items():
+            if row['current_bookings']:
+                plan.booked += 1
+            elif not regenerate:
+                continue
+            elif key in candidates and all(row[c] == candidates[key][c] for c in SLOT_COMPARE_COLUMNS):
+                plan.unchanged += 1
+            else:
+                plan.to_delete.append(row)
+
+        replaced = {_slot_key(row) for row in plan.to_delete}
+        for key, row in candidates.items():
+            if key not in existing or key in replaced:
+                plan.to_create.append(row)
+            elif not regenerate and not existing[key]['current_bookings']:
+                plan.unchanged += 1
+
+        plan.by_staff[staff_id] = len(plan.to_create)
+        return plan
+
+    def _apply(self, session: Session, plan: SlotGenerationResult):
+        """Write a plan: batched deletes, then batched inserts that skip slots created concurrently."""
+        table = AppointmentSlot.__table__
+
+        for batch in _batches([row['slot_id'] for row in plan.to_delete]):
+            plan.deleted += session.query(AppointmentSlot).filter(
+                AppointmentSlot.slot_id.in_(batch),
+                AppointmentSlot.current_bookings == 0
+            ).delete(synchronize_session=False)
+
+        for row in plan.to_create:
+            row['slot_id'] = generate_uuid()
+
+        dialect = session.get_bind().dialect.name
+        inserted = set()
+        for batch in _batches(plan.to_create):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as pg_insert
+                statement = pg_insert(table).on_conflict_do_nothing(constraint='unique_slot')
+            elif dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+                statement = sqlite_insert(table).on_conflict_do_nothing(index_elements=list(SLOT_KEY_COLUMNS))
+            else:
+                statement = insert(table)
+            inserted.update(
+                slot_id for (slot_id,) in session.execute(statement.returning(table.c.slot_id), batch)
+            )
+
+        # Rows another generation inserted first were skipped
+        plan.created = len(inserted)
+        plan.to_create = [row for row in plan.to_create if row['slot_id'] in inserted]
+        plan.by_staff = {staff_id: plan.created for staff_id in plan.by_staff}
+
+    def _generate_parallel(
+        self,
+        session: Session,
+        branch_id: UUID,
+        start_date: date,
+        end_date: date,
+        candidates_by_staff: Dict[UUID, Dict[Tuple, Dict[str, Any]]],
+        regenerate: bool,
+        dry_run: bool,
+        max_workers: int
+    ) -> SlotGenerationResult:
+        """Diff and write each doctor on its own session, max_workers at a time."""
+        Worker = sessionmaker(bind=session.get_bind())
+
+        def run(staff_id):
+            with Worker() as worker_session:
+                existing = self._get_existing_slots(worker_session, branch_id, [staff_id], start_date, end_date)
+                plan = self._plan(staff_id, candidates_by_staff[staff_id], existing.get(staff_id, {}),
+                                  regenerate, dry_run)
+                if not dry_run:
+                    try:
+                        self._apply(worker_session, plan)
+                        worker_session.commit()
+                    except Exception:
+                        worker_session.rollback()
+                        raise
+                return plan
+
+        result = SlotGenerationResult(dry_run=dry_run)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for plan in executor.map(run, list(candidates_by_staff)):
+                result.merge(plan)
+        return result
+
+    def _get_schedules(
+        self,
+        session: Session,
+        branch_id: UUID,
+        staff_ids: Optional[List[UUID]] = None
+    ) -> Dict[UUID, List[DoctorSchedule]]:
+        """Active schedules of a branch grouped by doctor."""
+        query = session.query(DoctorSchedule).filter(
+            DoctorSchedule.branch_id == branch_id,
+            DoctorSchedule.is_active == True,
+            DoctorSchedule.is_deleted == False
+        )
+        if staff_ids:
+            query = query.filter(DoctorSchedule.staff_id.in_(staff_ids))
+
+        schedules_by_staff: Dict[UUID, List[DoctorSchedule]] = {}
+        for schedule in query.order_by(DoctorSchedule.staff_id, DoctorSchedule.start_time).all():
+            schedules_by_staff.setdefault(schedule.staff_id, []).append(schedule)
+        return schedules_by_staff
+
+    def _get_branch_exceptions(
+        self,
+        session: Session,
+        staff_ids: List[UUID],
         branch_id: UUID,
         start_date: date,
         end_date: date
-    ) -> List[DoctorScheduleException]:
-        """Get schedule exceptions for a date range."""
-        return session.query(DoctorScheduleException).filter(
-            DoctorScheduleException.staff_id == staff_id,
+    ) -> Dict[UUID, List[DoctorScheduleException]]:
+        """Schedule exceptions of several doctors for a date range, grouped by doctor."""
+        exceptions = session.query(DoctorScheduleException).filter(
+            DoctorScheduleException.staff_id.in_(staff_ids),
             DoctorScheduleException.exception_date >= start_date,
             DoctorScheduleException.exception_date <= end_date,
             DoctorScheduleException.is_active == True,
@@ -422,25 +654,35 @@ class SlotGeneratorService:
             )
         ).all()
 
-    def _delete_unbooked_slots(
+        exceptions_by_staff: Dict[UUID, List[DoctorScheduleException]] = {}
+        for exc in exceptions:
+            exceptions_by_staff.setdefault(exc.staff_id, []).append(exc)
+        return exceptions_by_staff
+
+    def _get_existing_slots(
         self,
         session: Session,
-        staff_id: UUID,
         branch_id: UUID,
+        staff_ids: List[UUID],
         start_date: date,
         end_date: date
-    ) -> int:
-        """Delete unbooked slots for regeneration."""
-        result = session.query(AppointmentSlot).filter(
-            AppointmentSlot.staff_id == staff_id,
-            AppointmentSlot.branch_id == branch_id,
-            AppointmentSlot.slot_date >= start_date,
-            AppointmentSlot.slot_date <= end_date,
-            AppointmentSlot.current_bookings == 0
-        ).delete(synchronize_session=False)
+    ) -> Dict[UUID, Dict[Tuple, Dict[str, Any]]]:
+        """Existing slots of the range in one query, grouped by doctor and keyed like unique_slot."""
+        table = AppointmentSlot.__table__
+        columns = ('slot_id',) + SLOT_KEY_COLUMNS + SLOT_COMPARE_COLUMNS + ('current_bookings',)
+        rows = session.execute(
+            table.select().with_only_columns(*(table.c[column] for column in columns)).where(
+                table.c.branch_id == branch_id,
+                table.c.staff_id.in_(staff_ids),
+                table.c.slot_date >= start_date,
+                table.c.slot_date <= end_date
+            )
+        ).mappings()
 
-        logger.info(f"Deleted {result} unbooked slots for regeneration")
-        return result
+        existing_by_staff: Dict[UUID, Dict[Tuple, Dict[str, Any]]] = {}
+        for row in rows:
+            existing_by_staff.setdefault(row['staff_id'], {})[_slot_key(row)] = dict(row)
+        return existing_by_staff
 
 
 # Create singleton instance
@@ -0,0 +1,387 @@
+# app/services/stock_position_service.py
+
+"""
+Stock Position Service - current stock snapshot of the inventory ledger
+
+The inventory table is an append-only ledger; the balance of a batch is the
+sum of its units. stock_position keeps that balance (plus the attributes of
+the latest movement) per (hospital, branch, medicine, batch):
+
+- apply_stock_movement: called from the Inventory after_insert hook, so every
+  ledger writer updates the snapshot in its own transaction
+- get_batch_positions / get_batch_position: read paths (index lookups instead
+  of ROW_NUMBER scans over the ledger)
+- rebuild_stock_positions / verify_stock_positions: maintenance, exposed as
+  manage_db.py commands
+
+Readers that do not pass a branch see one row per (medicine, batch) with the
+balance summed across branches, matching how the ledger was read before.
+"""
+
+import uuid
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone, date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, literal_column, select, update, delete
+from sqlalchemy.orm import Session
+
+from app.models.transaction import Inventory, StockPosition
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+# Must match the unique index in migrations/create_stock_position_table.sql
+NIL_BRANCH = "'00000000-0000-0000-0000-000000000000'::uuid"
+
+# Attributes copied from the latest movement (NULLs keep the previous value)
+POSITION_ATTRIBUTES = (
+    'medicine_name', 'medicine_category', 'expiry', 'pack_purchase_price', 'pack_mrp',
+    'units_per_pack', 'unit_price', 'sale_price', 'cgst', 'sgst', 'igst', 'location'
+)
+
+
+@dataclass
+class BatchPosition:
+    """Current stock of one medicine batch (summed across branches unless filtered)"""
+    hospital_id: uuid.UUID
+    medicine_id: uuid.UUID
+    batch: str
+    current_stock: Decimal
+    branch_id: Optional[uuid.UUID] = None
+    medicine_name: Optional[str] = None
+    medicine_category: Optional[str] = None
+    expiry: Optional[date] = None
+    pack_purchase_price: Optional[Decimal] = None
+    pack_mrp: Optional[Decimal] = None
+    units_per_pack: Optional[Decimal] = None
+    unit_price: Optional[Decimal] = None
+    sale_price: Optional[Decimal] = None
+    cgst: Optional[Decimal] = None
+    sgst: Optional[Decimal] = None
+    igst: Optional[Decimal] = None
+    location: Optional[str] = None
+    stock_id: Optional[uuid.UUID] = None            # Latest ledger row for the batch
+    transaction_date: Optional[datetime] = None     # Time of the latest movement
+    record_count: int = 1                           # Position rows merged into this one
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _quantity(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
+
+def _display_quantity(value: Decimal):
+    """Whole quantities as int, so callers see the same values as the Integer ledger balance"""
+    value = _quantity(value)
+    return int(value) if value == value.to_integral_value() else value
+
+def _key_condition(table, hospital_id, branch_id, medicine_id, batch):
+    branch_condition = table.c.branch_id.is_(None) if branch_id is None else table.c.branch_id == branch_id
+    return and_(
+        table.c.hospital_id == hospital_id,
+        branch_condition,
+        table.c.medicine_id == medicine_id,
+        table.c.batch == batch
+    )
+
+# =============================================================================
+# INCREMENTAL MAINTENANCE
+# =============================================================================
+
+def apply_stock_movement(connection, entry: Inventory) -> None:
+    """
+    Add one ledger row to its stock position on the inserting connection.
+    PostgreSQL uses a single INSERT ... ON CONFLICT, other databases UPDATE
+    then INSERT.
+    """
+    table = StockPosition.__table__
+    units = _quantity(entry.units)
+    moved_at = entry.transaction_date or datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    attributes = {name: getattr(entry, name, None) for name in POSITION_ATTRIBUTES}
+
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        stmt = pg_insert(table).values(
+            position_id=uuid.uuid4(),
+            hospital_id=entry.hospital_id,
+            branch_id=entry.branch_id,
+            medicine_id=entry.medicine_id,
+            batch=entry.batch,
+            current_stock=units,
+            last_stock_id=entry.stock_id,
+            last_movement_at=moved_at,
+            created_at=now,
+            updated_at=now,
+            created_by=entry.created_by,
+            updated_by=entry.created_by,
+            **attributes
+        )
+        updates = {name: func.coalesce(getattr(stmt.excluded, name), table.c[name])
+                   for name in POSITION_ATTRIBUTES}
+        updates.update(
+            current_stock=table.c.current_stock + stmt.excluded.current_stock,
+            last_stock_id=stmt.excluded.last_stock_id,
+            last_movement_at=stmt.excluded.last_movement_at,
+            updated_at=stmt.excluded.updated_at,
+            updated_by=stmt.excluded.updated_by
+        )
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[
+                table.c.hospital_id,
+                func.coalesce(table.c.branch_id, literal_column(NIL_BRANCH)),
+                table.c.medicine_id,
+                table.c.batch
+            ],
+            set_=updates
+        ))
+        return
+
+    values = {name: value for name, value in attributes.items() if value is not None}
+    result = connection.execute(
+        update(table)
+        .where(_key_condition(table, entry.hospital_id, entry.branch_id, entry.medicine_id, entry.batch))
+        .values(
+            current_stock=table.c.current_stock + units,
+            last_stock_id=entry.stock_id,
+            last_movement_at=moved_at,
+            updated_at=now,
+            updated_by=entry.created_by,
+            **values
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(
+            position_id=uuid.uuid4(),
+            hospital_id=entry.hospital_id,
+            branch_id=entry.branch_id,
+            medicine_id=entry.medicine_id,
+            batch=entry.batch,
+            current_stock=units,
+            last_stock_id=entry.stock_id,
+            last_movement_at=moved_at,
+            created_at=now,
+            updated_at=now,
+            created_by=entry.created_by,
+            updated_by=entry.created_by,
+            **attributes
+        ))
+
+# =============================================================================
+# READ PATHS
+# =============================================================================
+
+def _merge_rows(rows) -> List[BatchPosition]:
+    """Fold branch rows into one BatchPosition per (medicine, batch); rows newest first"""
+    merged: Dict[Tuple, BatchPosition] = {}
+    for row in rows:
+        key = (row.medicine_id, row.batch)
+        position = merged.get(key)
+        if position is None:
+            merged[key] = BatchPosition(
+                hospital_id=row.hospital_id,
+                branch_id=row.branch_id,
+                medicine_id=row.medicine_id,
+                batch=row.batch,
+                current_stock=_quantity(row.current_stock),
+                stock_id=row.last_stock_id,
+                transaction_date=row.last_movement_at,
+                **{name: getattr(row, name) for name in POSITION_ATTRIBUTES}
+            )
+            continue
+        position.current_stock += _quantity(row.current_stock)
+        position.record_count += 1
+        if position.branch_id != row.branch_id:
+            position.branch_id = None
+
+    for position in merged.values():
+        position.current_stock = _display_quantity(position.current_stock)
+    return list(merged.values())
+
+def get_batch_positions(
+    session: Session,
+    hospital_id: uuid.UUID,
+    medicine_id: Optional[uuid.UUID] = None,
+    batch: Optional[str] = None,
+    branch_id: Optional[uuid.UUID] = None,
+    expiry_from: Optional[date] = None,
+    expiry_to: Optional[date] = None,
+    in_stock_only: bool = True,
+    for_update: bool = False
+) -> List[BatchPosition]:
+    """
+    Current stock per (medicine, batch), FIFO (earliest expiry first).
+
+    Args:
+        branch_id: Restrict to one branch; omitted means all branches summed
+        expiry_from / expiry_to: Expiry window (inclusive)
+        in_stock_only: Drop batches whose balance is zero or negative
+        for_update: Lock the position rows (writers computing a new balance)
+    """
+    # Pending ledger rows reach stock_position through the after_insert hook
+    session.flush()
+
+    table = StockPosition.__table__
+    query = select(table).where(table.c.hospital_id == hospital_id)
+    if medicine_id is not None:
+        query = query.where(table.c.medicine_id == medicine_id)
+    if batch is not None:
+        query = query.where(table.c.batch == batch)
+    if branch_id is not None:
+        query = query.where(table.c.branch_id == branch_id)
+    if expiry_from is not None:
+        query = query.where(table.c.expiry >= expiry_from)
+    if expiry_to is not None:
+        query = query.where(table.c.expiry <= expiry_to)
+    if for_update:
+        query = query.with_for_update()
+    query = query.order_by(table.c.last_movement_at.desc())
+
+    positions = _merge_rows(session.execute(query))
+    if in_stock_only:
+        positions = [p for p in positions if p.current_stock > 0]
+
+    positions.sort(key=lambda p: (p.expiry or date.max, p.medicine_name or '', p.batch))
+    return positions
+
+def get_batch_position(
+    session: Session,
+    hospital_id: uuid.UUID,
+    medicine_id: uuid.UUID,
+    batch: str,
+    branch_id: Optional[uuid.UUID] = None,
+    for_update: bool = False
+) -> Optional[BatchPosition]:
+    """Position of a single batch (including empty ones), or None if never stocked"""
+    positions = get_batch_positions(
+        session, hospital_id, medicine_id=medicine_id, batch=batch, branch_id=branch_id,
+        in_stock_only=False, for_update=for_update
+    )
+    return positions[0] if positions else None
+
+# =============================================================================
+# REBUILD AND VERIFY
+# =============================================================================
+
+def _ledger_balances(session: Session, hospital_id: Optional[uuid.UUID] = None):
+    """SUM(units) per key from the ledger"""
+    query = select(
+        Inventory.hospital_id, Inventory.branch_id, Inventory.medicine_id, Inventory.batch,
+        func.sum(Inventory.units).label('balance')
+    ).group_by(Inventory.hospital_id, Inventory.branch_id, Inventory.medicine_id, Inventory.batch)
+    if hospital_id is not None:
+        query = query.where(Inventory.hospital_id == hospital_id)
+    return {
+        (row.hospital_id, row.branch_id, row.medicine_id, row.batch): _quantity(row.balance)
+        for row in session.execute(query)
+    }
+
+def rebuild_stock_positions(
+    session: Session,
+    hospital_id: Optional[uuid.UUID] = None,
+    chunk_size: int = 1000
+) -> int:
+    """
+    Recreate stock_position from the ledger (all hospitals unless hospital_id).
+    Attributes come from the latest movement of each key. Returns rows written.
+    """
+    table = StockPosition.__table__
+    balances = _ledger_balances(session, hospital_id)
+
+    partition = (Inventory.hospital_id, Inventory.branch_id, Inventory.medicine_id, Inventory.batch)
+    ranked = select(
+        Inventory,
+        func.row_number().over(
+            partition_by=partition,
+            order_by=(Inventory.created_at.desc(), Inventory.transaction_date.desc())
+        ).label('rn')
+    )
+    if hospital_id is not None:
+        ranked = ranked.where(Inventory.hospital_id == hospital_id)
+    ranked = ranked.subquery()
+    latest = session.execute(select(ranked).where(ranked.c.rn == 1))
+
+    clear = delete(table)
+    if hospital_id is not None:
+        clear = clear.where(table.c.hospital_id == hospital_id)
+    session.execute(clear)
+
+    now = datetime.now(timezone.utc)
+    written = 0
+    chunk = []
+    for row in latest:
+        key = (row.hospital_id, row.branch_id, row.medicine_id, row.batch)
+        values = {name: getattr(row, name) for name in POSITION_ATTRIBUTES}
+        values.update(
+            position_id=uuid.uuid4(),
+            hospital_id=row.hospital_id,
+            branch_id=row.branch_id,
+            medicine_id=row.medicine_id,
+            batch=row.batch,
+            current_stock=balances.get(key, Decimal('0')),
+            last_stock_id=row.stock_id,
+            last_movement_at=row.transaction_date,
+            created_at=now,
+            updated_at=now,
+            created_by='system',
+            updated_by='system'
+        )
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            session.execute(insert(table), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        session.execute(insert(table), chunk)
+        written += len(chunk)
+
+    logger.info(f"✅ Rebuilt {written} stock positions"
+                f"{f' for hospital {hospital_id}' if hospital_id else ''}")
+    return written
+
+def verify_stock_positions(session: Session, hospital_id: Optional[uuid.UUID] = None) -> Dict:
+    """
+    Compare stock_position against SUM(units) of the ledger.
+
+    Returns:
+        Dict with checked (keys compared), ok (bool) and mismatches: one dict per
+        key whose snapshot differs, is missing, or has no ledger rows
+    """
+    table = StockPosition.__table__
+    balances = _ledger_balances(session, hospital_id)
+
+    query = select(table.c.hospital_id, table.c.branch_id, table.c.medicine_id,
+                   table.c.batch, table.c.current_stock)
+    if hospital_id is not None:
+        query = query.where(table.c.hospital_id == hospital_id)
+    snapshot = {
+        (row.hospital_id, row.branch_id, row.medicine_id, row.batch): _quantity(row.current_stock)
+        for row in session.execute(query)
+    }
+
+    mismatches = []
+    for key in balances.keys() | snapshot.keys():
+        ledger = balances.get(key)
+        position = snapshot.get(key)
+        if ledger == position:
+            continue
+        mismatches.append({
+            'hospital_id': key[0],
+            'branch_id': key[1],
+            'medicine_id': key[2],
+            'batch': key[3],
+            'ledger_stock': ledger,
+            'position_stock': position
+        })
+
+    if mismatches:
+        logger.warning(f"⚠️ {len(mismatches)} stock positions differ from the inventory ledger")
+    return {
+        'checked': len(balances.keys() | snapshot.keys()),
+        'ok': not mismatches,
+        'mismatches': mismatches
+    }
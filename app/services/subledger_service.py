@@ -6,12 +6,15 @@ import uuid
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Union, Tuple
 
-from sqlalchemy import func, and_, or_, text
+from sqlalchemy import func, and_, text
 from sqlalchemy.orm import Session
 
 from app.models.transaction import ARSubledger, APSubledger, GLTransaction, InvoiceHeader
-from app.models.master import Patient, Supplier, Branch
+from app.models.master import Patient, Branch
 from app.services.database_service import get_db_session, get_entity_dict
+from app.services.aging_service import (
+    compute_aging, compute_ar_aging_from_snapshot, refresh_ar_aging_snapshot, ar_spec, ap_spec
+)
 
 logger = logging.getLogger(__name__)
 
@@ -729,7 +732,8 @@ def get_ar_aging_by_branch(
     hospital_id: Union[str, uuid.UUID],
     branch_id: Optional[Union[str, uuid.UUID]] = None,
     as_of_date: Optional[datetime] = None,
-    session: Optional[Session] = None
+    session: Optional[Session] = None,
+    use_snapshot: bool = False
 ) -> Dict:
     """
     Generate AR aging report by branch
@@ -739,23 +743,26 @@ def get_ar_aging_by_branch(
         branch_id: Optional branch UUID to filter by branch
         as_of_date: Optional date to calculate aging as of
         session: Database session (optional)
+        use_snapshot: Read current balances from ar_aging_snapshot (refreshed
+            incrementally first); ignored when as_of_date is given
         
     Returns:
         Dictionary with aging report data by branch
     """
     if session is not None:
-        return _get_ar_aging_by_branch(session, hospital_id, branch_id, as_of_date)
+        return _get_ar_aging_by_branch(session, hospital_id, branch_id, as_of_date, use_snapshot)
     
     with get_db_session() as new_session:
-        return _get_ar_aging_by_branch(new_session, hospital_id, branch_id, as_of_date)
+        return _get_ar_aging_by_branch(new_session, hospital_id, branch_id, as_of_date, use_snapshot)
 
 def _get_ar_aging_by_branch(
     session: Session,
     hospital_id: Union[str, uuid.UUID],
     branch_id: Optional[Union[str, uuid.UUID]] = None,
-    as_of_date: Optional[datetime] = None
+    as_of_date: Optional[datetime] = None,
+    use_snapshot: bool = False
 ) -> Dict:
-    """Internal function to generate AR aging report by branch"""
+    """Internal function to generate AR aging report by branch (set-based, see aging_service)"""
     try:
         # Convert string UUIDs to UUID objects if needed
         if isinstance(hospital_id, str):
@@ -763,130 +770,11 @@ def _get_ar_aging_by_branch(
         if branch_id and isinstance(branch_id, str):
             branch_id = uuid.UUID(branch_id)
             
-        if as_of_date is None:
-            as_of_date = datetime.now(timezone.utc)
+        if use_snapshot and as_of_date is None:
+            refresh_ar_aging_snapshot(session, hospital_id)
+            return compute_ar_aging_from_snapshot(session, hospital_id, branch_id)
             
-        # Prepare base query filters
-        filters = [
-            ARSubledger.hospital_id == hospital_id,
-            ARSubledger.transaction_date <= as_of_date
-        ]
-        
-        # Add branch filter if specified
-        if branch_id:
-            filters.append(ARSubledger.branch_id == branch_id)
-        
-        # Query to get latest balance by patient and branch
-        subquery = session.query(
-            ARSubledger.patient_id,
-            ARSubledger.branch_id,
-            func.max(ARSubledger.transaction_date).label('latest_date')
-        ).filter(
-            *filters
-        ).group_by(
-            ARSubledger.patient_id,
-            ARSubledger.branch_id
-        ).subquery()
-        
-        # Join with original table to get balances
-        latest_entries = session.query(
-            ARSubledger
-        ).join(
-            subquery,
-            and_(
-                ARSubledger.patient_id == subquery.c.patient_id,
-                ARSubledger.branch_id == subquery.c.branch_id,
-                ARSubledger.transaction_date == subquery.c.latest_date
-            )
-        ).filter(
-            ARSubledger.current_balance > 0  # Only show patients with balance due
-        ).all()
-        
-        # Organize by branch
-        result = {}
-        
-        for entry in latest_entries:
-            # Get branch name
-            branch = session.query(Branch).filter_by(
-                branch_id=entry.branch_id
-            ).first()
-            
-            branch_name = branch.name if branch else f"Branch {entry.branch_id}"
-            
-            # Get patient details
-            patient = session.query(Patient).filter_by(
-                patient_id=entry.patient_id
-            ).first()
-            
-            patient_name = patient.full_name if patient else f"Patient {entry.patient_id}"
-            
-            # Calculate days outstanding
-            days_outstanding = (as_of_date - entry.transaction_date).days
-            
-            # Determine aging bucket
-            if days_outstanding <= 30:
-                aging_bucket = '0-30'
-            elif days_outstanding <= 60:
-                aging_bucket = '31-60'
-            elif days_outstanding <= 90:
-                aging_bucket = '61-90'
-            else:
-                aging_bucket = '90+'
-            
-            # Add to branch data
-            if branch_name not in result:
-                result[branch_name] = {
-                    'branch_id': str(entry.branch_id),
-                    'branch_name': branch_name,
-                    'total_ar': Decimal('0'),
-                    'aging_buckets': {
-                        '0-30': Decimal('0'),
-                        '31-60': Decimal('0'),
-                        '61-90': Decimal('0'),
-                        '90+': Decimal('0')
-                    },
-                    'patients': []
-                }
-            
-            # Update branch totals
-            result[branch_name]['total_ar'] += entry.current_balance
-            result[branch_name]['aging_buckets'][aging_bucket] += entry.current_balance
-            
-            # Add patient details
-            result[branch_name]['patients'].append({
-                'patient_id': str(entry.patient_id),
-                'patient_name': patient_name,
-                'current_balance': float(entry.current_balance),
-                'days_outstanding': days_outstanding,
-                'aging_bucket': aging_bucket,
-                'last_transaction_date': entry.transaction_date.isoformat() if entry.transaction_date else None
-            })
-        
-        # Calculate summary totals for all branches
-        summary = {
-            'total_ar': sum(branch_data['total_ar'] for branch_data in result.values()),
-            'aging_buckets': {
-                '0-30': sum(branch_data['aging_buckets']['0-30'] for branch_data in result.values()),
-                '31-60': sum(branch_data['aging_buckets']['31-60'] for branch_data in result.values()),
-                '61-90': sum(branch_data['aging_buckets']['61-90'] for branch_data in result.values()),
-                '90+': sum(branch_data['aging_buckets']['90+'] for branch_data in result.values())
-            }
-        }
-        
-        # Convert Decimal values to float for JSON serialization
-        for branch_name, branch_data in result.items():
-            branch_data['total_ar'] = float(branch_data['total_ar'])
-            for bucket, amount in branch_data['aging_buckets'].items():
-                branch_data['aging_buckets'][bucket] = float(amount)
-        
-        for bucket, amount in summary['aging_buckets'].items():
-            summary['aging_buckets'][bucket] = float(amount)
-        summary['total_ar'] = float(summary['total_ar'])
-        
-        return {
-            'branches': result,
-            'summary': summary
-        }
+        return compute_aging(session, ar_spec(), hospital_id, branch_id, as_of_date)
         
     except Exception as e:
         logger.error(f"Error generating AR aging report by branch: {str(e)}")
@@ -922,7 +810,7 @@ def _get_ap_aging_by_branch(
     branch_id: Optional[Union[str, uuid.UUID]] = None,
     as_of_date: Optional[datetime] = None
 ) -> Dict:
-    """Internal function to generate AP aging report by branch"""
+    """Internal function to generate AP aging report by branch (set-based, see aging_service)"""
     try:
         # Convert string UUIDs to UUID objects if needed
         if isinstance(hospital_id, str):
@@ -930,130 +818,7 @@ def _get_ap_aging_by_branch(
         if branch_id and isinstance(branch_id, str):
             branch_id = uuid.UUID(branch_id)
             
-        if as_of_date is None:
-            as_of_date = datetime.now(timezone.utc)
-            
-        # Prepare base query filters
-        filters = [
-            APSubledger.hospital_id == hospital_id,
-            APSubledger.transaction_date <= as_of_date
-        ]
-        
-        # Add branch filter if specified
-        if branch_id:
-            filters.append(APSubledger.branch_id == branch_id)
-        
-        # Query to get latest balance by supplier and branch
-        subquery = session.query(
-            APSubledger.supplier_id,
-            APSubledger.branch_id,
-            func.max(APSubledger.transaction_date).label('latest_date')
-        ).filter(
-            *filters
-        ).group_by(
-            APSubledger.supplier_id,
-            APSubledger.branch_id
-        ).subquery()
-        
-        # Join with original table to get balances
-        latest_entries = session.query(
-            APSubledger
-        ).join(
-            subquery,
-            and_(
-                APSubledger.supplier_id == subquery.c.supplier_id,
-                APSubledger.branch_id == subquery.c.branch_id,
-                APSubledger.transaction_date == subquery.c.latest_date
-            )
-        ).filter(
-            APSubledger.current_balance > 0  # Only show suppliers with balance due
-        ).all()
-        
-        # Organize by branch
-        result = {}
-        
-        for entry in latest_entries:
-            # Get branch name
-            branch = session.query(Branch).filter_by(
-                branch_id=entry.branch_id
-            ).first()
-            
-            branch_name = branch.name if branch else f"Branch {entry.branch_id}"
-            
-            # Get supplier details
-            supplier = session.query(Supplier).filter_by(
-                supplier_id=entry.supplier_id
-            ).first()
-            
-            supplier_name = supplier.supplier_name if supplier else f"Supplier {entry.supplier_id}"
-            
-            # Calculate days outstanding
-            days_outstanding = (as_of_date - entry.transaction_date).days
-            
-            # Determine aging bucket
-            if days_outstanding <= 30:
-                aging_bucket = '0-30'
-            elif days_outstanding <= 60:
-                aging_bucket = '31-60'
-            elif days_outstanding <= 90:
-                aging_bucket = '61-90'
-            else:
-                aging_bucket = '90+'
-            
-            # Add to branch data
-            if branch_name not in result:
-                result[branch_name] = {
-                    'branch_id': str(entry.branch_id),
-                    'branch_name': branch_name,
-                    'total_ap': Decimal('0'),
-                    'aging_buckets': {
-                        '0-30': Decimal('0'),
-                        '31-60': Decimal('0'),
-                        '61-90': Decimal('0'),
-                        '90+': Decimal('0')
-                    },
-                    'suppliers': []
-                }
-            
-            # Update branch totals
-            result[branch_name]['total_ap'] += entry.current_balance
-            result[branch_name]['aging_buckets'][aging_bucket] += entry.current_balance
-            
-            # Add supplier details
-            result[branch_name]['suppliers'].append({
-                'supplier_id': str(entry.supplier_id),
-                'supplier_name': supplier_name,
-                'current_balance': float(entry.current_balance),
-                'days_outstanding': days_outstanding,
-                'aging_bucket': aging_bucket,
-                'last_transaction_date': entry.transaction_date.isoformat() if entry.transaction_date else None
-            })
-        
-        # Calculate summary totals for all branches
-        summary = {
-            'total_ap': sum(branch_data['total_ap'] for branch_data in result.values()),
-            'aging_buckets': {
-                '0-30': sum(branch_data['aging_buckets']['0-30'] for branch_data in result.values()),
-                '31-60': sum(branch_data['aging_buckets']['31-60'] for branch_data in result.values()),
-                '61-90': sum(branch_data['aging_buckets']['61-90'] for branch_data in result.values()),
-                '90+': sum(branch_data['aging_buckets']['90+'] for branch_data in result.values())
-            }
-        }
-        
-        # Convert Decimal values to float for JSON serialization
-        for branch_name, branch_data in result.items():
-            branch_data['total_ap'] = float(branch_data['total_ap'])
-            for bucket, amount in branch_data['aging_buckets'].items():
-                branch_data['aging_buckets'][bucket] = float(amount)
-        
-        for bucket, amount in summary['aging_buckets'].items():
-            summary['aging_buckets'][bucket] = float(amount)
-        summary['total_ap'] = float(summary['total_ap'])
-        
-        return {
-            'branches': result,
-            'summary': summary
-        }
+        return compute_aging(session, ap_spec(), hospital_id, branch_id, as_of_date)
         
     except Exception as e:
         logger.error(f"Error generating AP aging report by branch: {str(e)}")
@@ -18,6 +18,7 @@ from app.services.database_service import get_db_session, get_entity_dict
 from app.services.gl_service import create_supplier_invoice_gl_entries, create_supplier_payment_gl_entries
 from app.services.inventory_service import record_stock_from_supplier_invoice
 from app.services.posting_config_service import get_posting_config, get_default_gl_account
+from app.services.sequence_allocator_service import next_document_number
 
 # NEW: Import enhanced branch service functions
 from app.services.branch_service import (
@@ -894,44 +895,14 @@ def _create_purchase_order(
 
 def _generate_po_number(session: Session, hospital_id: uuid.UUID) -> str:
     """
-    Generate a sequential purchase order number - EXISTING FUNCTION (unchanged)
+    Generate a sequential purchase order number (PO/YYYY-YYYY/NNNNN) from the sequence allocator
     """
     try:
-        # Get current financial year
-        today = datetime.now()
-        if today.month >= 4:  # Financial year starts in April
-            fin_year_start = today.year
-            fin_year_end = today.year + 1
-        else:
-            fin_year_start = today.year - 1
-            fin_year_end = today.year
-            
-        fin_year = f"{fin_year_start}-{fin_year_end}"
-        logger.debug(f"Generating PO number for financial year: {fin_year}")
-        
-        # Get the last PO number for this hospital and financial year
-        last_po = session.query(PurchaseOrderHeader).filter(
-            PurchaseOrderHeader.hospital_id == hospital_id,
-            PurchaseOrderHeader.po_number.like(f"PO/{fin_year}/%")
-        ).order_by(PurchaseOrderHeader.po_number.desc()).first()
-        
-        if last_po:
-            # Extract the sequence number from the last PO number
-            try:
-                seq_num = int(last_po.po_number.split('/')[-1])
-                new_seq_num = seq_num + 1
-                logger.debug(f"Last PO sequence: {seq_num}, new sequence: {new_seq_num}")
-            except:
-                # If parsing fails, start from 1
-                new_seq_num = 1
-                logger.warning("Failed to parse last PO number, starting from 1")
-        else:
-            # No existing PO for this hospital and financial year
-            new_seq_num = 1
-            logger.debug("No existing PO for this year, starting from 1")
-            
-        # Format the new PO number
-        po_number = f"PO/{fin_year}/{new_seq_num:05d}"
+        po_number = next_document_number(
+            hospital_id, 'PO',
+            session=session,
+            seed_column=PurchaseOrderHeader.po_number
+        )
         logger.info(f"Generated PO number: {po_number}")
         
         return po_number
@@ -1740,6 +1711,7 @@ def _create_supplier_invoice(
         # Create GL Transaction (FROM ENHANCED HELPER)
         gl_transaction = GLTransaction(
             hospital_id=hospital_id,
+            branch_id=invoice.branch_id,
             transaction_date=invoice.invoice_date,
             transaction_type='SUPPLIER_INVOICE',
             reference_id=str(invoice.invoice_id),
@@ -2115,6 +2087,7 @@ def _update_supplier_invoice(
                 # Create reversal GL transaction
                 reversal_gl_transaction = GLTransaction(
                     hospital_id=hospital_id,
+                    branch_id=invoice.branch_id,
                     transaction_date=reversal_timestamp,
                     transaction_type='SUPPLIER_INV_EDIT_REV',  # Shortened for field limits
                     reference_id=str(invoice_id),
@@ -2471,6 +2444,7 @@ def _update_supplier_invoice(
         # Create new GL Transaction (following create pattern)
         new_gl_transaction = GLTransaction(
             hospital_id=hospital_id,
+            branch_id=invoice.branch_id,
             transaction_date=invoice.invoice_date,
             transaction_type='SUPPLIER_INVOICE',
             reference_id=str(invoice_id),
@@ -3380,6 +3354,7 @@ def _cancel_supplier_invoice(session, invoice_id, hospital_id, cancellation_reas
             # Create reversal GL transaction
             reversal_gl_transaction = GLTransaction(
                 hospital_id=hospital_id,
+                branch_id=invoice.branch_id,
                 transaction_date=reversal_timestamp,
                 transaction_type='SUPPLIER_INVOICE_REVERSAL',
                 reference_id=str(invoice_id),
@@ -3963,6 +3938,7 @@ def _record_supplier_payment(
             # Create GL Transaction
             gl_transaction = GLTransaction(
                 hospital_id=hospital_id,
+                branch_id=payment.branch_id,
                 transaction_date=payment.payment_date,
                 transaction_type='SUPPLIER_PAYMENT',
                 reference_id=str(payment.payment_id),
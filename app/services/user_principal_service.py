@@ -0,0 +1,299 @@
+# app/services/user_principal_service.py
+
+"""
+User Principal Service - what Flask-Login's user_loader returns
+
+A UserPrincipal carries the per-request identity (user_id, hospital_id,
+branch_id, entity, role names, ui_preferences) and is rehydrated without a
+database round-trip:
+
+1. the worker's principal cache, else
+2. the copy serialized in the signed Flask session, else
+3. a build from the database (users, user_role_mapping, branch service),
+   which is then stored in both.
+
+A principal is valid while it is younger than PRINCIPAL_CACHE_TTL (app
+config, seconds) and its version equals the user's permission-matrix version
+stamp. User updates and role/mapping changes bump that stamp on commit (see
+permission_matrix_service), so the next request rebuilds the principal.
+
+Attributes the principal does not carry (full_name, entity_data, hospital...)
+are read from the full User, loaded at most once per request.
+"""
+
+import threading
+import time
+import uuid
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+from flask import g, has_request_context, session as flask_session
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.config import RoleMaster, UserRoleMapping
+from app.services.permission_matrix_service import get_permission_matrix_cache
+from app.utils.unicode_logging import get_unicode_safe_logger
+
+logger = get_unicode_safe_logger(__name__)
+
+DEFAULT_PRINCIPAL_TTL = 120  # seconds
+PRINCIPAL_SESSION_KEY = '_principal'
+
+
+def _as_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+def _app_config(name: str, default):
+    try:
+        from flask import current_app
+        return current_app.config.get(name, default)
+    except RuntimeError:
+        return default
+
+
+class UserPrincipal:
+    """
+    Immutable request identity, compatible with Flask-Login.
+    Unknown attributes are read from (and written to) the full User.
+    """
+
+    FIELDS = ('user_id', 'hospital_id', 'branch_id', 'entity_type', 'entity_id', 'is_active',
+              'role_names', 'ui_preferences', 'version', 'loaded_at')
+    __slots__ = FIELDS
+
+    def __init__(self, user_id: str, hospital_id=None, branch_id=None, entity_type: Optional[str] = None,
+                 entity_id=None, is_active: bool = True, role_names=(), ui_preferences=None,
+                 version=(0, 0), loaded_at: Optional[float] = None):
+        values = {
+            'user_id': user_id,
+            'hospital_id': _as_uuid(hospital_id),
+            'branch_id': _as_uuid(branch_id),
+            'entity_type': entity_type,
+            'entity_id': _as_uuid(entity_id),
+            'is_active': bool(is_active),
+            'role_names': tuple(role_names or ()),
+            'ui_preferences': MappingProxyType(dict(ui_preferences or {})),
+            'version': tuple(version),
+            'loaded_at': loaded_at if loaded_at is not None else time.time()
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    # -------------------------------------------------------------------------
+    # Flask-Login interface
+    # -------------------------------------------------------------------------
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
+
+    def get_id(self) -> str:
+        return str(self.user_id)
+
+    # -------------------------------------------------------------------------
+    # Full user fallback
+    # -------------------------------------------------------------------------
+
+    @property
+    def user(self):
+        """The full User (detached), loaded at most once per request"""
+        if has_request_context():
+            loaded = g.setdefault('_principal_users', {})
+            if self.user_id not in loaded:
+                loaded[self.user_id] = _load_user(self.user_id)
+            return loaded[self.user_id]
+        return _load_user(self.user_id)
+
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        user = self.user
+        if user is None:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+    def __setattr__(self, name: str, value):
+        if name in self.FIELDS:
+            raise AttributeError(f"UserPrincipal.{name} is read-only")
+        setattr(self.user, name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, UserPrincipal) and other.user_id == self.user_id
+
+    def __hash__(self):
+        return hash(self.user_id)
+
+    def __repr__(self):
+        return f"<UserPrincipal {self.user_id} hospital={self.hospital_id} branch={self.branch_id}>"
+
+    # -------------------------------------------------------------------------
+    # Serialization (signed session)
+    # -------------------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'user_id': self.user_id,
+            'hospital_id': str(self.hospital_id) if self.hospital_id else None,
+            'branch_id': str(self.branch_id) if self.branch_id else None,
+            'entity_type': self.entity_type,
+            'entity_id': str(self.entity_id) if self.entity_id else None,
+            'is_active': self.is_active,
+            'role_names': list(self.role_names),
+            'ui_preferences': dict(self.ui_preferences),
+            'version': list(self.version),
+            'loaded_at': self.loaded_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UserPrincipal':
+        return cls(**{name: data.get(name) for name in cls.FIELDS if name in data})
+
+    def replace(self, **changes) -> 'UserPrincipal':
+        values = self.to_dict()
+        values.update(changes)
+        return UserPrincipal.from_dict(values)
+
+
+def _load_user(user_id: str):
+    from app.models.transaction import User
+    from app.services.database_service import get_db_session
+
+    with get_db_session(read_only=True) as session:
+        return session.query(User).filter_by(user_id=user_id).first()
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_user_principal(session: Session, user_id: str) -> Optional[UserPrincipal]:
+    """
+    Load the principal from the database; None when the user does not exist.
+    branch_id is left empty - see resolve_principal_branch.
+    """
+    from app.models.transaction import User
+
+    version = get_permission_matrix_cache().version_for(user_id)
+    row = session.execute(
+        select(User.user_id, User.hospital_id, User.entity_type, User.entity_id,
+               User.is_active, User.ui_preferences).where(User.user_id == user_id)
+    ).first()
+    if row is None:
+        return None
+
+    role_names = session.execute(
+        select(RoleMaster.role_name).join(
+            UserRoleMapping, UserRoleMapping.role_id == RoleMaster.role_id
+        ).where(
+            UserRoleMapping.user_id == user_id,
+            UserRoleMapping.is_active == True
+        ).order_by(RoleMaster.role_name)
+    ).scalars().all()
+
+    return UserPrincipal(
+        user_id=row.user_id,
+        hospital_id=row.hospital_id,
+        entity_type=row.entity_type,
+        entity_id=row.entity_id,
+        is_active=row.is_active if row.is_active is not None else True,
+        role_names=role_names,
+        ui_preferences=row.ui_preferences if isinstance(row.ui_preferences, dict) else {},
+        version=version
+    )
+
+def resolve_principal_branch(principal: UserPrincipal) -> UserPrincipal:
+    """Fill branch_id with the user's working branch (branch_service opens its own sessions)"""
+    if not principal.hospital_id:
+        return principal
+    from app.services.branch_service import get_user_branch_id
+    return principal.replace(branch_id=get_user_branch_id(principal.user_id, principal.hospital_id))
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class UserPrincipalCache:
+    """Per-worker principals keyed by user_id, backed by the signed session"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self._ttl_seconds = ttl_seconds
+        self._principals: Dict[str, UserPrincipal] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl_seconds(self) -> int:
+        if self._ttl_seconds is not None:
+            return self._ttl_seconds
+        return int(_app_config('PRINCIPAL_CACHE_TTL', DEFAULT_PRINCIPAL_TTL))
+
+    def is_current(self, principal: Optional[UserPrincipal]) -> bool:
+        return (principal is not None
+                and principal.version == get_permission_matrix_cache().version_for(principal.user_id)
+                and time.time() - principal.loaded_at < self.ttl_seconds)
+
+    def _from_session(self, user_id: str) -> Optional[UserPrincipal]:
+        if not has_request_context():
+            return None
+        data = flask_session.get(PRINCIPAL_SESSION_KEY)
+        if not isinstance(data, dict) or data.get('user_id') != user_id:
+            return None
+        try:
+            return UserPrincipal.from_dict(data)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, user_id: str, session: Optional[Session] = None) -> Optional[UserPrincipal]:
+        user_id = str(user_id)
+        with self._lock:
+            principal = self._principals.get(user_id)
+        if self.is_current(principal):
+            return principal
+
+        principal = self._from_session(user_id)
+        if not self.is_current(principal):
+            if session is not None:
+                principal = build_user_principal(session, user_id)
+            else:
+                from app.services.database_service import get_db_session
+                with get_db_session(read_only=True) as read_session:
+                    principal = build_user_principal(read_session, user_id)
+            if principal is None:
+                return None
+            principal = resolve_principal_branch(principal)
+            if has_request_context():
+                flask_session[PRINCIPAL_SESSION_KEY] = principal.to_dict()
+            logger.debug(f"Loaded principal for user {user_id}")
+
+        with self._lock:
+            self._principals[user_id] = principal
+        return principal
+
+    def invalidate(self, user_id: Optional[str] = None):
+        with self._lock:
+            if user_id is None:
+                self._principals.clear()
+            else:
+                self._principals.pop(str(user_id), None)
+
+
+_user_principal_cache = None
+_user_principal_cache_lock = threading.Lock()
+
+def get_user_principal_cache() -> UserPrincipalCache:
+    """Process-wide principal cache"""
+    global _user_principal_cache
+    if _user_principal_cache is None:
+        with _user_principal_cache_lock:
+            if _user_principal_cache is None:
+                _user_principal_cache = UserPrincipalCache()
+    return _user_principal_cache
+
+def get_user_principal(user_id: str, session: Optional[Session] = None) -> Optional[UserPrincipal]:
+    """Principal for user_id (the Flask-Login user_loader)"""
+    return get_user_principal_cache().get(user_id, session)
@@ -33,6 +33,7 @@ from app.models.transaction import User
 from app.models.master import Staff, Patient, Branch, Hospital
 from app.security.authorization.permission_validator import has_permission
 from app.services.branch_service import get_user_branch_id as get_branch_id_from_service
+from app.services.user_principal_service import UserPrincipal
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -44,6 +45,9 @@ def get_user_branch_id_safe(user):
     IMPORTANT: Call this BEFORE entering a get_db_session() context to avoid nested sessions.
     """
     try:
+        # The request principal already carries the resolved branch
+        if isinstance(user, UserPrincipal) and user.branch_id:
+            return user.branch_id
         if hasattr(user, 'user_id') and hasattr(user, 'hospital_id') and user.hospital_id:
             return get_branch_id_from_service(user.user_id, user.hospital_id)
     except Exception as e:
@@ -2746,57 +2746,11 @@ def web_api_medicine_batches(medicine_id):
 
             current_app.logger.info(f"[BATCH LOOKUP] Medicine FOUND: {medicine.medicine_name}, hospital_id={medicine.hospital_id}")
 
-            # Get the LATEST current_stock per batch (current_stock is a running balance, not a quantity to sum)
-            # Use window function to get the most recent record per batch
-            from sqlalchemy.sql import text
-
-            query = text("""
-                WITH latest_per_batch AS (
-                    SELECT
-                        i.batch,
-                        i.expiry,
-                        i.current_stock,
-                        i.sale_price,
-                        i.pack_mrp,
-                        i.cgst,
-                        i.sgst,
-                        i.igst,
-                        i.created_at,
-                        ROW_NUMBER() OVER (PARTITION BY i.batch ORDER BY i.created_at DESC) as rn
-                    FROM inventory i
-                    WHERE i.hospital_id = :hospital_id
-                      AND i.medicine_id = :medicine_id
-                )
-                SELECT
-                    batch,
-                    expiry,
-                    current_stock,
-                    sale_price,
-                    pack_mrp,
-                    cgst,
-                    sgst,
-                    igst,
-                    1 as record_count
-                FROM latest_per_batch
-                WHERE rn = 1
-                  AND current_stock > 0  -- Only batches with available stock
-                ORDER BY expiry  -- FIFO based on expiry
-            """)
-
-            result_proxy = session.execute(query, {
-                'hospital_id': hospital_id,
-                'medicine_id': medicine_id
-            })
-
-            # Convert result proxy to list of batch records
-            consolidated_batches = []
-            for row in result_proxy:
-                # Create a namespace object to mimic ORM record
-                from types import SimpleNamespace
-                record = SimpleNamespace(**{column: getattr(row, column) for column in row._mapping.keys()})
-                consolidated_batches.append(record)
+            # Current stock per batch from the stock_position snapshot (FIFO by expiry)
+            from app.services.stock_position_service import get_batch_positions
 
-                # Log batch info
+            consolidated_batches = get_batch_positions(session, hospital_id, medicine_id=medicine_id)
+            for record in consolidated_batches:
                 price_str = f"{record.sale_price:.2f}" if record.sale_price else "0.00"
                 current_app.logger.debug(f"[BATCH LOOKUP] Batch '{record.batch}': Stock={record.current_stock}, Price={price_str}")
 
@@ -3353,6 +3307,31 @@ def print_invoice(invoice_id):
         logger.error(f"Error preparing invoice for printing: {str(e)}", exc_info=True)
         return redirect(url_for('billing_views.invoice_list'))
 
+@billing_views_bp.route('/<uuid:invoice_id>/print/pdf', methods=['GET'])
+@login_required
+@permission_required('billing', 'view')
+def print_invoice_pdf(invoice_id):
+    """Invoice PDF - the stored document once rendered, otherwise rendered on demand"""
+    from flask import Response, send_file
+    from app.services.invoice_document_service import get_invoice_document_service
+
+    try:
+        pdf = get_invoice_document_service().get_invoice_pdf(
+            invoice_id=invoice_id,
+            hospital_id=current_user.hospital_id,
+            user_id=current_user.user_id
+        )
+        if pdf and pdf['file_path']:
+            return send_file(pdf['file_path'], mimetype='application/pdf', download_name=pdf['filename'])
+        if pdf:
+            return Response(pdf['content'], mimetype='application/pdf',
+                            headers={'Content-Disposition': f'inline; filename="{pdf["filename"]}"'})
+        flash('Invoice PDF is not available, showing the printable invoice instead.', 'warning')
+    except Exception as e:
+        flash(f'Error preparing invoice PDF: {str(e)}', 'error')
+        logger.error(f"Error preparing invoice PDF: {str(e)}", exc_info=True)
+    return redirect(url_for('billing_views.print_invoice', invoice_id=invoice_id))
+
 @billing_views_bp.route('/group/<string:group_id>/print', methods=['GET'])
 @login_required
 @permission_required('billing', 'view')
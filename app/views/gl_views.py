@@ -6,6 +6,13 @@ from app.services.gl_service import (
     get_gl_transaction_by_id,
     search_gl_transactions
 )
+from app.services.gl_report_service import (
+    generate_trial_balance,
+    generate_profit_loss,
+    generate_balance_sheet,
+    generate_gstr1,
+    generate_gstr2a
+)
 from app.forms.gl_forms import (
     GLTransactionFilterForm,
     GLReportForm,
@@ -124,23 +131,25 @@ def generate_report(report_type):
         start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
         end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
         
-        with get_db_session() as session:
-            # This is a placeholder. In a real implementation, you would have different
-            # report generation services for different report types
+        end_date = end_date or datetime.date.today()
+        start_date = start_date or end_date.replace(day=1)
+        branch_id = request.args.get('branch_id') or None
+        include_zero = request.args.get('include_zero_balances') == 'on'
+
+        with get_db_session(read_only=True) as session:
             if report_type == 'trial_balance':
-                # Generate trial balance report
-                # This would call a service function like gl_service.generate_trial_balance()
-                report_data = {"title": "Trial Balance", "data": []}
+                report_data = generate_trial_balance(
+                    session, current_user.hospital_id, end_date, branch_id, include_zero_balances=include_zero
+                )
                 template = 'gl/trial_balance.html'
             elif report_type == 'profit_loss':
-                # Generate profit and loss report
-                # This would call a service function like gl_service.generate_profit_loss()
-                report_data = {"title": "Profit and Loss", "data": []}
+                report_data = generate_profit_loss(
+                    session, current_user.hospital_id, start_date, end_date, branch_id,
+                    include_zero_balances=include_zero
+                )
                 template = 'gl/profit_loss.html'
             elif report_type == 'balance_sheet':
-                # Generate balance sheet report
-                # This would call a service function like gl_service.generate_balance_sheet()
-                report_data = {"title": "Balance Sheet", "data": []}
+                report_data = generate_balance_sheet(session, current_user.hospital_id, end_date, branch_id)
                 template = 'gl/balance_sheet.html'
             else:
                 flash(f"Unknown report type: {report_type}", "error")
@@ -149,8 +158,10 @@ def generate_report(report_type):
         return render_template(
             template,
             report=report_data,
+            report_data=report_data,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            **{key: value for key, value in report_data.items() if key not in ('start_date', 'end_date')}
         )
     except Exception as e:
         current_app.logger.error(f"Error in generate_report: {str(e)}", exc_info=True)
@@ -188,22 +199,20 @@ def generate_gst_report(report_type):
     year = request.args.get('year', type=int)
     
     try:
-        with get_db_session() as session:
-            # This is a placeholder. In a real implementation, you would have different
-            # report generation services for different report types
+        today = datetime.date.today()
+        month = month or today.month
+        year = year or today.year
+        branch_id = request.args.get('branch_id') or None
+
+        with get_db_session(read_only=True) as session:
             if report_type == 'gstr1':
-                # Generate GSTR-1 report (Outward Supplies)
-                # This would call a service function like gl_service.generate_gstr1()
-                report_data = {"title": "GSTR-1 Report", "data": []}
+                report_data = generate_gstr1(session, current_user.hospital_id, month, year, branch_id)
                 template = 'gl/gstr1.html'
             elif report_type == 'gstr2a':
-                # Generate GSTR-2A report (Inward Supplies)
-                # This would call a service function like gl_service.generate_gstr2a()
-                report_data = {"title": "GSTR-2A Report", "data": []}
+                report_data = generate_gstr2a(session, current_user.hospital_id, month, year, branch_id)
                 template = 'gl/gstr2a.html'
             elif report_type == 'gstr3b':
-                # Generate GSTR-3B report (Summary Return)
-                # This would call a service function like gl_service.generate_gstr3b()
+                # GSTR-3B summary is not generated yet
                 report_data = {"title": "GSTR-3B Report", "data": []}
                 template = 'gl/gstr3b.html'
             else:
@@ -213,6 +222,7 @@ def generate_gst_report(report_type):
         return render_template(
             template,
             report=report_data,
+            report_data=report_data,
             month=month,
             year=year
         )
@@ -1334,6 +1334,44 @@ def api_simulate():
         return jsonify({'error': str(e)}), 500
 
 
+@promotion_views_bp.route('/api/simulate/bulk', methods=['POST'])
+@login_required
+def api_simulate_bulk():
+    """JSON: What-if simulation of campaigns across the catalogue and invoice history"""
+    hospital_id = get_user_hospital_id()
+    if not hospital_id:
+        return jsonify({'error': 'Hospital context not found'}), 400
+
+    try:
+        data = request.get_json() or {}
+        campaign_ids = data.get('campaign_ids') or []
+        if data.get('campaign_id'):
+            campaign_ids.append(data['campaign_id'])
+
+        import uuid as uuid_module
+        try:
+            campaign_ids = [str(uuid_module.UUID(str(campaign_id))) for campaign_id in campaign_ids]
+        except ValueError:
+            return jsonify({'error': 'Invalid campaign_id'}), 400
+
+        simulation_date = None
+        if data.get('simulation_date'):
+            simulation_date = datetime.strptime(data['simulation_date'], '%Y-%m-%d').date()
+
+        result = PromotionDashboardService.simulate_promotions_bulk(
+            hospital_id=str(hospital_id),
+            campaign_ids=campaign_ids,
+            simulation_date=simulation_date,
+            history_days=int(data.get('history_days', 30)),
+            patient_is_special_group=bool(data.get('patient_is_special_group', False))
+        )
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Error in bulk simulation: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @promotion_views_bp.route('/api/summary')
 @login_required
 def api_summary():
@@ -14,9 +14,8 @@ Integrated with Your Complete Architecture:
 - Hospital and Branch Context (app.utils.context_helpers)
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, g, make_response, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, g, session
 from flask_login import login_required, current_user
-from datetime import datetime
 from app import csrf  # Import csrf for exempting routes
 import uuid
 from typing import Dict, Any, Optional, List
@@ -31,7 +30,7 @@ from app.services.database_service import get_db_session
 from app.config.entity_configurations import get_entity_config, is_valid_entity_type, list_entity_types
 from app.engine.data_assembler import EnhancedUniversalDataAssembler
 from app.engine.universal_services import search_universal_entity_data, get_universal_service, get_universal_item_data
-from app.engine.document_service import get_document_service, prepare_document_data, get_document_buttons
+from app.engine.document_service import prepare_document_data, get_document_buttons
 from app.utils.context_helpers import ensure_request_context, get_user_branch_context, get_branch_uuid_from_context_or_request, get_current_hospital, get_current_branch, get_hospital_and_branch_for_display
 from app.engine.universal_crud_service import get_universal_crud_service
 from app.engine.universal_scope_controller import get_universal_scope_controller
@@ -273,7 +272,8 @@ def get_universal_list_data(entity_type: str) -> Dict:
             hospital_id=current_user.hospital_id,
             branch_id=branch_uuid,
             page=int(filters.get('page', 1)),
-            per_page=int(filters.get('per_page', config.items_per_page))
+            per_page=int(filters.get('per_page', config.items_per_page)),
+            cursor=filters.get('cursor')
         )         
         
         # Use enhanced data assembler
@@ -801,6 +801,7 @@ def get_service_data_safe(entity_type: str, config, current_filters: Dict,
                 current_user_id=current_user.user_id,
                 page=int(current_filters.get('page', 1)),
                 per_page=int(current_filters.get('per_page', config.items_per_page)),
+                cursor=current_filters.get('cursor'),
                 current_user=current_user
             )
         else:
@@ -2644,11 +2645,19 @@ def universal_batch_documents(entity_type: str):
     """
     Generate multiple documents at once
     Useful for bulk printing receipts, statements, etc.
+    format 'html' (default) renders one printable page; 'pdf', 'excel' and
+    'word' start a background batch (one merged PDF, or a ZIP) and return 202
+    with its status/download/cancel URLs
     """
     try:
+        from app.engine.batch_document_service import (
+            get_batch_document_service, normalize_batch_format, doc_config_as_dict
+        )
+        
         # Get entity IDs from request
         entity_ids = request.json.get('entity_ids', [])
         doc_type = request.json.get('doc_type', 'receipt')
+        output_format = request.json.get('format', 'html').lower()
         
         if not entity_ids:
             return jsonify({'error': 'No entities selected'}), 400
@@ -2662,28 +2671,31 @@ def universal_batch_documents(entity_type: str):
         if not doc_config:
             return jsonify({'error': f'Document type {doc_type} not configured'}), 404
         
-        # Get document service
-        doc_service = get_document_service()
-        
-        # Collect all documents
-        documents = []
-        service = get_universal_service(entity_type)
+        # Keep the request order, drop repeated ids
+        entity_ids = list(dict.fromkeys(str(entity_id) for entity_id in entity_ids))
+        batch_service = get_batch_document_service()
         branch_uuid, branch_name = get_branch_uuid_from_context_or_request()
+        fetch_kwargs = {
+            'hospital_id': current_user.hospital_id,
+            'branch_id': branch_uuid,
+            'include_calculations': True
+        }
         
-        for entity_id in entity_ids[:10]:  # Limit to 10 for performance
-            # Get data for each entity
-            raw_data = service.get_by_id(
-                item_id=entity_id,
-                hospital_id=current_user.hospital_id,
-                branch_id=branch_uuid,
-                include_calculations=True
-            )
+        if output_format != 'html':
+            batch_format = normalize_batch_format(output_format)
+            if not batch_format:
+                return jsonify({'error': f'Unsupported format {output_format}'}), 400
             
-            if raw_data:
-                # Enhance and prepare context
-                doc_data = doc_service.enhance_data_with_relationships(config, raw_data)
-                context = doc_service.prepare_document_context(config, doc_config, doc_data)
-                documents.append(context)
+            job = batch_service.start(entity_type, doc_type, entity_ids, batch_format, fetch_kwargs)
+            return jsonify(_batch_job_payload(entity_type, job)), 202
+        
+        # Collect all documents (entities prefetched in batches, shared organization context)
+        documents = [
+            context for _, context, _ in batch_service.iter_document_contexts(
+                entity_type, config, doc_config_as_dict(doc_config), entity_ids, fetch_kwargs
+            )
+            if context
+        ]
         
         # Render batch template
         return render_template(
@@ -2698,6 +2710,74 @@ def universal_batch_documents(entity_type: str):
         return jsonify({'error': str(e)}), 500
 
 
+def _batch_job_payload(entity_type: str, job) -> Dict:
+    """Job state plus the URLs to poll, download and cancel it"""
+    payload = job.to_dict()
+    payload.update(
+        status_url=url_for('universal_views.universal_batch_document_status', entity_type=entity_type, job_id=job.job_id),
+        download_url=url_for('universal_views.universal_batch_document_download', entity_type=entity_type, job_id=job.job_id),
+        cancel_url=url_for('universal_views.universal_batch_document_cancel', entity_type=entity_type, job_id=job.job_id),
+    )
+    return payload
+
+
+def _get_own_batch_job(entity_type: str, job_id: str):
+    """The batch job if it belongs to the current user, else None"""
+    from app.engine.batch_document_service import get_batch_document_service
+    
+    job = get_batch_document_service().get_job(job_id)
+    if (not job or job.state.get('entity_type') != entity_type
+            or job.state.get('user_id') != str(current_user.user_id)
+            or job.state.get('hospital_id') != str(current_user.hospital_id)):
+        return None
+    return job
+
+
+@universal_bp.route('/<entity_type>/documents/batch/<job_id>', methods=['GET'])
+@login_required
+@require_web_branch_permission('universal', 'view')
+def universal_batch_document_status(entity_type: str, job_id: str):
+    """Progress of a batch document job"""
+    job = _get_own_batch_job(entity_type, job_id)
+    if not job:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(_batch_job_payload(entity_type, job))
+
+
+@universal_bp.route('/<entity_type>/documents/batch/<job_id>/download', methods=['GET'])
+@login_required
+@require_web_branch_permission('universal', 'view')
+def universal_batch_document_download(entity_type: str, job_id: str):
+    """The merged PDF / ZIP of a completed batch"""
+    from flask import send_file
+    
+    job = _get_own_batch_job(entity_type, job_id)
+    if not job:
+        return jsonify({'error': 'Batch not found'}), 404
+    if job.status != 'completed' or not job.output_file.exists():
+        return jsonify(_batch_job_payload(entity_type, job)), 409
+    
+    return send_file(job.output_file, mimetype=job.state['mimetype'], as_attachment=True,
+                     download_name=job.state['filename'])
+
+
+@universal_bp.route('/<entity_type>/documents/batch/<job_id>/cancel', methods=['POST'])
+@login_required
+@require_web_branch_permission('universal', 'view')
+def universal_batch_document_cancel(entity_type: str, job_id: str):
+    """Stop a running batch; its partial output is discarded"""
+    from app.engine.batch_document_service import get_batch_document_service
+    
+    job = _get_own_batch_job(entity_type, job_id)
+    if not job:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    get_batch_document_service().cancel(job_id)
+    payload = _batch_job_payload(entity_type, job)
+    payload['cancel_requested'] = not job.is_finished
+    return jsonify(payload)
+
+
 # =============================================================================
 # UNIVERSAL EXPORT HANDLING
 # =============================================================================
@@ -2724,86 +2804,61 @@ def universal_export_view(entity_type: str, export_format: str):
             return redirect(url_for('universal_views.universal_list_view', entity_type=entity_type))
         
         # Validate export format
-        valid_formats = ['csv', 'excel', 'pdf']
-        if export_format.lower() not in valid_formats:
+        from app.engine.universal_export_service import EXPORT_FORMATS
+        if export_format.lower() not in EXPORT_FORMATS:
             flash(f"Invalid export format: {export_format}", 'error')
             return redirect(url_for('universal_views.universal_list_view', entity_type=entity_type))
         
-        # For now, return a simple export file
-        return create_simple_export(entity_type, export_format)
+        return handle_universal_export(entity_type, export_format.lower())
         
     except Exception as e:
         logger.error(f"❌ Error in export for {entity_type}/{export_format}: {str(e)}")
         flash(f"Error exporting {entity_type}: {str(e)}", 'error')
         return redirect(url_for('universal_views.universal_list_view', entity_type=entity_type))
 
-def create_simple_export(entity_type: str, export_format: str):
-    """Create simple export file for testing"""
-    try:
-        from flask import make_response
-        
-        # Create simple export content
-        if export_format.lower() == 'csv':
-            content = f"# {entity_type.replace('_', ' ').title()} Export\n"
-            content += f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            content += f"# User: {current_user.user_id}\n"
-            content += "ID,Name,Status,Created\n"
-            content += "1,Sample Item,Active,2025-06-23\n"
-            
-            response = make_response(content)
-            response.headers['Content-Type'] = 'text/csv'
-            response.headers['Content-Disposition'] = f'attachment; filename="{entity_type}_export.csv"'
-            
-        else:
-            content = f"{entity_type.replace('_', ' ').title()} Export - {export_format.upper()} format coming soon!"
-            response = make_response(content)
-            response.headers['Content-Type'] = 'text/plain'
-            response.headers['Content-Disposition'] = f'attachment; filename="{entity_type}_export.txt"'
-        
-        logger.info(f"✅ Export created: {entity_type}.{export_format}")
-        return response
-        
-    except Exception as e:
-        logger.error(f"Export creation error: {e}")
-        flash(f"Error creating export: {e}", 'error')
-        return redirect(url_for('universal_views.universal_list_view', entity_type=entity_type))
-
 def handle_universal_export(entity_type: str, export_format: str):
-    """Handle export functionality for any entity type"""
+    """
+    Stream a CSV/XLSX export of the entity list using the current list filters
+    Rows are fetched and written incrementally - memory stays flat for 200k+ rows
+    """
     try:
-        # Get entity configuration
-        config = get_entity_config(entity_type)
+        from flask import Response, stream_with_context
+        from app.engine.universal_export_service import (
+            UniversalExportService, EXPORT_FORMATS, get_export_filename
+        )
+        
         branch_uuid, _ = get_branch_uuid_from_context_or_request()
         
-        # Get current filters from request
+        # Same filters and sort as the list page, plus bulk-selected rows if any
         filters = request.args.to_dict()
+        selected_ids = [i for i in filters.get('selected_ids', '').split(',') if i]
+        sort_by = filters.get('sort') or filters.get('sort_by')
+        sort_order = filters.get('direction') or filters.get('sort_order')
+        
+        exporter = UniversalExportService(entity_type)
+        chunks = exporter.stream(
+            export_format,
+            filters,
+            current_user.hospital_id,
+            branch_id=branch_uuid,
+            user=current_user,
+            selected_ids=selected_ids or None,
+            sort_by=sort_by,
+            sort_order=sort_order
+        )
         
-        # Use enhanced data assembler for export
-        assembler = EnhancedUniversalDataAssembler()
-        
-        # Generate export data using assembler method
-        if hasattr(assembler, 'generate_export_data'):
-            filename, content_type, data = assembler.generate_export_data(
-                entity_type=entity_type,
-                export_format=export_format,
-                filters=filters,
-                current_user_id=current_user.user_id,
-                hospital_id=current_user.hospital_id,
-                branch_id=branch_uuid
-            )
-        else:
-            # Fallback to basic export
-            filename = f"{entity_type}_{export_format}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
-            content_type = f"application/{export_format}"
-            data = f"Export for {entity_type} - implement generate_export_data method"
-        
-        # Create response
-        response = make_response(data)
-        response.headers['Content-Type'] = content_type
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        _, content_type = EXPORT_FORMATS[export_format]
+        filename = get_export_filename(entity_type, export_format)
         
-        logger.info(f"✅ Export generated for {entity_type} in {export_format} format: {filename}")
-        return response
+        logger.info(f"✅ Streaming {export_format} export for {entity_type}: {filename}")
+        return Response(
+            stream_with_context(chunks),
+            mimetype=content_type,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Accel-Buffering': 'no'
+            }
+        )
         
     except Exception as e:
         logger.error(f"❌ Error generating export for {entity_type}/{export_format}: {str(e)}")
@@ -3242,6 +3297,10 @@ def universal_entity_search_api(entity_type: str):
         limit: Maximum results to return (default 10)
         fields: JSON array of fields to search
         exact: Whether to search by exact ID (for display value lookup)
+        mode: 'list' returns paginated entity rows instead of dropdown results
+        cursor: Keyset cursor from a previous list response (implies mode=list)
+        pagination: 'keyset' or 'offset' to override the entity's pagination_mode
+        page, per_page: Page controls for list mode; other args are list filters
     
     Returns:
         JSON response with search results
@@ -3265,6 +3324,10 @@ def universal_entity_search_api(entity_type: str):
                 'results': []
             }), 403
         
+        # List mode: paginated rows with keyset cursors and next/prev links
+        if request.args.get('mode') == 'list' or request.args.get('cursor'):
+            return _entity_list_search_response(entity_type)
+        
         # Get query parameters
         search_term = request.args.get('q', '').strip()
         limit = min(int(request.args.get('limit', 10)), 50)  # Max 50 results
@@ -3394,6 +3457,64 @@ def universal_entity_search_api(entity_type: str):
         }), 500
 
 
+LIST_MODE_CONTROL_ARGS = ('mode', 'cursor', 'pagination', 'page', 'per_page')
+
+def _entity_list_search_response(entity_type: str):
+    """
+    List mode for /api/universal/<entity_type>/search
+    Runs the entity's search_data with request args as filters and returns
+    rows plus pagination, including next/prev URLs for keyset cursors
+    """
+    from app.engine.keyset_pagination import InvalidCursorError, decode_cursor
+    
+    config = get_entity_config(entity_type)
+    cursor = request.args.get('cursor') or None
+    pagination_mode = request.args.get('pagination') or None
+    if pagination_mode not in (None, 'keyset', 'offset'):
+        return jsonify({'error': f"Invalid pagination mode: {pagination_mode}", 'results': []}), 400
+    
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursorError as e:
+            return jsonify({'error': str(e), 'results': []}), 400
+    
+    filters = {k: v for k, v in request.args.items() if k not in LIST_MODE_CONTROL_ARGS}
+    per_page = min(max(1, int(request.args.get('per_page', getattr(config, 'items_per_page', 20)))), 100)
+    branch_uuid, _ = get_branch_uuid_from_context_or_request()
+    
+    result = search_universal_entity_data(
+        entity_type=entity_type,
+        filters=filters,
+        hospital_id=current_user.hospital_id,
+        branch_id=branch_uuid,
+        current_user_id=current_user.user_id,
+        current_user=current_user,
+        page=int(request.args.get('page', 1)),
+        per_page=per_page,
+        cursor=cursor,
+        pagination_mode=pagination_mode
+    )
+    
+    if result.get('success') is False:
+        return jsonify({'error': result.get('error', 'Search failed'), 'results': []}), 500
+    
+    pagination = dict(result.get('pagination') or {})
+    base_args = {k: v for k, v in request.args.items() if k not in ('cursor', 'page')}
+    base_args['mode'] = 'list'
+    for link, token in (('next_url', pagination.get('next_cursor')), ('prev_url', pagination.get('prev_cursor'))):
+        pagination[link] = url_for('universal_views.universal_entity_search_api', entity_type=entity_type,
+                                   cursor=token, **base_args) if token else None
+    
+    return jsonify({
+        'success': True,
+        'results': result.get('items', []),
+        'count': len(result.get('items', [])),
+        'pagination': pagination,
+        'summary': result.get('summary', {})
+    })
+
+
 def _make_template_safe_config(config):
     """Helper to create template-safe config"""
     try:
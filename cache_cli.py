@@ -68,6 +68,7 @@ class CacheConfig:
     SERVICE_CACHE_MAX_MEMORY_MB = 500
     SERVICE_CACHE_DEFAULT_TTL = 1800  # 30 minutes
     SERVICE_CACHE_MAX_ENTRIES = 10000
+    SERVICE_CACHE_BACKEND = 'memory'  # memory | local | redis
     
     # ✅ CONFIG CACHE DEFAULTS (Secondary Layer)  
     CONFIG_CACHE_ENABLED = False
@@ -95,6 +96,7 @@ class CacheConfig:
             'SERVICE_CACHE_MAX_MEMORY_MB': cls.SERVICE_CACHE_MAX_MEMORY_MB,
             'SERVICE_CACHE_DEFAULT_TTL': cls.SERVICE_CACHE_DEFAULT_TTL,
             'SERVICE_CACHE_MAX_ENTRIES': cls.SERVICE_CACHE_MAX_ENTRIES,
+            'SERVICE_CACHE_BACKEND': cls.SERVICE_CACHE_BACKEND,
             'CONFIG_CACHE_ENABLED': cls.CONFIG_CACHE_ENABLED,
             'CONFIG_CACHE_PRELOAD': cls.CONFIG_CACHE_PRELOAD,
             'CONFIG_CACHE_TTL': cls.CONFIG_CACHE_TTL,
@@ -146,6 +148,8 @@ def configure_cache_app():
     app.config['SERVICE_CACHE_MAX_MEMORY_MB'] = CacheConfig.get_setting('SERVICE_CACHE_MAX_MEMORY_MB')
     app.config['SERVICE_CACHE_DEFAULT_TTL'] = CacheConfig.get_setting('SERVICE_CACHE_DEFAULT_TTL')
     app.config['SERVICE_CACHE_MAX_ENTRIES'] = CacheConfig.get_setting('SERVICE_CACHE_MAX_ENTRIES')
+    app.config['SERVICE_CACHE_BACKEND'] = CacheConfig.get_setting('SERVICE_CACHE_BACKEND')
+    app.config['SERVICE_CACHE_REDIS_URL'] = os.getenv('SERVICE_CACHE_REDIS_URL')
     
     app.config['CONFIG_CACHE_ENABLED'] = CacheConfig.get_setting('CONFIG_CACHE_ENABLED')
     app.config['CONFIG_CACHE_PRELOAD'] = CacheConfig.get_setting('CONFIG_CACHE_PRELOAD')
@@ -186,6 +190,7 @@ def config():
         ('SERVICE_CACHE_ENABLED', 'Service Cache'),
         ('SERVICE_CACHE_MAX_MEMORY_MB', 'Memory Limit (MB)'),
         ('SERVICE_CACHE_DEFAULT_TTL', 'Default TTL (seconds)'),
+        ('SERVICE_CACHE_BACKEND', 'Shared Backend (L2)'),
         ('CONFIG_CACHE_ENABLED', 'Config Cache'),
         ('CONFIG_CACHE_PRELOAD', 'Preload Configs'),
         ('CACHE_MONITORING_ENABLED', 'Monitoring'),
@@ -236,6 +241,9 @@ def stats():
         click.echo(f"   Memory: {service_stats['memory_usage_mb']:.1f}MB / {service_stats['max_memory_mb']:.0f}MB")
         click.echo(f"   Avg Response: {service_stats['avg_response_time_ms']:.1f}ms")
         click.echo(f"   Requests/Min: {service_stats.get('requests_per_minute', 0):.1f}")
+        click.echo(f"   Backend: {service_stats.get('backend', 'memory')} "
+                   f"(L2 hits: {service_stats.get('l2_hits', 0):,}, "
+                   f"coalesced loads: {service_stats.get('coalesced_loads', 0):,})")
         
         # Configuration Cache Performance
         click.echo(f"\n🔧 CONFIG CACHE (Entity Configurations)")
@@ -814,16 +822,23 @@ def memory_analysis(threshold, detailed):
         if detailed:
             click.echo(f"\n📊 DETAILED MEMORY BREAKDOWN:")
             
-            # Entity-specific memory usage (if available)
+            # Entity-specific resident memory (measured per entry)
             if 'entity_stats' in stats and stats['entity_stats']:
                 click.echo(f"   Entity Memory Distribution:")
-                total_hits = sum(entity_stats['hits'] for entity_stats in stats['entity_stats'].values())
+                total_bytes = sum(entity_stats.get('memory_bytes', 0) for entity_stats in stats['entity_stats'].values())
                 
                 for entity, entity_stats in sorted(stats['entity_stats'].items(), 
-                                                 key=lambda x: x[1]['hits'], reverse=True):
-                    hit_percentage = (entity_stats['hits'] / total_hits * 100) if total_hits > 0 else 0
-                    estimated_memory = (hit_percentage / 100) * stats['memory_usage_mb']
-                    click.echo(f"     {entity:<15}: ~{estimated_memory:>5.1f}MB ({hit_percentage:>5.1f}% of requests)")
+                                                 key=lambda x: x[1].get('memory_bytes', 0), reverse=True):
+                    memory_bytes = entity_stats.get('memory_bytes', 0)
+                    share = (memory_bytes / total_bytes * 100) if total_bytes > 0 else 0
+                    click.echo(f"     {entity:<25}: {memory_bytes / (1024 * 1024):>7.2f}MB "
+                               f"({share:>5.1f}%, {entity_stats.get('entries', 0):>5} entries)")
+            
+            click.echo(f"\n🧱 SEGMENTS:")
+            click.echo(f"   Protected (hot): {stats.get('protected_memory_mb', 0):.1f}MB")
+            click.echo(f"   Probation (new): {stats.get('probation_memory_mb', 0):.1f}MB")
+            click.echo(f"   Admission rejections: {stats.get('admission_rejections', 0):,}")
+            click.echo(f"   Evictions: {stats.get('total_evictions', 0):,}")
             
             # Cache efficiency metrics
             click.echo(f"\n⚡ EFFICIENCY METRICS:")
@@ -0,0 +1,62 @@
+-- Migration: Create ar_aging_snapshot table (latest AR balance per patient)
+-- Date: 2026-10-16
+-- Purpose: AR aging for large hospitals reads one row per patient instead of ranking the
+--          whole ar_subledger. Refreshed by aging_service.refresh_ar_aging_snapshot; schedule
+--          nightly with: python scripts/manage_db.py refresh-ar-aging-snapshot
+
+CREATE TABLE IF NOT EXISTS ar_aging_snapshot (
+    hospital_id UUID NOT NULL REFERENCES hospitals(hospital_id),
+    branch_id UUID NOT NULL REFERENCES branches(branch_id),
+    patient_id UUID NOT NULL REFERENCES patients(patient_id),
+
+    current_balance NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    last_transaction_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_entry_id UUID,
+    source_created_at TIMESTAMP WITH TIME ZONE,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (hospital_id, branch_id, patient_id)
+);
+
+-- Incremental refresh watermark: MAX(source_created_at) per hospital
+CREATE INDEX IF NOT EXISTS idx_ar_aging_snapshot_watermark
+ON ar_aging_snapshot(hospital_id, source_created_at);
+
+-- Supports the latest-entry ranking and the "entries created since" scan
+CREATE INDEX IF NOT EXISTS idx_ar_subledger_aging
+ON ar_subledger(hospital_id, patient_id, branch_id, transaction_date DESC, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_ar_subledger_created
+ON ar_subledger(hospital_id, created_at);
+
+COMMENT ON TABLE ar_aging_snapshot IS 'Latest ar_subledger balance per hospital/branch/patient; aging buckets derived at read time';
+COMMENT ON COLUMN ar_aging_snapshot.source_created_at IS 'created_at of last_entry_id, used as the incremental refresh watermark';
+
+-- Populate from the existing subledger (latest entry per patient/branch, ties broken by created_at)
+INSERT INTO ar_aging_snapshot (
+    hospital_id, branch_id, patient_id, current_balance,
+    last_transaction_date, last_entry_id, source_created_at, refreshed_at
+)
+SELECT
+    latest.hospital_id, latest.branch_id, latest.patient_id, COALESCE(latest.current_balance, 0),
+    latest.transaction_date, latest.entry_id, latest.created_at, CURRENT_TIMESTAMP
+FROM (
+    SELECT
+        s.*,
+        ROW_NUMBER() OVER (
+            PARTITION BY s.hospital_id, s.patient_id, s.branch_id
+            ORDER BY s.transaction_date DESC, s.created_at DESC, s.entry_id DESC
+        ) AS rn
+    FROM ar_subledger s
+) latest
+WHERE latest.rn = 1
+ON CONFLICT DO NOTHING;
+
+-- Verify migration
+DO $$
+DECLARE
+    snapshot_count INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO snapshot_count FROM ar_aging_snapshot;
+    RAISE NOTICE 'ar_aging_snapshot table created successfully. Populated % patient balances.', snapshot_count;
+END $$;
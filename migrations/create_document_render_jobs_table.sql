@@ -0,0 +1,47 @@
+-- Migration: Create document_render_jobs table (asynchronous invoice PDF rendering)
+-- Date: 2026-10-16
+-- Purpose: Invoice PDFs are rendered by document_render_service outside the request.
+--          Invoice creation inserts a 'pending' invoice_documents row and a queued job;
+--          stuck or retryable jobs are picked up by scripts/manage_db.py process-render-jobs
+
+CREATE TABLE IF NOT EXISTS document_render_jobs (
+    job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id UUID NOT NULL REFERENCES hospitals(hospital_id),
+    invoice_id UUID NOT NULL REFERENCES invoice_header(invoice_id),
+    document_id UUID NOT NULL REFERENCES invoice_documents(document_id),
+    idempotency_key VARCHAR(150) NOT NULL,
+    job_type VARCHAR(30) NOT NULL DEFAULT 'invoice_pdf',
+
+    -- queued -> running -> completed; back to queued for a retry, failed after max_attempts
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    next_attempt_at TIMESTAMP WITH TIME ZONE,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    base_url VARCHAR(255),
+
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_by VARCHAR(50),
+    updated_by VARCHAR(50),
+
+    CONSTRAINT uq_document_render_jobs_idempotency_key UNIQUE (idempotency_key)
+);
+
+-- Due jobs for the sweeper (queued and retry-ready, or running past the stale timeout)
+CREATE INDEX IF NOT EXISTS idx_document_render_jobs_due
+ON document_render_jobs(status, next_attempt_at)
+WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS idx_document_render_jobs_invoice
+ON document_render_jobs(invoice_id);
+
+-- Documents waiting for or serving the latest print of an invoice
+CREATE INDEX IF NOT EXISTS idx_invoice_documents_invoice_status
+ON invoice_documents(invoice_id, document_status, version_number DESC);
+
+COMMENT ON TABLE document_render_jobs IS 'Queued PDF rendering of invoice documents, one job per (invoice, version)';
+COMMENT ON COLUMN document_render_jobs.idempotency_key IS 'invoice_pdf:<invoice_id>:v<version> - enqueueing the same version twice returns the existing job';
+COMMENT ON COLUMN invoice_documents.document_status IS 'pending (render queued), generated, failed, archived, superseded';
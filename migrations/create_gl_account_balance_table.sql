@@ -0,0 +1,88 @@
+-- Migration: Create gl_account_balance table (daily account-balance rollup of the GL)
+-- Date: 2026-10-16
+-- Purpose: Trial balance, P&L and balance sheet read daily totals per account instead of
+--          scanning gl_entry. Rows are maintained by the GLEntry after_insert hook
+--          (gl_balance_service); rebuild/verify with scripts/manage_db.py
+--          rebuild-gl-balances / verify-gl-balances
+
+-- Branch of the source document, so the rollup (and reports) can be filtered by branch
+ALTER TABLE gl_transaction ADD COLUMN IF NOT EXISTS branch_id UUID REFERENCES branches(branch_id);
+
+-- Backfill from the documents referenced by existing transactions
+UPDATE gl_transaction t SET branch_id = d.branch_id
+FROM invoice_header d WHERE t.branch_id IS NULL AND t.reference_id = d.invoice_id::text;
+
+UPDATE gl_transaction t SET branch_id = d.branch_id
+FROM payment_details d WHERE t.branch_id IS NULL AND t.reference_id = d.payment_id::text;
+
+UPDATE gl_transaction t SET branch_id = d.branch_id
+FROM supplier_invoice d WHERE t.branch_id IS NULL AND t.reference_id = d.invoice_id::text;
+
+UPDATE gl_transaction t SET branch_id = d.branch_id
+FROM supplier_payment d WHERE t.branch_id IS NULL AND t.reference_id = d.payment_id::text;
+
+UPDATE gl_transaction t SET branch_id = d.branch_id
+FROM patient_advance_payments d WHERE t.branch_id IS NULL AND t.reference_id = d.advance_id::text;
+
+UPDATE gl_transaction t SET branch_id = d.branch_id
+FROM patient_credit_notes d WHERE t.branch_id IS NULL AND t.source_document_id = d.credit_note_id;
+
+CREATE TABLE IF NOT EXISTS gl_account_balance (
+    balance_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id UUID NOT NULL REFERENCES hospitals(hospital_id),
+    branch_id UUID REFERENCES branches(branch_id),
+    account_id UUID NOT NULL REFERENCES chart_of_accounts(account_id),
+    balance_date DATE NOT NULL,
+
+    -- Totals of gl_entry for the key
+    debit_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    credit_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_by VARCHAR(50),
+    updated_by VARCHAR(50)
+);
+
+-- One row per hospital/branch/account/day (NULL branch treated as a value).
+-- The ON CONFLICT target in gl_balance_service uses this exact expression.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_gl_account_balance_key
+ON gl_account_balance(hospital_id, COALESCE(branch_id, '00000000-0000-0000-0000-000000000000'::uuid), account_id, balance_date);
+
+-- Period sums for reports
+CREATE INDEX IF NOT EXISTS idx_gl_account_balance_period
+ON gl_account_balance(hospital_id, balance_date, account_id);
+
+-- GST returns read one month of the GST ledger
+CREATE INDEX IF NOT EXISTS idx_gst_ledger_period
+ON gst_ledger(hospital_id, entry_year, entry_month, transaction_type);
+
+COMMENT ON TABLE gl_account_balance IS 'Daily debit/credit totals per hospital/branch/account, maintained incrementally from gl_entry';
+COMMENT ON COLUMN gl_account_balance.balance_date IS 'entry_date in Asia/Kolkata (gl_balance_service.REPORTING_TIMEZONE)';
+COMMENT ON COLUMN gl_transaction.branch_id IS 'Branch of the source document';
+
+-- Populate from the existing ledger
+INSERT INTO gl_account_balance (
+    hospital_id, branch_id, account_id, balance_date,
+    debit_total, credit_total, entry_count, created_by, updated_by
+)
+SELECT
+    e.hospital_id, t.branch_id, e.account_id, (e.entry_date AT TIME ZONE 'Asia/Kolkata')::date,
+    COALESCE(SUM(e.debit_amount), 0), COALESCE(SUM(e.credit_amount), 0), COUNT(*), 'system', 'system'
+FROM gl_entry e
+JOIN gl_transaction t ON t.transaction_id = e.transaction_id
+GROUP BY e.hospital_id, t.branch_id, e.account_id, (e.entry_date AT TIME ZONE 'Asia/Kolkata')::date
+ON CONFLICT DO NOTHING;
+
+-- Verify migration
+DO $$
+DECLARE
+    balance_count INTEGER;
+    unbranched_count INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO balance_count FROM gl_account_balance;
+    SELECT COUNT(*) INTO unbranched_count FROM gl_transaction WHERE branch_id IS NULL;
+    RAISE NOTICE 'gl_account_balance table created successfully. Populated % account-days.', balance_count;
+    RAISE NOTICE '% GL transactions have no branch (counted under all branches only).', unbranched_count;
+END $$;
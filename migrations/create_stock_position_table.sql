@@ -0,0 +1,89 @@
+-- Migration: Create stock_position table (current stock snapshot of the inventory ledger)
+-- Date: 2026-10-16
+-- Purpose: Stock reads become index lookups instead of ROW_NUMBER scans over inventory.
+--          Rows are maintained by the Inventory after_insert hook (stock_position_service);
+--          rebuild/verify with scripts/manage_db.py rebuild-stock-positions / verify-stock-positions
+
+CREATE TABLE IF NOT EXISTS stock_position (
+    position_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id UUID NOT NULL REFERENCES hospitals(hospital_id),
+    branch_id UUID REFERENCES branches(branch_id),
+    medicine_id UUID NOT NULL REFERENCES medicines(medicine_id),
+    batch VARCHAR(20) NOT NULL,
+
+    -- Attributes of the latest movement for the batch
+    medicine_name VARCHAR(100) NOT NULL,
+    medicine_category VARCHAR(50),
+    expiry DATE NOT NULL,
+    pack_purchase_price NUMERIC(12, 2),
+    pack_mrp NUMERIC(12, 2),
+    units_per_pack NUMERIC(10, 2),
+    unit_price NUMERIC(12, 2),
+    sale_price NUMERIC(12, 2),
+    cgst NUMERIC(12, 2) DEFAULT 0,
+    sgst NUMERIC(12, 2) DEFAULT 0,
+    igst NUMERIC(12, 2) DEFAULT 0,
+    location VARCHAR(50),
+
+    -- Balance = SUM(inventory.units) for the key
+    current_stock NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    last_stock_id UUID,
+    last_movement_at TIMESTAMP WITH TIME ZONE,
+
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_by VARCHAR(50),
+    updated_by VARCHAR(50)
+);
+
+-- One row per hospital/branch/medicine/batch (NULL branch treated as a value).
+-- The ON CONFLICT target in stock_position_service uses this exact expression.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_position_key
+ON stock_position(hospital_id, COALESCE(branch_id, '00000000-0000-0000-0000-000000000000'::uuid), medicine_id, batch);
+
+-- Batch lookups for pharmacy billing / barcode and expiry reports
+CREATE INDEX IF NOT EXISTS idx_stock_position_medicine
+ON stock_position(hospital_id, medicine_id, expiry);
+
+CREATE INDEX IF NOT EXISTS idx_stock_position_expiry
+ON stock_position(hospital_id, expiry)
+WHERE current_stock > 0;
+
+COMMENT ON TABLE stock_position IS 'Current stock per hospital/branch/medicine/batch, maintained incrementally from the inventory ledger';
+COMMENT ON COLUMN stock_position.current_stock IS 'SUM(inventory.units) for the key';
+COMMENT ON COLUMN stock_position.last_stock_id IS 'Latest inventory.stock_id applied to this position';
+
+-- Populate from the existing ledger: balance from SUM(units), attributes from the latest row
+INSERT INTO stock_position (
+    hospital_id, branch_id, medicine_id, batch,
+    medicine_name, medicine_category, expiry, pack_purchase_price, pack_mrp, units_per_pack,
+    unit_price, sale_price, cgst, sgst, igst, location,
+    current_stock, last_stock_id, last_movement_at, created_by, updated_by
+)
+SELECT
+    latest.hospital_id, latest.branch_id, latest.medicine_id, latest.batch,
+    latest.medicine_name, latest.medicine_category, latest.expiry, latest.pack_purchase_price,
+    latest.pack_mrp, latest.units_per_pack, latest.unit_price, latest.sale_price,
+    latest.cgst, latest.sgst, latest.igst, latest.location,
+    latest.balance, latest.stock_id, latest.transaction_date, 'system', 'system'
+FROM (
+    SELECT
+        i.*,
+        SUM(i.units) OVER (PARTITION BY i.hospital_id, i.branch_id, i.medicine_id, i.batch) AS balance,
+        ROW_NUMBER() OVER (
+            PARTITION BY i.hospital_id, i.branch_id, i.medicine_id, i.batch
+            ORDER BY i.created_at DESC, i.transaction_date DESC
+        ) AS rn
+    FROM inventory i
+) latest
+WHERE latest.rn = 1
+ON CONFLICT DO NOTHING;
+
+-- Verify migration
+DO $$
+DECLARE
+    position_count INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO position_count FROM stock_position;
+    RAISE NOTICE 'stock_position table created successfully. Populated % positions.', position_count;
+END $$;
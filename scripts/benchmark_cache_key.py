@@ -0,0 +1,106 @@
+# =============================================================================
+# SERVICE CACHE KEY BENCHMARK
+# File: scripts/benchmark_cache_key.py
+# =============================================================================
+
+"""
+Compare the legacy service cache key construction (Flask request reads
+plus a json.dumps per component) with the canonical build_cache_key
+(single freeze + blake2b over explicit parameters only).
+
+Usage:
+    python scripts/benchmark_cache_key.py [iterations]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import timeit
+import uuid
+
+from flask import Flask, request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.engine.universal_service_cache import build_cache_key
+
+
+class _User:
+    def __init__(self):
+        self.user_id = '9876543210'
+        self.hospital_id = uuid.uuid4()
+
+
+def legacy_cache_key(entity_type, operation, service_params):
+    """Equivalent of the previous key builder: Flask request reads + json.dumps per component"""
+    service_params = dict(service_params)
+    key_components = {'entity_type': entity_type, 'operation': operation}
+    request_args = request.args.to_dict()
+    if request_args:
+        service_params['request_args'] = request_args
+        service_params['filters'] = {**(service_params.get('filters') or {}), **request_args}
+    service_params['request_path'] = request.path
+    key_components['request_path'] = request.path
+    if request.form:
+        service_params['form_data'] = request.form.to_dict()
+    for name, value in service_params.items():
+        if value is None or name == 'current_user':
+            continue
+        if isinstance(value, dict):
+            cleaned = {k: v for k, v in value.items() if v is not None and v != '' and v != []}
+            if cleaned:
+                key_components[name] = json.dumps(cleaned, sort_keys=True, default=str)
+        elif isinstance(value, (list, tuple)):
+            if value:
+                key_components[name] = json.dumps(list(value), sort_keys=True, default=str)
+        else:
+            key_components[name] = str(value)
+    if request_args:
+        key_components['_request_args'] = json.dumps(request_args, sort_keys=True)
+    key_string = json.dumps(key_components, sort_keys=True)
+    return f"{entity_type}:{operation}:{hashlib.sha256(key_string.encode()).hexdigest()[:16]}"
+
+
+def typical_search_params():
+    user = _User()
+    return {
+        'filters': {
+            'status': 'approved',
+            'supplier_name': 'Medi',
+            'start_date': '2025-04-01',
+            'end_date': '2026-03-31',
+            'payment_method': ['cash', 'upi'],
+            'sort_field': 'invoice_date',
+            'sort_direction': 'desc',
+            'reference_no': '',
+        },
+        'hospital_id': user.hospital_id,
+        'branch_id': uuid.uuid4(),
+        'page': 2,
+        'per_page': 20,
+        'current_user_id': user.user_id,
+        'current_user': user,
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    params = typical_search_params()
+    query = '&'.join(f"{k}={v}" for k, v in params['filters'].items() if isinstance(v, str))
+
+    app = Flask(__name__)
+    with app.test_request_context(f"/universal/supplier_payments/list?{query}"):
+        run(params, iterations)
+
+
+def run(params, iterations):
+    for label, builder in (('legacy (json + sha256)', legacy_cache_key),
+                           ('canonical (freeze + blake2b)', build_cache_key)):
+        seconds = timeit.timeit(lambda: builder('supplier_payments', 'search_data', params),
+                                number=iterations)
+        print(f"{label:32s} {seconds / iterations * 1e6:8.2f} µs/key")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# =============================================================================
+# DOCUMENT RENDER BENCHMARK
+# File: scripts/benchmark_document_render.py
+# =============================================================================
+
+"""
+Render a run of receipts (header with a hospital logo, two field sections and
+a line-item table) as PDF and Excel, and report the time per document and the
+peak RSS of the process. Each format is rendered twice:
+
+- cold: document resources cleared before every document, so styles are
+  compiled and the logo decoded per document (as before document_resources)
+- warm: compiled styles and resized logos reused across documents
+
+Usage:
+    python scripts/benchmark_document_render.py [documents]
+"""
+
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.engine.document_resources import clear_document_resources
+from app.engine.document_service import UniversalDocumentService
+
+HOSPITAL_ID = '4ef72e18-e65d-4a22-bd6c-1ae5e1a9b6a1'
+LINE_ITEMS = 12
+
+
+def write_logo(upload_root: str) -> str:
+    """A camera-sized upload, as hospitals tend to provide"""
+    logo_dir = os.path.join(upload_root, 'app', 'static', 'uploads', 'hospital_logos', HOSPITAL_ID)
+    os.makedirs(logo_dir)
+    logo_file = os.path.join(logo_dir, 'logo.png')
+    Image.new('RGB', (1600, 1600), (91, 155, 213)).save(logo_file)
+    return logo_file
+
+
+def field(name, label, value, field_type='text'):
+    return {'name': name, 'label': label, 'value': value, 'type': field_type}
+
+
+def receipt_context(number: int) -> dict:
+    reference_no = f"RCPT-2026-{number:05d}"
+    items = [{
+        'item_name': f"Consultation item {line}",
+        'quantity': 1 + line % 3,
+        'unit_price': f"{250 + line * 10}.00",
+        'discount_percent': line % 4 * 2.5,
+        'line_total': f"{(250 + line * 10) * (1 + line % 3)}.00",
+    } for line in range(LINE_ITEMS)]
+    return {
+        'data': {'reference_no': reference_no},
+        'hospital': {
+            'hospital_id': HOSPITAL_ID, 'name': 'City Care Hospital', 'logo_path': 'logo.png',
+            'address': '12 Park Street', 'city': 'Kolkata', 'phone': '+91 33 2222 1111',
+            'email': 'billing@citycare.example', 'gst_number': '19AAACC1206D1ZM',
+        },
+        'branch': {'name': 'Main'},
+        'assembled_data': {'field_sections': [{
+            'key': 'details', 'label': 'Details', 'sections': [
+                {'key': 'receipt', 'title': 'Receipt Information', 'fields': [
+                    field('reference_no', 'Receipt No', reference_no),
+                    field('payment_date', 'Payment Date', '16-Oct-2026', 'date'),
+                    field('total_amount', 'Amount', '4,850.00', 'currency'),
+                    field('payment_method', 'Method', 'UPI'),
+                ]},
+                {'key': 'patient', 'title': 'Patient', 'fields': [
+                    field('patient_name', 'Name', f"Patient {number}"),
+                    field('mrn', 'MRN', f"MRN{number:06d}"),
+                ]},
+                {'key': 'items', 'title': 'Line Items', 'fields': [{
+                    'name': 'line_items', 'label': 'Items', 'is_custom_renderer': True,
+                    'custom_renderer': {'css_classes': 'table-responsive'},
+                    'data': {'items': items, 'summary': {'line_total': '4,850.00'}},
+                }]},
+            ],
+        }]},
+        'entity_config': None,
+        'service': object(),
+        'author': 'Benchmark',
+        'renderer_data_loaded': True,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run(build, contexts, doc_config, cold: bool) -> float:
+    clear_document_resources()
+    started = time.perf_counter()
+    for context in contexts:
+        if cold:
+            clear_document_resources()
+        build(context, doc_config)
+    return (time.perf_counter() - started) / len(contexts)
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    logging.disable(logging.WARNING)
+
+    service = UniversalDocumentService()
+    doc_config = {'title': 'Payment Receipt', 'show_company_info': True, 'show_logo': True,
+                  'page_size': 'A4', 'orientation': 'portrait'}
+    contexts = [receipt_context(number) for number in range(1, documents + 1)]
+
+    with tempfile.TemporaryDirectory() as upload_root:
+        write_logo(upload_root)
+        cwd = os.getcwd()
+        os.chdir(upload_root)   # logo lookups are relative to the app root
+        try:
+            # Warm-up: first ReportLab/openpyxl imports and font loading
+            service.build_document_pdf(contexts[0], doc_config)
+            service.build_document_excel(contexts[0], doc_config)
+            print(f"{documents} receipts, {LINE_ITEMS} line items each, 1600x1600 logo")
+            print(f"{'baseline peak RSS':24s} {peak_rss_mb():8.1f} MB")
+            for label, build in (('pdf', service.build_document_pdf), ('excel', service.build_document_excel)):
+                for mode in ('cold', 'warm'):
+                    seconds = run(build, contexts, doc_config, cold=mode == 'cold')
+                    print(f"{label + ' ' + mode:24s} {seconds * 1e3:8.2f} ms/document  "
+                          f"(peak RSS {peak_rss_mb():.1f} MB)")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
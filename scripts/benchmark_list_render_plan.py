@@ -0,0 +1,217 @@
+# =============================================================================
+# LIST RENDER PLAN BENCHMARK
+# File: scripts/benchmark_list_render_plan.py
+# =============================================================================
+
+"""
+Compare per-row list assembly of the legacy field-by-field loop (per cell:
+show_in_list/virtual getattr checks, field type resolution and formatter
+branching; per row: action condition parsing) with the compiled
+ListRenderPlan, on a 100-row page of patient invoices.
+
+Usage:
+    python scripts/benchmark_list_render_plan.py [pages]
+"""
+
+import logging
+import os
+import sys
+import timeit
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.entity_configurations import get_entity_config
+from app.engine.data_assembler import EnhancedUniversalDataAssembler
+from app.engine.list_render_plan import (
+    FREE_ITEMS_BADGE, SAMPLE_ITEMS_BADGE, compile_list_render_plan, field_type_name
+)
+
+PAGE_SIZE = 100
+
+
+class LegacyTableAssembler(EnhancedUniversalDataAssembler):
+    """The table loop as it was before list render plans"""
+
+    def _get_field_type_safe(self, field) -> str:
+        if not field or not hasattr(field, 'field_type'):
+            return 'text'
+        if hasattr(field.field_type, 'value'):
+            return field.field_type.value.lower()
+        if hasattr(field.field_type, 'name'):
+            return field.field_type.name.lower()
+        return str(field.field_type).lower().replace('fieldtype.', '')
+
+    def _extract_virtual_field_value(self, field, item):
+        virtual_target = getattr(field, 'virtual_target', None)
+        virtual_key = getattr(field, 'virtual_key', None)
+        if virtual_target and virtual_key:
+            target_data = item.get(virtual_target, {})
+            return target_data.get(virtual_key, '') if isinstance(target_data, dict) else ''
+        return item.get(field.name, '')
+
+    def _assemble_table_data(self, config, items):
+        table_data = []
+        for item in items:
+            row_data = {}
+            for field in config.fields:
+                if getattr(field, 'show_in_list', False):
+                    if getattr(field, 'virtual', False):
+                        raw_value = self._extract_virtual_field_value(field, item)
+                    else:
+                        raw_value = item.get(field.name)
+                    self._current_item = item
+                    row_data[field.name] = self._format_field_value(field, raw_value, item)
+            row_data['_row_id'] = item.get(config.primary_key)
+            row_data['_row_actions'] = self._build_row_actions(config, item)
+            table_data.append(row_data)
+        return table_data
+
+    def _format_field_value(self, field, raw_value, item=None):
+        try:
+            if raw_value is None:
+                return ''
+            field_type = self._get_field_type_safe(field)
+            if field_type == 'currency' and getattr(field, 'format_pattern', None) == 'mixed_payment_breakdown':
+                try:
+                    return str(float(raw_value))
+                except (ValueError, TypeError):
+                    return '0'
+            if field_type == 'currency' or field_type == 'amount':
+                try:
+                    return float(raw_value) if raw_value is not None else 0.0
+                except (ValueError, TypeError):
+                    return 0.0
+            if field_type == 'date':
+                if isinstance(raw_value, (date, datetime)):
+                    return raw_value.strftime('%d/%b/%Y')
+                elif isinstance(raw_value, str):
+                    try:
+                        return datetime.strptime(raw_value, '%Y-%m-%d').date().strftime('%d/%b/%Y')
+                    except:
+                        return raw_value
+            elif field_type == 'datetime':
+                if isinstance(raw_value, datetime):
+                    return raw_value.strftime('%d/%b/%Y %H:%M')
+                elif isinstance(raw_value, date):
+                    return raw_value.strftime('%d/%b/%Y')
+            elif field_type == 'status_badge':
+                result = self._format_status_badge(field, raw_value, item)
+                if isinstance(result, dict) and 'badge_html' in result:
+                    return result['badge_html']
+                return f'<span class="status-badge status-default">{str(raw_value)}</span>'
+            return str(raw_value)
+        except Exception:
+            return str(raw_value)
+
+    def _format_status_badge(self, field, value, item=None):
+        is_deleted = False
+        if item and isinstance(item, dict):
+            is_deleted = item.get('is_deleted', False) or item.get('deleted_flag', False) or item.get('deleted', False)
+        if is_deleted:
+            return {'badge_html': '<span class="status-badge status-deleted"><i class="fas fa-trash-alt"></i> Deleted</span>'}
+        badge_html = ''
+        formatted_value = str(value).title()
+        css_class = 'status-badge status-default'
+        if hasattr(field, 'options') and field.options:
+            for option in field.options:
+                if str(option.get('value', '')).lower() == str(value).lower():
+                    formatted_value = option.get('label', value)
+                    css_class = f"status-badge {option.get('css_class', 'status-default')}"
+                    badge_html = f'<span class="{css_class}">{formatted_value}</span>'
+                    break
+        if not badge_html:
+            badge_html = f'<span class="{css_class}">{formatted_value}</span>'
+        if getattr(field, 'name', '') == 'payment_status' and item and isinstance(item, dict):
+            extra_badges = []
+            if item.get('has_free_items') == 'true':
+                extra_badges.append(FREE_ITEMS_BADGE)
+            if item.get('has_sample_items') == 'true':
+                extra_badges.append(SAMPLE_ITEMS_BADGE)
+            if extra_badges:
+                badge_html += '<br>' + ' '.join(extra_badges)
+        return {'formatted_value': formatted_value, 'css_class': css_class, 'badge_html': badge_html}
+
+    def _build_row_actions(self, config, item):
+        actions = []
+        for action_config in config.actions:
+            if not getattr(action_config, 'show_in_list', False):
+                continue
+            if self._evaluate_action_conditions(action_config, item):
+                button_type = getattr(action_config, 'button_type', None)
+                actions.append({
+                    'name': getattr(action_config, 'name', action_config.id),
+                    'label': action_config.label,
+                    'icon': action_config.icon,
+                    'css_class': getattr(action_config, 'css_class', 'btn-sm'),
+                    'button_type': button_type.value.replace('btn-', '') if button_type else 'info',
+                    'url': action_config.get_url(item, config),
+                    'confirmation_required': getattr(action_config, 'confirmation_required', False),
+                    'confirmation_message': getattr(action_config, 'confirmation_message', ''),
+                    'javascript_handler': getattr(action_config, 'javascript_handler', None)
+                })
+        return actions
+
+
+def sample_value(field, number):
+    """A plausible value for a list field of the given type"""
+    field_type = field_type_name(field)
+    if field_type in ('currency', 'amount', 'decimal', 'number'):
+        return Decimal('1250.50') + number
+    if field_type == 'date':
+        return date(2026, 3, 1) + timedelta(days=number % 28)
+    if field_type == 'datetime':
+        return datetime(2026, 3, 1, 9, 30) + timedelta(hours=number)
+    if field_type in ('status_badge', 'select') and field.options:
+        return field.options[number % len(field.options)].get('value')
+    if field_type == 'boolean':
+        return number % 2 == 0
+    return f"{field.name}-{number}"
+
+
+def sample_page(config):
+    items = []
+    for number in range(PAGE_SIZE):
+        item = {field.name: sample_value(field, number) for field in config.fields}
+        item.update({config.primary_key: str(uuid.uuid4()), 'is_deleted': False, 'workflow_status': 'approved',
+                     'has_free_items': 'true' if number % 7 == 0 else 'false'})
+        items.append(item)
+    return items
+
+
+def register_action_routes(app, config):
+    """Stand-in rules for the row action endpoints so url_for builds real URLs"""
+    for action in config.actions:
+        if action.route_name and action.route_name not in app.view_functions:
+            params = ''.join(f"/<{param}>" for param in (action.route_params or {}))
+            app.add_url_rule(f"/{action.route_name}{params}", endpoint=action.route_name, view_func=lambda **kw: '')
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logging.disable(logging.WARNING)   # legacy action checks log every row at INFO
+
+    config = get_entity_config('patient_invoices')
+    items = sample_page(config)
+    app = Flask(__name__)
+    register_action_routes(app, config)
+    with app.test_request_context('/universal/patient_invoices/list'):
+        legacy = LegacyTableAssembler()
+        plan = compile_list_render_plan(config)
+        assert legacy._assemble_table_data(config, items) == plan.render_rows(items)
+
+        print(f"{len(plan.columns)} list columns, {len(plan.actions)} row actions, {PAGE_SIZE} rows per page")
+        compile_seconds = timeit.timeit(lambda: compile_list_render_plan(config), number=pages) / pages
+        print(f"{'plan compile (once per config)':32s} {compile_seconds * 1e6:8.1f} µs")
+        for label, assemble in (('legacy field-by-field loop', lambda: legacy._assemble_table_data(config, items)),
+                                ('compiled list render plan', lambda: plan.render_rows(items))):
+            seconds = timeit.timeit(assemble, number=pages) / pages
+            print(f"{label:32s} {seconds / PAGE_SIZE * 1e6:8.1f} µs/row  ({seconds * 1e3:6.2f} ms/page)")
+
+
+if __name__ == '__main__':
+    main()
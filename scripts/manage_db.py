@@ -2195,5 +2195,117 @@ def init_migrations():
         click.echo(f"Error: {e.stderr}")
         sys.exit(1)
 
+
+# Stock Position Commands
+
+@cli.command()
+@click.option('--hospital-id', default=None, help='Rebuild only this hospital (default: all)')
+@safe_with_appcontext
+def rebuild_stock_positions(hospital_id):
+    """Rebuild the stock_position snapshot from the inventory ledger"""
+    import uuid
+    from app.services.database_service import get_db_session
+    from app.services.stock_position_service import rebuild_stock_positions as rebuild
+
+    with get_db_session() as session:
+        written = rebuild(session, uuid.UUID(hospital_id) if hospital_id else None)
+    click.echo(f'SUCCESS: Rebuilt {written} stock positions')
+
+@cli.command()
+@click.option('--hospital-id', default=None, help='Verify only this hospital (default: all)')
+@click.option('--limit', type=int, default=20, help='Number of mismatches to display')
+@safe_with_appcontext
+def verify_stock_positions(hospital_id, limit):
+    """Compare the stock_position snapshot with SUM(units) of the inventory ledger"""
+    import uuid
+    from app.services.database_service import get_db_session
+    from app.services.stock_position_service import verify_stock_positions as verify
+
+    with get_db_session(read_only=True) as session:
+        report = verify(session, uuid.UUID(hospital_id) if hospital_id else None)
+
+    click.echo(f"Checked {report['checked']} positions")
+    if report['ok']:
+        click.echo('SUCCESS: stock_position matches the inventory ledger')
+        return
+
+    for mismatch in report['mismatches'][:limit]:
+        click.echo(f"- medicine {mismatch['medicine_id']} batch {mismatch['batch']} "
+                   f"(branch {mismatch['branch_id']}): ledger={mismatch['ledger_stock']} "
+                   f"position={mismatch['position_stock']}")
+    click.echo(f"FAILED: {len(report['mismatches'])} positions differ - run rebuild-stock-positions")
+    sys.exit(1)
+
+@cli.command()
+@click.option('--hospital-id', default=None, help='Refresh only this hospital (default: all)')
+@click.option('--full', is_flag=True, help='Recompute every patient instead of only new subledger entries')
+@safe_with_appcontext
+def refresh_ar_aging_snapshot(hospital_id, full):
+    """Refresh ar_aging_snapshot from the AR subledger (run nightly from cron)"""
+    import uuid
+    from app.models.master import Hospital
+    from app.services.database_service import get_db_session
+    from app.services.aging_service import refresh_ar_aging_snapshot as refresh
+
+    with get_db_session() as session:
+        if hospital_id:
+            hospital_ids = [uuid.UUID(hospital_id)]
+        else:
+            hospital_ids = [row[0] for row in session.query(Hospital.hospital_id).all()]
+        written = sum(refresh(session, hid, full=full) for hid in hospital_ids)
+    click.echo(f'SUCCESS: Refreshed {written} AR aging snapshot rows for {len(hospital_ids)} hospital(s)')
+
+@cli.command()
+@click.option('--hospital-id', default=None, help='Rebuild only this hospital (default: all)')
+@safe_with_appcontext
+def rebuild_gl_balances(hospital_id):
+    """Rebuild the gl_account_balance rollup from gl_entry"""
+    import uuid
+    from app.services.database_service import get_db_session
+    from app.services.gl_balance_service import rebuild_gl_balances as rebuild
+
+    with get_db_session() as session:
+        written = rebuild(session, uuid.UUID(hospital_id) if hospital_id else None)
+    click.echo(f'SUCCESS: Rebuilt {written} GL account balances')
+
+@cli.command()
+@click.option('--limit', type=int, default=100, help='Maximum number of jobs to render')
+@safe_with_appcontext
+def process_render_jobs(limit):
+    """Render queued and retry-due invoice PDFs, re-queueing jobs of stopped workers (run from cron)"""
+    from app.services.document_render_service import get_render_queue
+
+    queue = get_render_queue()
+    try:
+        generated = queue.process_due_jobs(limit=limit)
+    finally:
+        queue.shutdown()
+    click.echo(f'SUCCESS: Rendered {generated} invoice document(s)')
+
+@cli.command()
+@click.option('--hospital-id', default=None, help='Verify only this hospital (default: all)')
+@click.option('--limit', type=int, default=20, help='Number of mismatches to display')
+@safe_with_appcontext
+def verify_gl_balances(hospital_id, limit):
+    """Compare the gl_account_balance rollup with the raw GL entries"""
+    import uuid
+    from app.services.database_service import get_db_session
+    from app.services.gl_balance_service import verify_gl_balances as verify
+
+    with get_db_session(read_only=True) as session:
+        report = verify(session, uuid.UUID(hospital_id) if hospital_id else None)
+
+    click.echo(f"Checked {report['checked']} account-days")
+    if report['ok']:
+        click.echo('SUCCESS: gl_account_balance matches gl_entry')
+        return
+
+    for mismatch in report['mismatches'][:limit]:
+        click.echo(f"- account {mismatch['account_id']} on {mismatch['balance_date']} "
+                   f"(branch {mismatch['branch_id']}): entries={mismatch['ledger']} "
+                   f"rollup={mismatch['rollup']}")
+    click.echo(f"FAILED: {len(report['mismatches'])} account-days differ - run rebuild-gl-balances")
+    sys.exit(1)
+
 if __name__ == '__main__':
     cli()
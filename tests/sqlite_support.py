@@ -0,0 +1,70 @@
+# tests/sqlite_support.py
+
+"""
+In-memory SQLite databases for service tests that do not need PostgreSQL
+(no conftest - that one requires the test database).
+
+JSONB columns are created as JSON. Test modules load it as a plugin, which
+registers the fixture:
+
+    pytest_plugins = ['tests.sqlite_support']
+
+    @pytest.fixture
+    def session(sqlite_session_factory):
+        return sqlite_session_factory(Patient, Staff)
+"""
+
+from typing import Callable, Dict, Optional, Tuple
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@compiles(JSONB, 'sqlite')
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+def create_sqlite_engine(*models, threads: bool = False,
+                         functions: Optional[Dict[str, Tuple[int, Callable]]] = None) -> Engine:
+    """
+    In-memory database with the tables of models.
+
+    Args:
+        threads: one connection shared by every thread (worker pools, render queues)
+        functions: SQL functions PostgreSQL has and SQLite lacks, name -> (arg count, callable)
+    """
+    if threads:
+        engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine('sqlite://')
+
+    if functions:
+        @event.listens_for(engine, 'connect')
+        def register_functions(dbapi_connection, _):
+            for name, (arg_count, function) in functions.items():
+                dbapi_connection.create_function(name, arg_count, function)
+
+    for model in models:
+        model.__table__.create(engine)
+    return engine
+
+
+@pytest.fixture
+def sqlite_session_factory():
+    """factory(*models, engine=None, **engine_options) -> Session, closed after the test"""
+    sessions = []
+
+    def factory(*models, engine: Optional[Engine] = None, **engine_options) -> Session:
+        session = sessionmaker(bind=engine or create_sqlite_engine(*models, **engine_options))()
+        sessions.append(session)
+        return session
+
+    yield factory
+    for session in sessions:
+        session.close()
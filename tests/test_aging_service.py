@@ -0,0 +1,119 @@
+# tests/test_aging_service.py
+# pytest tests/test_aging_service.py
+
+import json
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app.models.master import Branch, Patient, Supplier
+from app.models.transaction import APSubledger, ARAgingSnapshot, ARSubledger
+from app.services.aging_service import (
+    ap_spec, ar_spec, compute_aging, compute_ar_aging_from_snapshot, refresh_ar_aging_snapshot
+)
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+AS_OF = datetime(2026, 3, 31, 12, 0)
+
+
+# PostgreSQL functions used by the aging queries
+SQL_FUNCTIONS = {
+    'jsonb_extract_path_text': (2, lambda doc, key: json.loads(doc).get(key) if doc else None),
+    'concat': (-1, lambda *parts: ''.join(p or '' for p in parts)),
+}
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    session = sqlite_session_factory(Branch, Patient, Supplier, ARSubledger, APSubledger, ARAgingSnapshot,
+                                     functions=SQL_FUNCTIONS)
+    session.add(Branch(branch_id=BRANCH_ID, hospital_id=HOSPITAL_ID, name='Main'))
+    return session
+
+
+def _patient(session, first_name):
+    patient = Patient(patient_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID,
+                      mrn=first_name, personal_info={'first_name': first_name, 'last_name': 'K'},
+                      contact_info={})
+    session.add(patient)
+    return patient.patient_id
+
+def _ar_entry(session, patient_id, days_ago, balance, created_offset=0):
+    session.add(ARSubledger(
+        hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID, patient_id=patient_id,
+        transaction_date=AS_OF - timedelta(days=days_ago), entry_type='invoice',
+        reference_id=uuid.uuid4(), reference_type='invoice',
+        debit_amount=balance, current_balance=Decimal(balance),
+        created_at=AS_OF - timedelta(days=days_ago, seconds=-created_offset)
+    ))
+
+
+class TestAgingService:
+
+    def test_ar_aging_single_query_with_tie_break(self, session):
+        asha = _patient(session, 'Asha')
+        ravi = _patient(session, 'Ravi')
+        _ar_entry(session, asha, 10, 500)
+        _ar_entry(session, asha, 10, 300, created_offset=5)   # same date, later row wins
+        _ar_entry(session, ravi, 45, 1000)
+        _ar_entry(session, ravi, 120, 200)
+        session.flush()
+
+        statements = []
+        event.listen(session.bind, 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+        report = compute_aging(session, ar_spec(), HOSPITAL_ID, as_of_date=AS_OF)
+
+        assert len(statements) == 1
+        branch = report['branches']['Main']
+        assert branch['total_ar'] == 1300.0
+        assert branch['aging_buckets'] == {'0-30': 300.0, '31-60': 1000.0, '61-90': 0.0, '90+': 0.0}
+        names = {p['patient_name']: p['days_outstanding'] for p in branch['patients']}
+        assert names == {'Asha K': 10, 'Ravi K': 45}
+
+    def test_ap_aging_bucket_boundaries(self, session):
+        supplier_id = uuid.uuid4()
+        session.add(Supplier(supplier_id=supplier_id, hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID,
+                             supplier_name='Medico'))
+        for days_ago, balance in ((30, 10), (31, 20), (90, 40), (91, 80)):
+            session.add(APSubledger(
+                hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID, supplier_id=uuid.uuid4() if balance != 80 else supplier_id,
+                transaction_date=AS_OF - timedelta(days=days_ago), entry_type='invoice',
+                reference_id=uuid.uuid4(), reference_type='invoice', current_balance=Decimal(balance)
+            ))
+        session.flush()
+
+        report = compute_aging(session, ap_spec(), HOSPITAL_ID, as_of_date=AS_OF)
+
+        assert report['summary'] == {
+            'total_ap': 150.0,
+            'aging_buckets': {'0-30': 10.0, '31-60': 20.0, '61-90': 40.0, '90+': 80.0}
+        }
+        names = {s['supplier_name'] for s in report['branches']['Main']['suppliers']}
+        assert 'Medico' in names
+
+    def test_snapshot_refresh_is_incremental(self, session):
+        asha = _patient(session, 'Asha')
+        ravi = _patient(session, 'Ravi')
+        _ar_entry(session, asha, 5, 100)
+        _ar_entry(session, ravi, 70, 400)
+        session.flush()
+
+        assert refresh_ar_aging_snapshot(session, HOSPITAL_ID) == 2
+
+        _ar_entry(session, asha, 1, 0)   # Asha settles; only her row is recomputed
+        session.flush()
+        assert refresh_ar_aging_snapshot(session, HOSPITAL_ID) == 1
+        assert session.query(ARAgingSnapshot).count() == 2
+
+        snapshot_report = compute_ar_aging_from_snapshot(session, HOSPITAL_ID, as_of_date=AS_OF)
+        live_report = compute_aging(session, ar_spec(), HOSPITAL_ID, as_of_date=AS_OF)
+        assert snapshot_report['summary'] == live_report['summary']
+        assert snapshot_report['summary']['aging_buckets']['61-90'] == 400.0
+        assert snapshot_report['summary']['total_ar'] == 400.0
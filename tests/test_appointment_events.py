@@ -0,0 +1,150 @@
+# tests/test_appointment_events.py
+# pytest tests/test_appointment_events.py
+
+import uuid
+from datetime import date, time
+
+import pytest
+
+from app.engine import universal_service_cache
+from app.engine.service_cache_backend import LocalServiceCacheBackend
+from app.models.appointment import Appointment
+from app.models.master import Patient, Staff
+from app.services import appointment_event_service
+from app.services.appointment_event_service import AppointmentEventBroker, event_stream, format_sse
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+DR_RAO = uuid.uuid4()
+DR_IYER = uuid.uuid4()
+PATIENT_ID = uuid.uuid4()
+DAY = date(2026, 3, 2)
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    monkeypatch.setattr(universal_service_cache, '_service_cache_manager', None)
+    broker = AppointmentEventBroker(buffer_size=3)
+    monkeypatch.setattr(appointment_event_service, '_event_broker', broker)
+    return broker
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    session = sqlite_session_factory(Patient, Staff, Appointment)
+    session.add_all([
+        Staff(staff_id=DR_RAO, hospital_id=HOSPITAL_ID, first_name='Meera', last_name='Rao', staff_type='doctor',
+              personal_info={}, contact_info={}),
+        Staff(staff_id=DR_IYER, hospital_id=HOSPITAL_ID, first_name='Ravi', last_name='Iyer', staff_type='doctor',
+              personal_info={}, contact_info={}),
+        Patient(patient_id=PATIENT_ID, hospital_id=HOSPITAL_ID, mrn='MRN1',
+                personal_info={'first_name': 'Pat', 'last_name': 'One'}, contact_info={'phone': '9800000001'}),
+    ])
+    session.commit()
+    return session
+
+
+def _book(session, number='APT001', staff_id=DR_RAO):
+    appointment = Appointment(appointment_id=uuid.uuid4(), appointment_number=number, patient_id=PATIENT_ID,
+                              staff_id=staff_id, branch_id=BRANCH_ID, hospital_id=HOSPITAL_ID,
+                              appointment_date=DAY, start_time=time(10), status='confirmed')
+    session.add(appointment)
+    return appointment
+
+
+def _event(number, staff_id=DR_RAO, branch_id=BRANCH_ID):
+    return {'type': 'updated', 'hospital_id': str(HOSPITAL_ID), 'branch_id': str(branch_id),
+            'staff_ids': [str(staff_id)], 'appointment_id': number}
+
+
+class TestAppointmentEvents:
+
+    def test_changes_are_published_on_commit_only(self, session, broker):
+        subscription = broker.subscribe(HOSPITAL_ID, branch_id=BRANCH_ID)
+        appointment = _book(session)
+        session.flush()
+        assert subscription.get(timeout=0) is None
+
+        session.commit()
+        booked = subscription.get(timeout=0)
+        assert booked['type'] == 'booked'
+        assert booked['appointment']['patient_name'] == 'Pat One'
+        assert booked['appointment']['doctor_name'] == 'Dr. Meera Rao'
+        assert booked['calendar_event']['title'] == 'Pat One - Meera Rao'
+
+        appointment.status = 'checked_in'
+        session.rollback()
+        assert subscription.get(timeout=0) is None
+
+        appointment.chief_complaint = 'Rash'   # not tracked
+        session.commit()
+        assert subscription.get(timeout=0) is None
+
+        appointment.status = 'checked_in'
+        appointment.staff_id = DR_IYER
+        session.commit()
+        checked_in = subscription.get(timeout=0)
+        assert (checked_in['type'], checked_in['previous_status']) == ('checked_in', 'confirmed')
+        assert checked_in['staff_ids'] == sorted([str(DR_RAO), str(DR_IYER)])
+
+
+    def test_savepoints_neither_publish_nor_drop_events(self, session, broker):
+        subscription = broker.subscribe(HOSPITAL_ID, branch_id=BRANCH_ID)
+        with session.begin_nested():
+            _book(session)
+        assert subscription.get(timeout=0) is None   # released, not committed
+
+        with pytest.raises(RuntimeError):
+            with session.begin_nested():
+                raise RuntimeError('failed step')
+        session.commit()
+
+        assert subscription.get(timeout=0)['type'] == 'booked'
+
+    def test_subscriptions_are_filtered_by_branch_and_doctor(self, broker):
+        everyone = broker.subscribe(HOSPITAL_ID)
+        rao = broker.subscribe(HOSPITAL_ID, branch_id=BRANCH_ID, staff_id=DR_RAO)
+
+        broker.publish(_event('a'))
+        broker.publish(_event('b', staff_id=DR_IYER))
+        broker.publish(_event('c', branch_id=uuid.uuid4()))
+
+        assert [everyone.get(timeout=0)['appointment_id'] for _ in range(3)] == ['a', 'b', 'c']
+        assert rao.get(timeout=0)['appointment_id'] == 'a'
+        assert rao.get(timeout=0) is None
+
+    def test_reconnect_replays_missed_events_or_resets(self, broker):
+        first = broker.publish(_event('a'))
+        broker.publish(_event('b'))
+        broker.publish(_event('c', staff_id=DR_IYER))
+
+        resumed = broker.subscribe(HOSPITAL_ID, staff_id=DR_RAO, last_event_id=first['id'])
+        assert [e['appointment_id'] for e in resumed.replay] == ['b']
+
+        broker.publish(_event('d'))   # pushes 'a' out of the three event buffer
+        stale = broker.subscribe(HOSPITAL_ID, last_event_id=first['id'])
+        assert stale.get(timeout=0)['type'] == 'reset'
+
+        stream = event_stream(broker, resumed, keepalive_seconds=0)
+        assert next(stream) == 'retry: 3000\n\n'
+        assert next(stream).startswith(f"id: {resumed.replay[0]['id']}\nevent: updated\ndata: ")
+        assert next(stream) == format_sse(broker._buffer[-1])
+        assert next(stream) == ': keep-alive\n\n'
+        stream.close()
+        assert broker.subscriber_count == 1
+
+    def test_events_reach_subscribers_on_other_workers(self):
+        namespace = f'events-{uuid.uuid4().hex}'
+        worker_a = AppointmentEventBroker(backend=LocalServiceCacheBackend(namespace=namespace))
+        worker_b = AppointmentEventBroker(backend=LocalServiceCacheBackend(namespace=namespace))
+        on_a = worker_a.subscribe(HOSPITAL_ID)
+        on_b = worker_b.subscribe(HOSPITAL_ID)
+
+        published = worker_a.publish(_event('a'))
+
+        assert on_a.get(timeout=0)['id'] == published['id']
+        assert on_a.get(timeout=0) is None   # not delivered twice through the backend
+        assert on_b.get(timeout=0)['id'] == published['id']
+        assert worker_b.subscribe(HOSPITAL_ID, last_event_id=published['id']).replay == []
@@ -0,0 +1,122 @@
+# tests/test_appointment_feed.py
+# pytest tests/test_appointment_feed.py
+
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from app.models.appointment import Appointment
+from app.models.master import AppointmentResource, Patient, Staff
+from app.services.appointment_feed_service import (
+    appointment_conditions, calendar_event, feed_etag, load_allocations, load_appointments, queue_item,
+    resolve_names, resource_booking
+)
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+DOCTOR_ID = uuid.uuid4()
+ROOM_ID = uuid.uuid4()
+DAY = date(2026, 3, 2)
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    return sqlite_session_factory(Patient, Staff, Appointment, AppointmentResource)
+
+
+@pytest.fixture
+def week(session):
+    """Twenty appointments with Dr. Rao across the week, one in a laser room"""
+    session.add(Staff(staff_id=DOCTOR_ID, hospital_id=HOSPITAL_ID, first_name='Meera', last_name='Rao',
+                      staff_type='doctor', personal_info={}, contact_info={}))
+    appointments = []
+    for number in range(20):
+        patient_id = uuid.uuid4()
+        session.add(Patient(patient_id=patient_id, hospital_id=HOSPITAL_ID, mrn=f'MRN{number}',
+                            personal_info={'first_name': 'Pat', 'last_name': str(number)},
+                            contact_info={'phone': f'98000{number:05d}'}))
+        appointments.append(Appointment(
+            appointment_id=uuid.uuid4(), appointment_number=f'APT{number:03d}', patient_id=patient_id,
+            staff_id=DOCTOR_ID, branch_id=BRANCH_ID, hospital_id=HOSPITAL_ID,
+            appointment_date=DAY + timedelta(days=number % 5), start_time=time(9 + number % 8),
+            status='confirmed', booking_source='walk_in' if number == 0 else 'front_desk'
+        ))
+    session.add_all(appointments)
+    session.flush()
+    session.add(AppointmentResource(appointment_id=appointments[0].appointment_id, resource_type='room',
+                                    resource_id=ROOM_ID, allocation_date=DAY, start_time='09:00:00',
+                                    end_time='09:45:00', status='allocated'))
+    session.commit()
+    return appointments
+
+
+class TestAppointmentFeed:
+
+    def test_feed_runs_three_queries_for_any_number_of_appointments(self, session, week):
+        statements = []
+        event.listen(session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        conditions = appointment_conditions(HOSPITAL_ID, DAY, DAY + timedelta(days=6), branch_id=BRANCH_ID)
+        rows = load_appointments(session, conditions, order_by=(Appointment.appointment_date,))
+        names = resolve_names(session, [row.patient_id for row in rows], [row.staff_id for row in rows])
+        events = [calendar_event(row, names) for row in rows]
+
+        assert len(events) == 20
+        assert len(statements) == 3
+        first = events[0]
+        assert first['title'] == 'Pat 0 - Meera Rao'
+        assert (first['start'], first['end']) == ('2026-03-02T09:00:00', '2026-03-02T09:30:00')
+        assert first['extendedProps']['is_walk_in'] is True
+
+    def test_queue_items_and_resource_bookings(self, session, week):
+        week[0].status = 'checked_in'
+        week[0].checked_in_at = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+        session.commit()
+
+        rows = load_appointments(session, appointment_conditions(HOSPITAL_ID, DAY, DAY, status='checked_in'))
+        names = resolve_names(session, [row.patient_id for row in rows], [row.staff_id for row in rows])
+        item = queue_item(rows[0], names, now=datetime(2026, 3, 2, 9, 25, tzinfo=timezone.utc))
+
+        assert (item['patient_name'], item['patient_phone'], item['patient_mrn']) == ('Pat 0', '9800000000', 'MRN0')
+        assert (item['doctor_name'], item['waiting_minutes']) == ('Dr. Meera Rao', 25)
+
+        allocations = load_allocations(session, HOSPITAL_ID, 'room', DAY)
+        booking = resource_booking(allocations[0], names)
+        assert booking == {
+            'resource_id': str(ROOM_ID), 'appointment_id': str(week[0].appointment_id), 'patient_name': 'Pat 0',
+            'doctor_name': 'Dr. Meera', 'service_name': None, 'start_time': '09:00', 'end_time': '09:45',
+            'status': 'checked_in'
+        }
+
+    def test_etag_changes_only_when_the_range_changes(self, session, week):
+        conditions = appointment_conditions(HOSPITAL_ID, DAY, DAY + timedelta(days=6))
+        etag = feed_etag(session, conditions, 'calendar-events')
+
+        assert feed_etag(session, conditions, 'calendar-events') == etag
+        assert feed_etag(session, conditions, 'web-queue') != etag
+
+        week[3].updated_at = datetime.now(timezone.utc) + timedelta(minutes=1)
+        session.commit()
+        assert feed_etag(session, conditions, 'calendar-events') != etag
+
+    def test_conditional_response_answers_304_for_a_known_etag(self):
+        from app.api.routes.appointment_api import conditional_feed_response
+
+        app = Flask(__name__)
+        built = []
+
+        def build():
+            built.append(True)
+            return {'success': True}, 200
+
+        with app.test_request_context(headers={'If-None-Match': '"abc"'}):
+            response = conditional_feed_response('abc', build)
+            assert (response.status_code, built) == (304, [])
+        with app.test_request_context(headers={'If-None-Match': '"old"'}):
+            response = conditional_feed_response('abc', build)
+            assert (response.status_code, response.headers['ETag'], built) == (200, '"abc"', [True])
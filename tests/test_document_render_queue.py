@@ -0,0 +1,154 @@
+# tests/test_document_render_queue.py
+# pytest tests/test_document_render_queue.py
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.models.transaction import DocumentRenderJob, InvoiceDocument
+from app.services import document_render_service
+from app.services.document_render_service import DocumentRenderQueue, invoice_pdf_key
+from tests.sqlite_support import create_sqlite_engine
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+INVOICE_ID = uuid.uuid4()
+
+
+@pytest.fixture
+def engine():
+    return create_sqlite_engine(InvoiceDocument, DocumentRenderJob, threads=True)
+
+
+@pytest.fixture
+def session(sqlite_session_factory, engine):
+    return sqlite_session_factory(engine=engine)
+
+
+@pytest.fixture(autouse=True)
+def worker_queue(monkeypatch):
+    monkeypatch.setattr(document_render_service, '_render_queue', None)
+
+
+def _queue(engine, tmp_path, convert=None, **options):
+    """A queue that renders fake PDFs; installed as this worker's render queue"""
+    options.setdefault('executor', 'inline')
+    queue = DocumentRenderQueue(
+        engine=engine, storage_path=tmp_path, retry_seconds=0,
+        render_html=lambda session, job: f"<h1>{job.invoice_id}</h1>",
+        convert=convert or (lambda html, base_url: b'%PDF-' + html.encode()),
+        **options
+    )
+    document_render_service._render_queue = queue
+    return queue
+
+
+def _enqueue(session, queue, version=1, parent=None):
+    document = InvoiceDocument(
+        document_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, invoice_id=INVOICE_ID,
+        document_status='pending', original_filename='INV-GST-2025-2026-00001.pdf',
+        stored_filename=f'INV-GST-2025-2026-00001_v{version}.pdf',
+        file_path=f'2026/10/{HOSPITAL_ID}/INV-GST-2025-2026-00001_v{version}.pdf',
+        version_number=version, parent_document_id=parent.document_id if parent else None
+    )
+    job = DocumentRenderJob(
+        job_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, invoice_id=INVOICE_ID, document_id=document.document_id,
+        idempotency_key=invoice_pdf_key(INVOICE_ID, version), status='queued', attempts=0,
+        max_attempts=queue.max_attempts, base_url='http://clinic.local/'
+    )
+    session.add(document)
+    session.flush()
+    session.add(job)
+    session.flush()
+    queue.track(session, job)
+    return document, job
+
+
+class TestDocumentRenderQueue:
+
+    def test_committed_job_is_rendered_and_document_generated(self, engine, session, tmp_path):
+        queue = _queue(engine, tmp_path)
+        document, job = _enqueue(session, queue)
+        assert document.document_status == 'pending'
+
+        session.commit()   # hands the job to the queue ('inline': renders now)
+
+        session.refresh(document)
+        session.refresh(job)
+        assert (document.document_status, job.status, job.attempts) == ('generated', 'completed', 1)
+        stored = tmp_path / document.file_path
+        assert stored.read_bytes() == b'%PDF-<h1>' + str(INVOICE_ID).encode() + b'</h1>'
+        assert document.file_size == stored.stat().st_size
+        assert queue.process_job(job.job_id) is False   # already completed
+
+    def test_rolled_back_enqueue_is_never_submitted(self, engine, session, tmp_path):
+        rendered = []
+        queue = _queue(engine, tmp_path, convert=lambda html, base_url: rendered.append(html) or b'%PDF-')
+        _enqueue(session, queue)
+        session.rollback()
+        session.commit()
+
+        assert rendered == []
+        assert session.query(DocumentRenderJob).count() == 0
+
+    def test_failed_attempts_are_retried_then_marked_failed(self, engine, session, tmp_path):
+        attempts = []
+
+        def flaky(html, base_url):
+            attempts.append(base_url)
+            if len(attempts) < 2:
+                raise OSError('font cache locked')
+            return b'%PDF-'
+
+        queue = _queue(engine, tmp_path, convert=flaky, max_attempts=2)
+        document, job = _enqueue(session, queue)
+        session.commit()
+
+        session.refresh(job)
+        assert (job.status, job.attempts, job.last_error) == ('queued', 1, 'OSError: font cache locked')
+        assert queue.process_due_jobs() == 1
+        session.refresh(job)
+        session.refresh(document)
+        assert (job.status, document.document_status) == ('completed', 'generated')
+        assert attempts == ['http://clinic.local/'] * 2
+
+        broken = _queue(engine, tmp_path, convert=lambda html, base_url: 1 / 0, max_attempts=2)
+        document, job = _enqueue(session, broken, version=2)
+        session.commit()
+        broken.process_due_jobs()
+        session.refresh(job)
+        session.refresh(document)
+        assert (job.status, job.attempts, document.document_status) == ('failed', 2, 'failed')
+        assert broken.process_due_jobs() == 0
+
+    def test_regenerated_version_supersedes_parent_once_rendered(self, engine, session, tmp_path):
+        queue = _queue(engine, tmp_path, executor='thread', workers=2)
+        original, _ = _enqueue(session, queue)
+        session.commit()
+        queue.shutdown(wait=True)
+
+        revised, _ = _enqueue(session, queue, version=2, parent=original)
+        session.commit()
+        queue.shutdown(wait=True)
+
+        session.refresh(original)
+        session.refresh(revised)
+        assert (original.document_status, revised.document_status) == ('superseded', 'generated')
+        assert revised.version_number == 2
+
+    def test_jobs_of_stopped_workers_are_requeued(self, engine, session, tmp_path):
+        queue = _queue(engine, tmp_path)
+        document, job = _enqueue(session, queue)
+        session.info.clear()   # the worker died before submitting
+        session.commit()
+        with engine.begin() as connection:
+            connection.execute(update(DocumentRenderJob.__table__).values(
+                status='running', attempts=1, started_at=datetime.now(timezone.utc) - timedelta(hours=1)
+            ))
+
+        assert queue.process_due_jobs() == 1
+        session.refresh(job)
+        assert (job.status, job.attempts) == ('completed', 2)
@@ -0,0 +1,173 @@
+# tests/test_gl_reports.py
+# pytest tests/test_gl_reports.py
+
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models.master import ChartOfAccounts, Supplier
+from app.models.transaction import (
+    GLAccountBalance, GLEntry, GLTransaction, GSTLedger, InvoiceHeader, InvoiceLineItem, SupplierInvoice
+)
+from app.services.gl_balance_service import get_account_balances, rebuild_gl_balances, verify_gl_balances
+from app.services.gl_report_service import (
+    generate_balance_sheet, generate_gstr1, generate_gstr2a, generate_profit_loss, generate_trial_balance
+)
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    return sqlite_session_factory(ChartOfAccounts, Supplier, InvoiceHeader, InvoiceLineItem, SupplierInvoice,
+                                  GLTransaction, GLEntry, GLAccountBalance, GSTLedger)
+
+
+@pytest.fixture
+def accounts(session):
+    chart = {}
+    for key, group, number, name in (
+        ('cash', 'Assets', '1100', 'Cash'),
+        ('equipment', 'Assets', '1500', 'Equipment'),
+        ('payable', 'Liabilities', '2100', 'Accounts Payable'),
+        ('revenue', 'Income', '4100', 'Service Revenue'),
+        ('purchase', 'Expenses', '5100', 'Purchase'),
+    ):
+        account = ChartOfAccounts(account_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, account_group=group,
+                                  gl_account_no=number, account_name=name)
+        session.add(account)
+        chart[key] = account.account_id
+    session.flush()
+    return chart
+
+
+def _post(session, when, lines, branch_id=BRANCH_ID, reference_id=None):
+    """lines: (account_id, debit, credit)"""
+    total = sum(Decimal(debit) for _, debit, _ in lines)
+    transaction = GLTransaction(hospital_id=HOSPITAL_ID, branch_id=branch_id, transaction_date=when,
+                                transaction_type='TEST', reference_id=reference_id,
+                                total_debit=total, total_credit=total)
+    session.add(transaction)
+    session.flush()
+    for account_id, debit, credit in lines:
+        session.add(GLEntry(hospital_id=HOSPITAL_ID, transaction_id=transaction.transaction_id,
+                            account_id=account_id, debit_amount=Decimal(debit), credit_amount=Decimal(credit),
+                            entry_date=when))
+    session.flush()
+    return transaction
+
+
+class TestGLBalances:
+
+    def test_rollup_answers_periods_and_verifies(self, session, accounts):
+        _post(session, datetime(2025, 3, 20, 10, tzinfo=timezone.utc),
+              [(accounts['cash'], 1000, 0), (accounts['revenue'], 0, 1000)])
+        _post(session, datetime(2025, 4, 10, 10, tzinfo=timezone.utc),
+              [(accounts['cash'], 500, 0), (accounts['revenue'], 0, 500)])
+        _post(session, datetime(2025, 4, 10, 12, tzinfo=timezone.utc),        # reversal, same day
+              [(accounts['cash'], 0, 500), (accounts['revenue'], 500, 0)])
+        _post(session, datetime(2025, 4, 15, 10, tzinfo=timezone.utc),
+              [(accounts['purchase'], 300, 0), (accounts['payable'], 0, 300)])
+
+        cash_day = session.query(GLAccountBalance).filter_by(
+            account_id=accounts['cash'], balance_date=date(2025, 4, 10)).one()
+        assert (cash_day.debit_total, cash_day.credit_total, cash_day.entry_count) == (500, 500, 2)
+
+        balances = get_account_balances(session, HOSPITAL_ID, date(2025, 4, 1), date(2025, 4, 30))
+        assert balances[accounts['cash']] == {
+            'opening': Decimal('1000'), 'debit': Decimal('500'), 'credit': Decimal('500'), 'closing': Decimal('1000')
+        }
+        assert get_account_balances(session, HOSPITAL_ID, branch_id=uuid.uuid4()) == {}
+
+        assert verify_gl_balances(session, HOSPITAL_ID)['ok']
+        session.query(GLAccountBalance).filter_by(account_id=accounts['purchase']).update({'debit_total': 1})
+        report = verify_gl_balances(session, HOSPITAL_ID)
+        assert not report['ok'] and len(report['mismatches']) == 1
+
+        assert rebuild_gl_balances(session, HOSPITAL_ID) == 6
+        assert verify_gl_balances(session, HOSPITAL_ID)['ok']
+
+    def test_statements(self, session, accounts):
+        _post(session, datetime(2025, 3, 20, tzinfo=timezone.utc),
+              [(accounts['cash'], 1000, 0), (accounts['revenue'], 0, 1000)])
+        _post(session, datetime(2025, 4, 10, tzinfo=timezone.utc),
+              [(accounts['cash'], 2000, 0), (accounts['revenue'], 0, 2000)])
+        _post(session, datetime(2025, 4, 12, tzinfo=timezone.utc),
+              [(accounts['purchase'], 500, 0), (accounts['equipment'], 700, 0), (accounts['payable'], 0, 1200)])
+
+        trial = generate_trial_balance(session, HOSPITAL_ID, date(2025, 4, 30))
+        assert trial['total_debit'] == trial['total_credit'] == 4200.0
+        assert trial['total_difference'] == 0
+        assert [a['gl_account_no'] for a in trial['accounts']] == ['1100', '1500', '2100', '4100', '5100']
+
+        pnl = generate_profit_loss(session, HOSPITAL_ID, date(2025, 4, 1), date(2025, 4, 30))
+        assert (pnl['total_revenue'], pnl['total_expenses'], pnl['net_profit']) == (2000.0, 500.0, 1500.0)
+        assert pnl['profit_margin'] == 75.0
+
+        sheet = generate_balance_sheet(session, HOSPITAL_ID, date(2025, 4, 30))
+        assert sheet['total_current_assets'] == 3000.0
+        assert sheet['total_fixed_assets'] == 700.0
+        assert sheet['retained_earnings'] == 1000.0
+        assert sheet['current_year_earnings'] == 1500.0
+        assert sheet['total_assets'] == sheet['total_liabilities_and_equity'] == 3700.0
+
+
+class TestGSTReturns:
+
+    def test_gstr1_splits_large_interstate_invoices(self, session):
+        for number, interstate, total, igst, cgst in (('INV-1', True, 150000, 18000, 0),
+                                                      ('INV-2', False, 1180, 0, 90)):
+            invoice = InvoiceHeader(
+                invoice_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID, invoice_number=number,
+                invoice_date=datetime(2025, 4, 5), invoice_type='Service', patient_id=uuid.uuid4(),
+                place_of_supply='29', is_interstate=interstate, total_amount=total, grand_total=total,
+                total_taxable_value=total - igst - 2 * cgst
+            )
+            session.add(invoice)
+            session.add(InvoiceLineItem(
+                hospital_id=HOSPITAL_ID, invoice_id=invoice.invoice_id, item_type='Service', item_name='Facial',
+                hsn_sac_code='999722', quantity=1, unit_price=total, taxable_amount=total - igst - 2 * cgst,
+                gst_rate=18, cgst_amount=cgst, sgst_amount=cgst, igst_amount=igst, line_total=total
+            ))
+            session.add(GSTLedger(hospital_id=HOSPITAL_ID, transaction_date=datetime(2025, 4, 5),
+                                  transaction_type='SALES', transaction_reference=number,
+                                  cgst_output=cgst, sgst_output=cgst, igst_output=igst,
+                                  entry_month=4, entry_year=2025))
+        session.flush()
+
+        report = generate_gstr1(session, HOSPITAL_ID, 4, 2025)
+
+        assert [i['invoice_number'] for i in report['b2c_large_invoices']] == ['INV-1']
+        assert report['summary']['b2c_large']['igst'] == 18000.0
+        assert report['summary']['b2c_small'] == {'taxable_value': 1000.0, 'cgst': 90.0, 'sgst': 90.0,
+                                                  'igst': 0.0, 'cess': 0.0}
+        assert report['hsn_summary'][0]['total_value'] == 151180.0
+
+    def test_gstr2a_groups_by_supplier_registration(self, session):
+        supplier = Supplier(supplier_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID,
+                            supplier_name='Medico', gst_registration_number='29ABCDE1234F1Z5')
+        invoice = SupplierInvoice(invoice_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID,
+                                  supplier_id=supplier.supplier_id, supplier_invoice_number='S-9',
+                                  invoice_date=datetime(2025, 4, 8), total_amount=1120, total_gst_amount=120)
+        session.add_all([supplier, invoice])
+        transaction = _post(session, datetime(2025, 4, 8, tzinfo=timezone.utc), [],
+                            reference_id=str(invoice.invoice_id))
+        session.add(GSTLedger(hospital_id=HOSPITAL_ID, transaction_date=datetime(2025, 4, 8),
+                              transaction_type='PURCHASE', transaction_reference='S-9',
+                              cgst_input=60, sgst_input=60, itc_claimed=True,
+                              gl_reference=transaction.transaction_id, entry_month=4, entry_year=2025))
+        session.flush()
+
+        report = generate_gstr2a(session, HOSPITAL_ID, 4, 2025)
+
+        registered = report['b2b_invoices']['registered']
+        assert [(i['supplier_name'], i['taxable_value'], i['eligible_for_itc']) for i in registered] == [
+            ('Medico', 1000.0, True)
+        ]
+        assert report['summary']['total']['cgst'] == 60.0
+        assert generate_gstr2a(session, HOSPITAL_ID, 4, 2025, branch_id=uuid.uuid4())['b2b_invoices']['registered'] == []
@@ -0,0 +1,134 @@
+# tests/test_permission_matrix.py
+# pytest tests/test_permission_matrix.py
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.models.config import ModuleMaster, RoleMaster, RoleModuleAccess, RoleModuleBranchAccess, UserRoleMapping
+from app.models.master import Branch, Staff
+from app.models.transaction import User
+from app.services import permission_matrix_service
+from app.services.permission_matrix_service import PermissionMatrixCache, get_permission_matrix
+from app.services.permission_service import (
+    get_user_accessible_branches, has_branch_permission, has_cross_branch_permission, has_legacy_permission
+)
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+MAIN_BRANCH = uuid.uuid4()
+CITY_BRANCH = uuid.uuid4()
+USER_ID = '9000000001'
+
+
+@pytest.fixture
+def session(sqlite_session_factory, monkeypatch):
+    monkeypatch.setattr(permission_matrix_service, '_permission_matrix_cache', PermissionMatrixCache())
+    return sqlite_session_factory(ModuleMaster, RoleMaster, RoleModuleAccess, UserRoleMapping,
+                                  RoleModuleBranchAccess, Branch, Staff, User, threads=True)
+
+
+@pytest.fixture
+def clinic(session):
+    """Receptionist at City branch; billing in City, supplier everywhere with cross-branch view"""
+    staff_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    session.add_all([
+        Branch(branch_id=MAIN_BRANCH, hospital_id=HOSPITAL_ID, name='Main Branch', created_at=now - timedelta(days=9)),
+        Branch(branch_id=CITY_BRANCH, hospital_id=HOSPITAL_ID, name='City', created_at=now),
+        Staff(staff_id=staff_id, hospital_id=HOSPITAL_ID, branch_id=CITY_BRANCH, employee_code='S1',
+              personal_info={}, contact_info={}),
+        User(user_id=USER_ID, hospital_id=HOSPITAL_ID, entity_type='staff', entity_id=staff_id),
+        ModuleMaster(module_id=1, module_name='billing', hospital_id=HOSPITAL_ID),
+        ModuleMaster(module_id=2, module_name='supplier'),
+        ModuleMaster(module_id=3, module_name='patient'),
+        RoleMaster(role_id=10, hospital_id=HOSPITAL_ID, role_name='receptionist'),
+        UserRoleMapping(user_id=USER_ID, role_id=10, is_active=True),
+    ])
+    session.flush()
+    session.add_all([
+        RoleModuleBranchAccess(hospital_id=HOSPITAL_ID, role_id=10, module_id=1, branch_id=CITY_BRANCH,
+                               branch_access_type='specific', can_view=True, can_add=True),
+        RoleModuleBranchAccess(hospital_id=HOSPITAL_ID, role_id=10, module_id=2, branch_id=None,
+                               branch_access_type='all', can_edit=True, can_view_cross_branch=True),
+        RoleModuleAccess(hospital_id=HOSPITAL_ID, role_id=10, module_id=3, can_view=True),
+    ])
+    session.commit()
+
+
+class TestPermissionMatrix:
+
+    def test_matrix_compiles_grants_and_branches(self, session, clinic):
+        statements = []
+        event.listen(session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        matrix = get_permission_matrix(USER_ID, HOSPITAL_ID, session)
+
+        assert len(statements) == 4   # roles, grants (one union query), branches, assigned branch
+        assert matrix.allows('billing', 'add', CITY_BRANCH)
+        assert not matrix.allows('billing', 'add', MAIN_BRANCH)
+        assert not matrix.allows('billing', 'delete', CITY_BRANCH)
+        assert matrix.allows('supplier', 'edit', MAIN_BRANCH)
+        assert matrix.allows('supplier', 'view', MAIN_BRANCH)          # through cross-branch view
+        assert matrix.allows_cross_branch('supplier', 'view')
+        assert not matrix.allows_cross_branch('supplier', 'export')
+        assert matrix.allows_legacy('patient', 'view') and not matrix.allows_legacy('patient', 'edit')
+        assert not matrix.is_superuser
+        assert matrix.assigned_branch_id == str(CITY_BRANCH)
+        assert matrix.default_branch_id == str(MAIN_BRANCH)
+        assert [(b['name'], b['is_user_branch']) for b in matrix.accessible_branches] == [
+            ('City', True), ('Main Branch', False)
+        ]
+
+        statements.clear()
+        assert get_permission_matrix(USER_ID, HOSPITAL_ID, session) is matrix
+        assert statements == []
+
+    def test_permission_service_reads_the_matrix(self, session, clinic):
+        get_permission_matrix(USER_ID, HOSPITAL_ID, session)
+        user = User(user_id=USER_ID, hospital_id=HOSPITAL_ID, entity_type='staff', entity_id=uuid.uuid4())
+
+        assert has_branch_permission(user, 'billing', 'view')              # assigned branch is City
+        assert not has_branch_permission(user, 'billing', 'view', str(MAIN_BRANCH))
+        assert not has_branch_permission(user, 'billing', 'access')
+        assert has_cross_branch_permission(user, 'supplier', 'view')
+        assert has_legacy_permission(user, 'patient', 'view')
+        assert len(get_user_accessible_branches(USER_ID, HOSPITAL_ID)) == 2
+
+    def test_role_changes_invalidate_on_commit(self, session, clinic):
+        matrix = get_permission_matrix(USER_ID, HOSPITAL_ID, session)
+        access = session.query(RoleModuleBranchAccess).filter_by(module_id=1).one()
+
+        access.can_delete = True
+        session.flush()
+        session.rollback()
+        assert get_permission_matrix(USER_ID, HOSPITAL_ID, session) is matrix
+
+        session.add(RoleMaster(role_id=11, hospital_id=HOSPITAL_ID, role_name='Hospital Administrator'))
+        session.add(UserRoleMapping(user_id=USER_ID, role_id=11, is_active=True))
+        session.commit()
+
+        rebuilt = get_permission_matrix(USER_ID, HOSPITAL_ID, session)
+        assert rebuilt is not matrix and rebuilt.is_superuser
+
+        permission_matrix_service.get_permission_matrix_cache()._ttl_seconds = 0
+        assert get_permission_matrix(USER_ID, HOSPITAL_ID, session) is not rebuilt
+
+    def test_savepoints_do_not_apply_or_drop_pending_invalidations(self, session, clinic):
+        matrix = get_permission_matrix(USER_ID, HOSPITAL_ID, session)
+        session.query(UserRoleMapping).filter_by(user_id=USER_ID, role_id=10).one().is_active = False
+        session.flush()
+
+        with pytest.raises(RuntimeError):
+            with session.begin_nested():
+                raise RuntimeError('failed step')
+        with session.begin_nested():
+            pass
+        assert get_permission_matrix(USER_ID, HOSPITAL_ID, session) is matrix
+
+        session.commit()
+        revoked = get_permission_matrix(USER_ID, HOSPITAL_ID, session)
+        assert revoked is not matrix and not revoked.has_active_roles
@@ -0,0 +1,130 @@
+# tests/test_promotion_index.py
+# pytest tests/test_promotion_index.py
+
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app.models.master import Patient, PromotionCampaign, PromotionCampaignGroup, PromotionGroupItem, PromotionUsageLog
+from app.services import promotion_index_service
+from app.services.discount_service import DiscountService
+from app.services.promotion_index_service import PromotionIndexCache, get_promotion_index, load_promotion_context
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+GROUP_ID = uuid.uuid4()
+FACIAL = uuid.uuid4()
+PEEL = uuid.uuid4()
+SERUM = uuid.uuid4()
+TODAY = date.today()
+
+
+@pytest.fixture
+def session(sqlite_session_factory, monkeypatch):
+    monkeypatch.setattr(promotion_index_service, '_promotion_index_cache', PromotionIndexCache())
+    return sqlite_session_factory(Patient, PromotionCampaign, PromotionUsageLog, PromotionCampaignGroup,
+                                  PromotionGroupItem, threads=True)
+
+
+def _campaign(code, value, applies_to='all', **kwargs):
+    values = dict(
+        campaign_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, campaign_name=code, campaign_code=code,
+        start_date=TODAY - timedelta(days=1), end_date=TODAY + timedelta(days=30), is_active=True,
+        status='approved', discount_type='percentage', discount_value=Decimal(value), applies_to=applies_to,
+        is_personalized=False, target_special_group=False, current_uses=0
+    )
+    values.update(kwargs)
+    return PromotionCampaign(**values)
+
+
+@pytest.fixture
+def campaigns(session):
+    """Facial is in the skin group; serum is a medicine"""
+    session.add_all([
+        PromotionCampaignGroup(group_id=GROUP_ID, hospital_id=HOSPITAL_ID, group_code='SKIN', group_name='Skin'),
+        PromotionGroupItem(group_id=GROUP_ID, item_type='service', item_id=FACIAL),
+        _campaign('ALL5', '5'),
+        _campaign('SKIN20', '20', 'services', target_groups={'group_ids': [str(GROUP_ID)]}),
+        _campaign('SERUM15', '15', 'medicines', specific_items={'item_ids': [str(SERUM)]}, max_uses_per_patient=2),
+        _campaign('VIP30', '30', target_special_group=True),
+        _campaign('DRAFT50', '50', status='draft'),
+        _campaign('PERSONAL40', '40', is_personalized=True),
+    ])
+    session.commit()
+
+
+def _codes(rules):
+    return [rule.campaign_code for rule in rules]
+
+
+class TestPromotionIndex:
+
+    def test_candidates_are_bucketed_by_scope_item_and_patient(self, session, campaigns):
+        index = get_promotion_index(HOSPITAL_ID, TODAY, session)
+
+        assert index.campaign_count == 4
+        assert _codes(index.candidates('Service', FACIAL)) == ['ALL5', 'SKIN20']
+        assert _codes(index.candidates('Service', PEEL)) == ['ALL5']
+        assert _codes(index.candidates('Medicine', SERUM)) == ['ALL5', 'SERUM15']
+        assert _codes(index.candidates('Package', SERUM)) == ['ALL5']
+        assert _codes(index.candidates('Service', PEEL, patient_is_special_group=True)) == ['ALL5', 'VIP30']
+
+    def test_one_invoice_loads_campaigns_once(self, session, campaigns):
+        patient_id = uuid.uuid4()
+        session.add(PromotionUsageLog(campaign_id=session.query(PromotionCampaign).filter_by(
+            campaign_code='SERUM15').one().campaign_id, hospital_id=HOSPITAL_ID, patient_id=patient_id,
+            discount_amount=Decimal('10')))
+        session.commit()
+        statements = []
+        event.listen(session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        context = load_promotion_context(session, HOSPITAL_ID, patient_id, TODAY)
+        loaded = len(statements)
+        assert loaded == 3   # campaigns, group members, patient
+
+        results = [
+            DiscountService.calculate_promotion_discount(
+                session, HOSPITAL_ID, patient_id, item_type, item_id, Decimal('1000'), 1, TODAY,
+                promotion_context=context
+            )
+            for item_type, item_id in [('Service', FACIAL), ('Service', PEEL), ('Medicine', SERUM), ('Medicine', SERUM)]
+        ]
+
+        assert [r.metadata['campaign_code'] for r in results] == ['SKIN20', 'ALL5', 'SERUM15', 'SERUM15']
+        assert results[0].discount_amount == Decimal('200')
+        assert len(statements) == loaded + 1   # SERUM15 usage count, once for both lines
+
+    def test_campaign_changes_invalidate_on_commit(self, session, campaigns):
+        index = get_promotion_index(HOSPITAL_ID, TODAY, session)
+        campaign = session.query(PromotionCampaign).filter_by(campaign_code='ALL5').one()
+
+        campaign.is_active = False
+        session.flush()
+        session.rollback()
+        assert get_promotion_index(HOSPITAL_ID, TODAY, session) is index
+
+        campaign.is_active = False
+        session.commit()
+        rebuilt = get_promotion_index(HOSPITAL_ID, TODAY, session)
+        assert rebuilt is not index
+        assert _codes(rebuilt.candidates('Service', PEEL)) == []
+
+        session.query(PromotionGroupItem).filter_by(item_id=FACIAL).one().item_id = PEEL
+        session.commit()
+        assert _codes(get_promotion_index(HOSPITAL_ID, TODAY, session).candidates('Service', PEEL)) == ['SKIN20']
+
+    def test_failed_savepoint_keeps_pending_invalidation(self, session, campaigns):
+        index = get_promotion_index(HOSPITAL_ID, TODAY, session)
+        session.query(PromotionCampaign).filter_by(campaign_code='ALL5').one().is_active = False
+        session.flush()
+
+        with pytest.raises(RuntimeError):
+            with session.begin_nested():
+                raise RuntimeError('failed step')
+        session.commit()
+
+        assert get_promotion_index(HOSPITAL_ID, TODAY, session) is not index
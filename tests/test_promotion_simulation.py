@@ -0,0 +1,141 @@
+# tests/test_promotion_simulation.py
+# pytest tests/test_promotion_simulation.py
+
+import itertools
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import polars as pl
+import pytest
+
+from app.models.master import (
+    Hospital, Medicine, Package, Patient, PromotionCampaign, PromotionCampaignGroup, PromotionGroupItem, Service
+)
+from app.models.transaction import InvoiceHeader, InvoiceLineItem
+from app.services.discount_service import DiscountService
+from app.services.promotion_simulation_service import simulate_catalogue_promotions, stacked_percent_expr
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+FACIAL = uuid.uuid4()
+PEEL = uuid.uuid4()
+SERUM = uuid.uuid4()
+GLOW = uuid.uuid4()
+TODAY = date(2026, 3, 31)
+
+
+STACKING_CONFIGS = [
+    {'campaign': {'mode': 'exclusive'}, 'loyalty': {'mode': 'incremental'},
+     'bulk': {'mode': 'incremental', 'exclude_with_campaign': True}, 'vip': {'mode': 'absolute'},
+     'max_total_discount': None},
+    {'campaign': {'mode': 'incremental'}, 'loyalty': {'mode': 'absolute'},
+     'bulk': {'mode': 'absolute', 'exclude_with_campaign': False}, 'vip': {'mode': 'absolute'},
+     'max_total_discount': 25},
+    {'campaign': {'mode': 'absolute'}, 'loyalty': {'mode': 'exclusive'},
+     'bulk': {'mode': 'incremental', 'exclude_with_campaign': True}, 'vip': {'mode': 'incremental'},
+     'max_total_discount': 40},
+]
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    return sqlite_session_factory(Hospital, Service, Medicine, Package, Patient, PromotionCampaign,
+                                  PromotionCampaignGroup, PromotionGroupItem, InvoiceHeader, InvoiceLineItem)
+
+
+def _campaign(code, value, applies_to='all', **kwargs):
+    values = dict(
+        campaign_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, campaign_name=code, campaign_code=code,
+        start_date=TODAY - timedelta(days=60), end_date=TODAY + timedelta(days=30), is_active=True,
+        status='approved', discount_type='percentage', discount_value=Decimal(value), applies_to=applies_to,
+        is_personalized=False, target_special_group=False, current_uses=0
+    )
+    values.update(kwargs)
+    return PromotionCampaign(**values)
+
+
+@pytest.fixture
+def clinic(session):
+    """Exclusive campaigns, bulk from 3 units; the draft targets the skin group (facial only)"""
+    group_id = uuid.uuid4()
+    patient_id = uuid.uuid4()
+    session.add_all([
+        Hospital(hospital_id=HOSPITAL_ID, name='Skin Clinic', bulk_discount_enabled=True,
+                 bulk_discount_min_service_count=3, discount_stacking_config=STACKING_CONFIGS[0]),
+        Service(service_id=FACIAL, hospital_id=HOSPITAL_ID, code='FAC', service_name='Facial',
+                price=Decimal('1000'), standard_discount_percent=Decimal('5'), bulk_discount_percent=Decimal('10'),
+                bulk_discount_eligible=True),
+        Service(service_id=PEEL, hospital_id=HOSPITAL_ID, code='PEEL', service_name='Peel', price=Decimal('2000')),
+        Medicine(medicine_id=SERUM, hospital_id=HOSPITAL_ID, medicine_name='Serum', medicine_type='OTC',
+                 mrp=Decimal('500'), cost_price=Decimal('300')),
+        Package(package_id=GLOW, hospital_id=HOSPITAL_ID, package_name='Glow', price=Decimal('8000'),
+                selling_price=Decimal('7500')),
+        Patient(patient_id=patient_id, hospital_id=HOSPITAL_ID, mrn='P1', personal_info={}, contact_info={}),
+        PromotionCampaignGroup(group_id=group_id, hospital_id=HOSPITAL_ID, group_code='SKIN', group_name='Skin'),
+        PromotionGroupItem(group_id=group_id, item_type='service', item_id=FACIAL),
+        _campaign('MED10', '10', 'medicines'),
+        _campaign('BOGO', '100', promotion_type='buy_x_get_y', promotion_rules={}),
+        _campaign('SKIN30', '30', 'services', status='draft', target_groups={'group_ids': [str(group_id)]}),
+    ])
+
+    invoice_id = uuid.uuid4()
+    session.add(InvoiceHeader(
+        invoice_id=invoice_id, hospital_id=HOSPITAL_ID, invoice_number='INV-1', patient_id=patient_id,
+        invoice_date=datetime(2026, 3, 20, 10, 0), invoice_type='Service', total_amount=Decimal('3500'),
+        grand_total=Decimal('3500')
+    ))
+    for line_id, (item_column, item_id, item_type, quantity, price) in enumerate([
+        ('service_id', FACIAL, 'Service', 3, '1000'),
+        ('medicine_id', SERUM, 'Medicine', 1, '500'),
+    ]):
+        session.add(InvoiceLineItem(
+            hospital_id=HOSPITAL_ID, invoice_id=invoice_id, item_type=item_type, item_name=str(line_id),
+            quantity=quantity, unit_price=Decimal(price), line_total=Decimal(price) * quantity,
+            discount_amount=Decimal('0'), **{item_column: item_id}
+        ))
+    session.commit()
+    return session.query(PromotionCampaign).filter_by(campaign_code='SKIN30').one().campaign_id
+
+
+class TestPromotionSimulation:
+
+    @pytest.mark.parametrize('config', STACKING_CONFIGS)
+    def test_vectorized_stacking_matches_calculate_stacked_discount(self, config):
+        combos = list(itertools.product([0, 10, 30], [0, 5], [0, 15], [0, 20], [0, 3]))
+        frame = pl.DataFrame(combos, schema=['campaign_percent', 'bulk_percent', 'loyalty_percent',
+                                             'vip_percent', 'standard_percent'], orient='row')
+
+        totals = frame.select(stacked_percent_expr(config).alias('total'))['total'].to_list()
+
+        for (campaign, bulk, loyalty, vip, standard), total in zip(combos, totals):
+            expected = DiscountService.calculate_stacked_discount({
+                'campaign': {'percent': campaign, 'type': 'percentage'}, 'bulk': {'percent': bulk},
+                'loyalty': {'percent': loyalty}, 'vip': {'percent': vip}, 'standard': {'percent': standard}
+            }, config, item_price=1000)['total_percent']
+            assert total == pytest.approx(expected)
+
+    def test_draft_campaign_across_catalogue_and_history(self, session, clinic):
+        result = simulate_catalogue_promotions(session, HOSPITAL_ID, [clinic], simulation_date=TODAY)
+        items = {row['item_name']: row for row in result['items']}
+
+        assert [(c['campaign_code'], c['is_draft'], c['simulated']) for c in result['campaigns']] == [
+            ('MED10', False, True), ('BOGO', False, False), ('SKIN30', True, True)
+        ]
+        # Facial: bulk 10% (assumed reached) -> exclusive draft campaign 30%
+        assert (items['Facial']['baseline_percent'], items['Facial']['scenario_percent']) == (10, 30)
+        assert items['Facial']['scenario_campaign'] == 'SKIN30'
+        assert items['Facial']['margin_impact'] == pytest.approx(-200)
+        assert items['Peel']['scenario_percent'] == 0
+        assert items['Serum']['baseline_campaign'] == 'MED10'
+        assert items['Serum']['baseline_margin'] == pytest.approx(150)     # 500 - 50 - 300
+        assert items['Glow']['baseline_discount'] == 0
+
+        # History: 3 facials reach bulk (10%) and the serum gets MED10
+        history = result['history']
+        assert (history['lines'], history['invoices']) == (2, 1)
+        assert history['baseline_discount'] == pytest.approx(300 + 50)
+        assert history['projected_discount'] == pytest.approx(900 + 50)
+        assert history['projected_change'] == pytest.approx(600)
+        assert items['Facial']['history_margin_impact'] == pytest.approx(-600)
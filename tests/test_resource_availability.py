@@ -0,0 +1,163 @@
+# tests/test_resource_availability.py
+# pytest tests/test_resource_availability.py
+
+import uuid
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from app.models.appointment import Appointment
+from app.models.master import AppointmentResource, Room, ServiceResourceRequirement, Staff
+from app.services import resource_availability_service
+from app.services.resource_allocation_service import ResourceAllocationService
+from app.services.resource_availability_service import AvailabilityIndexCache, Booking, ResourceTimeline
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+SERVICE_ID = uuid.uuid4()
+DAY = date(2026, 3, 2)
+
+
+@pytest.fixture
+def session(sqlite_session_factory, monkeypatch):
+    monkeypatch.setattr(resource_availability_service, '_availability_cache', AvailabilityIndexCache())
+    return sqlite_session_factory(Staff, Room, ServiceResourceRequirement, Appointment, AppointmentResource,
+                                  threads=True)
+
+
+def _staff(name, staff_type):
+    return Staff(staff_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID, first_name=name,
+                 staff_type=staff_type, personal_info={}, contact_info={}, is_resource=True)
+
+
+def _room(code, room_type):
+    return Room(room_id=uuid.uuid4(), hospital_id=HOSPITAL_ID, branch_id=BRANCH_ID, room_code=code,
+                room_name=code, room_type=room_type, operating_start_time='09:00:00',
+                operating_end_time='13:00:00', default_slot_duration_minutes=30)
+
+
+def _appointment(number, start, end, status='confirmed', service_id=None):
+    return Appointment(appointment_id=uuid.uuid4(), appointment_number=number, patient_id=uuid.uuid4(),
+                       branch_id=BRANCH_ID, hospital_id=HOSPITAL_ID, appointment_date=DAY, start_time=start,
+                       end_time=end, status=status, service_id=service_id)
+
+
+def _allocate(appointment, resource, start, end):
+    resource_id = resource.room_id if isinstance(resource, Room) else resource.staff_id
+    return AppointmentResource(appointment_id=appointment.appointment_id,
+                               resource_type='room' if isinstance(resource, Room) else 'staff',
+                               resource_id=resource_id, allocation_date=DAY, start_time=start, end_time=end,
+                               status='allocated')
+
+
+@pytest.fixture
+def clinic(session):
+    """Laser room busy 10:00-11:00; Asha busy 10:30-11:30; a cancelled booking holds nothing"""
+    resources = {
+        'laser': _room('L1', 'laser'), 'laser2': _room('L2', 'laser'), 'consult': _room('C1', 'consultation'),
+        'asha': _staff('Asha', 'therapist'), 'bina': _staff('Bina', 'therapist'), 'nia': _staff('Nia', 'nurse'),
+    }
+    busy = _appointment('A1', time(10), time(11))
+    cancelled = _appointment('A2', time(12), time(13), status='cancelled')
+    session.add_all(list(resources.values()) + [busy, cancelled])
+    session.flush()
+    session.add_all([
+        _allocate(busy, resources['laser'], '10:00:00', '11:00:00'),
+        _allocate(busy, resources['asha'], '10:30:00', '11:30:00'),
+        _allocate(cancelled, resources['laser2'], '12:00:00', '13:00:00'),
+        ServiceResourceRequirement(hospital_id=HOSPITAL_ID, service_id=SERVICE_ID, resource_type='room',
+                                   room_type='laser', is_active=True),
+        ServiceResourceRequirement(hospital_id=HOSPITAL_ID, service_id=SERVICE_ID, resource_type='staff',
+                                   staff_type='therapist', staff_role='lead', is_active=True),
+        ServiceResourceRequirement(hospital_id=HOSPITAL_ID, service_id=SERVICE_ID, resource_type='staff',
+                                   staff_type='therapist', staff_role='assist', is_active=True),
+    ])
+    session.commit()
+    return resources
+
+
+class TestResourceAvailability:
+
+    def test_timeline_conflicts_and_free_windows(self):
+        timeline = ResourceTimeline([
+            Booking(600, 720, 1, 'a', '10:00', '12:00'),   # long booking
+            Booking(630, 660, 2, 'b', '10:30', '11:00'),
+            Booking(780, 810, 3, 'c', '13:00', '13:30'),
+        ])
+
+        assert timeline.is_free(540, 600)
+        assert timeline.conflict(700, 730).allocation_id == 1
+        assert timeline.conflict(630, 660, exclude_appointment_id='a').allocation_id == 2
+        assert timeline.is_free(720, 780)
+        assert timeline.free_windows(60, 540, 900, 15, limit=3) == [(540, 600), (720, 780), (810, 870)]
+
+    def test_availability_is_answered_from_one_allocation_query(self, session, clinic):
+        service = ResourceAllocationService()
+        statements = []
+        event.listen(session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        rooms = service.get_available_rooms(session, BRANCH_ID, DAY, time(10, 30), time(11), room_type='laser')
+        therapists = service.get_available_staff(session, BRANCH_ID, HOSPITAL_ID, DAY, time(10, 30), time(11),
+                                                 staff_type='therapist')
+
+        assert [room.room_code for room in rooms] == ['L2']   # its only booking was cancelled
+        assert [staff.first_name for staff in therapists] == ['Bina']
+        assert sum('appointment_resources' in sql for sql in statements) == 1
+        assert service.get_free_windows(session, HOSPITAL_ID, 'room', clinic['laser'].room_id, DAY, 60) == [
+            {'start_time': '09:00', 'end_time': '10:00'}, {'start_time': '11:00', 'end_time': '12:00'},
+            {'start_time': '11:30', 'end_time': '12:30'}, {'start_time': '12:00', 'end_time': '13:00'},
+        ]
+
+    def test_suggestions_cover_every_requirement_at_once(self, session, clinic):
+        service = ResourceAllocationService()
+
+        suggestion = service.suggest_resources_for_slot(
+            session, SERVICE_ID, BRANCH_ID, HOSPITAL_ID, DAY, time(9), time(10)
+        )
+        assert suggestion['room']['room_code'] == 'L1'
+        assert [(s['staff_name'], s['role']) for s in suggestion['staff']] == [('Asha', 'lead'), ('Bina', 'assist')]
+
+        busy = service.suggest_resources_for_slot(
+            session, SERVICE_ID, BRANCH_ID, HOSPITAL_ID, DAY, time(10, 30), time(11)
+        )
+        assert busy['room']['room_code'] == 'L2'
+        assert [s['staff_name'] for s in busy['staff']] == ['Bina']
+        assert busy['warnings'] == ['No therapist available for this time slot']
+
+    def test_allocation_changes_are_visible_in_session_and_invalidate_on_commit(self, session, clinic):
+        service = ResourceAllocationService()
+        appointment = _appointment('A3', time(9), time(9, 30))
+        session.add(appointment)
+        session.commit()
+
+        def free_laser_rooms():
+            rooms = service.get_available_rooms(session, BRANCH_ID, DAY, time(9), time(9, 30), room_type='laser')
+            return [room.room_code for room in rooms]
+
+        assert free_laser_rooms() == ['L1', 'L2']
+        service.allocate_room(session, appointment.appointment_id, clinic['laser'].room_id)
+        assert free_laser_rooms() == ['L2']   # uncommitted, seen by this session only
+        session.commit()
+        assert free_laser_rooms() == ['L2']
+
+        appointment.status = 'cancelled'
+        session.commit()
+        assert free_laser_rooms() == ['L1', 'L2']
+
+    def test_failed_savepoint_keeps_pending_invalidation(self, session, clinic):
+        service = ResourceAllocationService()
+        appointment = _appointment('A4', time(9), time(9, 30))
+        session.add(appointment)
+        session.commit()
+        cached = resource_availability_service.get_availability_index(HOSPITAL_ID, DAY, session)
+
+        service.allocate_room(session, appointment.appointment_id, clinic['laser'].room_id)
+        with pytest.raises(RuntimeError):
+            with session.begin_nested():
+                raise RuntimeError('failed step')
+        session.commit()
+
+        assert resource_availability_service.get_availability_index(HOSPITAL_ID, DAY, session) is not cached
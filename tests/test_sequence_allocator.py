@@ -0,0 +1,101 @@
+# tests/test_sequence_allocator.py
+# pytest tests/test_sequence_allocator.py
+
+import uuid
+from datetime import date
+
+import pytest
+from sqlalchemy import Column, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.models.config import InvoiceSequence
+from app.services.sequence_allocator_service import (
+    SequenceAllocator, format_document_number, get_financial_year, last_number_from_documents
+)
+from tests.sqlite_support import create_sqlite_engine
+
+HOSPITAL_ID = uuid.uuid4()
+FY = '2025-2026'
+
+DocumentBase = declarative_base()
+
+
+class Document(DocumentBase):
+    __tablename__ = 'documents'
+    document_number = Column(String(30), primary_key=True)
+    hospital_id = Column(UUID(as_uuid=True), nullable=False)
+
+
+@pytest.fixture
+def engine():
+    return create_sqlite_engine(InvoiceSequence, Document, threads=True)
+
+
+class TestSequenceAllocator:
+
+    def test_separate_mode_continues_from_seed(self, engine):
+        allocator = SequenceAllocator(engine=engine, modes={'PO': 'separate', 'GRN': 'separate'})
+
+        numbers = [allocator.allocate(HOSPITAL_ID, 'PO', FY, seed=lambda conn, hospital_id: 41)
+                   for _ in range(3)]
+
+        assert numbers == [42, 43, 44]
+        assert allocator.allocate(HOSPITAL_ID, 'GRN', FY, starting_number=100) == 100
+
+    def test_block_mode_hands_out_worker_ranges(self, engine):
+        worker_a = SequenceAllocator(engine=engine, modes={'PO': 'block'}, block_size=5)
+        worker_b = SequenceAllocator(engine=engine, modes={'PO': 'block'}, block_size=5)
+
+        assert [worker_a.allocate(HOSPITAL_ID, 'PO', FY) for _ in range(2)] == [1, 2]
+        assert worker_b.allocate(HOSPITAL_ID, 'PO', FY) == 6
+        assert [worker_a.allocate(HOSPITAL_ID, 'PO', FY) for _ in range(4)] == [3, 4, 5, 11]
+
+    @pytest.mark.parametrize('prefix', ['GST', 'DRG', 'NGS', 'CN'])
+    def test_statutory_series_are_gap_free_by_default(self, engine, prefix):
+        allocator = SequenceAllocator(engine=engine)
+        session = sessionmaker(bind=engine)()
+
+        # Invoice transaction fails after taking its number
+        assert allocator.allocate(HOSPITAL_ID, prefix, FY, session=session) == 1
+        session.rollback()
+
+        assert allocator.allocate(HOSPITAL_ID, prefix, FY, session=session) == 1
+        session.commit()
+        assert allocator.peek(HOSPITAL_ID, prefix, FY) == 2
+        assert allocator.mode_for('PO') == 'separate' and allocator.mode_for('RX') == 'separate'
+
+    def test_gapless_mode_returns_number_on_rollback(self, engine):
+        allocator = SequenceAllocator(engine=engine, modes={'GST': 'gapless'})
+        session = sessionmaker(bind=engine)()
+
+        assert allocator.allocate(HOSPITAL_ID, 'GST', FY, session=session) == 1
+        session.rollback()
+        assert allocator.allocate(HOSPITAL_ID, 'GST', FY, session=session) == 1
+        session.commit()
+        assert allocator.allocate(HOSPITAL_ID, 'GST', FY, session=session) == 2
+
+        with pytest.raises(ValueError):
+            allocator.allocate(HOSPITAL_ID, 'GST', FY)
+
+    def test_seed_from_documents_is_per_hospital(self, engine):
+        other_hospital = uuid.uuid4()
+        with engine.begin() as connection:
+            connection.execute(Document.__table__.insert(), [
+                {'document_number': f'CN/{FY}/00007', 'hospital_id': HOSPITAL_ID},
+                {'document_number': f'CN/{FY}/00031', 'hospital_id': other_hospital},
+                {'document_number': 'CN/2024-2025/00090', 'hospital_id': HOSPITAL_ID},
+            ])
+        allocator = SequenceAllocator(engine=engine)
+        seed = last_number_from_documents(Document.document_number, 'CN', FY)
+
+        session = sessionmaker(bind=engine)()
+
+        assert allocator.peek(HOSPITAL_ID, 'CN', FY, seed=seed) == 8
+        assert allocator.allocate(HOSPITAL_ID, 'CN', FY, session=session, seed=seed) == 8
+        assert allocator.allocate(other_hospital, 'CN', FY, session=session, seed=seed) == 32
+
+    def test_financial_year_format(self):
+        assert get_financial_year(date(2026, 3, 31)) == '2025-2026'
+        assert get_financial_year(date(2026, 4, 1), short=True) == '26-27'
+        assert format_document_number('GST', FY, 42) == 'GST/2025-2026/00042'
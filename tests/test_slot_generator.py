@@ -0,0 +1,105 @@
+# tests/test_slot_generator.py
+# pytest tests/test_slot_generator.py
+
+import uuid
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from app.models.appointment import AppointmentSlot, DoctorSchedule, DoctorScheduleException
+from app.services.slot_generator_service import SlotGeneratorService
+
+pytest_plugins = ['tests.sqlite_support']
+
+BRANCH_ID = uuid.uuid4()
+DR_MONDAY = uuid.uuid4()
+DR_TUESDAY = uuid.uuid4()
+START = date(2026, 3, 2)    # Monday
+END = date(2026, 3, 16)     # Monday, two weeks later
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    return sqlite_session_factory(DoctorSchedule, DoctorScheduleException, AppointmentSlot)
+
+
+@pytest.fixture
+def schedules(session):
+    """Mondays 9-12 with a 10:30-11:00 break; Tuesdays 14-15; a partial leave and a holiday"""
+    session.add_all([
+        DoctorSchedule(staff_id=DR_MONDAY, branch_id=BRANCH_ID, day_of_week=1, start_time=time(9),
+                       end_time=time(12), slot_duration_minutes=30, max_patients_per_slot=1,
+                       break_start_time=time(10, 30), break_end_time=time(11)),
+        DoctorSchedule(staff_id=DR_TUESDAY, branch_id=BRANCH_ID, day_of_week=2, start_time=time(14),
+                       end_time=time(15), slot_duration_minutes=30, max_patients_per_slot=2),
+        DoctorScheduleException(staff_id=DR_MONDAY, branch_id=BRANCH_ID, exception_date=date(2026, 3, 9),
+                                start_time=time(9), end_time=time(10), exception_type='leave', reason='Conference'),
+        DoctorScheduleException(staff_id=DR_MONDAY, exception_date=date(2026, 3, 16), exception_type='holiday'),
+    ])
+    session.commit()
+
+
+def _slots(session, staff_id, slot_date):
+    return [
+        (slot.start_time, slot.end_time, slot.is_blocked, slot.current_bookings)
+        for slot in session.query(AppointmentSlot).filter_by(staff_id=staff_id, slot_date=slot_date)
+        .order_by(AppointmentSlot.start_time)
+    ]
+
+
+class TestSlotGenerator:
+
+    def test_bulk_generation_is_idempotent_and_query_count_is_flat(self, session, schedules):
+        service = SlotGeneratorService()
+        statements = []
+        event.listen(session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        result = service.generate_slots(session, BRANCH_ID, START, END)
+        session.commit()
+
+        # 5 + 5 Monday slots (the 16th is a holiday) and 2 + 2 Tuesday slots
+        assert result.created == 14
+        assert result.by_staff == {DR_MONDAY: 10, DR_TUESDAY: 4}
+        assert len(statements) == 5   # schedules, exceptions, existing slots, one insert per doctor
+        assert _slots(session, DR_MONDAY, date(2026, 3, 9)) == [
+            (time(9), time(9, 30), True, 0), (time(9, 30), time(10), True, 0), (time(10), time(10, 30), False, 0),
+            (time(11), time(11, 30), False, 0), (time(11, 30), time(12), False, 0),
+        ]
+        assert session.query(AppointmentSlot).filter_by(slot_date=END).count() == 0
+
+        again = service.generate_slots(session, BRANCH_ID, START, END)
+        assert (again.created, again.unchanged) == (0, 14)
+
+    def test_dry_run_diff_and_regenerate_keep_booked_slots(self, session, schedules):
+        service = SlotGeneratorService()
+        service.generate_slots(session, BRANCH_ID, START, START)
+        session.query(AppointmentSlot).filter_by(staff_id=DR_MONDAY, start_time=time(9)).one().current_bookings = 1
+        session.query(DoctorSchedule).filter_by(staff_id=DR_MONDAY).one().slot_duration_minutes = 60
+        session.commit()
+
+        plan = service.generate_slots(session, BRANCH_ID, START, START, staff_ids=[DR_MONDAY],
+                                      regenerate=True, dry_run=True)
+        summary = plan.to_dict(include_diff=True)
+
+        assert (summary['slots_created'], summary['slots_deleted'], summary['booked_slots_kept']) == (1, 4, 1)
+        assert [(row['start_time'], row['end_time']) for row in summary['diff']['create']] == [('11:00', '12:00')]
+        assert len(_slots(session, DR_MONDAY, START)) == 5
+
+        result = service.generate_slots(session, BRANCH_ID, START, START, staff_ids=[DR_MONDAY], regenerate=True)
+        session.commit()
+
+        assert (result.created, result.deleted) == (1, 4)
+        assert _slots(session, DR_MONDAY, START) == [
+            (time(9), time(9, 30), False, 1), (time(11), time(12), False, 0)
+        ]
+
+    def test_slots_inserted_concurrently_are_skipped(self, session, schedules):
+        service = SlotGeneratorService()
+        stale = service.generate_slots(session, BRANCH_ID, START, END, dry_run=True)
+        service.generate_slots(session, BRANCH_ID, START, START)
+
+        service._apply(session, stale)
+
+        assert stale.created == len(stale.to_create) == 14 - 5
+        assert session.query(AppointmentSlot).count() == 14
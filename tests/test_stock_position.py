@@ -0,0 +1,97 @@
+# tests/test_stock_position.py
+# pytest tests/test_stock_position.py
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import update
+
+from app.models.transaction import Inventory, StockPosition
+from app.services.inventory_service import _get_batch_selection_for_invoice, _get_stock_details
+from app.services.stock_position_service import (
+    get_batch_position, get_batch_positions, rebuild_stock_positions, verify_stock_positions
+)
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+MEDICINE_ID = uuid.uuid4()
+
+
+@pytest.fixture
+def session(sqlite_session_factory):
+    return sqlite_session_factory(Inventory, StockPosition)
+
+
+def _movement(session, batch, units, expiry_days=200, branch_id=None, **extra):
+    entry = Inventory(
+        hospital_id=HOSPITAL_ID,
+        branch_id=branch_id,
+        stock_type=extra.pop('stock_type', 'Purchase'),
+        medicine_id=MEDICINE_ID,
+        medicine_name='Paracetamol 500',
+        batch=batch,
+        expiry=date.today() + timedelta(days=expiry_days),
+        units=Decimal(units),
+        current_stock=0,
+        transaction_date=datetime.now(timezone.utc),
+        **extra
+    )
+    session.add(entry)
+    session.flush()
+    return entry
+
+
+class TestStockPosition:
+
+    def test_ledger_inserts_maintain_position(self, session):
+        _movement(session, 'B1', 100, sale_price=Decimal('12.00'), branch_id=BRANCH_ID)
+        _movement(session, 'B1', -30, stock_type='Sales', sale_price=Decimal('11.50'))
+        _movement(session, 'B2', 10, expiry_days=30)
+
+        positions = get_batch_positions(session, HOSPITAL_ID, medicine_id=MEDICINE_ID)
+
+        assert [(p.batch, p.current_stock) for p in positions] == [('B2', 10), ('B1', 70)]
+        b1 = positions[1]
+        assert b1.record_count == 2
+        assert b1.sale_price == Decimal('11.50')
+        assert get_batch_positions(session, HOSPITAL_ID, branch_id=BRANCH_ID)[0].current_stock == 100
+
+    def test_pending_movement_visible_to_next_writer(self, session):
+        _movement(session, 'B1', 50)
+        session.add(Inventory(
+            hospital_id=HOSPITAL_ID, stock_type='Sales', medicine_id=MEDICINE_ID,
+            medicine_name='Paracetamol 500', batch='B1', expiry=date.today() + timedelta(days=200),
+            units=Decimal('-20'), current_stock=30, transaction_date=datetime.now(timezone.utc)
+        ))
+
+        position = get_batch_position(session, HOSPITAL_ID, MEDICINE_ID, 'B1', for_update=True)
+
+        assert position.current_stock == 30
+
+    def test_verify_and_rebuild(self, session):
+        _movement(session, 'B1', 40)
+        _movement(session, 'B1', -15)
+        assert verify_stock_positions(session, HOSPITAL_ID)['ok']
+
+        session.execute(update(StockPosition.__table__).values(current_stock=999))
+        report = verify_stock_positions(session, HOSPITAL_ID)
+        assert not report['ok']
+        assert report['mismatches'][0]['ledger_stock'] == Decimal('25')
+
+        assert rebuild_stock_positions(session, HOSPITAL_ID) == 1
+        assert verify_stock_positions(session, HOSPITAL_ID)['ok']
+        assert _get_stock_details(session, HOSPITAL_ID)[0]['current_stock'] == 25
+
+    def test_batch_selection_is_fifo_over_positions(self, session):
+        _movement(session, 'LATE', 20, expiry_days=300)
+        _movement(session, 'EARLY', 5, expiry_days=60)
+        _movement(session, 'EMPTY', 5, expiry_days=10)
+        _movement(session, 'EMPTY', -5, stock_type='Sales')
+
+        selection = _get_batch_selection_for_invoice(session, HOSPITAL_ID, MEDICINE_ID, Decimal('8'))
+
+        assert [(s['batch'], s['quantity']) for s in selection] == [('EARLY', 5), ('LATE', Decimal('3'))]
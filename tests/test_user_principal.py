@@ -0,0 +1,98 @@
+# tests/test_user_principal.py
+# pytest tests/test_user_principal.py
+
+import uuid
+
+import pytest
+from flask import Flask, session as flask_session
+from sqlalchemy import event
+
+from app.models.config import RoleMaster, UserRoleMapping
+from app.models.transaction import User
+from app.services import branch_service, menu_service, permission_matrix_service
+from app.services.permission_matrix_service import PermissionMatrixCache
+from app.services.user_principal_service import PRINCIPAL_SESSION_KEY, UserPrincipal, UserPrincipalCache
+
+pytest_plugins = ['tests.sqlite_support']
+
+HOSPITAL_ID = uuid.uuid4()
+BRANCH_ID = uuid.uuid4()
+USER_ID = '9000000002'
+
+
+@pytest.fixture
+def db(sqlite_session_factory, monkeypatch):
+    monkeypatch.setattr(permission_matrix_service, '_permission_matrix_cache', PermissionMatrixCache())
+    monkeypatch.setattr(branch_service, 'get_user_branch_id', lambda user_id, hospital_id: BRANCH_ID)
+    session = sqlite_session_factory(User, RoleMaster, UserRoleMapping, threads=True)
+    session.add_all([
+        User(user_id=USER_ID, hospital_id=HOSPITAL_ID, entity_type='staff', entity_id=uuid.uuid4(),
+             ui_preferences={'theme': 'dark'}),
+        RoleMaster(role_id=1, hospital_id=HOSPITAL_ID, role_name='receptionist'),
+        UserRoleMapping(user_id=USER_ID, role_id=1, is_active=True),
+    ])
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def request_context():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    with app.test_request_context('/'):
+        yield app
+
+
+def _count_statements(session):
+    statements = []
+    event.listen(session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestUserPrincipal:
+
+    def test_principal_is_rehydrated_from_cache_and_signed_session(self, db, request_context):
+        principal = UserPrincipalCache().get(USER_ID, db)
+
+        assert (principal.hospital_id, principal.branch_id, principal.role_names) == (
+            HOSPITAL_ID, BRANCH_ID, ('receptionist',)
+        )
+        assert principal.ui_preferences['theme'] == 'dark'
+        assert principal.is_authenticated and principal.get_id() == USER_ID
+        with pytest.raises(AttributeError):
+            principal.hospital_id = uuid.uuid4()
+        with pytest.raises(TypeError):
+            principal.ui_preferences['theme'] = 'light'
+
+        statements = _count_statements(db)
+        other_worker = UserPrincipalCache()
+        restored = other_worker.get(USER_ID, db)
+        assert statements == []
+        assert restored.to_dict() == flask_session[PRINCIPAL_SESSION_KEY] == principal.to_dict()
+
+    def test_user_and_role_changes_invalidate_on_commit(self, db, request_context):
+        cache = UserPrincipalCache()
+        principal = cache.get(USER_ID, db)
+        assert cache.get(USER_ID, db) is principal
+
+        db.query(User).filter_by(user_id=USER_ID).one().ui_preferences = {'theme': 'light'}
+        db.commit()
+        refreshed = cache.get(USER_ID, db)
+        assert refreshed is not principal and refreshed.ui_preferences['theme'] == 'light'
+
+        db.add(RoleMaster(role_id=2, hospital_id=HOSPITAL_ID, role_name='cashier'))
+        db.add(UserRoleMapping(user_id=USER_ID, role_id=2, is_active=True))
+        db.commit()
+        assert cache.get(USER_ID, db).role_names == ('cashier', 'receptionist')
+
+    def test_menu_is_memoized_per_principal_version(self, monkeypatch):
+        builds = []
+        monkeypatch.setattr('app.utils.menu_utils.get_menu_items',
+                            lambda user: builds.append(user.user_id) or [{'name': 'Dashboard'}])
+        monkeypatch.setattr(menu_service, '_menu_cache', menu_service.OrderedDict())
+        principal = UserPrincipal(user_id=USER_ID, hospital_id=HOSPITAL_ID, entity_type='staff')
+
+        first = menu_service.get_menu_for_principal(principal)
+        assert menu_service.get_menu_for_principal(principal) is first
+        assert menu_service.get_menu_for_principal(principal.replace(version=(0, 1))) is not first
+        assert builds == [USER_ID, USER_ID]
@@ -0,0 +1,163 @@
+# tests/universal_engine/test_batch_documents.py
+# pytest tests/universal_engine/test_batch_documents.py
+
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from pypdf import PdfReader
+from sqlalchemy import Column, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base
+
+from app.config.core_definitions import FieldDefinition, FieldType
+from app.engine import universal_entity_service
+from app.engine.batch_document_service import BatchDocumentJob, BatchDocumentService
+from app.engine.document_service import UniversalDocumentService
+from app.engine.universal_entity_service import UniversalEntityService
+from app.services.document_render_service import DocumentRenderQueue
+
+Base = declarative_base()
+
+
+class Receipt(Base):
+    __tablename__ = 'receipt'
+    receipt_id = Column(String, primary_key=True)
+    receipt_number = Column(String)
+
+
+CONFIG = SimpleNamespace(primary_key='receipt_id', fields=[
+    FieldDefinition(name='receipt_id', label='Receipt', field_type=FieldType.TEXT),
+    FieldDefinition(name='receipt_number', label='Number', field_type=FieldType.TEXT),
+])
+
+DOC_CONFIG = {'title': 'Receipt', 'show_company_info': True}
+
+
+class _Service(UniversalEntityService):
+    def __init__(self):
+        self.entity_type = 'receipts'
+        self.model_class = Receipt
+        self.config = None
+
+    def _get_base_query(self, session, hospital_id, branch_id, user=None):
+        return session.query(Receipt)
+
+    def _get_entity_config(self):
+        return CONFIG
+
+
+class _Batches(BatchDocumentService):
+    """Contexts built from ids alone (no Flask request); 'missing' is not found.
+    The id is printed in the header so merged pages can be told apart."""
+
+    def iter_document_contexts(self, entity_type, config, doc_config, item_ids, fetch_kwargs):
+        for item_id in item_ids:
+            if item_id == 'missing':
+                yield item_id, None, 'Not found'
+                continue
+            yield item_id, {
+                'data': {'reference_no': item_id},
+                'hospital': {'name': f"City Clinic {item_id}"},
+                'branch': {'name': 'Main'},
+                'assembled_data': {'field_sections': []},
+                'entity_config': SimpleNamespace(title_field='reference_no'),
+                'service': object(),
+                'author': 'Tester',
+            }, None
+
+
+@pytest.fixture
+def batches(tmp_path):
+    queue = DocumentRenderQueue(executor='thread', workers=2)
+    yield _Batches(storage_path=tmp_path, max_in_flight=2, render_queue=queue,
+                   document_service=UniversalDocumentService())
+    queue.shutdown(wait=True)
+
+
+def _run(batches, item_ids, output_format='pdf'):
+    job = batches.create_job('receipts', 'receipt', item_ids, output_format, title='Receipt')
+    batches.run(job, None, DOC_CONFIG, item_ids, {})
+    return batches.get_job(job.job_id)
+
+
+class TestGetByIds:
+
+    def test_items_are_loaded_in_batches(self, monkeypatch):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add_all([Receipt(receipt_id=f"r{i}", receipt_number=f"RCPT-{i:03d}") for i in range(12)])
+            session.commit()
+            session.expunge_all()
+
+            @contextmanager
+            def db_session():
+                yield session
+
+            statements = []
+            event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+            monkeypatch.setattr(universal_entity_service, 'get_db_session', db_session)
+            service = _Service()
+            service.BATCH_FETCH_SIZE = 5
+
+            items = service.get_by_ids([f"r{i}" for i in range(12)] + ['unknown'], hospital_id='h1')
+
+        assert len(statements) == 3
+        assert len(items) == 12 and 'unknown' not in items
+        assert items['r11']['receipt_number'] == 'RCPT-011'
+
+    def test_overridden_get_by_id_is_used_per_item(self):
+        class _Custom(_Service):
+            def get_by_id(self, item_id, **kwargs):
+                return {'receipt_id': item_id, 'custom': True} if item_id != 'gone' else None
+
+        items = _Custom().get_by_ids(['a', 'gone', 'b'], hospital_id='h1')
+
+        assert list(items) == ['a', 'b'] and items['a']['custom']
+
+
+class TestBatchDocuments:
+
+    def test_pdfs_are_merged_in_order_and_failures_reported(self, batches):
+        job = _run(batches, ['RCPT-1', 'missing', 'RCPT-2', 'RCPT-3'])
+
+        assert (job.status, job.state['processed'], job.state['succeeded'], job.state['failed']) == \
+            ('completed', 4, 3, 1)
+        assert job.state['errors'] == [{'item_id': 'missing', 'error': 'Not found'}]
+        assert job.to_dict()['progress'] == 100
+        pages = PdfReader(str(job.output_file)).pages
+        assert len(pages) == 3
+        assert [page.extract_text().split('\n')[0] for page in pages] == \
+            ['City Clinic RCPT-1', 'City Clinic RCPT-2', 'City Clinic RCPT-3']
+
+    def test_excel_documents_are_zipped(self, batches):
+        job = _run(batches, ['RCPT-1', 'RCPT-2'], output_format='excel')
+
+        assert job.status == 'completed' and job.state['filename'].endswith('.zip')
+        with zipfile.ZipFile(job.output_file) as archive:
+            assert archive.namelist() == ['Receipt_RCPT-1.xlsx', 'Receipt_RCPT-2.xlsx']
+            assert archive.read('Receipt_RCPT-1.xlsx')[:2] == b'PK'
+
+    def test_cancelled_batch_discards_its_output(self, batches, tmp_path):
+        job = batches.create_job('receipts', 'receipt', ['RCPT-1', 'RCPT-2'], 'pdf')
+        assert batches.cancel(job.job_id).status == 'queued'
+        batches.run(job, None, DOC_CONFIG, ['RCPT-1', 'RCPT-2'], {})
+
+        job = batches.get_job(job.job_id)
+        assert job.status == 'cancelled'
+        assert not job.output_file.exists() and not job.cancel_file.exists()
+        assert BatchDocumentJob.load(tmp_path, '../etc/passwd') is None
+
+    def test_documents_render_in_worker_processes(self, tmp_path):
+        queue = DocumentRenderQueue(executor='process', workers=1)
+        batches = _Batches(storage_path=tmp_path, max_in_flight=2, render_queue=queue,
+                           document_service=UniversalDocumentService())
+        try:
+            job = _run(batches, ['RCPT-1', 'RCPT-2'])
+        finally:
+            queue.shutdown(wait=True)
+
+        assert (job.status, job.state['succeeded']) == ('completed', 2)
+        assert len(PdfReader(BytesIO(job.output_file.read_bytes())).pages) == 2
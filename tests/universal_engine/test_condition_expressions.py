@@ -0,0 +1,90 @@
+# tests/universal_engine/test_condition_expressions.py
+# pytest tests/universal_engine/test_condition_expressions.py
+
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.core_definitions import ActionDefinition, ButtonType, FieldDefinition, FieldType
+from app.engine.condition_expressions import (
+    ConditionExpressionError, MissingFieldError, compile_condition, evaluate_condition, get_compiled_condition,
+    precompile_config_conditions
+)
+from app.engine.data_assembler import EnhancedUniversalDataAssembler
+
+MIXED_CASH = "item.payment_method == 'cash' or (item.payment_method == 'mixed' and item.cash_amount > 0)"
+
+
+class _Payment:
+    """ORM-like object whose properties must not be touched unless referenced"""
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+        self.touched = []
+
+    @property
+    def expensive_relationship(self):
+        self.touched.append('expensive_relationship')
+        return []
+
+
+class TestConditionExpressions:
+
+    def test_compiled_conditions_read_only_referenced_fields(self):
+        condition = compile_condition(MIXED_CASH)
+        assert [name for name, _ in condition.fields] == ['payment_method', 'cash_amount']
+
+        payment = _Payment(payment_method='mixed', cash_amount=Decimal('200'))
+        assert condition.evaluate(payment) is True
+        assert condition.evaluate({'payment_method': 'upi', 'cash_amount': 0}) is False
+        assert payment.touched == []
+
+        assert evaluate_condition("item.po_id or (item.invoice and item.invoice.po_id)",
+                                  {'po_id': None, 'invoice': SimpleNamespace(po_id='PO-1')})
+        assert evaluate_condition("upi_amount > 0", {'upi_amount': 5})
+        assert evaluate_condition("item.status in ['draft', 'pending_approval'] and item.deleted_at is None",
+                                  {'status': 'draft', 'deleted_at': None})
+
+    def test_missing_fields_and_get_defaults(self):
+        condition = compile_condition("item.get('has_free_items') == 'true'")
+        assert condition.evaluate({'has_free_items': 'true'}) is True
+        assert condition.evaluate({}) is False
+
+        with pytest.raises(MissingFieldError):
+            compile_condition("item.approved_at").evaluate({})
+        assert compile_condition("item.approved_at").evaluate({}, missing_as_none=True) is False
+        assert evaluate_condition("item.approved_at", {}) is True   # fields and sections show by default
+
+    @pytest.mark.parametrize('expression', [
+        "__import__('os').system('id')",
+        "item.__class__",
+        "item.status.__class__.__mro__",
+        "open('/etc/passwd')",
+        "item.status.upper()",
+        "[x for x in item.lines]",
+        "lambda: 1",
+        "item",
+        "item.status ==",
+    ])
+    def test_disallowed_expressions_are_rejected_at_compile_time(self, expression):
+        with pytest.raises(ConditionExpressionError):
+            compile_condition(expression)
+        assert get_compiled_condition(expression) is None
+        assert evaluate_condition(expression, {'status': 'draft'}) is True
+
+    def test_assembler_evaluates_fields_and_actions_through_compiled_conditions(self):
+        assembler = EnhancedUniversalDataAssembler()
+        cash_field = FieldDefinition(name='cash_amount', label='Cash', field_type=FieldType.CURRENCY,
+                                     conditional_display=MIXED_CASH)
+        refund = ActionDefinition(id='refund', label='Refund', icon='fas fa-undo', button_type=ButtonType.WARNING,
+                                  conditional_display="item.status == 'paid' and not item.refunded_at")
+        config = SimpleNamespace(fields=[cash_field], actions=[refund], section_definitions={
+            'approval': SimpleNamespace(conditional_display="item.approved_at")
+        })
+
+        assert precompile_config_conditions(config) == 3
+        assert assembler._should_display_field(cash_field, {'payment_method': 'mixed', 'cash_amount': 10})
+        assert not assembler._should_display_field(cash_field, _Payment(payment_method='upi', cash_amount=0))
+        assert assembler._evaluate_action_conditions(refund, {'status': 'paid'})   # refunded_at missing -> None
+        assert not assembler._evaluate_action_conditions(refund, {'status': 'paid', 'refunded_at': '2026-03-31'})
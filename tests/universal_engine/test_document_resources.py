@@ -0,0 +1,92 @@
+# tests/universal_engine/test_document_resources.py
+# pytest tests/universal_engine/test_document_resources.py
+
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.engine import document_resources
+from app.engine.document_resources import (
+    clear_document_resources, get_document_logo, get_excel_styles, get_pdf_style_sheet, style_sheet_key
+)
+from app.services.hospital_logo_service import HospitalLogoService
+
+HOSPITAL = {'hospital_id': 'h1'}
+
+
+@pytest.fixture(autouse=True)
+def fresh_resources():
+    clear_document_resources()
+    yield
+    clear_document_resources()
+
+
+def _logo(tmp_path, size, name='logo.png'):
+    logo_file = tmp_path / name
+    Image.new('RGB', size, (91, 155, 213)).save(logo_file)
+    return str(logo_file)
+
+
+class TestStyleSheets:
+
+    def test_style_sheet_is_compiled_once_per_page_setup(self, monkeypatch):
+        compiled = []
+        compile_pdf_style_sheet = document_resources.compile_pdf_style_sheet
+        monkeypatch.setattr(document_resources, 'compile_pdf_style_sheet',
+                            lambda doc_config: compiled.append(doc_config) or compile_pdf_style_sheet(doc_config))
+
+        a4 = get_pdf_style_sheet({'title': 'Receipt', 'page_size': 'A4'})
+        assert get_pdf_style_sheet({'title': 'Invoice', 'page_size': 'A4'}) is a4
+        assert get_pdf_style_sheet({'page_size': 'A5'}) is not a4
+        assert len(compiled) == 2
+        assert a4.title.fontSize == 18 and a4.items_table.getCommands()
+
+        clear_document_resources()
+        assert get_pdf_style_sheet({'page_size': 'A4'}) is not a4
+
+    def test_style_sheet_key_accepts_config_objects(self):
+        class DocConfig:
+            page_size = 'A4'
+            margins = {'top': 15, 'left': 15}
+
+        assert style_sheet_key(DocConfig()) == (None, 'A4', None, (('left', 15), ('top', 15)))
+        assert get_excel_styles() is get_excel_styles()
+
+
+class TestDocumentLogos:
+
+    def test_logo_is_resized_once_per_version(self, tmp_path, monkeypatch):
+        logo_file = _logo(tmp_path, (1600, 800))
+        opened = []
+        image_open = Image.open
+        monkeypatch.setattr(Image, 'open', lambda fp, *args: opened.append(fp) or image_open(fp, *args))
+
+        logo = get_document_logo(HOSPITAL, logo_file, 'large')
+        assert get_document_logo(HOSPITAL, logo_file, 'large') is logo
+        assert len(opened) == 1
+        with Image.open(BytesIO(logo)) as image:
+            assert image.size == (400, 200)
+
+        _logo(tmp_path, (300, 300))
+        os.utime(logo_file, ns=(0, 0))
+        with Image.open(BytesIO(get_document_logo(HOSPITAL, logo_file, 'large'))) as image:
+            assert image.size == (300, 300)
+
+    def test_missing_or_broken_logo_falls_back_to_the_file(self, tmp_path):
+        broken = tmp_path / 'broken.png'
+        broken.write_bytes(b'not an image')
+
+        assert get_document_logo(HOSPITAL, str(tmp_path / 'missing.png'), 'large') is None
+        assert get_document_logo(HOSPITAL, str(broken), 'small') is None
+
+    def test_clearing_one_hospital_keeps_the_others(self, tmp_path):
+        logo_file = _logo(tmp_path, (200, 200))
+        h1 = get_document_logo(HOSPITAL, logo_file, 'small')
+        h2 = get_document_logo({'hospital_id': 'h2'}, logo_file, 'small')
+
+        HospitalLogoService.clear_logo_variants('h1')
+
+        assert get_document_logo({'hospital_id': 'h2'}, logo_file, 'small') is h2
+        assert get_document_logo(HOSPITAL, logo_file, 'small') is not h1
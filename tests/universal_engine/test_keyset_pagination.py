@@ -0,0 +1,116 @@
+# tests/universal_engine/test_keyset_pagination.py
+# pytest tests/universal_engine/test_keyset_pagination.py
+
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import Column, Date, Integer, create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, declarative_base
+
+from app.engine.keyset_pagination import (
+    InvalidCursorError, count_rows, decode_cursor, encode_cursor, explain_statement, paginate_keyset
+)
+
+Base = declarative_base()
+
+
+class Invoice(Base):
+    __tablename__ = 'invoice'
+    invoice_id = Column(Integer, primary_key=True)
+    invoice_date = Column(Date, nullable=True)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    start = date(2024, 1, 1)
+    with Session(engine) as session:
+        # Duplicate dates and a few NULLs exercise the pk tie-breaker and NULL ordering
+        session.add_all([
+            Invoice(invoice_id=i, invoice_date=None if i % 11 == 0 else start + timedelta(days=i // 3))
+            for i in range(1, 58)
+        ])
+        session.commit()
+        yield session
+
+
+def _walk(session, descending, per_page=10):
+    pages, cursor = [], None
+    while True:
+        rows, info = paginate_keyset(session.query(Invoice), Invoice.invoice_date, Invoice.invoice_id,
+                                     descending, per_page, cursor)
+        pages.append((rows, info))
+        if not info['has_next']:
+            return pages
+        cursor = info['next_cursor']
+
+
+class TestKeysetPagination:
+
+    @pytest.mark.parametrize('descending', [True, False])
+    def test_pages_match_offset_order(self, session, descending):
+        order = (Invoice.invoice_date.desc().nulls_first(), Invoice.invoice_id.desc()) if descending \
+            else (Invoice.invoice_date.asc().nulls_last(), Invoice.invoice_id.asc())
+        expected = [row.invoice_id for row in session.query(Invoice).order_by(*order)]
+
+        pages = _walk(session, descending)
+
+        assert [row.invoice_id for rows, _ in pages for row in rows] == expected
+        assert len(pages) == 6
+        assert not pages[0][1]['has_prev'] and pages[1][1]['has_prev']
+
+    def test_prev_cursor_returns_previous_page(self, session):
+        pages = _walk(session, descending=True)
+        third_rows, third_info = pages[2]
+
+        rows, info = paginate_keyset(session.query(Invoice), Invoice.invoice_date, Invoice.invoice_id,
+                                     True, 10, third_info['prev_cursor'])
+
+        assert [r.invoice_id for r in rows] == [r.invoice_id for r in pages[1][0]]
+        assert info['has_next'] and info['has_prev']
+
+    def test_cursor_round_trip_and_tampering(self):
+        key = uuid.uuid4()
+        token = encode_cursor(date(2025, 3, 31), key, 'prev')
+        assert decode_cursor(token) == (date(2025, 3, 31), key, 'prev')
+        with pytest.raises(InvalidCursorError):
+            decode_cursor('not-a-cursor')
+
+    def test_count_modes(self, session):
+        query = session.query(Invoice)
+        assert count_rows(session, query)[0] == 57
+        total, info = count_rows(session, query, 'capped', 50)
+        assert (total, info['total_count_display'], info['count_is_exact']) == (50, '50+', False)
+        # Estimates are PostgreSQL-only; other dialects fall back to the capped count
+        total, info = count_rows(session, query, 'estimated', 100)
+        assert (total, info['count_is_exact']) == (57, True)
+
+    def test_estimate_expands_in_filters(self):
+        query = Session().query(Invoice).filter(Invoice.invoice_id.in_([3, 5, 8]))
+
+        statement, params = explain_statement(query, postgresql.dialect())
+
+        assert 'POSTCOMPILE' not in statement
+        assert statement.startswith('EXPLAIN (FORMAT JSON) SELECT')
+        assert sorted(params.values()) == [3, 5, 8]
+
+    def test_failed_estimate_keeps_the_transaction(self, session, monkeypatch):
+        statements = []
+        bind = session.get_bind()
+        event.listen(bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        # Pretend to be PostgreSQL: the EXPLAIN then fails on SQLite, like a bad plan would
+        monkeypatch.setattr(bind.dialect, 'name', 'postgresql')
+        session.add(Invoice(invoice_id=100, invoice_date=date(2025, 1, 1)))
+        session.flush()
+
+        query = session.query(Invoice).filter(Invoice.invoice_id.in_([1, 2, 100]))
+        total, info = count_rows(session, query, 'estimated', 100)
+
+        explain = next(sql for sql in statements if sql.startswith('EXPLAIN'))
+        assert 'POSTCOMPILE' not in explain
+        assert any(sql.startswith('ROLLBACK TO SAVEPOINT') for sql in statements)
+        # The capped fallback runs in the same transaction and still sees the flushed row
+        assert (total, info['count_mode'], info['count_is_exact']) == (3, 'capped', True)
@@ -0,0 +1,131 @@
+# tests/universal_engine/test_list_render_plan.py
+# pytest tests/universal_engine/test_list_render_plan.py
+
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.core_definitions import ActionDefinition, ButtonType, FieldDefinition, FieldType
+from app.engine import list_render_plan
+from app.engine.data_assembler import EnhancedUniversalDataAssembler
+from app.engine.list_render_plan import get_list_render_plan, invalidate_list_render_plans
+
+PAYMENT_STATUS_OPTIONS = [
+    {'value': 'paid', 'label': 'Paid', 'css_class': 'status-success'},
+    {'value': 'unpaid', 'label': 'Unpaid', 'css_class': 'status-danger'},
+]
+
+
+def _config():
+    return SimpleNamespace(
+        entity_type='patient_invoices',
+        primary_key='invoice_id',
+        fields=[
+            FieldDefinition(name='invoice_id', label='ID', field_type=FieldType.UUID),
+            FieldDefinition(name='invoice_number', label='Invoice #', field_type=FieldType.TEXT, show_in_list=True),
+            FieldDefinition(name='invoice_date', label='Date', field_type=FieldType.DATE, show_in_list=True),
+            FieldDefinition(name='created_at', label='Created', field_type=FieldType.DATETIME, show_in_list=True),
+            FieldDefinition(name='grand_total', label='Total', field_type=FieldType.CURRENCY, show_in_list=True),
+            FieldDefinition(name='payment_status', label='Status', field_type=FieldType.STATUS_BADGE,
+                            show_in_list=True, options=PAYMENT_STATUS_OPTIONS),
+            FieldDefinition(name='patient_phone', label='Phone', field_type=FieldType.TEXT, show_in_list=True,
+                            virtual=True, virtual_target='contact_info', virtual_key='phone'),
+        ],
+        actions=[
+            ActionDefinition(id='view_row', label='View', icon='fas fa-eye', button_type=ButtonType.PRIMARY,
+                             url_pattern='/invoice/{invoice_id}'),
+            ActionDefinition(id='delete_row', label='Delete', icon='fas fa-trash', button_type=ButtonType.DANGER,
+                             url_pattern='/invoice/delete/{invoice_id}', confirmation_required=True,
+                             conditions={'payment_status': ['unpaid'], 'is_deleted': False}),
+            ActionDefinition(id='refund', label='Refund', icon='fas fa-undo', button_type=ButtonType.WARNING,
+                             url_pattern='/invoice/refund/{invoice_id}',
+                             conditional_display="item.payment_status == 'paid' and item.grand_total > 1000"),
+            ActionDefinition(id='export', label='Export', icon='fas fa-file', button_type=ButtonType.INFO,
+                             show_in_list=False),
+        ]
+    )
+
+
+def _invoice(number, status, total, **extra):
+    return {'invoice_id': f'inv-{number}', 'invoice_number': f'INV-{number}', 'invoice_date': date(2026, 3, 31),
+            'created_at': '2026-03-31 14:05:00', 'grand_total': Decimal(total), 'payment_status': status,
+            'contact_info': {'phone': '98000 00001'}, **extra}
+
+
+@pytest.fixture(autouse=True)
+def clean_plans():
+    invalidate_list_render_plans()
+    yield
+    invalidate_list_render_plans()
+
+
+class TestListRenderPlan:
+
+    def test_rows_are_formatted_from_the_compiled_columns(self):
+        plan = get_list_render_plan(_config())
+        row = plan.render_row(_invoice(1, 'paid', '1250.50', has_free_items='true'))
+
+        assert [name for name, _, _ in plan.columns] == [
+            'invoice_number', 'invoice_date', 'created_at', 'grand_total', 'payment_status', 'patient_phone'
+        ]
+        assert row['invoice_date'] == '31/Mar/2026'
+        assert row['created_at'] == '31/Mar/2026 14:05'
+        assert row['grand_total'] == 1250.5
+        assert row['payment_status'].startswith('<span class="status-badge status-success">Paid</span><br>')
+        assert 'FREE' in row['payment_status']
+        assert row['patient_phone'] == '98000 00001'
+        assert row['_row_id'] == 'inv-1'
+
+        deleted = plan.render_row(_invoice(2, 'unpaid', '10', is_deleted=True, invoice_date=None))
+        assert deleted['invoice_date'] == ''
+        assert 'Deleted' in deleted['payment_status']
+
+    def test_row_actions_use_pre_parsed_conditions(self):
+        plan = get_list_render_plan(_config())
+
+        def action_names(item):
+            return [action['name'] for action in plan.row_actions(item)]
+
+        assert [action.action.id for action in plan.actions] == ['view_row', 'delete_row', 'refund']
+        assert action_names(_invoice(1, 'unpaid', '500')) == ['view_row', 'delete_row']
+        assert action_names(_invoice(2, 'unpaid', '500', is_deleted=True)) == ['view_row']
+        assert action_names(_invoice(3, 'paid', '1500')) == ['view_row', 'refund']
+        assert action_names(_invoice(4, 'paid', '500')) == ['view_row']
+        delete = plan.row_actions(_invoice(5, 'unpaid', '500'))[1]
+        assert (delete['url'], delete['button_type'], delete['confirmation_required']) == (
+            '/invoice/delete/inv-5', 'danger', True
+        )
+
+    def test_plan_matches_the_assembler_and_is_cached_per_config(self, monkeypatch):
+        config = _config()
+        compiled = []
+        compile_plan = list_render_plan.compile_list_render_plan
+        monkeypatch.setattr(list_render_plan, 'compile_list_render_plan',
+                            lambda c: compiled.append(c.entity_type) or compile_plan(c))
+
+        assembler = EnhancedUniversalDataAssembler()
+        items = [_invoice(n, 'unpaid' if n % 2 else 'paid', '1200') for n in range(100)]
+        table = assembler._assemble_table_data(config, items)
+        columns = assembler._assemble_table_columns(config)
+
+        assert table[0] == get_list_render_plan(config).render_row(items[0])
+        assert [c['name'] for c in columns][:2] == ['invoice_number', 'invoice_date']
+        assert columns[3]['field_type'] == 'currency'
+        assert compiled == ['patient_invoices']
+
+        config.fields.append(FieldDefinition(name='notes', label='Notes', field_type=FieldType.TEXT,
+                                             show_in_list=True))
+        assert assembler._assemble_table_data(config, items[:1])[0]['notes'] == ''
+        invalidate_list_render_plans('patient_invoices')
+        get_list_render_plan(config)
+        assert compiled == ['patient_invoices'] * 3
+
+    def test_single_field_formatting_delegates_to_the_compiled_formatters(self):
+        assembler = EnhancedUniversalDataAssembler()
+        created = FieldDefinition(name='created_at', label='Created', field_type=FieldType.DATETIME)
+
+        assert assembler._format_field_value(created, datetime(2026, 3, 31, 9, 5)) == '31/Mar/2026 09:05'
+        assert assembler._format_field_value(created, 'not a date') == 'not a date'
+        assert assembler._format_field_value(created, None) == ''
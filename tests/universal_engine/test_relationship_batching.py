@@ -0,0 +1,98 @@
+# tests/universal_engine/test_relationship_batching.py
+# pytest tests/universal_engine/test_relationship_batching.py
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, ForeignKey, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base, relationship
+
+from app.config.core_definitions import FieldDefinition, FieldType
+from app.engine.universal_entity_service import UniversalEntityService
+
+Base = declarative_base()
+
+
+class Supplier(Base):
+    __tablename__ = 'supplier'
+    supplier_id = Column(String, primary_key=True)
+    supplier_name = Column(String)
+
+
+class Branch(Base):
+    __tablename__ = 'branch'
+    branch_id = Column(String, primary_key=True)
+    name = Column(String)
+
+
+class PurchaseOrder(Base):
+    __tablename__ = 'purchase_order'
+    po_id = Column(String, primary_key=True)
+    supplier_id = Column(String, ForeignKey('supplier.supplier_id'))
+    branch_id = Column(String, ForeignKey('branch.branch_id'))
+    supplier = relationship(Supplier)
+    branch = relationship(Branch)
+
+
+CONFIG = SimpleNamespace(fields=[
+    FieldDefinition(name='po_id', label='PO', field_type=FieldType.TEXT),
+    FieldDefinition(name='supplier_id', label='Supplier', field_type=FieldType.UUID,
+                    related_display_field='supplier_name'),
+    FieldDefinition(name='branch_id', label='Branch', field_type=FieldType.UUID),
+])
+
+
+class _Service(UniversalEntityService):
+    def __init__(self):
+        self.entity_type = 'purchase_orders'
+        self.model_class = PurchaseOrder
+        self.config = CONFIG
+
+    def _get_entity_config(self):
+        return CONFIG
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        suppliers = [Supplier(supplier_id=f"s{i}", supplier_name=f"Supplier {i}") for i in range(5)]
+        branches = [Branch(branch_id=f"b{i}", name=f"Branch {i}") for i in range(2)]
+        orders = [PurchaseOrder(po_id=str(uuid.uuid4()), supplier_id=f"s{i % 5}", branch_id=f"b{i % 2}")
+                  for i in range(100)]
+        session.add_all(suppliers + branches + orders)
+        session.commit()
+        session.expunge_all()
+        yield session
+
+
+def _count_queries(session):
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute',
+                 lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestRelationshipBatching:
+
+    def test_page_resolves_names_with_one_query_per_relation(self, session):
+        items = session.query(PurchaseOrder).all()
+        statements = _count_queries(session)
+
+        rows = _Service()._convert_items_to_dict(items, session)
+
+        assert len(statements) == 2
+        assert rows[0]['supplier_name'] == 'Supplier 0'
+        assert rows[7]['branch_name'] == 'Branch 1'
+
+    def test_existing_view_values_are_not_overwritten(self, session):
+        items = session.query(PurchaseOrder).all()
+        service = _Service()
+        rows = [{'supplier_name': 'From view'} for _ in items]
+
+        lookup = service._prefetch_relationships(rows, items, session)
+
+        assert 'supplier_id' not in lookup
+        assert set(lookup['branch_id']) == {'b0', 'b1'}
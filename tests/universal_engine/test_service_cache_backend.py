@@ -0,0 +1,110 @@
+# tests/universal_engine/test_service_cache_backend.py
+# pytest tests/universal_engine/test_service_cache_backend.py
+
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.engine.service_cache_backend import LocalServiceCacheBackend, RedisServiceCacheBackend
+from app.engine.universal_service_cache import UniversalServiceCache
+
+
+def _make_workers(backend_factory, count=2):
+    """Simulate several gunicorn workers sharing one backend"""
+    return [UniversalServiceCache(backend=backend_factory()) for _ in range(count)]
+
+
+def _local_factory():
+    namespace = f"test-{uuid.uuid4().hex}"
+    return lambda: LocalServiceCacheBackend(namespace)
+
+
+def _run_concurrently(workers, loader, calls_per_worker=4):
+    results = []
+    threads = [
+        threading.Thread(target=lambda w=w: results.append(
+            w.get_cached_service_result('suppliers', 'search_data', {'page': 1}, loader)))
+        for w in workers for _ in range(calls_per_worker)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestServiceCacheSharedBackend:
+
+    def test_concurrent_misses_run_loader_once(self):
+        workers = _make_workers(_local_factory())
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'items': [1, 2, 3]}
+
+        results = _run_concurrently(workers, loader)
+
+        assert len(calls) == 1
+        assert all(r == {'items': [1, 2, 3]} for r in results)
+
+    def test_second_worker_served_from_l2(self):
+        worker_a, worker_b = _make_workers(_local_factory())
+        worker_a.get_cached_service_result('suppliers', 'search_data', {}, lambda: {'items': []})
+
+        result = worker_b.get_cached_service_result('suppliers', 'search_data', {},
+                                                    lambda: pytest.fail('loader should not run'))
+
+        assert result == {'items': []}
+        assert worker_b.get_cache_statistics()['l2_hits'] == 1
+
+    def test_invalidation_broadcast_clears_other_workers(self):
+        worker_a, worker_b = _make_workers(_local_factory())
+        worker_a.get_cached_service_result('suppliers', 'search_data', {}, lambda: {'items': []})
+        worker_b.get_cached_service_result('suppliers', 'search_data', {}, lambda: {'items': []})
+        assert len(worker_b.cache_store) == 1
+
+        worker_a.invalidate_entity_cache('suppliers', cascade=True)
+
+        assert len(worker_a.cache_store) == 0
+        assert len(worker_b.cache_store) == 0
+        calls = []
+        worker_b.get_cached_service_result('suppliers', 'search_data', {},
+                                           lambda: calls.append(1) or {'items': [1]})
+        assert calls == [1]
+
+    def test_redis_backend_with_fakeredis(self):
+        fakeredis = pytest.importorskip('fakeredis')
+        server = fakeredis.FakeServer()
+        workers = _make_workers(lambda: RedisServiceCacheBackend(client=fakeredis.FakeRedis(server=server)))
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'items': ['a']}
+
+        _run_concurrently(workers, loader)
+        assert len(calls) == 1
+
+        workers[0].invalidate_entity_cache('suppliers')
+        deadline = time.time() + 3
+        while workers[1].cache_store and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(workers[1].cache_store) == 0
+
+        for worker in workers:
+            worker.backend.close()
+
+    def test_redis_tag_index_outlives_its_longest_entry(self):
+        fakeredis = pytest.importorskip('fakeredis')
+        backend = RedisServiceCacheBackend(client=fakeredis.FakeRedis())
+        backend.set('long', b'1', 600, ['suppliers'])
+        backend.set('short', b'2', 5, ['suppliers'])
+
+        assert backend.client.ttl(backend._tag_key('suppliers')) > 5
+        assert backend.delete_tags(['suppliers']) == 2
+        assert backend.get('long') is None
@@ -0,0 +1,65 @@
+# tests/universal_engine/test_service_cache_keys.py
+# pytest tests/universal_engine/test_service_cache_keys.py
+
+import uuid
+
+from app.engine.universal_service_cache import (
+    UniversalServiceCache, build_cache_key, cache_service_method
+)
+
+
+class _Service:
+    def __init__(self):
+        self.calls = 0
+
+    @cache_service_method('suppliers', 'search_data')
+    def search_data(self, filters, hospital_id, branch_id=None, page=1, per_page=20):
+        self.calls += 1
+        return {'items': [filters, page]}
+
+
+class TestServiceCacheKeys:
+
+    def test_key_ignores_dict_order_and_empty_values(self):
+        hospital_id = uuid.uuid4()
+        a = build_cache_key('suppliers', 'search_data', {
+            'filters': {'status': 'active', 'name': 'Medi', 'gst': ''},
+            'hospital_id': hospital_id, 'page': 1})
+        b = build_cache_key('suppliers', 'search_data', {
+            'page': 1, 'hospital_id': str(hospital_id),
+            'filters': {'name': 'Medi', 'status': 'active', 'gst': None}})
+        assert a == b
+        assert a.startswith('suppliers:search_data:')
+
+    def test_different_filters_give_different_keys(self):
+        base = {'filters': {'status': 'active'}, 'page': 1}
+        other = {'filters': {'status': 'inactive'}, 'page': 1}
+        assert build_cache_key('suppliers', 'search_data', base) != \
+            build_cache_key('suppliers', 'search_data', other)
+        assert build_cache_key('suppliers', 'search_data', base) != \
+            build_cache_key('suppliers', 'search_data', {**base, 'page': 2})
+
+    def test_positional_and_keyword_calls_share_entry(self, monkeypatch):
+        cache = UniversalServiceCache()
+        monkeypatch.setattr('app.engine.universal_service_cache.get_service_cache_manager',
+                            lambda: cache)
+        service = _Service()
+        hospital_id = uuid.uuid4()
+
+        service.search_data({'status': 'active'}, hospital_id, page=2)
+        service.search_data(filters={'status': 'active'}, hospital_id=hospital_id, page=2)
+        assert service.calls == 1
+
+        service.search_data({'status': 'active'}, hospital_id, page=3)
+        assert service.calls == 2
+
+    def test_missing_hospital_bypasses_cache(self, monkeypatch):
+        cache = UniversalServiceCache()
+        monkeypatch.setattr('app.engine.universal_service_cache.get_service_cache_manager',
+                            lambda: cache)
+        service = _Service()
+
+        service.search_data({}, None)
+        service.search_data({}, None)
+        assert service.calls == 2
+        assert len(cache.cache_store) == 0
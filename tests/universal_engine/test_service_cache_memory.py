@@ -0,0 +1,60 @@
+# tests/universal_engine/test_service_cache_memory.py
+# pytest tests/universal_engine/test_service_cache_memory.py
+
+from app.engine.universal_service_cache import UniversalServiceCache, estimate_size_bytes
+
+
+def _page(page_number, rows=10, width=20):
+    return {'items': [{'id': i, 'name': 'x' * width} for i in range(rows)], 'page': page_number}
+
+
+def _load(cache, entity_type, page_number, loader):
+    return cache.get_cached_service_result(entity_type, 'search_data', {'page': page_number}, loader)
+
+
+class TestServiceCacheMemory:
+
+    def test_estimate_scales_with_result_size(self):
+        small = estimate_size_bytes(_page(1, rows=100))
+        large = estimate_size_bytes(_page(1, rows=1000))
+
+        assert small > 100 * 50
+        assert 8 * small < large < 12 * small
+
+    def test_byte_budget_is_enforced(self):
+        cache = UniversalServiceCache(max_memory_mb=1, max_entries=10000)
+
+        for page_number in range(500):
+            _load(cache, 'suppliers', page_number, lambda n=page_number: _page(n, rows=50))
+            assert cache.current_memory_usage <= cache.max_memory_bytes
+
+        assert cache.statistics.evictions > 0
+        assert cache.current_memory_usage == sum(e.size_bytes for e in cache.cache_store.values())
+
+    def test_large_one_off_result_does_not_flush_hot_pages(self):
+        cache = UniversalServiceCache(max_memory_mb=1, max_entries=10000)
+        hot_pages = range(40)
+        for _ in range(3):
+            for page_number in hot_pages:
+                _load(cache, 'suppliers', page_number, lambda n=page_number: _page(n, rows=40))
+
+        for export_number in range(10):
+            _load(cache, 'supplier_invoices', export_number,
+                  lambda: _page(0, rows=600, width=200))
+
+        stats = cache.get_cache_statistics()
+        assert stats['entity_stats']['suppliers']['entries'] == len(hot_pages)
+        assert cache.current_memory_usage <= cache.max_memory_bytes
+
+    def test_statistics_report_bytes_per_entity(self):
+        cache = UniversalServiceCache(max_memory_mb=10)
+        _load(cache, 'suppliers', 1, lambda: _page(1))
+        _load(cache, 'patients', 1, lambda: _page(1, rows=100))
+
+        entity_stats = cache.get_cache_statistics()['entity_stats']
+
+        assert entity_stats['patients']['memory_bytes'] > entity_stats['suppliers']['memory_bytes'] > 0
+        assert entity_stats['suppliers']['entries'] == 1
+
+        cache.invalidate_entity_cache('patients')
+        assert cache.get_cache_statistics()['entity_stats']['patients']['memory_bytes'] == 0
@@ -0,0 +1,83 @@
+# tests/universal_engine/test_service_cache_tags.py
+# pytest tests/universal_engine/test_service_cache_tags.py
+
+import uuid
+
+from app.engine.service_cache_backend import LocalServiceCacheBackend
+from app.engine.universal_service_cache import UniversalServiceCache
+
+HOSPITAL_A = 'hospital-a'
+HOSPITAL_B = 'hospital-b'
+
+
+def _load(cache, entity_type, **params):
+    return cache.get_cached_service_result(entity_type, 'search_data', dict(params),
+                                           lambda: {'items': [params]})
+
+
+def _cached_scopes(cache, entity_type):
+    return sorted(
+        (e.tags[1] for e in cache.cache_store.values() if e.entity_type == entity_type)
+    )
+
+
+class TestServiceCacheTags:
+
+    def test_hospital_scoped_invalidation_keeps_other_hospitals(self):
+        cache = UniversalServiceCache()
+        _load(cache, 'supplier_payments', hospital_id=HOSPITAL_A, page=1)
+        _load(cache, 'supplier_payments', hospital_id=HOSPITAL_A, page=2)
+        _load(cache, 'supplier_payments', hospital_id=HOSPITAL_B, page=1)
+
+        count = cache.invalidate_entity_cache('supplier_payments', hospital_id=HOSPITAL_A)
+
+        assert count == 2
+        assert _cached_scopes(cache, 'supplier_payments') == [f'supplier_payments|h={HOSPITAL_B}']
+
+    def test_branch_write_keeps_other_branch_pages(self):
+        cache = UniversalServiceCache()
+        _load(cache, 'patient_invoices', hospital_id=HOSPITAL_A, branch_id='b1')
+        _load(cache, 'patient_invoices', hospital_id=HOSPITAL_A, branch_id='b2')
+        _load(cache, 'patient_invoices', hospital_id=HOSPITAL_A)  # all branches
+
+        cache.invalidate_entity_cache('patient_invoices', hospital_id=HOSPITAL_A, branch_id='b1')
+
+        remaining = [e.tags[2] for e in cache.cache_store.values()]
+        assert remaining == [f'patient_invoices|h={HOSPITAL_A}|b=b2']
+
+    def test_unscoped_entries_are_always_invalidated(self):
+        cache = UniversalServiceCache()
+        _load(cache, 'suppliers', page=1)
+
+        cache.invalidate_entity_cache('suppliers', hospital_id=HOSPITAL_A)
+
+        assert len(cache.cache_store) == 0
+
+    def test_cascade_uses_same_hospital_scope(self):
+        cache = UniversalServiceCache()
+        _load(cache, 'supplier_payments', hospital_id=HOSPITAL_A)
+        _load(cache, 'supplier_payments', hospital_id=HOSPITAL_B)
+
+        cache.invalidate_entity_cache('suppliers', cascade=True, hospital_id=HOSPITAL_A)
+
+        assert _cached_scopes(cache, 'supplier_payments') == [f'supplier_payments|h={HOSPITAL_B}']
+
+    def test_tag_index_is_released_with_entries(self):
+        cache = UniversalServiceCache()
+        _load(cache, 'suppliers', hospital_id=HOSPITAL_A, item_id='s1')
+
+        cache.invalidate_entity_cache('suppliers', hospital_id=HOSPITAL_A, record_id='s1')
+
+        assert cache._tag_index == {}
+
+    def test_scoped_invalidation_reaches_other_workers(self):
+        namespace = f"test-{uuid.uuid4().hex}"
+        worker_a = UniversalServiceCache(backend=LocalServiceCacheBackend(namespace))
+        worker_b = UniversalServiceCache(backend=LocalServiceCacheBackend(namespace))
+        for worker in (worker_a, worker_b):
+            _load(worker, 'supplier_payments', hospital_id=HOSPITAL_A)
+            _load(worker, 'supplier_payments', hospital_id=HOSPITAL_B)
+
+        worker_a.invalidate_entity_cache('supplier_payments', hospital_id=HOSPITAL_A)
+
+        assert _cached_scopes(worker_b, 'supplier_payments') == [f'supplier_payments|h={HOSPITAL_B}']
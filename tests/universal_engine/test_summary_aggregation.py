@@ -0,0 +1,77 @@
+# tests/universal_engine/test_summary_aggregation.py
+# pytest tests/universal_engine/test_summary_aggregation.py
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Date, Integer, Numeric, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base
+
+from app.engine.universal_entity_service import UniversalEntityService
+
+Base = declarative_base()
+
+
+class Payment(Base):
+    __tablename__ = 'payment'
+    payment_id = Column(Integer, primary_key=True)
+    payment_date = Column(Date)
+    amount = Column(Numeric(12, 2))
+    workflow_status = Column(String)
+
+
+CONFIG = SimpleNamespace(
+    fields=[],
+    primary_date_field='payment_date',
+    summary_cards=[
+        {'field': 'total_count', 'type': 'number'},
+        {'field': 'amount', 'type': 'currency'},
+        {'field': 'approved_count', 'filter_field': 'workflow_status', 'filter_value': 'approved'},
+        {'field': 'this_month_count'},
+        {'field': 'pending', 'type': 'number', 'filter_field': 'workflow_status', 'filter_value': 'pending'},
+        {'field': 'missing_sum', 'type': 'currency'},
+    ]
+)
+
+
+class _Service(UniversalEntityService):
+    def __init__(self):
+        self.entity_type = 'payments'
+        self.model_class = Payment
+        self.config = CONFIG
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    today = datetime.now().date()
+    with Session(engine) as session:
+        session.add_all([
+            Payment(payment_id=1, payment_date=today, amount=100, workflow_status='approved'),
+            Payment(payment_id=2, payment_date=today, amount=50, workflow_status='pending'),
+            Payment(payment_id=3, payment_date=today.replace(year=today.year - 1), amount=25,
+                    workflow_status='approved'),
+        ])
+        session.commit()
+        yield session
+
+
+class TestSummaryAggregation:
+
+    def test_single_query_matches_per_card_results(self, session):
+        service = _Service()
+        query = session.query(Payment).filter(Payment.amount > 0)
+        statements = []
+        event.listen(session.get_bind(), 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+
+        summary = service._aggregate_summary_cards(session, query)
+
+        assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 1
+        assert summary == {
+            'amount': 175.0, 'approved_count': 2, 'this_month_count': 2,
+            'pending': 1, 'missing_sum': 0.0,
+        }
+        assert summary == service._calculate_summary_per_card(query)
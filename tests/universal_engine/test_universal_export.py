@@ -0,0 +1,87 @@
+# tests/universal_engine/test_universal_export.py
+# pytest tests/universal_engine/test_universal_export.py
+
+import csv
+import io
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Date, String, select
+from sqlalchemy.orm import declarative_base
+
+from app.config.core_definitions import FieldType
+from app.engine.universal_export_service import ExportColumn, UniversalExportService
+
+COLUMNS = [
+    ExportColumn('invoice_number', 'Invoice #', FieldType.TEXT, {}),
+    ExportColumn('invoice_date', 'Date', FieldType.DATE, {}),
+    ExportColumn('grand_total', 'Total', FieldType.CURRENCY, {}),
+    ExportColumn('payment_status', 'Status', FieldType.SELECT, {'paid': 'Paid', 'unpaid': 'Unpaid'}),
+    ExportColumn('is_cancelled', 'Cancelled', FieldType.BOOLEAN, {}),
+]
+
+ExportBase = declarative_base()
+
+
+class ExportInvoice(ExportBase):
+    __tablename__ = 'export_invoices'
+    invoice_number = Column(String, primary_key=True)
+    invoice_date = Column(Date)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = UniversalExportService.__new__(UniversalExportService)
+    exporter.entity_type = 'patient_invoices'
+    exporter.config = SimpleNamespace(plural_name='Patient Invoices')
+    exporter.columns = COLUMNS
+    exporter.chunk_rows = 500
+
+    def iter_rows(*args, **kwargs):
+        for i in range(1200):
+            yield (f"INV-{i}", date(2026, 3, 31), Decimal('1250.50'),
+                   'paid' if i % 2 else 'unpaid', False)
+
+    monkeypatch.setattr(exporter, 'iter_rows', iter_rows)
+    return exporter
+
+
+class TestUniversalExport:
+
+    def test_csv_streams_in_chunks(self, exporter):
+        chunks = list(exporter.stream_csv({}, uuid.uuid4()))
+
+        assert len(chunks) == 3
+        rows = list(csv.reader(io.StringIO(''.join(chunks).lstrip('\ufeff'))))
+        assert rows[0] == ['Invoice #', 'Date', 'Total', 'Status', 'Cancelled']
+        assert rows[1] == ['INV-0', '2026-03-31', '1250.50', 'Unpaid', 'No']
+        assert len(rows) == 1201
+
+    def test_xlsx_keeps_native_types(self, exporter):
+        openpyxl = pytest.importorskip('openpyxl')
+        content = b''.join(exporter.stream_xlsx({}, uuid.uuid4()))
+
+        sheet = openpyxl.load_workbook(io.BytesIO(content), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == ('Invoice #', 'Date', 'Total', 'Status', 'Cancelled')
+        assert rows[2][2] == 1250.5 and rows[2][3] == 'Paid'
+        assert rows[2][1].date() == date(2026, 3, 31)
+        assert len(rows) == 1201
+
+    def test_rows_follow_the_list_sort(self, exporter):
+        exporter.model_class = ExportInvoice
+        exporter.config = SimpleNamespace(
+            fields=[SimpleNamespace(name='number', db_column='invoice_number')],
+            default_sort_field='invoice_date', default_sort_direction='desc')
+
+        def order_by(sort_by=None, sort_order=None):
+            query = exporter._apply_sorting(select(ExportInvoice), sort_by, sort_order)
+            return str(query).split('ORDER BY ')[1]
+
+        assert order_by('number', 'asc') == 'export_invoices.invoice_number ASC'
+        assert order_by('invoice_date', 'asc') == 'export_invoices.invoice_date ASC'
+        assert order_by() == 'export_invoices.invoice_date DESC'
+        assert order_by('no_such_field', 'asc') == 'export_invoices.invoice_date DESC'
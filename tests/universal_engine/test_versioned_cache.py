@@ -0,0 +1,72 @@
+# tests/universal_engine/test_versioned_cache.py
+# pytest tests/universal_engine/test_versioned_cache.py
+
+import time
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.engine.service_cache_backend import LocalServiceCacheBackend
+from app.engine.versioned_cache import PendingCommitWork, VersionStampedCache
+
+
+class _Cache(VersionStampedCache):
+    op = 'test_versioned_cache'
+    scope_index = 1
+    max_entries = 2
+
+
+def _build(name):
+    return lambda session: SimpleNamespace(name=name, version=None, built_at=time.monotonic())
+
+
+class TestVersionStampedCache:
+
+    def test_invalidation_is_scoped_and_broadcast(self):
+        namespace = uuid.uuid4().hex
+        worker_a = _Cache(ttl_seconds=60, backend=LocalServiceCacheBackend(namespace))
+        worker_b = _Cache(ttl_seconds=60, backend=LocalServiceCacheBackend(namespace))
+        on_a = worker_a.get_or_build(('x', 'h1'), _build('a'), session=object())
+        on_b = worker_b.get_or_build(('x', 'h1'), _build('b'), session=object())
+        other = worker_b.get_or_build(('x', 'h2'), _build('b2'), session=object())
+
+        worker_a.invalidate('h1')
+
+        assert worker_a.get_or_build(('x', 'h1'), _build('a'), session=object()) is not on_a
+        assert worker_b.get_or_build(('x', 'h1'), _build('b'), session=object()) is not on_b
+        assert worker_b.get_or_build(('x', 'h2'), _build('b2'), session=object()) is other
+
+    def test_oldest_entries_are_evicted(self):
+        cache = _Cache(ttl_seconds=60)
+        first = cache.get_or_build(('x', 'h1'), _build('1'), session=object())
+        cache.get_or_build(('x', 'h2'), _build('2'), session=object())
+        cache.get_or_build(('x', 'h3'), _build('3'), session=object())
+
+        assert cache.get_or_build(('x', 'h1'), _build('1'), session=object()) is not first
+
+
+class TestPendingCommitWork:
+
+    def test_runs_once_the_outermost_transaction_commits(self):
+        applied = []
+        work = PendingCommitWork('test_pending_commit_work', lambda session, pending: applied.append(pending))
+        with Session(create_engine('sqlite://')) as session:
+            session.connection()
+            work.collect(session).add('rolled back')
+            session.rollback()
+
+            work.collect(session).add('kept')
+            with session.begin_nested():
+                work.collect(session).add('released')
+            try:
+                with session.begin_nested():
+                    raise ValueError
+            except ValueError:
+                pass
+            assert applied == []
+
+            session.commit()
+
+        assert applied == [{'kept', 'released'}]